@@ -1,15 +1,17 @@
 from datetime import datetime
+from typing import List
 
-from fastapi import APIRouter, Security, Depends, Query, HTTPException
+from fastapi import APIRouter, Security, Depends, Query, HTTPException, Header
 from motor.motor_asyncio import AsyncIOMotorClient
-from starlette.responses import StreamingResponse
 from stralib import get_strategy_signal, get_strategy_flow
 
+from app.core.errors import DataQueryTimeout
+from app.core.executor import run_blocking
 from app.core.jwt import get_current_user_authorizer
 from app.db.mongodb import get_database
 from app.extentions import logger
 from app.service.datetime import get_early_morning
-from app.service.df import generator_streamer
+from app.service.df import dataframe_response, negotiate_dataframe_format
 from app.service.permission import check_robot_permission, check_equipment_permission
 
 router = APIRouter()
@@ -20,6 +22,10 @@ async def get_adam_signal(
     sid: str = Query(..., description="标识符"),
     start_datetime: datetime = Query(None, description="开始时间"),
     end_datetime: datetime = Query(None, description="结束时间"),
+    format: str = Query(None, regex="^(pickle|arrow|parquet)$", description="返回格式, 未指定时按Accept请求头协商, 默认为pickle"),
+    columns: List[str] = Query(None, description="返回的列, 默认返回全部列"),
+    compression: str = Query(None, description="压缩算法, arrow可选gzip/bz2/brotli/lz4/zstd, parquet可选snappy/gzip/brotli/lz4/zstd"),
+    accept: str = Header(None),
     db: AsyncIOMotorClient = Depends(get_database),
     user=Security(get_current_user_authorizer(), scopes=["稻草人数据:查看"]),
 ):
@@ -30,11 +36,16 @@ async def get_adam_signal(
     start_datetime = start_datetime or get_early_morning()
     end_datetime = end_datetime or get_early_morning()
     try:
-        df = get_strategy_signal(sid, start_datetime, end_datetime)
+        df = await run_blocking(get_strategy_signal, sid, start_datetime, end_datetime)
+    except DataQueryTimeout:
+        raise
     except Exception as e:
         logger.error(f"[查询装备({sid})信号失败] {e}")
         raise HTTPException(status_code=400, detail=f"查询装备列表发生错误，错误信息: {e}")
-    return StreamingResponse(generator_streamer(df))
+    try:
+        return dataframe_response(df, negotiate_dataframe_format(format, accept), columns, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/flow/", description="查询机器人流水数据")
@@ -42,6 +53,10 @@ async def get_adam_flow(
     sid: str = Query(..., description="标识符"),
     start_datetime: datetime = Query(None, description="开始时间"),
     end_datetime: datetime = Query(None, description="结束时间"),
+    format: str = Query(None, regex="^(pickle|arrow|parquet)$", description="返回格式, 未指定时按Accept请求头协商, 默认为pickle"),
+    columns: List[str] = Query(None, description="返回的列, 默认返回全部列"),
+    compression: str = Query(None, description="压缩算法, arrow可选gzip/bz2/brotli/lz4/zstd, parquet可选snappy/gzip/brotli/lz4/zstd"),
+    accept: str = Header(None),
     db: AsyncIOMotorClient = Depends(get_database),
     user=Security(get_current_user_authorizer(), scopes=["稻草人数据:查看"]),
 ):
@@ -49,8 +64,13 @@ async def get_adam_flow(
     start_datetime = start_datetime or get_early_morning()
     end_datetime = end_datetime or get_early_morning()
     try:
-        df = get_strategy_flow(sid, start_datetime, end_datetime)
+        df = await run_blocking(get_strategy_flow, sid, start_datetime, end_datetime)
+    except DataQueryTimeout:
+        raise
     except Exception as e:
         logger.error(f"[查询机器人({sid})流水失败] {e}")
         raise HTTPException(status_code=400, detail=f"查询机器人列表发生错误，错误信息: {e}")
-    return StreamingResponse(generator_streamer(df))
+    try:
+        return dataframe_response(df, negotiate_dataframe_format(format, accept), columns, compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,4 +1,3 @@
-import copy
 import logging
 from datetime import datetime
 
@@ -10,12 +9,12 @@ from pymongo.errors import DuplicateKeyError
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
 from app.core.jwt import get_current_user_authorizer
-from app.crud.robot import get_robot, 创建机器人
+from app.crud.robot import 创建机器人
 from app.db.mongodb import get_database
 from app.enums.robot import 机器人状态
 from app.models.robot import Robot
 from app.schema.robot import 机器人inCreate
-from app.service.backtest import 初始化回测数据, 获取回测数据, get_user_config, get_robot_data, RobotMatchUp, format_回测数据, init_start
+from app.service.backtest import 初始化回测数据, 获取回测数据, BacktestSession, init_start
 from app.service.datetime import get_early_morning
 from app.service.robots.robot import 生成机器人标识符, 获取风控装备列表
 from app.service.str.styles import to_underline_dict, to_hump_dict
@@ -40,63 +39,51 @@ async def get_backtest_data(websocket: WebSocket, db: AsyncIOMotorClient = Depen
 @router.websocket("/robot", name="机器人回测")
 async def 机器人回测(websocket: WebSocket, db: AsyncIOMotorClient = Depends(get_database)):
     await websocket.accept()
-    while True:
-        try:
-            data = await websocket.receive_json()
-        except WebSocketDisconnect as e:
-            logging.warning(f"[{e}]websocket服务等待超时， 自动断开链接")
-            await websocket.close()
-            break
-        json_data = to_underline_dict(data)
-        event = json_data["event"]
-        data = json_data["data"]
-        if event == "start":
-            init_start(data, logging)
-            ret_data = {"event": "start_callback", "data": to_hump_dict(data)}
-            await websocket.send_json(ret_data)
-        elif event == "next":
-            user_config = data["user_config"]
-            is_auto = data["is_auto"]
-            robot = await get_robot(data["robot_id"], db)
-            fundbal = int(user_config.pop("fund_available", 500000))
-            mktval = int(user_config.pop("market_value", 0) or 0)
-            asset = {"fundbal": fundbal, "mktval": mktval}
-            stocks = user_config.pop("stocks", []) or []
-            for stock in stocks:
-                stock["stopup"] = 99999999
-                stock["stopdown"] = 0
-            userconfig_obj = get_user_config(robot, data["start"], data["end"])
+    session = BacktestSession(websocket, db)
+    try:
+        while True:
             try:
-                robot_data = get_robot_data(robot, data["start"], data["end"])
-            except Exception as e:
-                logging.warning(f"backtest_next[结束] {e}", exc_info=True)
-                await websocket.send_json({"event": "end", "data": "获取机器人数据异常"})
+                data = await websocket.receive_json()
+            except WebSocketDisconnect as e:
+                logging.warning(f"[{e}]websocket服务等待超时， 自动断开链接")
                 await websocket.close()
                 break
-            robot_match_up = RobotMatchUp(asset, stocks, userconfig_obj, robot_data)
-            try:
-                for item in robot_match_up.robot_yield_trader():
-                    tmp = tuple(item.items())[0]
-                    result = format_回测数据(tmp[0], copy.deepcopy(tmp[1]))
-                    ret_data = {"event": "backtest_data", "data": result}
-                    await websocket.send_json(ret_data)
-                    if not is_auto:
-                        if result["当日信号"]:
-                            break
-                else:
+            json_data = to_underline_dict(data)
+            event = json_data["event"]
+            data = json_data["data"]
+            if event == "start":
+                init_start(data, logging)
+                ret_data = {"event": "start_callback", "data": to_hump_dict(data)}
+                await websocket.send_json(ret_data)
+            elif event == "next":
+                try:
+                    robot_match_up = await session.prepare(data)
+                except Exception as e:
+                    logging.warning(f"backtest_next[结束] {e}", exc_info=True)
+                    await websocket.send_json({"event": "end", "data": "获取机器人数据异常"})
+                    await websocket.close()
+                    break
+                try:
+                    finished = await session.stream(robot_match_up, data["is_auto"])
+                except WebSocketDisconnect as e:
+                    logging.warning(f"[{e}]websocket连接已断开, 取消回测")
+                    break
+                except Exception as e:
+                    logging.warning(f"backtest_next[结束] {e}", exc_info=True)
+                    await websocket.send_json({"event": "end", "data": "回测数据异常"})
+                    await websocket.close()
+                    break
+                if finished:
                     logging.warning(f"backtest_next[结束] success")
                     await websocket.send_json({"event": "end"})
                     await websocket.close()
                     break
-            except Exception as e:
-                logging.warning(f"backtest_next[结束] {e}", exc_info=True)
-                await websocket.send_json({"event": "end", "data": "回测数据异常"})
+            else:
+                logging.warning(f"关闭websocket连接")
                 await websocket.close()
                 break
-        else:
-            logging.warning(f"关闭websocket连接")
-            await websocket.close()
-            break
+    finally:
+        session.close()
 
 
 @router.post("/robots/new")
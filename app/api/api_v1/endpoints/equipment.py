@@ -7,6 +7,7 @@ from starlette.status import HTTP_201_CREATED, HTTP_422_UNPROCESSABLE_ENTITY, HT
 from stralib import FastTdate
 
 from app.core.errors import NoEquipError, EquipCreateNotAllowed, EquipmentDeleteNotAllowed, RecordDoesNotExist, StrategySignalError
+from app.core.executor import run_blocking
 from app.core.jwt import get_current_user_authorizer
 from app.crud.client_base import get_client_equipment_count
 from app.crud.equipment import (
@@ -281,7 +282,7 @@ async def create_equipment(新装备: 装备InCreate, db: AsyncIOMotorClient = D
         # 手动传入时插入一个空信号，避免查不到信号而报错
         empty_signal = generate_empty_adam_signal(online_time)
         try:
-            update_adam_strategy_signal(装备字典["标识符"], empty_signal, online_time, online_time)
+            await run_blocking(update_adam_strategy_signal, 装备字典["标识符"], empty_signal, online_time, online_time)
         except Exception as e:
             raise StrategySignalError(message=f"更新策略数据错误，错误信息：{e}")
     else:
@@ -368,7 +369,7 @@ async def candlestick_chart(
 ):
     if push_forward:
         start = FastTdate.last_tdate(start)
-    data = KDataDiagram(symbol=symbol).market(start, end)
+    data = await run_blocking(KDataDiagram(symbol=symbol).market, start, end)
     return [CandlestickInResponse(**x) for x in data]
 
 
@@ -32,6 +32,10 @@ from app.service.fund_account.fund_account import (
     update_fund_account_by_flow,
     update_position_by_flow,
 )
+from app.service.fund_account.statistics import (
+    rebuild_fund_account_statistics,
+    update_statistics_by_flow,
+)
 from app.service.fund_account.validator import (
     capital_validation,
     date_validation,
@@ -45,6 +49,7 @@ from app.service.fund_account.validator import (
     user_validation,
     withdraw_validation,
 )
+from app.service.portfolio.snapshot import invalidate_portfolio_snapshot
 from app.utils.datetime import date2datetime
 
 router = APIRouter()
@@ -73,8 +78,10 @@ async def create_fund_account_flow_view(
     await position_validation(db, flow)
     await update_position_by_flow(db, flow)
     flow_in_db = await create_fund_account_flow(db, flow)
+    await update_statistics_by_flow(db, flow_in_db)
     await update_fund_account_by_flow(db, fund_account, flow_in_db)
     await set_portfolio_import_date(db, fund_account)
+    await invalidate_portfolio_snapshot(db, flow_in_db.fund_id)
     return flow_in_db
 
 
@@ -129,7 +136,9 @@ async def update_fund_account_flow_view(
         raise e
     await update_position_by_flow(db, flow)
     result = await update_fund_account_flow_by_id(db, flow_id, flow)
+    await rebuild_fund_account_statistics(db, flow.fund_id, flow.symbol)
     await update_fund_account_by_flow(db, fund_account, flow)
+    await invalidate_portfolio_snapshot(db, flow.fund_id)
     return result
 
 
@@ -155,9 +164,11 @@ async def delete_fund_account_flow_view(
     flow.fundeffect = PyDecimal(-1 * flow.fundeffect.to_decimal())
     flow.stkeffect = -flow.stkeffect
     result = await delete_fund_account_flow_by_id(db, flow_id)
+    await rebuild_fund_account_statistics(db, flow.fund_id, flow.symbol)
     import_date = await set_portfolio_import_date(db, fund_account)
     await update_position_by_flow(db, flow)
     await update_fund_account_by_flow(db, fund_account, flow, import_date)
+    await invalidate_portfolio_snapshot(db, flow.fund_id)
     return result
 
 
@@ -215,6 +226,7 @@ async def deposit_view(
     await update_fund_account_by_flow(db, fund_account, flow)
     result = await create_fund_account_flow(db, flow)
     await set_portfolio_import_date(db, fund_account)
+    await invalidate_portfolio_snapshot(db, flow.fund_id)
     return result
 
 
@@ -243,4 +255,5 @@ async def withdraw_view(
     await update_fund_account_by_flow(db, fund_account, flow)
     result = await create_fund_account_flow(db, flow)
     await set_portfolio_import_date(db, fund_account)
+    await invalidate_portfolio_snapshot(db, flow.fund_id)
     return result
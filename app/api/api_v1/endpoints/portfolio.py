@@ -163,13 +163,14 @@ async def yield_trend_get_view(
     start_date: datetime = Query(None),
     end_date: datetime = Query(None),
     push_forward: bool = Query(False),
+    max_points: int = Query(None, ge=2, description="最大数据点数, 超出时等间隔抽样"),
     db: AsyncIOMotorClient = Depends(get_database),
     user=Security(get_current_user_authorizer(), scopes=["组合:查看"]),
 ):
     if push_forward:
         start_date = FastTdate.last_tdate(start_date)
     try:
-        return await get_yield_trend(db, portfolio_id, start_date, end_date)
+        return await get_yield_trend(db, portfolio_id, start_date, end_date, max_points)
     except EntityDoesNotExist:
         raise HTTPException(404, detail=f"未找到组合`{portfolio_id}`。")
 
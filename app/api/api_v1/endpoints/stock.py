@@ -12,6 +12,8 @@ from pymongo import DeleteOne, UpdateOne
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 from stralib import FastTdate
 
+from app.core.errors import DataQueryTimeout
+from app.core.executor import run_blocking
 from app.core.jwt import get_current_user_authorizer
 from app.crud.stock import (
     bulk_write_stock_pool,
@@ -33,7 +35,7 @@ from app.enums.stock import 自选股分类
 from app.models.base.stock import 股票基本信息
 from app.models.rwmodel import PyObjectId
 from app.models.stock import FavoriteStock
-from app.outer_sys.hq import get_security_hq, get_security_info, get_security_ticks
+from app.outer_sys.hq import get_security_hqs, get_security_info, get_security_ticks
 from app.schema.base import UpdateResult
 from app.schema.common import ResultInResponse
 from app.schema.stock import (
@@ -171,12 +173,12 @@ async def get_market_index_data(
     if push_forward:
         start_date = FastTdate.last_tdate(start_date)
     try:
-        return [
-            MarketIndexDataInResponse(**x)
-            for x in KDataDiagram(symbol=symbol).market(
-                start_date.date(), end_date.date()
-            )
-        ]
+        data = await run_blocking(
+            KDataDiagram(symbol=symbol).market, start_date.date(), end_date.date()
+        )
+        return [MarketIndexDataInResponse(**x) for x in data]
+    except DataQueryTimeout:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"获取市场指数数据失败，错误信息: {e}")
 
@@ -189,15 +191,17 @@ async def quotation_list_view(
         ..., embed=True, description="股票市场字符串列表，如[000001_0,600001_1]"
     )
 ):
+    security_list = await get_security_hqs(
+        [tuple(code.split("_")) for code in symbol_exchange_list],
+        return_exceptions=True,
+    )
     results = []
-    for code in symbol_exchange_list:
-        symbol, exchange = code.split("_")
-        try:
-            security = await get_security_hq(symbol, exchange)
-        except (ValidationError, HQSourceError, SecurityNotFoundError):
+    for security in security_list:
+        if isinstance(security, (ValidationError, HQSourceError, SecurityNotFoundError)):
             continue
-        else:
-            results.append(security)
+        if isinstance(security, Exception):
+            raise security
+        results.append(security)
     return results
 
 
@@ -232,7 +236,9 @@ async def get_stock_k_line_view(
         ..., title="结束日期", description="ISO 8601日期格式的字符串, 如: 2020-01-01 00:00:00"
     ),
 ):
-    data = KDataDiagram(symbol=symbol, exchange=exchange).stock(start_date, end_date)
+    data = await run_blocking(
+        KDataDiagram(symbol=symbol, exchange=exchange).stock, start_date, end_date
+    )
     return data
 
 
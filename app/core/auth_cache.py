@@ -0,0 +1,32 @@
+import re
+from typing import Dict, List, Optional, Pattern
+
+from cacheout import Cache
+
+from app import settings
+
+# 解码后的token, 缓存时长不超过token剩余有效期
+token_cache = Cache(maxsize=settings.auth.auth_cache_maxsize, ttl=settings.auth.token_cache_ttl)
+# 当前用户, 以用户名为键
+user_cache = Cache(maxsize=settings.auth.auth_cache_maxsize, ttl=settings.auth.user_cache_ttl)
+# 预编译的权限匹配器, 以用户的角色列表为键
+scope_matcher_cache = Cache(maxsize=settings.auth.auth_cache_maxsize, ttl=settings.auth.permission_cache_ttl)
+
+
+def compile_scope_matcher(permissions: Dict[str, List[str]]) -> Pattern:
+    """由权限字典生成权限匹配器, `*`匹配任意权限."""
+    user_security_scopes = [":".join([key, value]).replace("*", ".*") for key in permissions for value in permissions[key]]
+    return re.compile("|".join(user_security_scopes))
+
+
+def invalidate_user_cache(username: Optional[str] = None) -> None:
+    """用户信息变更后清除缓存, 未指定用户名时清空全部用户缓存."""
+    if username is None:
+        user_cache.clear()
+    else:
+        user_cache.delete(username)
+
+
+def invalidate_permission_cache() -> None:
+    """角色或权限变更后清空权限匹配器缓存."""
+    scope_matcher_cache.clear()
@@ -1,28 +1,63 @@
-from typing import Dict
+from typing import Dict, Optional
+
+import aiohttp
 
 from app import settings
 from app.core.discuzqlib.client import DiscuzqClient
+from app.extentions import logger
 
 
 class Discuzq:
     clients: Dict[str, DiscuzqClient] = {}
     _admin: DiscuzqClient = None
+    _session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def session(cls) -> aiohttp.ClientSession:
+        """所有社区客户端共享的keep-alive会话"""
+        if cls._session is None or cls._session.closed:
+            cls._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.discuzq.max_connections),
+                timeout=aiohttp.ClientTimeout(total=settings.discuzq.timeout),
+            )
+            # 会话重建后已有客户端持有的会话失效
+            cls.clients = {}
+            cls._admin = None
+        return cls._session
 
     @classmethod
     def client(cls, username=None, password=None):
         """获取discourse的client"""
-        cl = cls.clients.get(
-            username, DiscuzqClient(settings.discuzq.base_url, username, password)
-        )
-        cls.clients[username] = cl
+        session = cls.session()
+        cl = cls.clients.get(username)
+        if cl is None:
+            cl = DiscuzqClient(settings.discuzq.base_url, username, password, session=session)
+            cls.clients[username] = cl
         return cl
 
     @classmethod
     def admin(cls):
+        session = cls.session()
         if cls._admin is None:
             cls._admin = DiscuzqClient(
                 settings.discuzq.base_url,
                 settings.discuzq.admin,
                 settings.discuzq.password,
+                session=session,
             )
         return cls._admin
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭共享会话"""
+        session, cls._session = cls._session, None
+        cls.clients = {}
+        cls._admin = None
+        if session is not None and not session.closed:
+            await session.close()
+
+
+async def close_discuzq() -> None:
+    logger.info("正在关闭社区会话...")
+    await Discuzq.close()
+    logger.info("社区会话已关闭.")
@@ -1,6 +1,6 @@
 import asyncio
 from functools import wraps
-from typing import List
+from typing import List, Optional
 
 import aiohttp
 
@@ -20,25 +20,29 @@ def login_required(func):
 def renew_client_token(func):
     """
     装饰器，如果发现401，那么就进行登陆或者access
-    token的renew操作
+    token的renew操作，然后重新发起请求
     """
 
     @wraps(func)
     async def wrapper(*args, **kwargs):
+        access_token = args[0].access_token
         try:
             return await func(*args, **kwargs)
         except DiscuzqError:
-            if args[0].access_token != "":
-                return await args[0].renew_token()
+            if access_token != "":
+                await args[0].renew_token(access_token)
             else:
                 await args[0].login()
-                return await func(*args, **kwargs)
+            return await func(*args, **kwargs)
 
     return wrapper
 
 
 class DiscuzqClient:
-    def __init__(self, url, username, password):
+    def __init__(self, url, username, password, session: Optional[aiohttp.ClientSession] = None):
+        """
+        session: 共享的会话，多个客户端共用同一个连接池，未指定时创建独立的会话
+        """
         self.max_len = 15  # 社区用户长度最大为15
         self.url = url
         self.login_uri = "{}/{}".format(self.url, "api/login")
@@ -47,11 +51,17 @@ class DiscuzqClient:
         self.password = password
         self.access_token = ""
         self.refresh_token = ""
-        self._sess = aiohttp.ClientSession()
+        self._sess = session or aiohttp.ClientSession()
+        self._auth_lock = asyncio.Lock()
+
+    @property
+    def headers(self) -> dict:
+        """认证请求头，token随请求发送，不绑定在会话上"""
+        return {"Authorization": "Bearer {}".format(self.access_token)} if self.access_token else {}
 
     @renew_client_token
     async def _patch_req(self, uri, payload):
-        async with self._sess.patch(uri, json=payload) as resp:
+        async with self._sess.patch(uri, json=payload, headers=self.headers) as resp:
             res = await resp.json()
             if "errors" in res:
                 raise DiscuzqError(res["errors"])
@@ -65,7 +75,7 @@ class DiscuzqClient:
         if limit:
             uri = "{}&page[limit]={}".format(uri, limit)
 
-        async with self._sess.get(uri) as resp:
+        async with self._sess.get(uri, headers=self.headers) as resp:
             res = await resp.json()
             if "errors" in res:
                 raise DiscuzqError(res["errors"])
@@ -74,7 +84,7 @@ class DiscuzqClient:
 
     @renew_client_token
     async def _delete_req(self, uri, payload):
-        async with self._sess.delete(uri, json=payload) as resp:
+        async with self._sess.delete(uri, json=payload, headers=self.headers) as resp:
             res = await resp.json()
             if "errors" in res:
                 raise DiscuzqError(res["errors"])
@@ -83,63 +93,63 @@ class DiscuzqClient:
 
     @renew_client_token
     async def _post_req(self, uri, payload):
-        async with self._sess.post(uri, json=payload) as resp:
+        async with self._sess.post(uri, json=payload, headers=self.headers) as resp:
             res = await resp.json()
             if "errors" in res:
                 raise DiscuzqError(res["errors"])
             else:
                 return res
 
-    async def renew_token(self):
+    async def renew_token(self, expired_token: Optional[str] = None):
         """
         访问API进行accesss token的renew操作
-        """
-        payload = {
-            "data": {
-                "attributes": {
-                    "grant_type": "refresh_token",
-                    "refresh_token": self.refresh_token,
+        expired_token: 请求失败时使用的token，若token已被其他并发请求更新则不再renew
+        """
+        async with self._auth_lock:
+            if expired_token is not None and self.access_token != expired_token:
+                return
+            payload = {
+                "data": {
+                    "attributes": {
+                        "grant_type": "refresh_token",
+                        "refresh_token": self.refresh_token,
+                    }
                 }
             }
-        }
-        self._sess = aiohttp.ClientSession(headers={})
-        async with self._sess.post(
-            "{}/api/refresh-token".format(self.url), json=payload
-        ) as resp:
-            res = await resp.json()
-            if "errors" in res:
-                raise DiscuzqError(res["errors"])
-            else:
-                self.access_token = res["data"]["attributes"]["access_token"]
-                self.refresh_token = res["data"]["attributes"]["refresh_token"]
-                self._sess = aiohttp.ClientSession(
-                    headers={"Authorization": "Bearer {}".format(self.access_token)}
-                )
+            async with self._sess.post(
+                "{}/api/refresh-token".format(self.url), json=payload
+            ) as resp:
+                res = await resp.json()
+                if "errors" in res:
+                    raise DiscuzqError(res["errors"])
+                else:
+                    self.access_token = res["data"]["attributes"]["access_token"]
+                    self.refresh_token = res["data"]["attributes"]["refresh_token"]
 
     async def login(self):
         """
-        登陆
-        """
-        payload = {
-            "data": {
-                "attributes": {
-                    "username": self.username,
-                    "password": self.password
-                    if self.password
-                    else "{}@discuzQcom".format(self.username),
+        登陆，并发请求只登陆一次
+        """
+        async with self._auth_lock:
+            if self.access_token != "":
+                return
+            payload = {
+                "data": {
+                    "attributes": {
+                        "username": self.username,
+                        "password": self.password
+                        if self.password
+                        else "{}@discuzQcom".format(self.username),
+                    }
                 }
             }
-        }
-        async with self._sess.post(self.login_uri, json=payload) as resp:
-            res = await resp.json()
-            if "errors" in res:
-                raise DiscuzqError(res["errors"])
-            else:
-                self.access_token = res["data"]["attributes"]["access_token"]
-                self.refresh_token = res["data"]["attributes"]["refresh_token"]
-                self._sess = aiohttp.ClientSession(
-                    headers={"Authorization": "Bearer {}".format(self.access_token)}
-                )
+            async with self._sess.post(self.login_uri, json=payload) as resp:
+                res = await resp.json()
+                if "errors" in res:
+                    raise DiscuzqError(res["errors"])
+                else:
+                    self.access_token = res["data"]["attributes"]["access_token"]
+                    self.refresh_token = res["data"]["attributes"]["refresh_token"]
 
     async def register(self, username: str, password: str):
         """
@@ -158,13 +168,12 @@ class DiscuzqClient:
                 },
             }
         }
-        async with self._sess.post(self.register_uri, json=payload) as resp:
+        # 注册返回的是新用户的token，不能覆盖当前客户端(如管理员)的token
+        async with self._sess.post(self.register_uri, json=payload, headers=self.headers) as resp:
             res = await resp.json()
             if "errors" in res:
                 raise DiscuzqError(res["errors"])
             else:
-                self.access_token = res["data"]["attributes"]["access_token"]
-                self.refresh_token = res["data"]["attributes"]["refresh_token"]
                 return {"id": int(res["data"]["id"])}
 
     async def getsert_user(self, username: str, password: str):
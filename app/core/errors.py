@@ -363,6 +363,11 @@ class RecordDoesNotExist(BaseError):
     message = "未查询到记录信息"
 
 
+class DataQueryTimeout(BaseError):
+    code = "114008"
+    message = "数据查询超时，请稍后重试"
+
+
 # # 厂商数据异常 115xxx
 
 
@@ -522,4 +527,9 @@ class InvalidManufacturerAPIReq(BaseError):
 # 消息
 class SMSSendError(BaseError):
     code = "600001"
-    message = "短消息发送失败"
\ No newline at end of file
+    message = "短消息发送失败"
+
+
+class MessageSendError(BaseError):
+    code = "600002"
+    message = "消息发送失败"
\ No newline at end of file
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from app import settings
+from app.core.errors import DataQueryTimeout
+from app.extentions import logger
+
+EXECUTOR_MAPPING = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+class BlockingExecutor:
+    """阻塞调用执行池.
+
+    - 将stralib/zvt等同步数据调用放到线程池或进程池中执行, 避免阻塞事件循环
+    - 每次调用可单独指定超时时间, 超时抛出`DataQueryTimeout`, 已提交的任务不会被中断
+    - 按函数统计调用次数、失败次数、超时次数及耗时
+    - 使用进程池时, 调用的函数及参数必须可以被pickle
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 8, timeout: float = 30):
+        if kind not in EXECUTOR_MAPPING:
+            raise ValueError(f"不支持的执行池类型`{kind}`, 可选: {list(EXECUTOR_MAPPING)}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._running = 0
+        self._stats = defaultdict(lambda: {"calls": 0, "errors": 0, "timeouts": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = EXECUTOR_MAPPING[self.kind](max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """在执行池中调用`func`, `timeout`为None时使用默认超时时间, 为0时不限制."""
+        name = getattr(func, "__qualname__", repr(func))
+        timeout = self.timeout if timeout is None else timeout
+        stats = self._stats[name]
+        stats["calls"] += 1
+        self._running += 1
+        start = time.perf_counter()
+        future = asyncio.get_event_loop().run_in_executor(self._get_executor(), partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout or None)
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            logger.warning(f"[阻塞调用超时] {name} 超过{timeout}秒未返回.")
+            raise DataQueryTimeout
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            self._running -= 1
+            elapsed = time.perf_counter() - start
+            stats["total_seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        """执行池统计."""
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "running": self._running,
+            "funcs": {
+                name: {**stats, "avg_seconds": stats["total_seconds"] / stats["calls"] if stats["calls"] else 0}
+                for name, stats in self._stats.items()
+            },
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """关闭执行池."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+blocking_executor = BlockingExecutor(kind=settings.executor.kind, max_workers=settings.executor.max_workers, timeout=settings.executor.timeout)
+# 机器人回测逐日推进生成器, 生成器无法跨进程传递, 固定使用线程池, 并与数据查询隔离
+backtest_executor = BlockingExecutor(kind="thread", max_workers=settings.executor.backtest_max_workers, timeout=settings.executor.timeout)
+# 机器人构建及运行, 机器人对象需要在事件循环中继续使用且共享RobotData, 固定使用线程池
+robot_executor = BlockingExecutor(kind="thread", max_workers=settings.executor.robot_max_workers, timeout=settings.executor.timeout)
+# 计算密集型任务(如时点数据反推), 使用进程池避免占用事件循环所在进程的GIL
+cpu_executor = BlockingExecutor(kind="process", max_workers=settings.executor.cpu_max_workers, timeout=0)
+
+
+async def run_blocking(func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """在阻塞调用执行池中调用`func`."""
+    return await blocking_executor.run(func, *args, timeout=timeout, **kwargs)
+
+
+async def close_blocking_executor() -> None:
+    """关闭阻塞调用执行池."""
+    logger.info("正在关闭阻塞调用执行池...")
+    blocking_executor.shutdown()
+    backtest_executor.shutdown()
+    robot_executor.shutdown()
+    cpu_executor.shutdown()
+    logger.info("阻塞调用执行池已关闭.")
@@ -1,4 +1,4 @@
-import re
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -8,13 +8,14 @@ from fastapi.security import SecurityScopes
 from jwt import PyJWTError
 
 from app import settings
+from app.core.auth_cache import token_cache, user_cache
 from app.core.errors import (
     InvalidManufacturerAPIReq,
     PermissionDenied,
     TokenValidationError,
 )
 from app.core.security import verify_password
-from app.crud.permission import 获取某用户的所有权限
+from app.crud.permission import 获取某用户的权限匹配器
 from app.crud.user import get_user_by_username
 from app.db.mongodb import AsyncIOMotorClient, get_database
 from app.models.base.token import TokenPayload
@@ -24,19 +25,26 @@ from app.schema.user import User
 def _get_authorization_token(authorization: str = Header(...)):
     try:
         token_prefix, token = authorization.split(" ")
-        try:
-            payload = jwt.decode(
-                token,
-                key=settings.auth.get_rsa_public_key(),
-                audience=settings.auth.audience,
-                algorithms=settings.auth.algorithm,
-            )
-        except PyJWTError:
-            raise TokenValidationError(message="Token验证失败")
     except ValueError:
         raise TokenValidationError(message="无法解析的Header，检查是否正确设置了认证Header")
+    token_payload = token_cache.get(token)
+    if token_payload is not None:
+        return token_payload
+    try:
+        payload = jwt.decode(
+            token,
+            key=settings.auth.get_rsa_public_key(),
+            audience=settings.auth.audience,
+            algorithms=settings.auth.algorithm,
+        )
+    except PyJWTError:
+        raise TokenValidationError(message="Token验证失败")
     payload.update(token=token)
-    return TokenPayload(**payload)
+    token_payload = TokenPayload(**payload)
+    ttl = min(settings.auth.token_cache_ttl, payload["exp"] - time.time()) if "exp" in payload else settings.auth.token_cache_ttl
+    if ttl > 0:
+        token_cache.set(token, token_payload, ttl=ttl)
+    return token_payload
 
 
 async def _get_current_user(
@@ -44,11 +52,12 @@ async def _get_current_user(
     token_payload: TokenPayload = Depends(_get_authorization_token),
     security_scopes: SecurityScopes = SecurityScopes(),
 ) -> User:
-    dbuser = await get_user_by_username(db, token_payload.username)
-    permissions = await 获取某用户的所有权限(db, dbuser)
-    user_security_scopes = [":".join([key, value]).replace("*", ".*") for key in permissions.permissions for value in permissions.permissions[key]]
-    token_regex = "|".join(user_security_scopes)
-    r = re.compile(token_regex)
+    dbuser = user_cache.get(token_payload.username)
+    if dbuser is None:
+        dbuser = await get_user_by_username(db, token_payload.username)
+        if dbuser is not None:
+            user_cache.set(token_payload.username, dbuser)
+    r = await 获取某用户的权限匹配器(db, dbuser)
     for scope in security_scopes.scopes:
         if not r.match(scope):
             raise PermissionDenied(code="403", message=f"用户权限不足, 需要的权限: {security_scopes.scope_str}")
@@ -39,7 +39,7 @@ from app.core.errors import (
     UserAlreadyExist, NoPostError, EquipTooMany, NoFileError, NoActionError, CancelOrderError,
     TradeDateError, NoDataError, RobotTooMany, PortfolioCloseError, EquipVersionError, CRUDOperatorError,
     PortfolioSyncTypeError, TableFieldError, RecordDoesNotExist, StrategySignalError, StrategyDataError,
-    CreateQuantityLimit, SMSSendError)
+    CreateQuantityLimit, SMSSendError, DataQueryTimeout)
 from app.core.status import HTTP_461_DISC_ERROR
 
 
@@ -121,6 +121,7 @@ def register_exceptions(app):
     app.add_exception_handler(DataBaseError, DataBaseError.handler)
     app.add_exception_handler(DBConnectionError, DBConnectionError.handler)
     app.add_exception_handler(CRUDError, CRUDError.handler)
+    app.add_exception_handler(DataQueryTimeout, DataQueryTimeout.handler)
     app.add_exception_handler(CRUDOperatorError, CRUDOperatorError.handler)
     app.add_exception_handler(TableFieldError, TableFieldError.handler)
     app.add_exception_handler(RecordDoesNotExist, RecordDoesNotExist.handler)
@@ -51,6 +51,10 @@ def get_msg_config_collection(conn: AsyncIOMotorClient) -> AsyncIOMotorCollectio
     return conn[settings.db.DB_NAME][settings.collections.MESSAGE_CONFIG]
 
 
+def get_message_outbox_collection(conn: AsyncIOMotorClient) -> AsyncIOMotorCollection:
+    return conn[settings.db.DB_NAME][settings.collections.MESSAGE_OUTBOX]
+
+
 def get_error_log_collection(conn: AsyncIOMotorClient) -> AsyncIOMotorCollection:
     return conn[settings.db.DB_NAME][settings.collections.ERROR_LOG]
 
@@ -129,6 +133,10 @@ def get_fund_account_position_collection(conn: AsyncIOMotorClient) -> AsyncIOMot
     return conn[settings.db.DB_NAME][settings.collections.FUND_ACCOUNT_POSITION]
 
 
+def get_fund_account_statistics_collection(conn: AsyncIOMotorClient) -> AsyncIOMotorCollection:
+    return conn[settings.db.DB_NAME][settings.collections.FUND_ACCOUNT_STATISTICS]
+
+
 def get_position_time_series_data_collection(conn: AsyncIOMotorClient) -> AsyncIOMotorCollection:
     return conn[settings.db.DB_NAME][settings.collections.POSITION_TIME_SERIES_DATA]
 
@@ -145,6 +153,10 @@ def get_portfolio_analysis_collection(conn: AsyncIOMotorClient) -> AsyncIOMotorC
     return conn[settings.db.DB_NAME][settings.collections.PORTFOLIO_ANALYSIS]
 
 
+def get_portfolio_snapshot_collection(conn: AsyncIOMotorClient) -> AsyncIOMotorCollection:
+    return conn[settings.db.DB_NAME][settings.collections.PORTFOLIO_SNAPSHOT]
+
+
 def format_field_sort(sort_str: str) -> List[List]:
     """
     公共排序方法
@@ -1,6 +1,6 @@
 import logging
 from datetime import datetime
-from typing import List, Union
+from typing import Dict, List, Union
 
 import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -15,7 +15,7 @@ from app.crud.base import get_equipment_collection, get_collection_by_config, ge
 from app.crud.client_base import get_client_equipment_cursor
 from app.crud.discuzq import create_thread
 from app.crud.permission import 获取某用户的所有权限
-from app.crud.profile import get_profile_for_user
+from app.crud.profile import get_profile_for_user, get_profiles_for_users
 from app.crud.real_and_backtest import get_实盘回测_filter
 from app.enums.common import 回测评级数据集, 数据库排序
 from app.enums.equipment import 装备分类_3, 装备状态, EquipmentCollectionName, 装备状态更新操作类型Enum
@@ -44,6 +44,7 @@ from app.models.equipment import (
     基金定投实盘指标,
 )
 from app.models.equipment import 选股装备回测评级
+from app.models.robot import Robot
 from app.schema.common import ResultInResponse
 from app.schema.equipment import (
     装备InResponse,
@@ -82,14 +83,27 @@ async def 查询装备列表(conn: AsyncIOMotorClient, equipment_query: dict, li
     if "标识符" in db_query:
         db_query["标识符"] = {"$in": db_query["标识符"]}
     list_cursor = await get_client_equipment_cursor(conn, db_query, limit, skip, 排序, user=user)
+    rows = [row async for row in list_cursor]
+    profiles = await get_profiles_for_users(conn, [row["作者"] for row in rows])
     response = []
-    async for row in list_cursor:
-        row["作者"] = await get_profile_for_user(conn, row["作者"])
+    for row in rows:
+        row["作者"] = profiles[row["作者"]]
         equipment = 装备InResponse(**row)
         response.append(equipment)
     return response
 
 
+async def 查询机器人装备列表(conn: AsyncIOMotorClient, robot: Robot, user=None) -> Dict[str, List[装备InResponse]]:
+    """一次查询机器人引用的全部装备, 按装备列表字段分组并保持机器人中的顺序."""
+    categories = ["风控包列表", "择时装备列表", "风控装备列表", "选股装备列表", "交易装备列表"]
+    sids = list(dict.fromkeys(sid for category in categories for sid in getattr(robot, category) or []))
+    equipment_mapping = {}
+    if sids:
+        equipment_list = await 查询装备列表(conn, {"标识符": sids}, 0, 0, [], user=user)
+        equipment_mapping = {equipment.标识符: equipment for equipment in equipment_list}
+    return {category: [equipment_mapping[sid] for sid in getattr(robot, category) or [] if sid in equipment_mapping] for category in categories}
+
+
 async def 查询我的装备列表(conn: AsyncIOMotorClient, 筛选: str, 排序: str, 排序方式: str, user: User, 分类: 装备分类_3 = None) -> List[Equipment]:
     equipment_query = {"状态": {"$ne": "已删除"}, "分类": 分类 if 分类 else {"$ne": 分类}}
     user_permissions = await 获取某用户的所有权限(conn, user)
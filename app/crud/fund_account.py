@@ -1,20 +1,22 @@
-from datetime import date
-from typing import List, Optional
+from datetime import date, datetime
+from typing import List, Optional, Union
 
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import UpdateOne
+from pymongo import InsertOne, ReplaceOne, UpdateOne
 
 from app.core.errors import EntityDoesNotExist
 from app.crud.base import (
     get_fund_account_collection,
     get_fund_account_flow_collection,
     get_fund_account_position_collection,
+    get_fund_account_statistics_collection,
 )
 from app.enums.fund_account import Exchange, FlowTType
 from app.models.fund_account import (
     FundAccountFlowInDB,
     FundAccountInDB,
     FundAccountPositionInDB,
+    FundAccountStatisticsInDB,
 )
 from app.models.rwmodel import PyObjectId
 from app.schema.base import UpdateResult
@@ -51,6 +53,17 @@ async def get_fund_account_by_id(
     raise EntityDoesNotExist
 
 
+async def get_fund_account_from_db(
+    conn: AsyncIOMotorClient, *, ids: Optional[List[PyObjectId]] = None
+) -> List[FundAccountInDB]:
+    """查询资金账户列表."""
+    query = {}
+    if ids is not None:
+        query["_id"] = {"$in": ids}
+    cursor = get_fund_account_collection(conn).find(query)
+    return [FundAccountInDB(**fund_account) async for fund_account in cursor]
+
+
 async def update_fund_account_by_id(
     conn: AsyncIOMotorClient, _id: PyObjectId, fund_account: FundAccountInUpdate
 ) -> UpdateResult:
@@ -84,6 +97,13 @@ async def create_fund_account_flow(
     return fund_account_flow
 
 
+async def bulk_write_fund_account_flow(
+    conn: AsyncIOMotorClient, operations: List[Union[InsertOne, UpdateOne]]
+) -> None:
+    """批量写入资金账户流水."""
+    await get_fund_account_flow_collection(conn).bulk_write(operations)
+
+
 async def get_fund_account_flow_by_id(
     conn: AsyncIOMotorClient, _id: PyObjectId
 ) -> FundAccountFlowInDB:
@@ -98,16 +118,20 @@ async def get_fund_account_flow_from_db(
     conn: AsyncIOMotorClient,
     *,
     fund_id: Optional[str] = None,
+    fund_ids: Optional[List[str]] = None,
     ttype: Optional[List[FlowTType]] = None,
     start_date: Optional[date] = None,
     tdate: Optional[date] = None,
     end_date: Optional[date] = None,
     symbol: Optional[str] = None,
+    created_after: Optional[datetime] = None,
 ) -> List[FundAccountFlowInDB]:
     """查询资金账户流水."""
     query = {}
     if fund_id is not None:
         query["fund_id"] = fund_id
+    if fund_ids is not None:
+        query["fund_id"] = {"$in": fund_ids}
     if ttype is not None:
         query["ttype"] = {"$in": [t.value for t in ttype]}
     if start_date is not None:
@@ -123,6 +147,8 @@ async def get_fund_account_flow_from_db(
         query["symbol"] = symbol
     if tdate is not None:
         query["tdate"] = date2datetime(tdate)
+    if created_after is not None:
+        query["created_at"] = {"$gte": created_after}
     cursor = get_fund_account_flow_collection(conn).find(query).sort("tdate")
     return [FundAccountFlowInDB(**flow) async for flow in cursor]
 
@@ -196,10 +222,18 @@ async def update_fund_account_position_by_id(
     )
 
 
+async def bulk_write_fund_account_position(
+    conn: AsyncIOMotorClient, operations: List[Union[InsertOne, UpdateOne]]
+) -> None:
+    """批量写入资金账户持仓."""
+    await get_fund_account_position_collection(conn).bulk_write(operations)
+
+
 async def get_fund_account_position_from_db(
     conn: AsyncIOMotorClient,
     *,
     fund_id: Optional[str] = None,
+    fund_ids: Optional[List[str]] = None,
     symbol: Optional[str] = None,
     exchange: Optional[Exchange] = None,
 ) -> List[FundAccountPositionInDB]:
@@ -207,6 +241,8 @@ async def get_fund_account_position_from_db(
     query = {}
     if fund_id is not None:
         query["fund_id"] = fund_id
+    if fund_ids is not None:
+        query["fund_id"] = {"$in": fund_ids}
     if symbol is not None:
         query["symbol"] = symbol
     if exchange is not None:
@@ -224,3 +260,31 @@ async def get_fund_account_position_by_id(
     if row:
         return FundAccountPositionInDB(**row)
     raise EntityDoesNotExist
+
+
+async def get_fund_account_statistics_from_db(
+    conn: AsyncIOMotorClient,
+    *,
+    fund_id: str,
+    symbols: Optional[List[str]] = None,
+) -> List[FundAccountStatisticsInDB]:
+    """查询资金账户个股统计."""
+    query = {"fund_id": fund_id}
+    if symbols is not None:
+        query["symbol"] = {"$in": symbols}
+    cursor = get_fund_account_statistics_collection(conn).find(query)
+    return [FundAccountStatisticsInDB(**row) async for row in cursor]
+
+
+async def bulk_write_fund_account_statistics(
+    conn: AsyncIOMotorClient, operations: List[ReplaceOne]
+) -> None:
+    """批量写入资金账户个股统计."""
+    await get_fund_account_statistics_collection(conn).bulk_write(operations)
+
+
+async def delete_fund_account_statistics_many(
+    conn: AsyncIOMotorClient, query: dict
+) -> None:
+    """删除资金账户个股统计."""
+    await get_fund_account_statistics_collection(conn).delete_many(query)
@@ -1,9 +1,11 @@
+from datetime import datetime
 from typing import List
 
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 
-from app.crud.base import get_msg_config_collection
-from app.models.msg import MessageConfig
+from app.crud.base import get_message_outbox_collection, get_msg_config_collection
+from app.models.msg import MessageConfig, OutboxMessageInDB
 from app.models.rwmodel import PyObjectId
 from app.schema.base import UpdateResult
 from app.schema.common import ResultInResponse
@@ -45,3 +47,25 @@ async def get_msg_configs(conn: AsyncIOMotorClient, query: dict) -> List[Message
     rows = get_msg_config_collection(conn).find(db_query)
     if rows:
         return [MessageConfigInResponse(**row) async for row in rows]
+
+
+async def create_outbox_messages(conn: AsyncIOMotorClient, messages: List[OutboxMessageInDB]) -> None:
+    """写入发件箱, 已存在(`key`相同)的消息保持不变."""
+    if messages:
+        operations = [
+            UpdateOne({"key": message.key}, {"$setOnInsert": message.dict(by_alias=True)}, upsert=True) for message in messages
+        ]
+        await get_message_outbox_collection(conn).bulk_write(operations, ordered=False)
+
+
+async def get_outbox_messages(conn: AsyncIOMotorClient, query: dict) -> List[OutboxMessageInDB]:
+    rows = get_message_outbox_collection(conn).find(query)
+    return [OutboxMessageInDB(**row) async for row in rows]
+
+
+async def update_outbox_message(conn: AsyncIOMotorClient, message: OutboxMessageInDB) -> None:
+    """更新发件箱消息的发送状态."""
+    message.updated_at = datetime.utcnow()
+    await get_message_outbox_collection(conn).update_one(
+        {"_id": message.id}, {"$set": message.dict(include={"status", "attempts", "error", "sent_at", "updated_at"})}
+    )
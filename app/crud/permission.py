@@ -1,7 +1,8 @@
-from typing import Union
+from typing import Pattern, Union
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app.core.auth_cache import compile_scope_matcher, invalidate_permission_cache, scope_matcher_cache
 from app.core.errors import PermissionAlreadyExist, RoleAlreadyExist, PermissionDoesNotExist
 from app.core.utils import merge_two_dicts
 from app.crud.base import get_permissions_collection
@@ -42,6 +43,17 @@ async def 获取某用户的所有权限(conn: AsyncIOMotorClient, user: Union[U
     return response
 
 
+async def 获取某用户的权限匹配器(conn: AsyncIOMotorClient, user: Union[User, UserInDB]) -> Pattern:
+    """ 获取某用户所有权限的预编译匹配器, 按角色列表缓存。"""
+    key = tuple(user.roles or ())
+    matcher = scope_matcher_cache.get(key)
+    if matcher is None:
+        permissions = await 获取某用户的所有权限(conn, user)
+        matcher = compile_scope_matcher(permissions.permissions)
+        scope_matcher_cache.set(key, matcher)
+    return matcher
+
+
 async def 增加一条权限记录(conn: AsyncIOMotorClient, permission: Union[角色权限InRequest]) -> Permission:
     result = await get_permissions_collection(conn).find_one({"role": permission.role})
     if result:
@@ -53,6 +65,7 @@ async def 增加一条权限记录(conn: AsyncIOMotorClient, permission: Union[
         raise RoleAlreadyExist(message=f"该角色（{permission.role}）不是一条合法的角色，请检查角色列表")
 
     await get_permissions_collection(conn).insert_one(permission.dict())
+    invalidate_permission_cache()
     return Permission(**permission.dict())
 
 
@@ -62,4 +75,5 @@ async def 删除一条权限记录(conn: AsyncIOMotorClient, permission: Union[
         logger.error(f"该角色（{permission.role}）没有权限记录")
         raise PermissionDoesNotExist
     await get_permissions_collection(conn).delete_one({"_id": result["_id"]})
+    invalidate_permission_cache()
     return ResultInResponse()
@@ -1,15 +1,17 @@
 from datetime import datetime, timedelta
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import UpdateOne
 from stralib import FastTdate
 
 from app import settings
+from app.core.auth_cache import invalidate_user_cache
 from app.core.errors import NoPortfolioError, PortfolioCloseError
 from app.crud.base import (
     get_portfolio_analysis_collection,
     get_portfolio_collection,
+    get_portfolio_snapshot_collection,
     get_user_collection,
     get_user_message_collection,
 )
@@ -21,7 +23,7 @@ from app.enums.user import 消息分类, 消息类型
 from app.global_var import G
 from app.models.base.portfolio import 用户资金账户信息, 风险点信息
 from app.models.fund_account import FundAccountInDB
-from app.models.portfolio import Portfolio
+from app.models.portfolio import Portfolio, PortfolioSnapshotInDB
 from app.models.rwmodel import PyObjectId
 from app.schema.base import UpdateResult
 from app.schema.common import PageInResponse, ResultInResponse
@@ -112,6 +114,7 @@ async def patch_portfolio_by_id(
                         "$addToSet": {"portfolio.create_info.closed_list": id},
                     },
                 )
+                invalidate_user_cache(portfolio["username"])
                 subscribe_user_cursor = get_user_collection(conn).find(
                     {"portfolio": {"$in": [id]}}
                 )
@@ -206,6 +209,34 @@ async def bulk_write_portfolio_analysis(
     await get_portfolio_analysis_collection(conn).bulk_write(operations)
 
 
+async def get_portfolio_snapshot_from_db(
+    conn: AsyncIOMotorClient, portfolio: PyObjectId
+) -> Optional[PortfolioSnapshotInDB]:
+    """查询组合运行数据快照."""
+    row = await get_portfolio_snapshot_collection(conn).find_one({"portfolio": portfolio})
+    return PortfolioSnapshotInDB(**row) if row else None
+
+
+async def get_portfolio_snapshots_from_db(
+    conn: AsyncIOMotorClient, portfolios: List[PyObjectId]
+) -> Dict[PyObjectId, PortfolioSnapshotInDB]:
+    """查询多个组合的运行数据快照, 以组合id为键."""
+    cursor = get_portfolio_snapshot_collection(conn).find({"portfolio": {"$in": portfolios}})
+    return {row["portfolio"]: PortfolioSnapshotInDB(**row) async for row in cursor}
+
+
+async def bulk_write_portfolio_snapshot(
+    conn: AsyncIOMotorClient, operations: List[UpdateOne]
+) -> None:
+    """批量写入组合运行数据快照."""
+    await get_portfolio_snapshot_collection(conn).bulk_write(operations, ordered=False)
+
+
+async def delete_portfolio_snapshot(conn: AsyncIOMotorClient, portfolio: PyObjectId) -> None:
+    """删除组合运行数据快照."""
+    await get_portfolio_snapshot_collection(conn).delete_one({"portfolio": portfolio})
+
+
 async def update_portfolio_import_date_by_id(
     conn: AsyncIOMotorClient, portfolio_id: PyObjectId, import_date: datetime
 ) -> None:
@@ -1,12 +1,26 @@
 import re
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
+from cacheout import Cache
+
+from app import settings
 from app.core.errors import NoUserError
+from app.crud.base import get_user_collection
 from app.crud.user import get_user
 from app.db.mongodb import AsyncIOMotorClient
 from app.extentions import logger
 from app.models import MOBILE_RE
 from app.models.base.profile import Profile
+from app.models.user import User
+
+profile_cache = Cache(maxsize=settings.profile_cache_maxsize, ttl=settings.profile_cache_ttl)
+
+
+def user2profile(user: User) -> Profile:
+    """ 用户转换为资料, 手机号用户名脱敏 """
+    if re.match(MOBILE_RE, user.username):
+        user.username = f"{user.username[:3]}{'*' * 4}{user.username[-4:]}"
+    return Profile(**user.dict())
 
 
 async def get_profile_for_user(conn: AsyncIOMotorClient, target_username: str, current_username: Optional[str] = None) -> Profile:
@@ -15,9 +29,29 @@ async def get_profile_for_user(conn: AsyncIOMotorClient, target_username: str, c
     if not user:
         logger.error(f"没有找到用户：{target_username}")
         raise NoUserError
-    if re.match(MOBILE_RE, user.username):
-        user.username = f"{user.username[:3]}{'*' * 4}{user.username[-4:]}"
 
-    profile = Profile(**user.dict())
+    profile = user2profile(user)
 
     return profile
+
+
+async def get_profiles_for_users(conn: AsyncIOMotorClient, target_usernames: Iterable[str], use_cache: bool = True) -> Dict[str, Profile]:
+    """ 批量获取用户的资料, 未缓存的用户通过一次`$in`查询获取 """
+    usernames = list(dict.fromkeys(target_usernames))
+    profiles = {}
+    if use_cache:
+        for username in usernames:
+            profile = profile_cache.get(username)
+            if profile is not None:
+                profiles[username] = profile
+    missing = [username for username in usernames if username not in profiles]
+    if missing:
+        async for row in get_user_collection(conn).find({"username": {"$in": missing}}):
+            username = row["username"]
+            profiles[username] = user2profile(User(**row))
+            profile_cache.set(username, profiles[username])
+    not_found = [username for username in usernames if username not in profiles]
+    if not_found:
+        logger.error(f"没有找到用户：{not_found}")
+        raise NoUserError
+    return profiles
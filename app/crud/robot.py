@@ -33,9 +33,9 @@ from app.crud.base import (
 )
 from app.crud.client_base import get_client_robot_cursor, get_client_robot_list
 from app.crud.discuzq import create_thread
-from app.crud.equipment import delete_strategy_by_sid, 查询装备列表
+from app.crud.equipment import delete_strategy_by_sid, 查询机器人装备列表
 from app.crud.permission import 获取某用户的所有权限
-from app.crud.profile import get_profile_for_user
+from app.crud.profile import get_profile_for_user, get_profiles_for_users
 from app.crud.real_and_backtest import get_实盘回测_filter
 from app.crud.strategy_data import get_strategy_data_list
 from app.crud.user import get_user
@@ -89,12 +89,7 @@ async def 查询某机器人信息(
     result = dict(作者=author)
     result.update(**robot.dict(exclude={"作者"}))
     if show_detail:
-        风控包列表 = await 查询装备列表(conn, {"标识符": robot.风控包列表}, 0, 0, [], user=user)
-        择时装备列表 = await 查询装备列表(conn, {"标识符": robot.择时装备列表}, 0, 0, [], user=user)
-        风控装备列表 = await 查询装备列表(conn, {"标识符": robot.风控装备列表}, 0, 0, [], user=user)
-        选股装备列表 = await 查询装备列表(conn, {"标识符": robot.选股装备列表}, 0, 0, [], user=user)
-        交易装备列表 = await 查询装备列表(conn, {"标识符": robot.交易装备列表}, 0, 0, [], user=user)
-        extra = dict(风控包列表=风控包列表, 择时装备列表=择时装备列表, 风控装备列表=风控装备列表, 选股装备列表=选股装备列表, 交易装备列表=交易装备列表)
+        extra = await 查询机器人装备列表(conn, robot, user=user)
         result.update(extra)
         return 机器人详情InResponse(**result)
     else:
@@ -115,13 +110,9 @@ async def 查询机器人列表(
         if not isinstance(db_query["标签"], dict):
             db_query["标签"] = {"$in": db_query["标签"]}
     list_cursor = await get_client_robot_cursor(conn, db_query, limit, skip, order_by, user=user)
-    response = []
-    async for row in list_cursor:
-        robot = Robot(**row)
-        author = await get_profile_for_user(conn, robot.作者)
-        robot = 机器人inResponse(**robot.dict(exclude={"作者"}), 作者=author)
-        response.append(robot)
-    return response
+    robots = [Robot(**row) async for row in list_cursor]
+    profiles = await get_profiles_for_users(conn, [robot.作者 for robot in robots])
+    return [机器人inResponse(**robot.dict(exclude={"作者"}), 作者=profiles[robot.作者]) for robot in robots]
 
 
 async def 查询我的机器人列表(conn: AsyncIOMotorClient, 筛选: str, 排序: str, 排序方式: str, user: User) -> List[Robot]:
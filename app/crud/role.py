@@ -2,6 +2,7 @@ from typing import List
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app.core.auth_cache import invalidate_permission_cache
 from app.crud.base import get_roles_collection
 from app.models.role import Role
 
@@ -23,12 +24,14 @@ async def 是否角色在数据库中(conn: AsyncIOMotorClient, role_name: str)
 
 async def 增加一个角色(conn: AsyncIOMotorClient, role: Role) -> Role:
     result = await get_roles_collection(conn).insert_one(role.dict())
+    invalidate_permission_cache()
     if result:
         return role
 
 
 async def 删除一个角色(conn: AsyncIOMotorClient, role: Role) -> bool:
     result = await get_roles_collection(conn).delete_one(role.dict())
+    invalidate_permission_cache()
     if result.deleted_count > 0:
         return True
     else:
@@ -1,5 +1,5 @@
 from datetime import date
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import DeleteOne, InsertOne, ReplaceOne
@@ -113,6 +113,7 @@ async def get_fund_time_series_data(
     conn: AsyncIOMotorClient,
     *,
     fund_id: Optional[str] = None,
+    fund_ids: Optional[List[str]] = None,
     tdate: Optional[date] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
@@ -123,6 +124,8 @@ async def get_fund_time_series_data(
         raise ValueError("不可以同时指定`tdate`和 `start_date`或`end_date` .")
     if fund_id is not None:
         query["fund_id"] = fund_id
+    if fund_ids is not None:
+        query["fund_id"] = {"$in": fund_ids}
     if tdate is not None:
         query["tdate"] = date2datetime(tdate)
     if end_date is not None:
@@ -185,3 +188,35 @@ async def get_portfolio_assessment_time_series_data(
         .sort("tdate")
     )
     return [PortfolioAssessmentTimeSeriesDataInDB(**flow) async for flow in cursor]
+
+
+async def get_latest_portfolio_assessment_time_series_data(
+    conn: AsyncIOMotorClient, portfolios: List[PyObjectId]
+) -> Dict[PyObjectId, PortfolioAssessmentTimeSeriesDataInDB]:
+    """查询多个组合最新一个交易日的评估时点数据."""
+    pipeline = [
+        {"$match": {"portfolio": {"$in": portfolios}}},
+        {"$sort": {"tdate": -1}},
+        {"$group": {"_id": "$portfolio", "doc": {"$first": "$$ROOT"}}},
+    ]
+    cursor = get_portfolio_assessment_time_series_data_collection(conn).aggregate(pipeline)
+    return {row["_id"]: PortfolioAssessmentTimeSeriesDataInDB(**row["doc"]) async for row in cursor}
+
+
+async def get_portfolio_yield_time_series_data(
+    conn: AsyncIOMotorClient,
+    portfolio: PyObjectId,
+    start_date: date,
+    end_date: date,
+) -> List[PortfolioAssessmentTimeSeriesDataInDB]:
+    """查询组合在指定区间内的累计收益率时点数据, 只返回交易日和累计收益率字段."""
+    query = {
+        "portfolio": portfolio,
+        "tdate": {"$gte": date2datetime(start_date), "$lte": date2datetime(end_date, "max")},
+    }
+    cursor = (
+        get_portfolio_assessment_time_series_data_collection(conn)
+        .find(query, {"portfolio": 1, "tdate": 1, "account_yield": 1})
+        .sort("tdate")
+    )
+    return [PortfolioAssessmentTimeSeriesDataInDB(**row) async for row in cursor]
@@ -7,6 +7,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import EmailStr
 
 from app import settings
+from app.core.auth_cache import invalidate_user_cache
 from app.core.config import get
 from app.core.errors import CRUDError, NoUserError, TableFieldError
 from app.crud.base import (
@@ -98,12 +99,14 @@ async def create_user(conn: AsyncIOMotorClient, user: UserInCreate, roles=()) ->
 
 async def delete_user(conn: AsyncIOMotorClient, username: str):
     result = await get_user_collection(conn).delete_one({"username": username})
+    invalidate_user_cache(username)
     if result.deleted_count == 0:
         raise NoUserError(message="用户不存在或者已经删除")
 
 
 async def delete_manufacturer_user(conn: AsyncIOMotorClient, username: str):
     result = await get_user_collection(conn).delete_one({"username": username})
+    invalidate_user_cache(username)
     if result.deleted_count == 0:
         raise NoUserError(message="用户不存在或者已经删除")
 
@@ -118,6 +121,7 @@ async def update_manufacturer_user(conn: AsyncIOMotorClient, username: str, data
         if data.name not in ManufacturerUserInUpdate().dict().keys():
             raise TableFieldError()
     updated_result = await get_user_collection(conn).update_one({"username": username}, {"$set": {f"{data.name}": data.value}})
+    invalidate_user_cache(username)
     if not updated_result.matched_count:
         raise CRUDError(message=f"更新用户文档错误，错误内容：{updated_result}")
     return await get_user(conn, username)
@@ -127,6 +131,7 @@ async def update_user(conn: AsyncIOMotorClient, username: str, user: UserInUpdat
     params = user.dict(exclude_defaults=True)
     if params:
         updated_result = await get_user_collection(conn).update_one({"username": username}, {"$set": params})
+        invalidate_user_cache(username)
         if not updated_result.matched_count:
             raise CRUDError(message=f"更新用户文档错误，错误内容：{updated_result}")
     return await get_user(conn, username)
@@ -159,6 +164,7 @@ async def create_manufacturer_user(conn: AsyncIOMotorClient, user: ManufacturerU
 async def update_pwd(conn: AsyncIOMotorClient, password: str, dbuser: User):
     dbuser.change_password(password)
     updated_result = await get_user_collection(conn).update_one({"username": dbuser.username}, {"$set": dbuser.dict()})
+    invalidate_user_cache(dbuser.username)
     if updated_result.matched_count == updated_result.modified_count == 1:
         return dbuser
 
@@ -166,6 +172,7 @@ async def update_pwd(conn: AsyncIOMotorClient, password: str, dbuser: User):
 async def update_app_secret(conn: AsyncIOMotorClient, app_secret: str, dbuser: User):
     dbuser.change_app_secret(app_secret)
     updated_result = await get_user_collection(conn).update_one({"username": dbuser.username}, {"$set": {"app_secret": app_secret}})
+    invalidate_user_cache(dbuser.username)
     if updated_result.matched_count == updated_result.modified_count == 1:
         return dbuser
 
@@ -181,10 +188,12 @@ async def 订阅装备(conn: AsyncIOMotorClient, user: User, equipment: Equipmen
                 {"username": user.username},
                 {"$set": {"equipment.subscribe_info": user.equipment.subscribe_info.dict()}},
             )
+            invalidate_user_cache(user.username)
             await get_user_collection(conn).update_one(
                 {"username": equipment.作者},
                 {"$inc": {"equipment.subscribe_info.fans_num": 1}},
             )
+            invalidate_user_cache(equipment.作者)
             订阅人数 = equipment.订阅人数 + 1
             await get_equipment_collection(conn).update_one({"标识符": equipment.标识符}, {"$set": {"订阅人数": 订阅人数}})
             message = {
@@ -211,10 +220,12 @@ async def 取消订阅装备(conn: AsyncIOMotorClient, user: User, equipment: Eq
                 {"username": user.username},
                 {"$set": {"equipment.subscribe_info": user.equipment.subscribe_info.dict()}},
             )
+            invalidate_user_cache(user.username)
             await get_user_collection(conn).update_one(
                 {"username": equipment.作者},
                 {"$inc": {"equipment.subscribe_info.fans_num": -1}},
             )
+            invalidate_user_cache(equipment.作者)
             订阅人数 = equipment.订阅人数 - 1 if equipment.订阅人数 > 0 else 0
             await get_equipment_collection(conn).update_one({"标识符": equipment.标识符}, {"$set": {"订阅人数": 订阅人数}})
             return ResultInResponse()
@@ -231,7 +242,9 @@ async def 订阅机器人(conn: AsyncIOMotorClient, user: User, robot: Robot):
                 {"username": user.username},
                 {"$set": {"robot.subscribe_info": user.robot.subscribe_info.dict()}},
             )
+            invalidate_user_cache(user.username)
             await get_user_collection(conn).update_one({"username": robot.作者}, {"$inc": {"robot.subscribe_info.fans_num": 1}})
+            invalidate_user_cache(robot.作者)
             订阅人数 = robot.订阅人数 + 1
             await get_robots_collection(conn).update_one({"标识符": robot.标识符}, {"$set": {"订阅人数": 订阅人数}})
             message = {
@@ -258,7 +271,9 @@ async def 取消订阅机器人(conn: AsyncIOMotorClient, user: User, robot: Rob
                 {"username": user.username},
                 {"$set": {"robot.subscribe_info": user.robot.subscribe_info.dict()}},
             )
+            invalidate_user_cache(user.username)
             await get_user_collection(conn).update_one({"username": robot.作者}, {"$inc": {"robot.subscribe_info.fans_num": -1}})
+            invalidate_user_cache(robot.作者)
             订阅人数 = robot.订阅人数 - 1 if robot.订阅人数 > 0 else 0
             await get_robots_collection(conn).update_one({"标识符": robot.标识符}, {"$set": {"订阅人数": 订阅人数}})
             return ResultInResponse()
@@ -276,10 +291,12 @@ async def subscribe_portfolio(conn: AsyncIOMotorClient, user: User, portfolio: P
                 {"username": user.username},
                 {"$set": {"portfolio.subscribe_info": user.portfolio.subscribe_info.dict()}},
             )
+            invalidate_user_cache(user.username)
             await get_user_collection(conn).update_one(
                 {"username": portfolio.username},
                 {"$inc": {"portfolio.subscribe_info.fans_num": 1}},
             )
+            invalidate_user_cache(portfolio.username)
             subscribe_num = portfolio.subscribe_num + 1
             subscribers = portfolio.subscribers
             if user.username not in portfolio.subscribers:
@@ -309,10 +326,12 @@ async def unsubscribe_portfolio(conn: AsyncIOMotorClient, user: User, portfolio:
                 {"username": user.username},
                 {"$set": {"portfolio.subscribe_info": user.portfolio.subscribe_info.dict()}},
             )
+            invalidate_user_cache(user.username)
             await get_user_collection(conn).update_one(
                 {"username": portfolio.username},
                 {"$inc": {"portfolio.subscribe_info.fans_num": -1}},
             )
+            invalidate_user_cache(portfolio.username)
             subscribe_num = portfolio.subscribe_num - 1 if portfolio.subscribe_num > 0 else 0
             subscribers = portfolio.subscribers
             if user.username in portfolio.subscribers:
@@ -377,5 +396,6 @@ async def read_user_message(conn: AsyncIOMotorClient, id: Optional[str], user: U
 async def update_user_roles(conn: AsyncIOMotorClient, id: Union[ObjectId, str], role: List[str]) -> ResultInResponse:
     id = id if isinstance(id, ObjectId) else ObjectId(id)
     updated_result = await get_user_collection(conn).update_one({"_id": id}, {"$set": {"roles": role}})
+    invalidate_user_cache()
     if updated_result.matched_count == updated_result.modified_count == 1:
         return ResultInResponse()
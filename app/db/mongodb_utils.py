@@ -35,6 +35,16 @@ async def load_configuration_from_mongo():
     logger.info(f"完成{count}条配置!")
 
 
+async def ensure_mongo_indexes():
+    if not settings.db.ENSURE_INDEXES_ON_STARTUP:
+        return
+    logger.info("创建缺失的索引中...")
+    from app.service.mongodb.index import ensure_indexes
+
+    created = await ensure_indexes(db.client)
+    logger.info(f"完成{sum(len(x) for x in created.values())}个索引!")
+
+
 async def close_mongo_connection():
     logger.info("关闭数据库连接...")
     db.client.close()
@@ -1,10 +1,49 @@
-from typing import Union
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Any, Dict, List, Optional, Union
 
 import aioredis
 from aioredis import Redis
+from cacheout import Cache
 
 from app import settings
 
+# 键的值等于预期值时删除
+COMPARE_AND_DELETE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+# 哈希字段的值等于预期值时删除该字段及其余的键
+HASH_COMPARE_AND_DELETE_SCRIPT = (
+    "if redis.call('hget', KEYS[1], ARGV[1]) == ARGV[2] then "
+    "redis.call('hdel', KEYS[1], ARGV[1]) "
+    "for i = 2, #KEYS do redis.call('del', KEYS[i]) end "
+    "return 1 else return 0 end"
+)
+
+
+def measure(command: Optional[str] = None):
+    """统计命令调用次数、失败次数及耗时, `command`为None时以第一个参数作为命令名."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            name = command or str(args[0]).upper()
+            stats = self._stats[name]
+            stats["calls"] += 1
+            start = time.perf_counter()
+            try:
+                return await func(self, *args, **kwargs)
+            except Exception:
+                stats["errors"] += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                stats["total_seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+        return wrapper
+
+    return decorator
+
 
 class SuperRedis:
     def __init__(
@@ -12,10 +51,15 @@ class SuperRedis:
         address: str,
         pool_minsize: int = settings.redis.redis_pool_minsize,
         pool_maxsize: int = settings.redis.redis_pool_maxsize,
+        local_cache_ttl: int = settings.redis.redis_local_cache_ttl,
+        local_cache_maxsize: int = settings.redis.redis_local_cache_maxsize,
     ) -> None:
         self._redis_address = address
         self._redis_pool_minsize = pool_minsize
         self._redis_pool_maxsize = pool_maxsize
+        # 不可变键(写入后不再修改, 如按日期命名的任务完成标志)的本地缓存
+        self._local_cache = Cache(maxsize=local_cache_maxsize, ttl=local_cache_ttl)
+        self._stats = defaultdict(lambda: {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
 
     @property
     async def _client(self) -> Redis:
@@ -65,6 +109,7 @@ class SuperRedis:
         client = await self._client
         return client.pipeline()
 
+    @measure()
     async def execute(self, command, *args, **kwargs) -> bool:
         """
         原生命令支持
@@ -82,6 +127,47 @@ class SuperRedis:
         client = await self._client
         return await client.execute(command, *args, **kwargs)
 
+    @measure("BLPOP")
+    async def blpop(self, key: str, timeout: int = 0, encoding: Union[str, None] = "utf8") -> Optional[list]:
+        """
+        阻塞弹出列表头部元素, 超时返回None
+
+        阻塞命令在从连接池中取出的独占连接上执行, 不阻塞其他命令共用的连接
+        """
+        client = await self._client
+        with await client as conn:
+            return await conn.blpop(key, timeout=timeout, encoding=encoding)
+
+    @measure("PUBLISH")
+    async def publish(self, channel: str, message: str) -> int:
+        """
+        发布消息
+
+        Examples
+        -------
+        >>> await G.entrust_redis.publish("order_status", portfolio_id)
+        """
+        client = await self._client
+        return await client.publish(channel, message)
+
+    async def subscribe(self, channel: str):
+        """
+        订阅频道, 返回aioredis的Channel对象
+
+        Examples
+        -------
+        >>> channel = await G.entrust_redis.subscribe("order_status")
+        >>> while await channel.wait_message():
+        ...     message = await channel.get(encoding="utf8")
+        """
+        client = await self._client
+        channel, = await client.subscribe(channel)
+        return channel
+
+    async def unsubscribe(self, channel: str) -> None:
+        client = await self._client
+        await client.unsubscribe(channel)
+
     async def flush(self) -> None:
         """
         清空数据库
@@ -95,6 +181,7 @@ class SuperRedis:
         """
         client = await self._client
         await client.flushdb()
+        self._local_cache.clear()
 
     async def close(self) -> None:
         """
@@ -110,8 +197,24 @@ class SuperRedis:
         client = await self._client
         client.close()
         await client.wait_closed()
+        self._local_cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各命令的调用次数、失败次数及耗时
+
+        Examples
+        -------
+        >>> G.entrust_redis.stats()
+        {"HGETALL": {"calls": 2, "errors": 0, "total_seconds": 0.002, "max_seconds": 0.001, "avg_seconds": 0.001}}
+        """
+        return {
+            command: {**stats, "avg_seconds": stats["total_seconds"] / stats["calls"] if stats["calls"] else 0}
+            for command, stats in self._stats.items()
+        }
 
     # str command
+    @measure("ADD")
     async def add(
         self,
         key: Union[str, int],
@@ -124,6 +227,7 @@ class SuperRedis:
             return False
         return await client.set(key, value, expire=expire)
 
+    @measure("GET")
     async def get(
         self,
         key: Union[str, int],
@@ -134,6 +238,7 @@ class SuperRedis:
         cached_value = await client.get(key, encoding=encoding)
         return cached_value if cached_value is not None else default
 
+    @measure("SET")
     async def set(
         self,
         key: Union[str, int],
@@ -143,11 +248,120 @@ class SuperRedis:
         client = await self._client
         return await client.set(key, value, expire=expire)
 
+    @measure("DEL")
     async def delete(self, key: Union[str, int]) -> bool:
         client = await self._client
         return await client.delete(key)
 
+    @measure("MGET")
+    async def mget(
+        self,
+        keys: List[Union[str, int]],
+        default: Union[str, int] = None,
+        encoding: Union[str, None] = "utf8",
+    ) -> List:
+        """
+        批量获取多个键的值, 不存在的键返回`default`
+
+        Examples
+        -------
+        >>> await G.scheduler_redis.mget(["a", "b"])
+        ["1", None]
+        """
+        if not keys:
+            return []
+        client = await self._client
+        values = await client.mget(*keys, encoding=encoding)
+        return [value if value is not None else default for value in values]
+
+    @measure("MSET")
+    async def mset(
+        self,
+        mapping: Dict[Union[str, int], Union[str, int, bytes]],
+        expire: int = settings.redis.default_time_out,
+    ) -> None:
+        """
+        批量赋值并设置过期时间, 一次往返写入全部键
+
+        Examples
+        -------
+        >>> await G.scheduler_redis.mset({"a": "1", "b": "2"}, expire=60)
+        """
+        if not mapping:
+            return
+        client = await self._client
+        pipe = client.pipeline()
+        for key, value in mapping.items():
+            pipe.set(key, value, expire=expire)
+        await pipe.execute()
+
+    @measure("EVAL")
+    async def compare_and_delete(self, key: Union[str, int], value: Union[str, int]) -> bool:
+        """
+        键的值等于`value`时删除, 用于释放锁或租约等需要先比较再删除的场景
+
+        Examples
+        -------
+        >>> await G.scheduler_redis.compare_and_delete("scheduler_leader", worker_id)
+        True
+        """
+        client = await self._client
+        return bool(await client.eval(COMPARE_AND_DELETE_SCRIPT, keys=[key], args=[value]))
+
+    async def get_cached(
+        self,
+        key: Union[str, int],
+        default: Union[str, int] = None,
+        encoding: Union[str, None] = "utf8",
+    ):
+        """
+        获取不可变键的值, 优先读取本地缓存
+
+        只缓存已存在的键, 本地缓存时间不超过键在redis中的剩余过期时间; 仅用于写入后不再修改或删除的键(如按日期命名的任务完成标志)
+
+        Examples
+        -------
+        >>> await G.scheduler_redis.get_cached(f"{str_of_today()}_ability")
+        """
+        return (await self.get_cached_many([key], default, encoding))[0]
+
+    async def get_cached_many(
+        self,
+        keys: List[Union[str, int]],
+        default: Union[str, int] = None,
+        encoding: Union[str, None] = "utf8",
+    ) -> List:
+        """
+        批量获取不可变键的值, 本地未缓存的键一次MGET读取, 本地缓存时间不超过键的剩余过期时间
+
+        Examples
+        -------
+        >>> await G.scheduler_redis.get_cached_many(["a", "b"])
+        ["1", None]
+        """
+        values = {key: self._local_cache.get((key, encoding)) for key in keys}
+        missing = [key for key, value in values.items() if value is None]
+        if missing:
+            found = {}
+            for key, value in zip(missing, await self.mget(missing, encoding=encoding)):
+                if value is not None:
+                    found[key] = values[key] = value
+            if found:
+                # 键在redis中过期后本地缓存也随之过期
+                pipe = await self.pipeline()
+                futures = [pipe.pttl(key) for key in found]
+                await pipe.execute()
+                for (key, value), future in zip(found.items(), futures):
+                    pttl = future.result()
+                    # -2为键已不存在, 0在本地缓存中表示永不过期
+                    if pttl in (-2, 0):
+                        continue
+                    ttl = self._local_cache.ttl if pttl < 0 else min(self._local_cache.ttl, pttl / 1000)
+                    self._local_cache.set((key, encoding), value, ttl=ttl)
+        return [values[key] if values[key] is not None else default for key in keys]
+
     # hash command
+    @measure("HGET")
     async def hget(
         self, key: Union[str, int], field: Union[str, int], encoding: str = "utf8"
     ):
@@ -171,6 +385,7 @@ class SuperRedis:
         cached_value = await client.hget(key, field, encoding=encoding)
         return cached_value
 
+    @measure("HGETALL")
     async def hgetall(self, key: Union[str, int], default: Union[str, int] = None):
         """
         获取哈希中所有的字段以及对应的值
@@ -188,6 +403,7 @@ class SuperRedis:
         cached_value = await client.hgetall(key, encoding="utf8")
         return cached_value if cached_value is not None else default
 
+    @measure("HMSET")
     async def hmset_dict(self, key, *args, **kwargs):
         """
         哈希批量赋值
@@ -226,6 +442,7 @@ class SuperRedis:
         client = await self._client
         return await client.hmset_dict(key, *args, **kwargs)
 
+    @measure("HDEL")
     async def hdel(self, key, field, *fields):
         """
         删除一个或者多个哈希值
@@ -242,7 +459,54 @@ class SuperRedis:
         client = await self._client
         return await client.hdel(key, field, *fields)
 
+    @measure("HMGET")
+    async def hmget(self, key: Union[str, int], field: Union[str, int], *fields, encoding: str = "utf8") -> List:
+        """
+        获取哈希中多个字段的值
+
+        Examples
+        -------
+        >>> await G.entrust_redis.hmget(PORTFOLIO_HASH, "a", "b")
+        ["1", None]
+        """
+        client = await self._client
+        return await client.hmget(key, field, *fields, encoding=encoding)
+
+    @measure("HGETALL_MANY")
+    async def hgetall_many(self, keys: List[Union[str, int]], default: Union[dict, None] = None) -> List:
+        """
+        一次往返获取多个哈希的所有字段以及对应的值, 按`keys`的顺序返回
+
+        Examples
+        -------
+        >>> await G.entrust_redis.hgetall_many(["portfolio_a", "portfolio_b"], {})
+        [{"order_1": "1"}, {}]
+        """
+        if not keys:
+            return []
+        client = await self._client
+        pipe = client.pipeline()
+        futures = [pipe.hgetall(key, encoding="utf8") for key in keys]
+        await pipe.execute()
+        return [value if value else default for value in [future.result() for future in futures]]
+
+    @measure("EVAL")
+    async def hcompare_and_delete(self, key: Union[str, int], field: Union[str, int], value: Union[str, int], *keys) -> bool:
+        """
+        哈希字段的值等于`value`时删除该字段以及`keys`中的键
+
+        在管道中使用时直接加入脚本: `pipe.eval(HASH_COMPARE_AND_DELETE_SCRIPT, keys=[key, *keys], args=[field, value])`
+
+        Examples
+        -------
+        >>> await G.entrust_redis.hcompare_and_delete(PORTFOLIO_HASH, portfolio_id, version, portfolio_id)
+        True
+        """
+        client = await self._client
+        return bool(await client.eval(HASH_COMPARE_AND_DELETE_SCRIPT, keys=[key, *keys], args=[field, value]))
+
     # set command
+    @measure("SMEMBERS")
     async def smembers(self, key: Union[str, int], default: Union[str, int] = None):
         """
         获取集合的全部值
@@ -263,6 +527,7 @@ class SuperRedis:
         cached_value = await client.smembers(key, encoding="utf8")
         return cached_value if cached_value is not None else default
 
+    @measure("SADD")
     async def sadd(self, key, member, *members):
         """
         向集合中添加一个或多个成员
@@ -283,3 +548,75 @@ class SuperRedis:
         """
         client = await self._client
         return await client.sadd(key, member, *members)
+
+    # sorted set command
+    @measure("ZADD")
+    async def zadd(self, key, score, member, *pairs):
+        """
+        向有序集合中添加一个或多个成员, 已存在的成员更新分数
+
+        Parameters
+        ----------
+        key
+        score
+        member
+        pairs 其余成员, 按 score, member 依次排列
+
+        Returns
+        -------
+
+        Examples
+        -------
+        >>> await G.portfolio_yield_redis.zadd("portfolio_profit_rank", 0.1, "a", 0.2, "b")
+        """
+        client = await self._client
+        return await client.zadd(key, score, member, *pairs)
+
+    @measure("ZREM")
+    async def zrem(self, key, member, *members):
+        """
+        移除有序集合中的一个或多个成员
+
+        Parameters
+        ----------
+        key
+        member
+        members
+
+        Returns
+        -------
+
+        """
+        client = await self._client
+        return await client.zrem(key, member, *members)
+
+    @measure("ZREVRANGE")
+    async def zrevrange(
+        self,
+        key: Union[str, int],
+        start: int = 0,
+        stop: int = -1,
+        withscores: bool = False,
+        encoding: str = "utf8",
+    ):
+        """
+        按分数从高到低返回有序集合指定区间内的成员
+
+        Parameters
+        ----------
+        key
+        start
+        stop
+        withscores 为True时返回 (member, score) 元组列表
+        encoding
+
+        Returns
+        -------
+
+        Examples
+        -------
+        >>> await G.portfolio_yield_redis.zrevrange("portfolio_profit_rank", withscores=True)
+        [("b", 0.2), ("a", 0.1)]
+        """
+        client = await self._client
+        return await client.zrevrange(key, start, stop, withscores=withscores, encoding=encoding)
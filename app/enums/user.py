@@ -31,6 +31,13 @@ class 发送消息类型(str, Enum):
     not_send = "not_send"  # 不发送消息
 
 
+@unique
+class 发件箱状态(str, Enum):
+    pending = "pending"  # 待发送
+    sent = "sent"  # 已发送
+    failed = "failed"  # 发送失败
+
+
 @unique
 class 用户状态(str, Enum):
     normal = "normal"  # 正常
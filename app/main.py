@@ -3,19 +3,23 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app import settings
 from app.api.api_v1.api import router as api_router
+from app.core.discuzq import close_discuzq
+from app.core.executor import close_blocking_executor
 from app.core.regiser import register_exceptions
 from app.db.mongodb_utils import (
     close_mongo_connection,
     connect_to_mongo,
+    ensure_mongo_indexes,
     load_configuration_from_mongo,
 )
 from app.db.mysql_utils import close_mysql, init_mysql
 from app.db.redis_utils import close_redis, init_redis_pool
 from app.extentions.logger import init_log
 from app.middleware import DBErrorMiddleware
-from app.outer_sys.hq.events import close_hq2redis_conn, connect_hq2reids, set_hq_source
+from app.outer_sys.hq.events import close_hq2redis_conn, close_hq_source, connect_hq2reids, set_hq_source
 from app.outer_sys.trade_system import close_trade_system, connect_trade_system
 from app.outer_sys.wechat.utils import init_wechat
+from app.schedulers.base.runner import start_job_runner, stop_job_runner
 from app.schedulers.load_jobs import load_jobs_with_lock
 
 init_log()
@@ -39,9 +43,13 @@ app.add_middleware(
 
 app.add_event_handler("startup", connect_to_mongo)
 app.add_event_handler("startup", load_configuration_from_mongo)
+app.add_event_handler("startup", ensure_mongo_indexes)
 app.add_event_handler("startup", load_jobs_with_lock)
 app.add_event_handler("startup", set_hq_source)
 app.add_event_handler("shutdown", close_mongo_connection)
+app.add_event_handler("shutdown", close_hq_source)
+app.add_event_handler("shutdown", close_blocking_executor)
+app.add_event_handler("shutdown", close_discuzq)
 if not settings.manufacturer_switch:
     app.add_event_handler("startup", init_redis_pool)
     app.add_event_handler("startup", connect_hq2reids)
@@ -49,6 +57,8 @@ if not settings.manufacturer_switch:
     app.add_event_handler("startup", connect_trade_system)
     app.add_event_handler("startup", init_mysql)
     app.add_event_handler("startup", init_wechat)
+    app.add_event_handler("startup", start_job_runner)
+    app.add_event_handler("shutdown", stop_job_runner)
     app.add_event_handler("shutdown", close_redis)
     app.add_event_handler("shutdown", close_mysql)
     app.add_event_handler("shutdown", close_trade_system)
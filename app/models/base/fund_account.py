@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import Field, root_validator
 
@@ -73,3 +73,43 @@ class FundAccountPosition(RWModel):
         if available_volume is None:
             input_data["available_volume"] = input_data["volume"]
         return input_data
+
+
+class FundAccountStatistics(RWModel):
+    """资金账户个股统计.
+
+    - 由资金账户流水计算, 每个资金账户的每只股票一条记录
+    - 买入金额/卖出金额为含费用的资金变动, 分红金额包含分红和扣税
+    - `sell_dates`按交易日(`%Y%m%d`)记录卖出次数, 用于统计任意区间内的交易次数
+    """
+
+    fund_id: str = Field(..., description="资金账户")
+    symbol: str = Field(..., description="股票代码")
+    exchange: Exchange = Field(..., description="交易所")
+    buy_num: int = Field(0, description="买入次数")
+    sell_num: int = Field(0, description="卖出次数")
+    buy_volume: int = Field(0, description="买入数量(含送转股)")
+    sell_volume: int = Field(0, description="卖出数量")
+    buy_amount: float = Field(0, description="买入金额")
+    sell_amount: float = Field(0, description="卖出金额")
+    dividend: float = Field(0, description="分红金额")
+    first_tdate: Optional[datetime] = Field(None, description="首次交易日")
+    last_tdate: Optional[datetime] = Field(None, description="最后交易日")
+    first_created_at: Optional[datetime] = Field(None, description="最早流水创建时间")
+    sell_dates: Dict[str, int] = Field({}, description="各交易日卖出次数")
+
+    @property
+    def trade_num(self) -> int:
+        return self.buy_num + self.sell_num
+
+    @property
+    def realized_pnl(self) -> float:
+        """已实现收益(按买入均价计算卖出部分的成本)."""
+        cost = self.buy_amount / self.buy_volume * self.sell_volume if self.buy_volume else 0
+        return self.sell_amount - cost + self.dividend
+
+    def get_sell_num(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> int:
+        """区间内的卖出次数."""
+        start = f"{start_date:%Y%m%d}" if start_date else ""
+        end = f"{end_date:%Y%m%d}" if end_date else "99999999"
+        return sum(num for tdate, num in self.sell_dates.items() if start <= tdate <= end)
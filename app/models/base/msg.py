@@ -1,6 +1,8 @@
+from datetime import datetime
+
 from pydantic import Field
 
-from app.enums.user import 消息类型
+from app.enums.user import 发件箱状态, 发送消息类型, 消息类型
 from app.models.rwmodel import RWModel
 
 
@@ -9,3 +11,17 @@ class 消息配置(RWModel):
     content: str = Field(None, title="消息内容")
     redirect: str = Field(None, title="跳转地址")
     category: 消息类型 = Field(None, title="消息分类")
+
+
+class 发件箱消息(RWModel):
+    key: str = Field(..., title="消息唯一标识, 用于去重")
+    batch: str = Field(None, title="群发批次")
+    username: str = Field(None, title="用户名")
+    send_type: 发送消息类型 = Field(..., title="发送消息类型")
+    to: str = Field(..., title="接收地址(邮箱或微信open_id)")
+    title: str = Field(None, title="消息标题")
+    content: str = Field(..., title="消息内容")
+    status: 发件箱状态 = Field(发件箱状态.pending, title="发送状态")
+    attempts: int = Field(0, title="已尝试发送次数")
+    error: str = Field(None, title="最近一次发送失败的原因")
+    sent_at: datetime = Field(None, title="发送时间")
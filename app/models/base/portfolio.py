@@ -1,11 +1,11 @@
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import Field
 
 from app.enums.fund_account import CurrencyType
 from app.models.base.stock import 股票基本信息
-from app.models.rwmodel import RWModel, PyObjectId
+from app.models.rwmodel import RWModel, PyDecimal, PyObjectId
 from app.enums.portfolio import 组合状态, 投资类型, 风险点状态, 风险类型
 
 
@@ -107,3 +107,27 @@ class 组合阶段收益(RWModel):
     last_3_month: float = Field(0, title="季度收益率")
     last_half_year: float = Field(0, title="半年收益率")
     last_year: float = Field(0, title="年收益率")
+
+
+class 组合快照(RWModel):
+    portfolio: PyObjectId = Field(..., title="组合")
+    tdate: datetime = Field(..., title="交易日")
+    start_date: datetime = Field(..., title="总收益开始日期")
+    weekly_start_date: datetime = Field(..., title="周收益开始日期")
+    monthly_start_date: datetime = Field(..., title="月收益开始日期")
+    profit_rate: float = Field(0, title="总收益率")
+    daily_profit_rate: float = Field(0, title="日收益率")
+    weekly_profit_rate: float = Field(0, title="周收益率")
+    monthly_profit_rate: float = Field(0, title="月收益率")
+    assets: PyDecimal = Field("0.00", title="总资产")
+    securities: PyDecimal = Field("0.00", title="证券资产")
+    cash: PyDecimal = Field("0.00", title="现金")
+    profit_loss_ratio: float = Field(0, title="盈亏比")
+    winning_rate: float = Field(0, title="交易胜率")
+    annual_rate: float = Field(0, title="年化收益率")
+    max_drawdown: float = Field(0, title="最大回撤")
+    sharpe_ratio: float = Field(0, title="夏普比率")
+    mktval_volatility: float = Field(0, title="收益波动率")
+    base_profit_rates: Dict[str, float] = Field({}, title="各区间截至上一交易日的收益率")
+    base_assets: Optional[float] = Field(None, title="上一交易日资产")
+    base_net_deposit: float = Field(0, title="当日净入金")
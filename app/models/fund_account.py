@@ -8,6 +8,7 @@ from app.models.base.fund_account import (
     FundAccount,
     FundAccountFlow,
     FundAccountPosition,
+    FundAccountStatistics,
 )
 from app.models.dbmodel import DBModelMixin
 from app.models.rwmodel import PyDecimal
@@ -53,3 +54,7 @@ class FundAccountFlowInDB(DBModelMixin, FundAccountFlow):
 
 class FundAccountPositionInDB(DBModelMixin, FundAccountPosition):
     """资金账户持仓."""
+
+
+class FundAccountStatisticsInDB(DBModelMixin, FundAccountStatistics):
+    """资金账户个股统计."""
@@ -1,5 +1,10 @@
-from app.models.base.msg import 消息配置
+from app.models.base.msg import 发件箱消息, 消息配置
+from app.models.dbmodel import DBModelMixin
 
 
 class MessageConfig(消息配置):
     """消息配置表"""
+
+
+class OutboxMessageInDB(DBModelMixin, 发件箱消息):
+    """消息发件箱"""
@@ -4,7 +4,7 @@ from typing import Optional
 from pydantic import Field
 
 from app.enums.portfolio import PortfolioCategory, 风险点状态, 风险类型
-from app.models.base.portfolio import 总收益排行信息, 组合基本信息, 组合阶段收益, 统计数据信息
+from app.models.base.portfolio import 总收益排行信息, 组合基本信息, 组合快照, 组合阶段收益, 统计数据信息
 from app.models.dbmodel import DBModelMixin
 from app.models.rwmodel import PyObjectId
 
@@ -40,3 +40,7 @@ class Portfolio(DBModelMixin, 组合基本信息, 总收益排行信息):
 
 class PortfolioAnalysisInDB(DBModelMixin, 统计数据信息):
     """组合统计数据."""
+
+
+class PortfolioSnapshotInDB(DBModelMixin, 组合快照):
+    """组合运行数据快照."""
@@ -1,28 +1,57 @@
+from typing import Dict, List, Tuple, Union
+
 from hq2redis.models import SecurityInfo, SecurityPrice, SecurityHQ, SecurityTicks, SecurityMeta
 
 from app.global_var import G
+from app.outer_sys.hq.cache import hq_cache
 
 
 async def get_security_info(symbol: str, exchange: str) -> SecurityInfo:
     """获取证券基本数据."""
-    return await G.hq.get_security_info(symbol, exchange)
+    return await hq_cache.get("info", symbol, exchange, G.hq.get_security_info)
 
 
 async def get_security_price(symbol: str, exchange: str) -> SecurityPrice:
     """获取证券价格数据."""
-    return await G.hq.get_security_price(symbol, exchange)
+    return await hq_cache.get("price", symbol, exchange, G.hq.get_security_price)
 
 
 async def get_security_hq(symbol: str, exchange: str) -> SecurityHQ:
     """获取证券行情数据."""
-    return await G.hq.get_security_hq(symbol, exchange)
+    return await hq_cache.get("hq", symbol, exchange, G.hq.get_security_hq)
 
 
 async def get_security_ticks(symbol: str, exchange: str) -> SecurityTicks:
     """获取证券Ticks数据."""
-    return await G.hq.get_security_ticks(symbol, exchange)
+    return await hq_cache.get("ticks", symbol, exchange, G.hq.get_security_ticks)
 
 
 async def get_security_meta(symbol: str, exchange: str) -> SecurityMeta:
     """获取证券元数据."""
-    return await G.hq.get_security_meta(symbol, exchange)
+    return await hq_cache.get("meta", symbol, exchange, G.hq.get_security_meta)
+
+
+async def get_security_infos(
+    securities: List[Tuple[str, str]], return_exceptions: bool = False
+) -> List[Union[SecurityInfo, Exception]]:
+    """批量获取证券基本数据."""
+    return await hq_cache.get_many("info", securities, G.hq.get_security_infos, return_exceptions=return_exceptions)
+
+
+async def get_security_prices(
+    securities: List[Tuple[str, str]], return_exceptions: bool = False
+) -> List[Union[SecurityPrice, Exception]]:
+    """批量获取证券价格数据."""
+    return await hq_cache.get_many("price", securities, G.hq.get_security_prices, return_exceptions=return_exceptions)
+
+
+async def get_security_hqs(
+    securities: List[Tuple[str, str]], return_exceptions: bool = False
+) -> List[Union[SecurityHQ, Exception]]:
+    """批量获取证券行情数据."""
+    return await hq_cache.get_many("hq", securities, G.hq.get_security_hqs, return_exceptions=return_exceptions)
+
+
+def get_hq_cache_stats() -> Dict[str, Dict[str, int]]:
+    """获取行情缓存命中统计."""
+    return hq_cache.stats()
@@ -1,4 +1,6 @@
+import asyncio
 from abc import ABCMeta, abstractmethod
+from typing import List, Tuple, Union
 
 from hq2redis.models import SecurityInfo, SecurityPrice, SecurityHQ, SecurityTicks, SecurityMeta
 from hq2redis.utils import get_security_meta
@@ -6,6 +8,14 @@ from hq2redis.utils import get_security_meta
 
 class HQSource(metaclass=ABCMeta):
     HQ2REDIS_EXCHANGE_MAPPING = {"0": "SZ", "1": "SH"}
+    @classmethod
+    async def startup(cls) -> None:
+        """初始化行情源所需的连接等资源."""
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """释放行情源占用的资源."""
+
     @classmethod
     @abstractmethod
     def get_code(cls, symbol: str, exchange: str) -> str:
@@ -37,6 +47,38 @@ class HQSource(metaclass=ABCMeta):
         meta = get_security_meta(cls._get_hq2redis_code(symbol, exchange))
         return SecurityMeta(symbol=symbol, exchange=cls.HQ2REDIS_EXCHANGE_MAPPING[exchange], **meta)
 
+    @classmethod
+    async def get_security_infos(
+        cls, securities: List[Tuple[str, str]], return_exceptions: bool = False
+    ) -> List[Union[SecurityInfo, Exception]]:
+        """批量获取证券基本信息数据.
+
+        securities为(symbol, exchange)列表, 返回结果与传入顺序一致.
+        return_exceptions为True时, 获取失败的证券以异常对象占位而不是直接抛出.
+        """
+        return await cls._gather(cls.get_security_info, securities, return_exceptions)
+
+    @classmethod
+    async def get_security_prices(
+        cls, securities: List[Tuple[str, str]], return_exceptions: bool = False
+    ) -> List[Union[SecurityPrice, Exception]]:
+        """批量获取证券价格数据."""
+        return await cls._gather(cls.get_security_price, securities, return_exceptions)
+
+    @classmethod
+    async def get_security_hqs(
+        cls, securities: List[Tuple[str, str]], return_exceptions: bool = False
+    ) -> List[Union[SecurityHQ, Exception]]:
+        """批量获取证券行情数据."""
+        return await cls._gather(cls.get_security_hq, securities, return_exceptions)
+
+    @classmethod
+    async def _gather(cls, func, securities: List[Tuple[str, str]], return_exceptions: bool) -> list:
+        """并发获取多只证券的数据, 子类可重写以控制并发方式."""
+        return list(
+            await asyncio.gather(*[func(symbol, exchange) for symbol, exchange in securities], return_exceptions=return_exceptions)
+        )
+
     @classmethod
     def _get_hq2redis_code(cls, symbol: str, exchange: str):
         return f"{symbol}.{cls.HQ2REDIS_EXCHANGE_MAPPING[exchange]}"
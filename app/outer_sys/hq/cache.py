@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from cacheout import LRUCache
+
+from app import settings
+from app.settings.hq import DEFAULT_HQ_CACHE_TTL
+
+SecurityKey = Tuple[str, str]
+
+
+class HQCache:
+    """行情进程内缓存.
+
+    - 按数据类型分别配置缓存时长(秒), 时长为0表示缓存至当日结束, 未配置的数据类型使用默认时长
+    - 每种数据类型使用独立的LRU缓存, 超出最大数量时淘汰最久未使用的证券
+    - 同一证券的并发未命中请求合并为一次上游请求
+    """
+
+    def __init__(self, ttl: Dict[str, float], maxsize: int, switch: bool = True):
+        self.switch = switch
+        # 配置的缓存时长覆盖默认值, 环境变量只配置部分数据类型时其余类型仍可缓存
+        self._ttl = {**DEFAULT_HQ_CACHE_TTL, **ttl}
+        self._caches = {data_type: LRUCache(maxsize=maxsize) for data_type in self._ttl}
+        self._pending: Dict[Tuple[str, SecurityKey], asyncio.Future] = {}
+        self._stats = {data_type: {"hit": 0, "miss": 0, "coalesced": 0} for data_type in self._ttl}
+
+    def _get_ttl(self, data_type: str) -> float:
+        ttl = self._ttl[data_type]
+        if ttl:
+            return ttl
+        now = datetime.now()
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return (tomorrow - now).total_seconds()
+
+    async def get(self, data_type: str, symbol: str, exchange: str, fetch: Callable[[str, str], Awaitable[Any]]) -> Any:
+        """获取单只证券数据, 未命中时调用fetch获取."""
+        if not self.switch:
+            return await fetch(symbol, exchange)
+
+        async def fetch_many(securities: List[SecurityKey], return_exceptions: bool = True) -> list:
+            try:
+                return [await fetch(*securities[0])]
+            except Exception as e:
+                return [e]
+
+        result = (await self.get_many(data_type, [(symbol, exchange)], fetch_many, return_exceptions=True))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def get_many(
+        self,
+        data_type: str,
+        securities: List[SecurityKey],
+        fetch_many: Callable[..., Awaitable[list]],
+        return_exceptions: bool = False,
+    ) -> list:
+        """批量获取证券数据, 仅对未命中且不在请求中的证券调用fetch_many."""
+        if not self.switch:
+            return await fetch_many(securities, return_exceptions=return_exceptions)
+        cache, stats = self._caches[data_type], self._stats[data_type]
+        results, waiting, missing = {}, {}, []
+        for key in dict.fromkeys(securities):
+            value = cache.get(key)
+            if value is not None:
+                stats["hit"] += 1
+                results[key] = value
+            elif (data_type, key) in self._pending:
+                stats["coalesced"] += 1
+                waiting[key] = self._pending[(data_type, key)]
+            else:
+                stats["miss"] += 1
+                missing.append(key)
+        if missing:
+            task = asyncio.ensure_future(self._fetch(data_type, missing, fetch_many))
+            for key in missing:
+                self._pending[(data_type, key)] = task
+                waiting[key] = task
+        for key, task in waiting.items():
+            results[key] = (await asyncio.shield(task))[key]
+        rv = [results[key] for key in securities]
+        if not return_exceptions:
+            for value in rv:
+                if isinstance(value, Exception):
+                    raise value
+        return rv
+
+    async def _fetch(self, data_type: str, securities: List[SecurityKey], fetch_many: Callable[..., Awaitable[list]]) -> Dict[SecurityKey, Any]:
+        try:
+            values = await fetch_many(securities, return_exceptions=True)
+        finally:
+            for key in securities:
+                self._pending.pop((data_type, key), None)
+        ttl = self._get_ttl(data_type)
+        for key, value in zip(securities, values):
+            if not isinstance(value, Exception):
+                self._caches[data_type].set(key, value, ttl=ttl)
+        return dict(zip(securities, values))
+
+    def clear(self) -> None:
+        """清空缓存."""
+        for cache in self._caches.values():
+            cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """缓存命中统计."""
+        return {data_type: {**stats, "size": len(self._caches[data_type])} for data_type, stats in self._stats.items()}
+
+
+hq_cache = HQCache(ttl=settings.hq.cache_ttl, maxsize=settings.hq.cache_maxsize, switch=settings.hq.cache_switch)
@@ -14,9 +14,17 @@ async def set_hq_source():
     if hq_source not in HQ_SOURCE_MAPPING.keys():
         raise ValueError("请配置可用的行情源(Jiantou/Redis).")
     G.hq = HQ_SOURCE_MAPPING[hq_source]()
+    await G.hq.startup()
     logger.info("配置行情源完成.")
 
 
+async def close_hq_source():
+    """关闭行情源."""
+    logger.info("正在关闭行情源...")
+    await G.hq.shutdown()
+    logger.info("行情源已关闭.")
+
+
 async def connect_hq2reids():
     logger.info("正在连接HQ2Redis...")
     hq2redis = HQ2Redis(
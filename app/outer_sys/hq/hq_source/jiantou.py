@@ -1,6 +1,9 @@
+import asyncio
 from datetime import datetime
+from typing import List, Optional, Tuple
 
 import httpx
+from cacheout import Cache
 from hq2redis import HQSourceError
 from hq2redis.models import SecurityInfo, SecurityPrice, SecurityHQ, SecurityTicks
 from hq2redis.utils import get_security_meta
@@ -12,20 +15,81 @@ from app.outer_sys.hq.abc import HQSource
 class JiantouHQ(HQSource):
     BASE_URL = settings.hq.jiantou_url
     JIANTOU_EXCHANGE_MAPPING = {"0": "2", "1": "1"}
+    MAX_CONCURRENCY = settings.hq.jiantou_max_concurrency
+    RETRIES = settings.hq.jiantou_retries
+    RETRY_BACKOFF = settings.hq.jiantou_retry_backoff
+    # 价格、行情、Ticks数据请求的是同一个接口, 短时间内复用同一份响应
+    _response_cache = Cache(maxsize=settings.hq.cache_maxsize, ttl=settings.hq.jiantou_cache_ttl)
+    _client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    async def startup(cls) -> None:
+        """创建长连接的HTTP连接池."""
+        cls._get_client()
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """关闭HTTP连接池."""
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+        cls._response_cache.clear()
+
+    @classmethod
+    def _get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.hq.jiantou_max_connections,
+                    max_keepalive_connections=settings.hq.jiantou_max_keepalive_connections,
+                ),
+                timeout=httpx.Timeout(settings.hq.jiantou_timeout),
+            )
+        return cls._client
 
     @classmethod
     async def _fetch(cls, symbol: str, exchange: str) -> dict:
-        async with httpx.AsyncClient() as client:
+        result = cls._response_cache.get((symbol, exchange))
+        if result is None:
+            result = await cls._request(symbol, exchange)
+            cls._response_cache.set((symbol, exchange), result)
+        return result
+
+    @classmethod
+    async def _request(cls, symbol: str, exchange: str) -> dict:
+        url = cls.BASE_URL.format(symbol, cls.JIANTOU_EXCHANGE_MAPPING[exchange])
+        message, cause = "", None
+        for retry in range(cls.RETRIES + 1):
+            if retry:
+                await asyncio.sleep(cls.RETRY_BACKOFF * 2 ** (retry - 1))
             try:
-                response = await client.get(cls.BASE_URL.format(symbol, cls.JIANTOU_EXCHANGE_MAPPING[exchange]))
-            except httpx.ConnectTimeout as e:
-                raise HQSourceError("请求建投API超时.") from e
-            else:
-                if response.status_code == 200:
-                    json = response.json()
-                    if json.get("status") == "OK":
-                        return json["result"]
-                raise HQSourceError(f"请求证券`{symbol}.{exchange}`失败, 接口返回值错误.")
+                response = await cls._get_client().get(url)
+            except httpx.TimeoutException as e:
+                message, cause = "请求建投API超时.", e
+                continue
+            except httpx.RequestError as e:
+                message, cause = f"请求建投API失败({e}).", e
+                continue
+            if response.status_code >= 500:
+                message, cause = f"请求证券`{symbol}.{exchange}`失败, 接口状态码{response.status_code}.", None
+                continue
+            if response.status_code == 200:
+                json = response.json()
+                if json.get("status") == "OK":
+                    return json["result"]
+            raise HQSourceError(f"请求证券`{symbol}.{exchange}`失败, 接口返回值错误.")
+        raise HQSourceError(message) from cause
+
+    @classmethod
+    async def _gather(cls, func, securities: List[Tuple[str, str]], return_exceptions: bool) -> list:
+        """限制并发数批量请求建投API, 避免瞬时请求过多."""
+        semaphore = asyncio.Semaphore(cls.MAX_CONCURRENCY)
+
+        async def _fetch_with_semaphore(symbol: str, exchange: str):
+            async with semaphore:
+                return await func(symbol, exchange)
+
+        return await super()._gather(_fetch_with_semaphore, securities, return_exceptions)
 
     @classmethod
     def get_code(cls, symbol: str, exchange: str) -> str:
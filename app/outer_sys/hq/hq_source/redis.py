@@ -1,12 +1,39 @@
+from typing import Callable, List, Optional, Tuple, Type, Union
+
 from hq2redis.models import SecurityInfo, SecurityPrice, SecurityHQ, SecurityTicks, SecurityMeta
 from hq2redis.reader import get_security_info, get_security_price, get_security_hq, get_security_ticks, \
     get_security_meta
+from pydantic import BaseModel, ValidationError
 
+from app import settings
+from app.db.redis import SuperRedis
 from app.outer_sys.hq.abc import HQSource
 
 
 class RedisHQ(HQSource):
     EXCHANGE_MAPPING = {"0": "SZ", "1": "SH"}
+    # 批量读取hq2redis中各证券的行情哈希时使用的连接池
+    _redis: Optional[SuperRedis] = None
+
+    @classmethod
+    async def startup(cls) -> None:
+        """创建批量读取行情的连接池."""
+        cls._get_redis()
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """关闭连接池."""
+        if cls._redis is not None:
+            await cls._redis.close()
+            cls._redis = None
+
+    @classmethod
+    def _get_redis(cls) -> SuperRedis:
+        if cls._redis is None:
+            redis = settings.redis
+            cls._redis = SuperRedis(f"redis://:{redis.hq2redis_password}@{redis.hq2redis_host}:{redis.hq2redis_port}/{redis.hq2redis_db}")
+        return cls._redis
+
     @classmethod
     def get_code(cls, symbol: str, exchange: str) -> str:
         """获取证券代码."""
@@ -36,3 +63,37 @@ class RedisHQ(HQSource):
     async def get_security_meta(cls, symbol: str, exchange: str) -> SecurityMeta:
         """获取证券元数据."""
         return await get_security_meta(cls.get_code(symbol, exchange))
+
+    @classmethod
+    async def get_security_prices(
+        cls, securities: List[Tuple[str, str]], return_exceptions: bool = False
+    ) -> List[Union[SecurityPrice, Exception]]:
+        """批量获取证券价格数据, 通过管道一次往返读取."""
+        return await cls._pipeline_get(SecurityPrice, cls.get_security_price, securities, return_exceptions)
+
+    @classmethod
+    async def get_security_hqs(
+        cls, securities: List[Tuple[str, str]], return_exceptions: bool = False
+    ) -> List[Union[SecurityHQ, Exception]]:
+        """批量获取证券行情数据, 通过管道一次往返读取."""
+        return await cls._pipeline_get(SecurityHQ, cls.get_security_hq, securities, return_exceptions)
+
+    @classmethod
+    async def _pipeline_get(
+        cls, model: Type[BaseModel], func: Callable, securities: List[Tuple[str, str]], return_exceptions: bool
+    ) -> list:
+        """在一个管道中读取各证券的行情哈希, 未读取到或无法解析的证券回退到单只读取, 与单只读取的结果及异常一致."""
+        rows = await cls._get_redis().hgetall_many([cls.get_code(symbol, exchange) for symbol, exchange in securities], {})
+        rv, missing = [], []
+        for index, row in enumerate(rows):
+            try:
+                rv.append(model(**row) if row else None)
+            except ValidationError:
+                rv.append(None)
+            if rv[-1] is None:
+                missing.append(index)
+        if missing:
+            fallback = await cls._gather(func, [securities[index] for index in missing], return_exceptions)
+            for index, value in zip(missing, fallback):
+                rv[index] = value
+        return rv
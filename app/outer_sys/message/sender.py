@@ -0,0 +1,76 @@
+import asyncio
+from typing import List, Optional
+
+from app.core.errors import MessageSendError
+from app.core.executor import run_blocking
+from app.enums.user import 发送消息类型
+from app.extentions import logger
+from app.outer_sys.message.adaptor.mail import SendEmail
+from app.outer_sys.message.adaptor.wechat import SendWechatMessage
+
+
+class AsyncMessageSender:
+    """异步消息发送.
+
+    - 邮件使用连接池: 每个SMTP连接只登录一次, 发送完成后归还复用, 发送出错的连接直接关闭
+    - 微信消息复用同一客户端
+    - 阻塞的连接、发送调用在阻塞调用执行池中执行, 不阻塞事件循环
+    - 同时发送的消息数不超过`concurrency`(即邮件连接数上限), 发送失败按指数退避重试`retries`次
+    """
+
+    def __init__(self, concurrency: int = 5, retries: int = 3, retry_backoff: float = 1):
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._idle_emails: List[SendEmail] = []
+        self._wechat: Optional[SendWechatMessage] = None
+
+    async def _send_email(self, to: str, title: str, content: str) -> dict:
+        client = self._idle_emails.pop() if self._idle_emails else await run_blocking(SendEmail)
+        try:
+            result = await run_blocking(client.send, to_addr=to, title=title, content=content, send_type="html")
+        except Exception:
+            await self._quit_email(client)
+            raise
+        self._idle_emails.append(client)
+        return result
+
+    async def _send_wechat(self, to: str, content: str) -> dict:
+        if self._wechat is None:
+            self._wechat = SendWechatMessage()
+        return await run_blocking(self._wechat.send, content=content, open_id=to)
+
+    async def _send_once(self, send_type: 发送消息类型, to: str, title: str, content: str) -> None:
+        if send_type == 发送消息类型.email:
+            result = await self._send_email(to, title, content)
+        else:
+            result = await self._send_wechat(to, content)
+        if result.get("code"):
+            raise MessageSendError(message=f"消息发送失败: {result.get('error_message')}")
+
+    async def send(self, send_type: 发送消息类型, to: str, title: str, content: str) -> None:
+        """发送消息, 重试后仍失败时抛出最后一次的异常."""
+        if send_type not in (发送消息类型.email, 发送消息类型.we_chat):
+            raise MessageSendError(message=f"不支持的发送消息类型`{send_type}`")
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await self._send_once(send_type, to, title, content)
+                except Exception as e:
+                    if attempt >= self.retries:
+                        raise
+                    logger.warning(f"[消息发送失败] {to} 第{attempt + 1}次: {getattr(e, 'message', e)}")
+                await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    @staticmethod
+    async def _quit_email(client: SendEmail) -> None:
+        try:
+            await run_blocking(client.quit)
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        """关闭邮件连接池."""
+        idle_emails, self._idle_emails = self._idle_emails, []
+        for client in idle_emails:
+            await self._quit_email(client)
@@ -1,12 +1,17 @@
+import asyncio
 import pickle
+from collections import defaultdict
+from copy import copy, deepcopy
 from datetime import datetime
 from functools import partial
 
+from cacheout import Cache
 from stralib import UserConfig, Robot, SysConfig, FastTdate
 from stralib.data_service.robot_data import RobotData
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 from app.core.errors import PermissionDenied, NoDataError
+from app.core.executor import robot_executor
 from app.crud.base import get_robots_collection
 from app.db.mongodb import db
 from app.global_var import G
@@ -75,11 +80,50 @@ async def get_stralib_robot_data(sid: str) -> RobotData:
     return robot_data
 
 
-async def account_robot_factory(portfolio: Portfolio) -> partial:
+class RobotContextCache:
+    """机器人运行上下文缓存.
+
+    - 使用同一机器人的组合共享格式化后的机器人配置和`RobotData`, 每个机器人只查询、反序列化一次
+    - 并发获取同一机器人的上下文时只构建一次, 构建失败(如机器人不支持检测)的结果同样被缓存
+    - 风险检测每次运行使用独立的缓存; 解决方案使用带过期时间的共享缓存(`solution_robot_contexts`)
+    - 每次获取返回`RobotData`的浅拷贝, 机器人对其属性的赋值不影响其他组合; 在执行池中构建、运行机器人时
+      需持有`lock(sid)`, 同一`RobotData`中的数据同时只被一个线程访问
+    """
+
+    def __init__(self, ttl: float = 0, maxsize: int = 0):
+        self._contexts = Cache(maxsize=maxsize, ttl=ttl)
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def _load(self, sid: str) -> Tuple[Dict[str, Any], RobotData]:
+        robot = await RobotTools.get_portfolio_robot(sid)
+        if robot["标识符"].startswith("15"):
+            raise PermissionDenied(message="15开头机器人不支持检测")
+        return robot, await get_stralib_robot_data(sid)
+
+    async def get(self, sid: str) -> Tuple[Dict[str, Any], RobotData]:
+        """获取机器人配置(副本, 可以直接修改)及`RobotData`."""
+        future = self._contexts.get(sid)
+        if future is None:
+            future = asyncio.ensure_future(self._load(sid))
+            self._contexts.set(sid, future)
+        robot, source_data = await asyncio.shield(future)
+        return deepcopy(robot), copy(source_data)
+
+    def lock(self, sid: str) -> asyncio.Lock:
+        """使用机器人`sid`的`RobotData`时持有的锁."""
+        return self._locks[sid]
+
+    def clear(self) -> None:
+        self._contexts.clear()
+
+
+# 解决方案接口共享的机器人上下文, 机器人重新计算后最多延迟1分钟生效
+solution_robot_contexts = RobotContextCache(ttl=60, maxsize=1000)
+
+
+async def account_robot_factory(portfolio: Portfolio, robot_contexts: Optional[RobotContextCache] = None) -> partial:
     """返回由组合信息配置的机器人"""
-    robot = await RobotTools.get_portfolio_robot(portfolio.robot)
-    if robot["标识符"].startswith("15"):
-        raise PermissionDenied(message="15开头机器人不支持检测")
+    robot, source_data = await (robot_contexts or RobotContextCache()).get(portfolio.robot)
     tdate = robot["计算时间"]
     config = user_config_factory(
         robot,
@@ -94,19 +138,20 @@ async def account_robot_factory(portfolio: Portfolio) -> partial:
         **principle_to_robot(portfolio.robot_config),
     )
     robot_config = UserConfig.from_dict(config)
-    source_data = await get_stralib_robot_data(portfolio.robot)
     return partial(Robot, tdate, rconfig=robot_config, all_data=source_data)
 
 
 async def create_stralib_robot(
     portfolio: Portfolio,
     fund_account_assets: FundAccountInDB,
-    fund_account_position: List[FundAccountPositionInDB]
+    fund_account_position: List[FundAccountPositionInDB],
+    robot_contexts: Optional[RobotContextCache] = None,
 ) -> Robot:
-    """构造stralib Robot."""
-    b_robot = await RobotTools.get_portfolio_robot(portfolio.robot)
-    if b_robot["标识符"].startswith("15"):
-        raise PermissionDenied(message="15开头机器人不支持检测")
+    """构造stralib Robot, 传入`robot_contexts`时复用其中的机器人配置及RobotData.
+
+    机器人在`robot_executor`中构建, 共享RobotData时调用方需持有`robot_contexts.lock(portfolio.robot)`.
+    """
+    b_robot, source_data = await (robot_contexts or RobotContextCache()).get(portfolio.robot)
     tdate = b_robot["计算时间"]
     config = user_config_factory(
         b_robot,
@@ -124,8 +169,8 @@ async def create_stralib_robot(
     stocks = config.pop("stocks")
 
     config = UserConfig.from_dict(config)
-    source_data = await get_stralib_robot_data(portfolio.robot)
-    robot = Robot(tdate, asset, stocks, config, source_data)
+    # 不限制超时, 避免超时返回后执行池中的线程仍在访问共享的RobotData
+    robot = await robot_executor.run(Robot, tdate, asset, stocks, config, source_data, timeout=0)
     return robot
 
 
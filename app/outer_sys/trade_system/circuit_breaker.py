@@ -0,0 +1,52 @@
+import time
+
+
+class CircuitBreaker:
+    """熔断器.
+
+    - 连续失败达到`failure_threshold`次后熔断(open), 熔断期间请求直接失败
+    - 熔断`recovery_timeout`秒后进入半开(half_open)状态, 只放行一个试探请求
+    - 试探请求成功则恢复(closed), 失败则重新熔断
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.failure_threshold:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """试探请求结束但未记录结果(如被取消)时释放试探名额, 下一个请求重新试探."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
@@ -1,15 +1,19 @@
+import asyncio
 import inspect
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from urllib.parse import urlencode
 
 import aiohttp
 from aiohttp import ClientOSError, ClientResponseError, ServerDisconnectedError
 from aiohttp.client import _RequestContextManager
+from cacheout import Cache
 from yarl import URL
 
+from app import settings
 from app.outer_sys.hq import get_security_info
+from app.outer_sys.trade_system.circuit_breaker import CircuitBreaker
 from app.outer_sys.trade_system.pt import mapper
 from app.outer_sys.trade_system.pt.mapper import EXCHANGE, ORDER_STATUS
 from app.outer_sys.trade_system.trade_interface import TradeSystemAdaptor
@@ -17,12 +21,41 @@ from app.schema.trade_system import TradeInResponse
 
 
 class PTAdaptor(TradeSystemAdaptor):
-    """模拟交易适配."""
+    """模拟交易适配.
+
+    - 使用有连接数上限和超时时间的长连接池
+    - 查询接口失败时按指数退避重试, 连续失败达到阈值后熔断, 熔断期间直接返回失败
+    - 查询接口的响应短时间缓存, 下单/撤单后清除该资金账户的缓存; 委托查询用于监控订单状态, 不缓存
+    """
+
+    NO_CACHE_FUNCS = {"get_orders"}
 
     def __init__(self, base_url: URL):
         TradeSystemAdaptor.__init__(self)
         self._base_url = base_url
-        self._client = aiohttp.ClientSession(raise_for_status=True)
+        self._client: Optional[aiohttp.ClientSession] = None
+        self._breaker = CircuitBreaker(
+            settings.trade_system.breaker_failure_threshold,
+            settings.trade_system.breaker_recovery_timeout,
+        )
+        self._cache = Cache(
+            maxsize=settings.trade_system.cache_maxsize,
+            ttl=settings.trade_system.cache_ttl,
+        )
+
+    def _get_client(self) -> aiohttp.ClientSession:
+        if self._client is None or self._client.closed:
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.trade_system.max_connections),
+                timeout=aiohttp.ClientTimeout(total=settings.trade_system.timeout),
+                raise_for_status=True,
+            )
+        return self._client
+
+    def invalidate_cache(self, fund_id: str) -> None:
+        """清除资金账户的查询缓存."""
+        for key in [key for key in self._cache.keys() if key[0] == fund_id]:
+            self._cache.delete(key)
 
     def _make_url(self, path: str, name: str = "", query: Optional[dict] = None) -> URL:
         query_str = urlencode(query) if query is not None else ""
@@ -68,9 +101,9 @@ class PTAdaptor(TradeSystemAdaptor):
         self, method: str, url: URL, header: Optional[dict], json: Optional[dict]
     ) -> _RequestContextManager:
         if method == "POST":
-            return self._client.request(method, url, headers=header, json=json)
+            return self._get_client().request(method, url, headers=header, json=json)
         else:
-            return self._client.request(method, url, headers=header)
+            return self._get_client().request(method, url, headers=header)
 
     async def request_interface(
         self,
@@ -82,26 +115,87 @@ class PTAdaptor(TradeSystemAdaptor):
         convert_out: bool = True,
     ) -> TradeInResponse:
         method, path = self.function2interface(func_name)
+        url = self._make_url(path, name, query)
+        headers = self._make_headers(login_required, payload)
+        # 只重试和缓存幂等的查询接口
+        is_query = method == "GET"
+        use_cache = is_query and func_name not in self.NO_CACHE_FUNCS and settings.trade_system.cache_ttl
+        account_id = (headers or {}).get("Authorization", "").replace("Token ", "") or name
+        cache_key = (account_id, func_name, str(url), convert_out)
+        if use_cache:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                # 调用方可能修改返回数据, 缓存中保留原始副本
+                return cached.copy(deep=True)
+        is_probe = self._breaker.state == CircuitBreaker.HALF_OPEN
+        if not self._breaker.allow_request():
+            return TradeInResponse(msg="模拟交易系统暂不可用(熔断中).", flag=False)
+        retries = settings.trade_system.retries if is_query else 0
         try:
-            async with self.request_wrapper(
-                method,
-                self._make_url(path, name, query),
-                self._make_headers(login_required, payload),
-                payload,
-            ) as resp:
-                response_json = await resp.json()
-                if convert_out:
-                    if isinstance(response_json, list):
-                        rv = []
-                        for item in response_json:
-                            rv.append(self.out2beehive(func_name, item))
-                    else:
-                        rv = self.out2beehive(func_name, response_json)
+            for retry in range(retries + 1):
+                if retry:
+                    await asyncio.sleep(settings.trade_system.retry_backoff * 2 ** (retry - 1))
+                try:
+                    async with self.request_wrapper(method, url, headers, payload) as resp:
+                        response_json = await resp.json()
+                except ClientResponseError as e:
+                    if e.status < 500:
+                        # 请求本身有误, 不计入熔断
+                        self._breaker.record_success()
+                        return TradeInResponse(msg=f"连接模拟交易系统失败, {e}.", flag=False)
+                    error = e
+                except (ClientOSError, ServerDisconnectedError, asyncio.TimeoutError) as e:
+                    error = e
                 else:
-                    rv = response_json
-                return TradeInResponse(data=rv, flag=True)
-        except (ClientResponseError, ClientOSError, ServerDisconnectedError) as e:
-            return TradeInResponse(msg=f"连接模拟交易系统失败, {e}.", flag=False)
+                    self._breaker.record_success()
+                    break
+            else:
+                self._breaker.record_failure()
+                return TradeInResponse(msg=f"连接模拟交易系统失败, {error}.", flag=False)
+        finally:
+            # 试探请求被取消或抛出未处理的异常时释放试探名额, 否则熔断器无法恢复
+            if is_probe:
+                self._breaker.release_probe()
+        if convert_out:
+            if isinstance(response_json, list):
+                rv = []
+                for item in response_json:
+                    rv.append(self.out2beehive(func_name, item))
+            else:
+                rv = self.out2beehive(func_name, response_json)
+        else:
+            rv = response_json
+        tir = TradeInResponse(data=rv, flag=True)
+        if use_cache:
+            self._cache.set(cache_key, tir.copy(deep=True))
+        return tir
+
+    async def _gather_many(self, func, fund_ids: List[str], **kwargs) -> Dict[str, TradeInResponse]:
+        """限制并发数批量查询多个资金账户."""
+        semaphore = asyncio.Semaphore(settings.trade_system.max_concurrency)
+
+        async def _fetch(fund_id: str) -> TradeInResponse:
+            async with semaphore:
+                return await func(fund_id=fund_id, **kwargs)
+
+        fund_ids = list(dict.fromkeys(fund_ids))
+        return dict(zip(fund_ids, await asyncio.gather(*(_fetch(fund_id) for fund_id in fund_ids))))
+
+    async def get_fund_assets_many(self, fund_ids: List[str], convert_out: bool = True) -> Dict[str, TradeInResponse]:
+        """批量查询账户资产."""
+        return await self._gather_many(self.get_fund_asset, fund_ids, convert_out=convert_out)
+
+    async def get_fund_stocks_many(self, fund_ids: List[str], convert_out: bool = True) -> Dict[str, TradeInResponse]:
+        """批量查询账户持仓."""
+        return await self._gather_many(self.get_fund_stock, fund_ids, convert_out=convert_out)
+
+    async def get_statements_many(self, fund_ids: List[str], **kwargs) -> Dict[str, TradeInResponse]:
+        """批量查询交割单."""
+        return await self._gather_many(self.get_statement, fund_ids, **kwargs)
+
+    async def get_order_records_many(self, fund_ids: List[str], **kwargs) -> Dict[str, TradeInResponse]:
+        """批量查询委托记录."""
+        return await self._gather_many(self.get_order_record, fund_ids, **kwargs)
 
     async def register_trade_system(self, **kwargs) -> TradeInResponse:
         """在交易系统注册账号.
@@ -247,7 +341,9 @@ class PTAdaptor(TradeSystemAdaptor):
         """
         func_name = inspect.currentframe().f_code.co_name
         out_order = self.beehive2out(**kwargs)
-        return await self.request_interface(func_name=func_name, payload=out_order)
+        tir = await self.request_interface(func_name=func_name, payload=out_order)
+        self.invalidate_cache(kwargs["fund_id"])
+        return tir
 
     async def order_cancel(self, **kwargs) -> TradeInResponse:
         """撤单.
@@ -265,9 +361,11 @@ class PTAdaptor(TradeSystemAdaptor):
         func_name = inspect.currentframe().f_code.co_name
         payload = self.beehive2out(**kwargs)
         name = payload["order_id"]
-        return await self.request_interface(
+        tir = await self.request_interface(
             func_name=func_name, payload=payload, name=name, convert_out=False
         )
+        self.invalidate_cache(kwargs["fund_id"])
+        return tir
 
     async def get_today_orders(self, **kwargs) -> TradeInResponse:
         """
@@ -393,4 +491,6 @@ class PTAdaptor(TradeSystemAdaptor):
         return TradeInResponse(data="清算完成", flag=True)
 
     async def close(self):
-        await self._client.close()
+        if self._client is not None:
+            await self._client.close()
+        self._cache.clear()
@@ -1,3 +1,6 @@
+from typing import List
+
+
 class TradeSystemAdaptor(object):
     def __init__(self):
         ...
@@ -61,6 +64,22 @@ class TradeSystemAdaptor(object):
         """交割单查询"""
         ...
 
+    def get_fund_assets_many(self, fund_ids, **kwargs):
+        """批量账户资产查询."""
+        ...
+
+    def get_fund_stocks_many(self, fund_ids, **kwargs):
+        """批量账户持仓查询."""
+        ...
+
+    def get_statements_many(self, fund_ids, **kwargs):
+        """批量交割单查询."""
+        ...
+
+    def get_order_records_many(self, fund_ids, **kwargs):
+        """批量操作记录查询."""
+        ...
+
     def close(self):
         """关闭交易系统连接."""
         ...
@@ -139,6 +158,26 @@ class TradeInterface:
             fund_id=fund_id, convert_out=convert_out
         )
 
+    async def get_fund_assets_many(self, fund_ids: List[str], convert_out: bool = True):
+        """批量账户资产查询, 返回以资金账户id为键的查询结果.
+
+        Parameters
+        ----------
+        fund_ids: 资金账户id列表
+        convert_out: 是否转换格式
+        """
+        return await self.backend_adaptor.get_fund_assets_many(fund_ids, convert_out=convert_out)
+
+    async def get_fund_stocks_many(self, fund_ids: List[str], convert_out: bool = True):
+        """批量账户持仓查询, 返回以资金账户id为键的查询结果.
+
+        Parameters
+        ----------
+        fund_ids: 资金账户id列表
+        convert_out: 是否转换格式
+        """
+        return await self.backend_adaptor.get_fund_stocks_many(fund_ids, convert_out=convert_out)
+
     def order_input(
         self,
         fund_id: str,
@@ -187,6 +226,26 @@ class TradeInterface:
             fund_id=fund_id,
         )
 
+    async def get_order_records_many(
+        self,
+        fund_ids: List[str],
+        start_date: str = None,
+        stop_date: str = None,
+        op_flag: int = 1,
+    ):
+        """批量委托记录查询, 返回以资金账户id为键的查询结果.
+
+        Parameters
+        ----------
+        fund_ids: 资金账户id列表
+        start_date: '20180101'
+        stop_date: '20180606'
+        op_flag: 1:委托 2:成交 3:可撤
+        """
+        return await self.backend_adaptor.get_order_records_many(
+            fund_ids, start_date=start_date, stop_date=stop_date, op_flag=op_flag
+        )
+
     async def get_statement(
         self,
         fund_id: str,
@@ -210,6 +269,26 @@ class TradeInterface:
             convert_out=convert_out,
         )
 
+    async def get_statements_many(
+        self,
+        fund_ids: List[str],
+        start_date: str = None,
+        stop_date: str = None,
+        convert_out: bool = True,
+    ):
+        """批量交割单记录查询, 返回以资金账户id为键的查询结果.
+
+        Parameters
+        ----------
+        fund_ids: 资金账户id列表
+        start_date: '20180101'
+        stop_date: '20180606'
+        convert_out: 是否转换格式
+        """
+        return await self.backend_adaptor.get_statements_many(
+            fund_ids, start_date=start_date, stop_date=stop_date, convert_out=convert_out
+        )
+
     def order_cancel(self, fund_id: str, order_id: str):
         """撤单.
 
@@ -1,8 +1,14 @@
+from typing import Dict, List
+
 from wechatpy import WeChatClientException
 
+from app.core.executor import run_blocking
 from app.extentions import logger
 from app.global_var import G
 
+# 批量获取用户信息接口每次最多支持的open_id数
+WECHAT_BATCH_GET_LIMIT = 100
+
 
 def get_wechat_avatar(open_id):
     """
@@ -24,3 +30,14 @@ def get_wechat_avatar(open_id):
     else:
         avatar = wx_user.get("headimgurl") if wx_user else ""
     return avatar
+
+
+async def get_wechat_users(open_ids: List[str]) -> Dict[str, dict]:
+    """批量获取微信用户信息, 以open_id为键.
+
+    每次最多`WECHAT_BATCH_GET_LIMIT`个open_id, 请求在阻塞调用执行池中执行, 不阻塞事件循环.
+    """
+    if len(open_ids) > WECHAT_BATCH_GET_LIMIT:
+        raise ValueError(f"每次最多获取{WECHAT_BATCH_GET_LIMIT}个微信用户信息.")
+    user_list = await run_blocking(G.wechat_client.user.get_batch, open_ids) if open_ids else []
+    return {user["openid"]: user for user in user_list}
@@ -37,6 +37,7 @@ from app.schema.portfolio import PortfolioInResponse
 from app.service.check_status import CheckStatus
 from app.service.datetime import get_early_morning, shift_month_datetime, str_of_today
 from app.service.fund_account.fund_account import get_fund_account_flow
+from app.service.portfolio.snapshot import refresh_portfolio_snapshots
 from app.service.time_series_data.converter import (
     field_converter,
     fund_time_series_data2ability,
@@ -352,6 +353,8 @@ async def calculate_ability(portfolio_list: List[PortfolioInResponse]):
         )
     if fund_account_operations:
         await bulk_write_fund_account(db.client, fund_account_operations)
+    # 更新组合运行数据快照
+    await refresh_portfolio_snapshots(db.client, portfolio_list)
 
 
 @print_execute_time
@@ -7,12 +7,22 @@ class JobTools:
     @classmethod
     def add_base(cls, scheduler, config, job_num=None):
         """任务生成"""
-        if job_num:
+        func = config.get("func")
+        if settings.scheduler.distributed:
+            # 分布式执行时经`run_as_leader`确认租约后触发, 分片任务只投递分片, 由各worker领取执行
+            from app.schedulers.base.runner import enqueue_shard, get_func_path, run_as_leader
+
+            if job_num:
+                for i in range(0, job_num):
+                    args = (get_func_path(enqueue_shard), get_func_path(func), i, job_num)
+                    scheduler.add_job(run_as_leader, id=f"{func.__name__}_{i}", args=args, **config.get("cron"))
+            else:
+                scheduler.add_job(run_as_leader, args=(get_func_path(func),), **{"name": func.__name__, **config.get("cron")})
+        elif job_num:
             for i in range(0, job_num):
-                func = config.get("func")
                 scheduler.add_job(func, id=f"{func.__name__}_{i}", args=(i, job_num), **config.get("cron"))
         else:
-            scheduler.add_job(config.get("func"), **config.get("cron"))
+            scheduler.add_job(func, **config.get("cron"))
 
 
 class JobAbs(metaclass=ABCMeta):
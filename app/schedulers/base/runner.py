@@ -0,0 +1,256 @@
+import asyncio
+import importlib
+import inspect
+import json
+import os
+import socket
+import time
+from contextlib import suppress
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from app import settings
+from app.db.redis import SuperRedis
+from app.global_var import G
+from app.schedulers import logger, scheduler
+
+LEADER_KEY = "scheduler_leader"
+SHARD_QUEUE_KEY = "scheduler_shard_queue"
+SHARD_PROGRESS_KEY = "scheduler_shard_progress"
+# 执行中的分片: 字段为`run_id:job_idx`, 值为分片消息及最近心跳时间
+SHARD_RUNNING_KEY = "scheduler_shard_running"
+# 超时分片最多重新投递的次数, 避免导致worker崩溃的分片被反复投递
+SHARD_MAX_REQUEUE = 3
+# 只允许执行定时任务模块中的函数
+SHARD_FUNC_PREFIX = "app.schedulers."
+# 仅当租约仍属于当前worker时续期
+RENEW_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+# 执行中的分片记录未被更新(未续心跳或已完成)时才重新投递
+REQUEUE_SCRIPT = (
+    "if redis.call('hget', KEYS[1], ARGV[1]) == ARGV[2] then "
+    "redis.call('hdel', KEYS[1], ARGV[1]) return redis.call('rpush', KEYS[2], ARGV[3]) else return 0 end"
+)
+
+
+def get_func_path(func: Callable) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def load_func(func_path: str) -> Callable:
+    if not func_path.startswith(SHARD_FUNC_PREFIX):
+        raise ValueError(f"不允许执行的分片任务`{func_path}`")
+    module, name = func_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+
+def get_run_id(func_path: str, fire_time: Optional[datetime] = None) -> str:
+    """同一次触发的各分片在同一分钟内投递, 以任务函数和触发分钟作为运行标识."""
+    fire_time = fire_time or datetime.now()
+    return f"{func_path.rsplit('.', 1)[-1]}_{fire_time:%Y%m%d%H%M}"
+
+
+async def enqueue_shard(func_path: str, job_idx: int, job_num: int) -> None:
+    """分片任务触发时投递到分片队列, 由各worker领取执行."""
+    run_id = get_run_id(func_path)
+    await set_shard_progress(G.scheduler_redis, run_id, job_idx, status="pending")
+    await G.scheduler_redis.execute("RPUSH", SHARD_QUEUE_KEY, json.dumps({"func": func_path, "args": [job_idx, job_num], "run_id": run_id}))
+
+
+async def run_as_leader(func_path: str, *args) -> None:
+    """分布式执行时定时任务触发前确认当前worker仍持有leader租约.
+
+    租约续期与任务共用事件循环, 阻塞的任务可能使租约过期并由其他worker接管, 此时跳过本次触发避免任务重复执行.
+    """
+    if job_runner is None or not await job_runner.check_leader():
+        logger.warning(f"[定时任务] 当前worker未持有leader租约, 跳过`{func_path}`.")
+        return
+    func = load_func(func_path)
+    if inspect.iscoroutinefunction(func):
+        await func(*args)
+    else:
+        await asyncio.get_event_loop().run_in_executor(None, partial(func, *args))
+
+
+async def set_shard_progress(redis: SuperRedis, run_id: str, job_idx: int, **kwargs) -> None:
+    key = f"{SHARD_PROGRESS_KEY}:{run_id}"
+    await redis.hmset_dict(key, {str(job_idx): json.dumps({**kwargs, "updated_at": datetime.now().isoformat()})})
+    await redis.execute("EXPIRE", key, 3600 * 24)
+
+
+async def get_shard_progress(redis: SuperRedis, run_id: str) -> Dict[str, dict]:
+    """查询某次运行各分片的状态."""
+    progress = await redis.hgetall(f"{SHARD_PROGRESS_KEY}:{run_id}", {})
+    return {job_idx: json.loads(value) for job_idx, value in progress.items()}
+
+
+class DistributedJobRunner:
+    """分布式定时任务执行器.
+
+    - 各worker通过redis租约竞选leader, 只有leader运行定时任务调度器; leader租约过期后由其他worker接管
+    - 分片任务(`JobTools.add_base(..., job_num)`)在leader上触发时只投递分片, 由所有worker从分片队列中领取执行
+    - 每个分片的状态(pending/running/success/failed)、执行worker及耗时记录在redis哈希中
+    - 领取分片的BLPOP占用连接池中的独占连接(连接池大小需大于`shard_concurrency`), 不阻塞租约续期及进度写入
+    - 定时任务通过`run_as_leader`触发, 执行前确认租约仍属于当前worker
+    - 执行中的分片定期续心跳, 超过`visibility_timeout`未续心跳(worker崩溃)的分片由leader重新投递
+    """
+
+    def __init__(self, redis: SuperRedis, lease_ttl: int = 30, shard_concurrency: int = 1, visibility_timeout: int = 600):
+        self.redis = redis
+        self.lease_ttl = lease_ttl
+        self.shard_concurrency = shard_concurrency
+        self.visibility_timeout = visibility_timeout
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self._tasks: List[asyncio.Future] = []
+
+    async def acquire_leader(self) -> bool:
+        """获取或续期leader租约."""
+        ttl = self.lease_ttl * 1000
+        if self.is_leader:
+            return bool(await self.redis.execute("EVAL", RENEW_SCRIPT, 1, LEADER_KEY, self.worker_id, ttl))
+        return bool(await self.redis.execute("SET", LEADER_KEY, self.worker_id, "PX", ttl, "NX"))
+
+    async def release_leader(self) -> None:
+        await self.redis.compare_and_delete(LEADER_KEY, self.worker_id)
+
+    async def on_elected(self) -> None:
+        logger.info(f"[定时任务] {self.worker_id}成为leader.")
+        if scheduler.running:
+            scheduler.resume()
+        else:
+            from app.schedulers.load_jobs import load_jobs
+
+            await load_jobs()
+
+    def on_demoted(self) -> None:
+        logger.warning(f"[定时任务] {self.worker_id}失去leader租约, 暂停调度.")
+        scheduler.pause()
+
+    async def check_leader(self) -> bool:
+        """确认leader租约仍属于当前worker, 已被接管时暂停调度."""
+        is_leader = await self.redis.get(LEADER_KEY) == self.worker_id
+        if not is_leader and self.is_leader:
+            self.on_demoted()
+            self.is_leader = False
+        return is_leader
+
+    async def elect(self) -> None:
+        while True:
+            try:
+                is_leader = await self.acquire_leader()
+            except Exception as e:
+                logger.warning(f"[定时任务] leader租约续期失败: {e}")
+                is_leader = False
+            if is_leader and not self.is_leader:
+                await self.on_elected()
+            elif not is_leader and self.is_leader:
+                self.on_demoted()
+            self.is_leader = is_leader
+            await asyncio.sleep(self.lease_ttl / 3)
+
+    async def heartbeat(self, field: str, message: dict) -> None:
+        """分片执行期间定期续心跳."""
+        while True:
+            value = json.dumps({"message": message, "worker": self.worker_id, "heartbeat": time.time()})
+            await self.redis.hmset_dict(SHARD_RUNNING_KEY, {field: value})
+            await asyncio.sleep(self.visibility_timeout / 3)
+
+    async def run_shard(self, message: dict) -> None:
+        run_id, job_idx = message["run_id"], message["args"][0]
+        field = f"{run_id}:{job_idx}"
+        start = datetime.now()
+        await set_shard_progress(self.redis, run_id, job_idx, status="running", worker=self.worker_id)
+        heartbeat = asyncio.ensure_future(self.heartbeat(field, message))
+        try:
+            await load_func(message["func"])(*message["args"])
+        except Exception as e:
+            logger.exception(f"[定时任务] 分片{run_id}[{job_idx}]执行失败.")
+            status, error = "failed", str(e)
+        else:
+            status, error = "success", None
+        finally:
+            heartbeat.cancel()
+            with suppress(asyncio.CancelledError):
+                await heartbeat
+        seconds = (datetime.now() - start).total_seconds()
+        await set_shard_progress(self.redis, run_id, job_idx, status=status, worker=self.worker_id, seconds=seconds, error=error)
+        await self.redis.hdel(SHARD_RUNNING_KEY, field)
+
+    async def requeue_expired(self) -> None:
+        """重新投递超过`visibility_timeout`未续心跳的分片."""
+        running = await self.redis.hgetall(SHARD_RUNNING_KEY, {})
+        for field, value in running.items():
+            item = json.loads(value)
+            if time.time() - item["heartbeat"] < self.visibility_timeout:
+                continue
+            message = item["message"]
+            run_id, job_idx = message["run_id"], message["args"][0]
+            requeued = message.get("requeued", 0) + 1
+            if requeued > SHARD_MAX_REQUEUE:
+                logger.error(f"[定时任务] 分片{field}多次执行超时, 不再重新投递.")
+                if await self.redis.hcompare_and_delete(SHARD_RUNNING_KEY, field, value):
+                    await set_shard_progress(self.redis, run_id, job_idx, status="failed", worker=item["worker"], error="执行超时")
+                continue
+            payload = json.dumps({**message, "requeued": requeued})
+            if await self.redis.execute("EVAL", REQUEUE_SCRIPT, 2, SHARD_RUNNING_KEY, SHARD_QUEUE_KEY, field, value, payload):
+                logger.warning(f"[定时任务] 分片{field}在{item['worker']}上超时未续心跳, 重新投递.")
+                await set_shard_progress(self.redis, run_id, job_idx, status="pending", requeued=requeued)
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            if not self.is_leader:
+                continue
+            try:
+                await self.requeue_expired()
+            except Exception as e:
+                logger.warning(f"[定时任务] 重新投递超时分片失败: {e}")
+
+    async def consume(self) -> None:
+        while True:
+            try:
+                item = await self.redis.blpop(SHARD_QUEUE_KEY, 5)
+            except Exception as e:
+                logger.warning(f"[定时任务] 领取分片失败: {e}")
+                await asyncio.sleep(5)
+                continue
+            if item:
+                await self.run_shard(json.loads(item[1]))
+
+    def start(self) -> None:
+        self._tasks = [asyncio.ensure_future(self.elect()), asyncio.ensure_future(self.watch())]
+        self._tasks.extend(asyncio.ensure_future(self.consume()) for _ in range(self.shard_concurrency))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.is_leader:
+            scheduler.shutdown(wait=False)
+            await self.release_leader()
+            self.is_leader = False
+
+
+job_runner: Optional[DistributedJobRunner] = None
+
+
+async def start_job_runner():
+    """启动分布式定时任务执行器."""
+    global job_runner
+    if not settings.scheduler.distributed:
+        return
+    job_runner = DistributedJobRunner(
+        G.scheduler_redis,
+        settings.scheduler.lease_ttl,
+        settings.scheduler.shard_concurrency,
+        settings.scheduler.shard_visibility_timeout,
+    )
+    job_runner.start()
+    logger.info(f"[定时任务] 分布式执行器已启动: {job_runner.worker_id}")
+
+
+async def stop_job_runner():
+    """停止分布式定时任务执行器."""
+    if job_runner is not None:
+        await job_runner.stop()
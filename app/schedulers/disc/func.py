@@ -1,25 +1,42 @@
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import ValidationError
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 
 from app import settings
-from app.core.errors import DiscuzqCustomError
+from app.core.auth_cache import invalidate_user_cache
 from app.crud.base import (
     get_equipment_collection,
     get_portfolio_collection,
     get_robots_collection,
     get_user_collection,
 )
-from app.crud.discuzq import (
-    create_thread,
-    get_or_create_disc_user,
-    update_user_signature,
-)
+from app.crud.discuzq import get_or_create_disc_user, update_user_signature
 from app.db.mongodb import db
 from app.extentions import logger
-from app.schema.user import User
-from app.service.disc import clear_error_article
+from app.global_var import G
+from app.service.datetime import str_of_today
+from app.service.disc import DiscSyncEngine, clear_error_article
+
+
+def get_disc_sync_engine(
+    conn: AsyncIOMotorClient,
+    collection: Callable[[AsyncIOMotorClient], AsyncIOMotorCollection],
+    field: str,
+    name: str,
+    filters: Optional[Dict],
+) -> DiscSyncEngine:
+    """创建社区数据同步, 未指定`filters`(全量同步)时记录当日检查点."""
+    return DiscSyncEngine(
+        conn,
+        collection,
+        field,
+        redis=None if filters else G.scheduler_redis,
+        checkpoint_key=None if filters else f"{str_of_today()}_disc_sync_checkpoint_{name}",
+        concurrency=settings.discuzq.sync_concurrency,
+        retries=settings.discuzq.sync_retries,
+        retry_backoff=settings.discuzq.sync_retry_backoff,
+        batch_size=settings.discuzq.sync_batch_size,
+    )
 
 
 async def fill_disc_user(conn: AsyncIOMotorClient, filters: Dict = None):
@@ -30,6 +47,7 @@ async def fill_disc_user(conn: AsyncIOMotorClient, filters: Dict = None):
 
     """
     logger.info("将社区用户id刷到用户表的字段disc_id中")
+    engine = get_disc_sync_engine(conn, get_user_collection, "disc_id", "user", filters)
     filters = filters or {}
     # 将无效的文章id置为空
     error_filters = {"disc_id": {"$exists": True}}
@@ -37,26 +55,19 @@ async def fill_disc_user(conn: AsyncIOMotorClient, filters: Dict = None):
     await clear_error_article(conn, get_user_collection, error_filters, "disc_id")
     #
     filters.update({"$or": [{"disc_id": {"$exists": False}}, {"disc_id": None}]})
-    missing_data = get_user_collection(conn).find(filters)
-    async for user in missing_data:
-        user["id"] = user["_id"]
-        user["nickname"] = user.get("nickname") or f"用户{user['username'][-4:]}"
-        user["email"] = (
-            user.get("email")
-            or f"disc_{user['mobile'] or user['username']}@discourse.com"
-        )
-        user["password"] = f"{user['mobile'] or user['username']}@abcdefg"
-        try:
-            disc_id = await get_or_create_disc_user(user["username"], User(**user))
-            await update_user_signature(disc_id, user["nickname"])
-        except DiscuzqCustomError as e:
-            logger.error(f"创建社区用户({user['username']})失败：{e.message}")
-        except ValidationError as e:
-            logger.error(f"创建社区用户({user['username']})失败：{e}")
-        else:
-            await get_user_collection(conn).update_one(
-                {"username": user["username"]}, {"$set": {"disc_id": disc_id}}
-            )
+
+    async def sync(user: dict) -> Optional[int]:
+        nickname = user.get("nickname") or f"用户{user['username'][-4:]}"
+        # 查询或创建用户均可重复执行
+        disc_id = await engine.call(get_or_create_disc_user, user["username"])
+        if disc_id is not None:
+            await engine.call(update_user_signature, disc_id, nickname)
+        return disc_id
+
+    updated = await engine.run(filters, sync)
+    # 社区用户id直接批量写入用户表, 清空用户缓存
+    invalidate_user_cache()
+    logger.info(f"已更新{updated}个用户的社区用户id")
 
 
 async def fill_disc_article_to_portfolio(
@@ -69,6 +80,7 @@ async def fill_disc_article_to_portfolio(
 
     """
     logger.info("将社区文章id刷到组合表的字段article_id中")
+    engine = get_disc_sync_engine(conn, get_portfolio_collection, "article_id", "portfolio", filters)
     filters = filters or {}
     # 将无效的文章id置为空
     error_filters = {"article_id": {"$exists": True}}
@@ -83,25 +95,18 @@ async def fill_disc_article_to_portfolio(
             "$or": [{"article_id": {"$exists": False}}, {"article_id": None}],
         }
     )
-    missing_data = get_portfolio_collection(conn).find(filters)
-    async for x in missing_data:
+
+    async def sync(x: dict) -> Optional[int]:
         title = (
             f"{x['username']}({x['create_date'].strftime('%Y-%m-%d %H:%M:%S')}) "
             f"刚刚创建了一个新的组合:{x['name']} 使用的{x['robot']} 机器人"
         )
-        data = {
-            "title": title,
-            "raw": f"{title}\n{x['introduction']}",
-            "category": settings.discuzq.category["组合"],
-        }
-        try:
-            article = await create_thread(x["username"], **data)
-        except DiscuzqCustomError as e:
-            logger.error(f"创建组合社区文章({x['username']}-{x['_id']})失败：{e.message}")
-        else:
-            await get_portfolio_collection(conn).update_one(
-                {"_id": x["_id"]}, {"$set": {"article_id": article["id"]}}
-            )
+        return await engine.create_thread(
+            x["username"], title, f"{title}\n{x['introduction']}", settings.discuzq.category["组合"]
+        )
+
+    updated = await engine.run(filters, sync)
+    logger.info(f"已更新{updated}个组合的社区文章id")
 
 
 async def fill_disc_article_to_equipment(
@@ -114,6 +119,7 @@ async def fill_disc_article_to_equipment(
 
     """
     logger.info("将社区文章id刷到装备表的字段“文章标识符”中")
+    engine = get_disc_sync_engine(conn, get_equipment_collection, "文章标识符", "equipment", filters)
     filters = filters or {}
     error_filters = {"文章标识符": {"$exists": True}}
     error_filters.update(filters)
@@ -121,22 +127,17 @@ async def fill_disc_article_to_equipment(
     filters.update(
         {"状态": {"$ne": "已删除"}, "$or": [{"文章标识符": {"$exists": False}}, {"文章标识符": None}]}
     )
-    missing_data = get_equipment_collection(conn).find(filters)
-    async for x in missing_data:
-        topic = {
-            "title": f"装备【{x['名称']}】{x['创建时间'].strftime('%Y-%m-%d')}上线啦",
-            "raw": f"装备【{x['名称']}】 创建成功啦\n{x['简介']}",
-            "category": settings.discuzq.category["装备"],
-        }
-        try:
-            obj = await create_thread(x["作者"], **topic)
-        except DiscuzqCustomError as e:
-            logger.error(f"[发布文章({x['标识符']})失败] {e.message}")
-        else:
-            # 更新装备中的字段
-            await get_equipment_collection(conn).update_one(
-                {"标识符": x["标识符"]}, {"$set": {"文章标识符": obj["id"]}}
-            )
+
+    async def sync(x: dict) -> Optional[int]:
+        return await engine.create_thread(
+            x["作者"],
+            f"装备【{x['名称']}】{x['创建时间'].strftime('%Y-%m-%d')}上线啦",
+            f"装备【{x['名称']}】 创建成功啦\n{x['简介']}",
+            settings.discuzq.category["装备"],
+        )
+
+    updated = await engine.run(filters, sync)
+    logger.info(f"已更新{updated}个装备的社区文章id")
 
 
 async def fill_disc_article_to_robot(conn: AsyncIOMotorClient, filters: Dict = None):
@@ -147,6 +148,7 @@ async def fill_disc_article_to_robot(conn: AsyncIOMotorClient, filters: Dict = N
 
     """
     logger.info("将社区文章id刷到机器人表的字段“文章标识符”中")
+    engine = get_disc_sync_engine(conn, get_robots_collection, "文章标识符", "robot", filters)
     filters = filters or {}
     error_filters = {"文章标识符": {"$exists": True}}
     error_filters.update(filters)
@@ -157,22 +159,17 @@ async def fill_disc_article_to_robot(conn: AsyncIOMotorClient, filters: Dict = N
             "$or": [{"文章标识符": {"$exists": False}}, {"文章标识符": None}],
         }
     )
-    missing_data = get_robots_collection(conn).find(filters)
-    async for x in missing_data:
-        topic = {
-            "title": f"机器人【{x['名称']}】{x['创建时间'].strftime('%Y-%m-%d')}创建成功啦",
-            "raw": f"机器人【{x['名称']}】 创建成功啦\n{x['简介']}",
-            "category": settings.discuzq.category["机器人"],
-        }
-        try:
-            obj = await create_thread(x["作者"], **topic)
-        except DiscuzqCustomError as e:
-            logger.error(f"[发布文章({x['标识符']})失败]{e.message}")
-        else:
-            # 更新装备中的字段
-            await get_robots_collection(conn).update_one(
-                {"标识符": x["标识符"]}, {"$set": {"文章标识符": obj["id"]}}
-            )
+
+    async def sync(x: dict) -> Optional[int]:
+        return await engine.create_thread(
+            x["作者"],
+            f"机器人【{x['名称']}】{x['创建时间'].strftime('%Y-%m-%d')}创建成功啦",
+            f"机器人【{x['名称']}】 创建成功啦\n{x['简介']}",
+            settings.discuzq.category["机器人"],
+        )
+
+    updated = await engine.run(filters, sync)
+    logger.info(f"已更新{updated}个机器人的社区文章id")
 
 
 DATA_LIST = {
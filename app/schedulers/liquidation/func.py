@@ -1,20 +1,29 @@
 import asyncio
 import time as t
+from collections import defaultdict
 from dataclasses import asdict
-from datetime import time
+from datetime import date, datetime, time
 from decimal import Decimal
-from typing import List
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
 
 from dividend_utils.dividend import get_xdr_price
 from dividend_utils.liquidator import liquidate_dividend, liquidate_dividend_tax
 from dividend_utils.models import Flow, Position
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne
 from stralib import FastTdate
 
+from app import settings
 from app.crud.fund_account import (
+    bulk_write_fund_account_flow,
+    bulk_write_fund_account_position,
     create_fund_account_flow,
     delete_fund_account_flow_many,
     get_fund_account_by_id,
+    get_fund_account_from_db,
     get_fund_account_flow_from_db,
     get_fund_account_position_from_db,
     update_fund_account_by_id,
@@ -25,6 +34,7 @@ from app.crud.time_series_data import get_position_time_series_data
 from app.db.mongodb import db
 from app.enums.fund_account import FlowTType
 from app.enums.portfolio import PortfolioCategory, 组合状态
+from app.extentions import logger
 from app.global_var import G
 from app.models.base.time_series_data import Position as TSPosition
 from app.models.base.time_series_data import Position as TimeSeriesPosition
@@ -39,6 +49,7 @@ from app.schema.fund_account import FundAccountInUpdate, FundAccountPositionInUp
 from app.service.check_status import CheckStatus
 from app.service.datetime import get_early_morning, str_of_today
 from app.service.fund_account.fund_account import liquidation_fund_asset
+from app.service.fund_account.statistics import rebuild_fund_account_statistics
 from app.utils.datetime import date2datetime, get_seconds
 
 
@@ -86,101 +97,173 @@ def update_time_series_position_data_by_flow(
             ts_position.position_list.append(make_ts_position(flow))
 
 
-async def liquidate_dividend_task():
-    """清算分红（手动调仓组合）."""
+async def prefetch_dividend_detail(symbols: Iterable[str]) -> Dict[str, pd.DataFrame]:
+    """一次性查询全部证券的分红明细, 按证券代码分组返回."""
     from zvt.api import DividendDetail
 
-    if not FastTdate.is_tdate():
-        return None
-    # 等待时点数据同步完成
-    while not await CheckStatus.check_time_series_status():
-        await asyncio.sleep(10)
-
-    portfolio_list = await get_portfolio_list(
-        db.client, {"status": 组合状态.running, "category": PortfolioCategory.ManualImport}
+    symbols = list(symbols)
+    dividend_detail = await asyncio.get_event_loop().run_in_executor(
+        None, partial(DividendDetail.query_data, filters=[DividendDetail.code.in_(symbols)])
     )
-    tdate = get_early_morning()
-    for portfolio in portfolio_list:
-        fund_account = portfolio.fund_account[0]
-        fund_asset = await get_fund_account_by_id(
-            db.client, PyObjectId(fund_account.fundid)
+    empty = dividend_detail.iloc[0:0]
+    dividend_details = defaultdict(lambda: empty)
+    for code, detail in dividend_detail.groupby("code"):
+        dividend_details[code] = detail.reset_index(drop=True)
+    return dividend_details
+
+
+def filter_dividend_detail(dividend_detail: pd.DataFrame, pay_date: date) -> pd.DataFrame:
+    """筛选指定派息日的分红明细."""
+    if dividend_detail.empty:
+        return dividend_detail
+    return dividend_detail[pd.to_datetime(dividend_detail["dividend_pay_date"]).dt.date == pay_date]
+
+
+async def load_dividend_context(
+    conn: AsyncIOMotorClient, fund_asset: FundAccountInDB, tdate: datetime
+) -> Tuple[FundAccountInDB, datetime, List[PositionTimeSeriesDataInDB], List[FundAccountFlowInDB]]:
+    """加载资金账户清算分红所需的持仓时点数据和待失效的分红流水."""
+    start_date = FastTdate.next_tdate(fund_asset.ts_data_sync_date)
+    position_time_series_data = await get_position_time_series_data(
+        conn, fund_id=str(fund_asset.id), start_date=start_date.date()
+    )
+    if start_date != tdate:
+        dividend_flow_list = await get_fund_account_flow_from_db(
+            conn,
+            fund_id=str(fund_asset.id),
+            start_date=start_date.date(),
+            ttype=[FlowTType.DIVIDEND],
         )
-        start_date = FastTdate.next_tdate(fund_asset.ts_data_sync_date)
+    else:
+        dividend_flow_list = []
+    return fund_asset, start_date, position_time_series_data, dividend_flow_list
 
-        # 持仓时点数据
-        position_time_series_data = await get_position_time_series_data(
-            db.client, fund_id=fund_account.fundid, start_date=start_date.date()
-        )
 
-        if start_date != tdate:
-            # 处理已失效的分红流水
-            dividend_flow_list = await get_fund_account_flow_from_db(
-                db.client,
-                fund_id=fund_account.fundid,
-                start_date=start_date.date(),
-                ttype=[FlowTType.DIVIDEND],
-            )
-            flow_tdates = []
-            for flow in dividend_flow_list:
-                update_cost = False
-                if flow.tdate not in flow_tdates:
-                    flow_tdates.append(flow.tdate)
-                    update_cost = True
-                flow = reverse_flow(flow)
-                position = await get_fund_account_position_from_db(
-                    db.client, fund_id=flow.fund_id, symbol=flow.symbol
-                )
-                if position:
-                    await update_position_by_flow(
-                        db.client, position[0], flow, update_cost
-                    )
-                if flow.stkeffect != 0:
-                    update_time_series_position_data_by_flow(
-                        position_time_series_data, flow
-                    )
-            total_dividend = sum(
+async def liquidate_fund_account_dividend(
+    conn: AsyncIOMotorClient,
+    fund_asset: FundAccountInDB,
+    start_date: datetime,
+    position_time_series_data: List[PositionTimeSeriesDataInDB],
+    dividend_flow_list: List[FundAccountFlowInDB],
+    dividend_details: Dict[str, pd.DataFrame],
+    tdate: datetime,
+) -> None:
+    """清算单个资金账户的分红."""
+    fund_id = str(fund_asset.id)
+    has_expired_flows = start_date != tdate and bool(dividend_flow_list)
+    if start_date != tdate:
+        # 处理已失效的分红流水
+        position_mapping = {}
+        for position in await get_fund_account_position_from_db(conn, fund_id=fund_id):
+            position_mapping.setdefault(position.symbol, position)
+        updated_positions = {}
+        flow_tdates = []
+        for flow in dividend_flow_list:
+            update_cost = False
+            if flow.tdate not in flow_tdates:
+                flow_tdates.append(flow.tdate)
+                update_cost = True
+            flow = reverse_flow(flow)
+            position = position_mapping.get(flow.symbol)
+            if position:
+                dividend_detail = filter_dividend_detail(dividend_details[flow.symbol], flow.tdate.date()) if update_cost else None
+                updated_positions[position.id] = calculate_position_by_flow(position, flow, update_cost, dividend_detail)
+            if flow.stkeffect != 0:
+                update_time_series_position_data_by_flow(position_time_series_data, flow)
+        if updated_positions:
+            await bulk_write_fund_account_position(
+                conn,
                 [
-                    flow.fundeffect.to_decimal()
-                    for flow in dividend_flow_list
-                    if flow.stkeffect == 0
-                ]
-                or [Decimal("0")]
+                    UpdateOne({"_id": _id}, {"$set": FundAccountPositionInUpdate(**position.dict()).dict()})
+                    for _id, position in updated_positions.items()
+                ],
             )
-            if total_dividend != Decimal("0"):
-                await update_fund_account_by_flow(db.client, fund_asset, total_dividend)
+        total_dividend = sum([flow.fundeffect.to_decimal() for flow in dividend_flow_list if flow.stkeffect == 0] or [Decimal("0")])
+        if total_dividend != Decimal("0"):
+            await update_fund_account_by_flow(conn, fund_asset, total_dividend)
 
-            # 删除已有分红流水
-            await delete_fund_account_flow_many(
-                db.client,
-                {"_id": {"$in": [flow.id for flow in dividend_flow_list]}},
+        # 删除已有分红流水
+        await delete_fund_account_flow_many(
+            conn,
+            {"_id": {"$in": [flow.id for flow in dividend_flow_list]}},
+        )
+
+    flow_list_in_db = []
+    while position_time_series_data:
+        position_tdate = position_time_series_data.pop(0)
+        liq_date = position_tdate.tdate
+        if position_tdate.position_list is None:
+            continue
+        for position in position_tdate.position_list:
+            dividend_flow_list = liquidate_dividend(
+                dividend_details[position.symbol].copy(),
+                time_series_position2dividend(fund_id, position),
+                liq_date,
             )
+            for dividend_flow in dividend_flow_list or []:
+                flow_in_db = FundAccountFlowInDB(**asdict(dividend_flow))
+                flow_list_in_db.append(flow_in_db)
+                if flow_in_db.tdate <= tdate and flow_in_db.stkeffect:
+                    update_time_series_position_data_by_flow(position_time_series_data, flow_in_db)
+    if flow_list_in_db:
+        await bulk_write_fund_account_flow(conn, [InsertOne(flow.dict(exclude={"id"})) for flow in flow_list_in_db])
+    if has_expired_flows or flow_list_in_db:
+        await rebuild_fund_account_statistics(conn, fund_id)
 
-        while position_time_series_data:
-            position_tdate = position_time_series_data.pop(0)
-            liq_date = position_tdate.tdate
-            if position_tdate.position_list is None:
-                continue
-            for position in position_tdate.position_list:
-                dividend_detail = DividendDetail.query_data(
-                    filters=[DividendDetail.code == position.symbol]
-                )
-                dividend_flow_list = liquidate_dividend(
-                    dividend_detail,
-                    time_series_position2dividend(fund_account.fundid, position),
-                    liq_date,
-                )
-                if dividend_flow_list:
-                    flow_list_in_db = [
-                        FundAccountFlowInDB(**asdict(dividend_flow))
-                        for dividend_flow in dividend_flow_list
-                    ]
-                    for flow_in_db in flow_list_in_db:
-                        await create_fund_account_flow(db.client, flow_in_db)
-                        if flow_in_db.tdate <= tdate and flow_in_db.stkeffect:
-                            update_time_series_position_data_by_flow(
-                                position_time_series_data, flow_in_db
-                            )
 
+async def liquidate_dividend_task():
+    """清算分红（手动调仓组合）.
+
+    1. 并发加载各资金账户的持仓时点数据和待失效的分红流水
+    2. 一次性预取全部相关证券的分红明细
+    3. 限制并发数清算各资金账户, 流水和持仓批量写入
+    """
+    if not FastTdate.is_tdate():
+        return None
+    # 等待时点数据同步完成
+    while not await CheckStatus.check_time_series_status():
+        await asyncio.sleep(10)
+
+    portfolio_list = await get_portfolio_list(
+        db.client, {"status": 组合状态.running, "category": PortfolioCategory.ManualImport}
+    )
+    tdate = get_early_morning()
+    fund_asset_list = await get_fund_account_from_db(
+        db.client, ids=[PyObjectId(portfolio.fund_account[0].fundid) for portfolio in portfolio_list]
+    )
+    semaphore = asyncio.Semaphore(settings.scheduler.max_thread_num)
+
+    async def load(fund_asset: FundAccountInDB) -> Optional[tuple]:
+        async with semaphore:
+            try:
+                return await load_dividend_context(db.client, fund_asset, tdate)
+            except Exception:
+                logger.exception(f"加载资金账户`{fund_asset.id}`分红清算数据失败, 已跳过处理.")
+                return None
+
+    async def liquidate(context: tuple):
+        async with semaphore:
+            try:
+                await liquidate_fund_account_dividend(db.client, *context, dividend_details, tdate)
+            except Exception:
+                # 单个资金账户失败不影响其他资金账户
+                logger.exception(f"清算资金账户`{context[0].id}`分红失败, 已跳过处理.")
+
+    try:
+        context_list = await asyncio.gather(*[load(fund_asset) for fund_asset in fund_asset_list])
+        context_list = [context for context in context_list if context is not None]
+        symbols = set()
+        for _, _, position_time_series_data, dividend_flow_list in context_list:
+            symbols.update(flow.symbol for flow in dividend_flow_list)
+            for position_tdate in position_time_series_data:
+                symbols.update(position.symbol for position in position_tdate.position_list or [])
+        dividend_details = await prefetch_dividend_detail(symbols)
+        await asyncio.gather(*[liquidate(context) for context in context_list])
+    except Exception:
+        # 只在成功时设置完成标记, 失败时另行标记, 后续任务据此跳过
+        logger.exception("清算分红失败, 后续清算任务将跳过.")
+        await CheckStatus.set_task_failed("liquidate_dividend")
+        raise
     redis_key = f"{str_of_today()}_liquidate_dividend"
     await G.scheduler_redis.set(redis_key, "1", get_seconds(time(23, 59)))
 
@@ -199,6 +282,25 @@ async def update_fund_account_by_flow(
     await update_fund_account_by_id(conn, fund_account.id, fund_account_in_update)
 
 
+def calculate_position_by_flow(
+    position: FundAccountPositionInDB,
+    flow: FundAccountFlowInDB,
+    update_cost: bool = True,
+    dividend_detail: Optional[pd.DataFrame] = None,
+) -> FundAccountPositionInDB:
+    """通过分红流水计算持仓, dividend_detail为该流水派息日的分红明细."""
+    position.volume += flow.stkeffect
+    position.available_volume = position.volume
+    if update_cost:
+        # 更新成本价
+        xdr_cost = get_xdr_price(dividend_detail, float(position.cost.to_decimal()))
+        if flow.stkeffect < 0 or flow.fundeffect.to_decimal() < 0:
+            xdr_price = position.cost.to_decimal() - Decimal(str(xdr_cost))
+            xdr_cost = position.cost.to_decimal() + xdr_price
+        position.cost = PyDecimal(str(xdr_cost))
+    return position
+
+
 async def update_position_by_flow(
     conn: AsyncIOMotorClient,
     position: FundAccountPositionInDB,
@@ -208,21 +310,15 @@ async def update_position_by_flow(
     """通过分红流水更新持仓."""
     from zvt.api import DividendDetail
 
-    position.volume += flow.stkeffect
-    position.available_volume = position.volume
+    dividend_detail = None
     if update_cost:
-        # 更新成本价
         dividend_detail = DividendDetail.query_data(
             filters=[
                 DividendDetail.code == position.symbol,
                 DividendDetail.dividend_pay_date == flow.tdate.date(),
             ]
         )
-        xdr_cost = get_xdr_price(dividend_detail, float(position.cost.to_decimal()))
-        if flow.stkeffect < 0 or flow.fundeffect.to_decimal() < 0:
-            xdr_price = position.cost.to_decimal() - Decimal(str(xdr_cost))
-            xdr_cost = position.cost.to_decimal() + xdr_price
-        position.cost = PyDecimal(str(xdr_cost))
+    position = calculate_position_by_flow(position, flow, update_cost, dividend_detail)
     position_in_update = FundAccountPositionInUpdate(**position.dict())
     await update_fund_account_position_by_id(conn, position.id, position_in_update)
 
@@ -231,13 +327,25 @@ async def liquidate_dividend_flow_task():
     """清算分红流水（手动调仓组合）."""
     if not FastTdate.is_tdate():
         return None
-    while not await CheckStatus.check_liquidate_dividend_status():
-        await asyncio.sleep(10)
+    if not await CheckStatus.wait_for_task(
+        CheckStatus.check_liquidate_dividend_status, "liquidate_dividend", "liquidate_dividend_flow"
+    ):
+        return None
+    try:
+        await liquidate_dividend_flow(get_early_morning())
+    except Exception:
+        logger.exception("清算分红流水失败, 后续清算任务将跳过.")
+        await CheckStatus.set_task_failed("liquidate_dividend_flow")
+        raise
+    redis_key = f"{str_of_today()}_liquidate_dividend_flow"
+    await G.scheduler_redis.set(redis_key, "1", get_seconds(time(23, 59)))
 
+
+async def liquidate_dividend_flow(tdate: datetime):
+    """按分红流水更新各资金账户的持仓和资产."""
     portfolio_list = await get_portfolio_list(
         db.client, {"status": 组合状态.running, "category": PortfolioCategory.ManualImport}
     )
-    tdate = get_early_morning()
     for portfolio in portfolio_list:
         fund_account = portfolio.fund_account[0]
         fund_asset = await get_fund_account_by_id(
@@ -269,8 +377,6 @@ async def liquidate_dividend_flow_task():
         if total_dividend != Decimal("0"):
             await update_fund_account_by_flow(db.client, fund_asset, total_dividend)
         await liquidation_fund_asset(db.client, portfolio)
-    redis_key = f"{str_of_today()}_liquidate_dividend_flow"
-    await G.scheduler_redis.set(redis_key, "1", get_seconds(time(23, 59)))
 
 
 def beehiveflow2dividend(flow_list: List[FundAccountFlowInDB]) -> List[Flow]:
@@ -285,12 +391,26 @@ def beehiveflow2dividend(flow_list: List[FundAccountFlowInDB]) -> List[Flow]:
 
 async def liquidate_dividend_tax_task():
     """清算红利税（手动调仓组合）."""
-    from zvt.api import DividendDetail
-
     if not FastTdate.is_tdate():
         return None
-    while not await CheckStatus.check_liquidate_dividend_flow_status():
-        await asyncio.sleep(10)
+    if not await CheckStatus.wait_for_task(
+        CheckStatus.check_liquidate_dividend_flow_status, "liquidate_dividend_flow", "liquidate_dividend_tax"
+    ):
+        return None
+    try:
+        await liquidate_dividend_tax()
+    except Exception:
+        logger.exception("清算红利税失败, 后续任务将跳过.")
+        await CheckStatus.set_task_failed("liquidate_dividend_tax")
+        raise
+    redis_key = f"{str_of_today()}_liquidate_dividend_tax"
+    await G.scheduler_redis.set(redis_key, "1", get_seconds(time(23, 59)))
+
+
+async def liquidate_dividend_tax():
+    """计算各资金账户的红利税并更新持仓成本和资产."""
+    from zvt.api import DividendDetail
+
     portfolio_list = await get_portfolio_list(
         db.client, {"status": 组合状态.running, "category": PortfolioCategory.ManualImport}
     )
@@ -384,6 +504,5 @@ async def liquidate_dividend_tax_task():
                 await update_fund_account_position_by_id(
                     db.client, position.id, position_in_update
                 )
+        await rebuild_fund_account_statistics(db.client, fund_account.fundid)
         await liquidation_fund_asset(db.client, portfolio)
-    redis_key = f"{str_of_today()}_liquidate_dividend_tax"
-    await G.scheduler_redis.set(redis_key, "1", get_seconds(time(23, 59)))
@@ -33,6 +33,9 @@ async def load_jobs():
 
 async def load_jobs_with_lock():
     """加载定时任务：增加文件锁，限制同一时间内只有一个进程可以操作定时任务"""
+    if settings.scheduler.distributed and not settings.manufacturer_switch:
+        # 分布式执行时由`start_job_runner`竞选leader后加载
+        return
     try:
         import atexit
         import fcntl
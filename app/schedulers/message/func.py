@@ -1,17 +1,38 @@
 from datetime import datetime
 
+from app import settings
 from app.crud.base import get_user_collection
 from app.db.mongodb import db
+from app.schedulers import logger
 from app.service.datetime import get_early_morning
-from app.service.message.send import get_all_equipment_signals, get_equipment_signal_by_user, send_message
+from app.service.message.outbox import deliver_outbox, enqueue_messages
+from app.service.message.send import (
+    build_signal_message,
+    get_all_equipment_signals,
+    get_equipment_signal_by_user,
+    get_signal_batch,
+)
 
 
 async def send_equipment_signal_message_task(filters: dict = None, tdate: datetime = None):
-    """群发消息(装备信号)给用户"""
+    """群发消息(装备信号)给用户
+
+    当日全部装备的信号只计算一次; 各用户的消息先写入发件箱, 再并发发送. 重新执行时只发送未发送成功的消息.
+    """
     tdate = tdate or get_early_morning()
     filters = filters or {"send_flag": True}
-    users = get_user_collection(db.client).find(filters)
     all_signals = await get_all_equipment_signals(db.client, tdate)
-    async for user in users:
-        content = await get_equipment_signal_by_user(db.client, user, tdate, all_signals)
-        await send_message(user, content, tdate) if content else None
+    messages = []
+    # 当日没有装备信号时只补发之前发送失败的消息
+    if all_signals:
+        async for user in get_user_collection(db.client).find(filters):
+            content = await get_equipment_signal_by_user(db.client, user, tdate, all_signals)
+            message = build_signal_message(user, content, tdate)
+            if message is not None:
+                messages.append(message)
+            if len(messages) >= settings.notification.batch_size:
+                await enqueue_messages(db.client, messages)
+                messages = []
+    await enqueue_messages(db.client, messages)
+    result = await deliver_outbox(db.client, get_signal_batch(tdate))
+    logger.info(f"[装备信号群发] 发送成功{result['sent']}条, 失败{result['failed']}条")
@@ -1,14 +1,15 @@
 import asyncio
 from datetime import datetime, time
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
 
 from ability.operators import ReverseFlowsOperator
 from aiohttp import ServerDisconnectedError
-from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from pymongo import DeleteOne, ReplaceOne
 from stralib import FastTdate
 from stralib.utils import listdict2dict
 
-from app.crud.fund_account import bulk_write_fund_account
+from app import settings
+from app.core.executor import cpu_executor
 from app.crud.portfolio import get_portfolio_list
 from app.crud.time_series_data import (
     bulk_write_fund_time_series_data,
@@ -22,21 +23,23 @@ from app.enums.fund_account import CurrencyType
 from app.enums.portfolio import PortfolioCategory, 组合状态
 from app.extentions import logger
 from app.global_var import G
-from app.models.fund_account import FundAccountInDB
+from app.models.fund_account import FundAccountInDB, FundAccountPositionInDB
 from app.models.time_series_data import (
     FundTimeSeriesDataInDB,
     PositionTimeSeriesDataInDB,
 )
-from app.schema.fund_account import FundAccountInUpdate
 from app.schema.portfolio import PortfolioInResponse
 from app.service.check_status import CheckStatus
 from app.service.datetime import get_early_morning, str_of_today
+from app.service.fund_account.valuation import revalue_fund_accounts
 from app.service.fund_account.fund_account import (
-    calculate_fund_asset,
     get_fund_account_flow,
     get_fund_account_position,
+    get_fund_accounts_position,
     get_portfolio_fund_list,
+    get_portfolios_fund_list,
 )
+from app.service.portfolio.snapshot import refresh_portfolio_snapshots
 from app.service.time_series_data.converter import (
     ability2fund_time_series_data,
     ability2position_time_series_data,
@@ -46,11 +49,15 @@ from app.service.time_series_data.converter import (
     position2time_series,
     position_time_series_data2ability,
 )
+from app.service.time_series_data.writer import TimeSeriesDataWriter
 from app.utils.datetime import date2datetime, date2tdate, get_seconds
 
 
 async def save_today_time_series_data(
-    fund_account: FundAccountInDB, tdate: datetime, category: PortfolioCategory
+    fund_account: FundAccountInDB,
+    tdate: datetime,
+    category: PortfolioCategory,
+    position_list: Optional[List[FundAccountPositionInDB]] = None,
 ) -> Tuple[ReplaceOne, ReplaceOne]:
     """保存当前交易日时点数据.
 
@@ -59,6 +66,7 @@ async def save_today_time_series_data(
     fund_account: 资金账户
     tdate: 当前交易日
     category: 组合类别
+    position_list: 已批量获取的资金账户持仓, 未指定时单独获取
 
     Returns
     ----------
@@ -67,11 +75,9 @@ async def save_today_time_series_data(
     fund_id = str(fund_account.id)
 
     # 持仓时点数据
-    position_time_series_data = await position2time_series(
-        await get_fund_account_position(db.client, fund_id=fund_id, category=category),
-        fund_id,
-        tdate,
-    )
+    if position_list is None:
+        position_list = await get_fund_account_position(db.client, fund_id=fund_id, category=category)
+    position_time_series_data = await position2time_series(position_list, fund_id, tdate)
     # 资产时点数据
     fund_time_series_data = fund2time_series(fund_account, tdate)
     return ReplaceOne(
@@ -85,12 +91,19 @@ async def save_today_time_series_data(
     )
 
 
+def reverse_flows(fund_id: str, start: datetime, end: datetime, symbol_list: List[str], flows: dict, init_assets: dict, init_stocks: dict):
+    """由流水反推历史时点数据, 计算量较大, 在进程池中执行."""
+    rfo = ReverseFlowsOperator(fundId=fund_id, start=start, end=end, symbol_list=symbol_list)
+    return rfo.generate(flows=flows, init_assets=init_assets, init_stocks=init_stocks)
+
+
 async def generate_history_time_series_data(
     fund_account: FundAccountInDB,
     start: datetime,
     end: datetime,
     category: PortfolioCategory,
     currency: CurrencyType,
+    position_list: Optional[List[FundAccountPositionInDB]] = None,
 ) -> Tuple[List[PositionTimeSeriesDataInDB], List[FundTimeSeriesDataInDB]]:
     fund_id = str(fund_account.id)
     # 由于这里的计算逻辑为向以前交易日推算数据，所以传参时start=end, end=start
@@ -105,17 +118,11 @@ async def generate_history_time_series_data(
         currency=currency,
         trade_only=False,
     )
-    rfo = ReverseFlowsOperator(
-        fundId=fund_id,
-        start=end,
-        end=start,
-        symbol_list=[
-            flow.symbol for flow in flow_list if flow.symbol and flow.symbol != "SYMBOL"
-        ],
-    )
     # 当前用户持仓
-    fund_account_position = await get_fund_account_position(
-        db.client, fund_id=fund_id, category=category
+    fund_account_position = (
+        position_list
+        if position_list is not None
+        else await get_fund_account_position(db.client, fund_id=fund_id, category=category)
     )
     # 转换为时点数据格式
     position_time_series_data = await position2time_series(
@@ -125,12 +132,15 @@ async def generate_history_time_series_data(
     init_assets = {
         end: fund_time_series_data2ability(fund2time_series(fund_account, end))
     }
-    fund_time_series_list, _, position_time_series_list = rfo.generate(
-        flows=listdict2dict(
-            [field_converter(flow.dict()) for flow in flow_list], key="tdate"
-        ),
-        init_assets=init_assets,
-        init_stocks=init_stocks,
+    fund_time_series_list, _, position_time_series_list = await cpu_executor.run(
+        reverse_flows,
+        fund_id,
+        end,
+        start,
+        [flow.symbol for flow in flow_list if flow.symbol and flow.symbol != "SYMBOL"],
+        listdict2dict([field_converter(flow.dict()) for flow in flow_list], key="tdate"),
+        init_assets,
+        init_stocks,
     )
     return (
         ability2position_time_series_data(fund_id, position_time_series_list),
@@ -144,6 +154,7 @@ async def save_history_time_series_data(
     end: datetime,
     category: PortfolioCategory,
     currency: CurrencyType,
+    position_list: Optional[List[FundAccountPositionInDB]] = None,
 ) -> Tuple[List[ReplaceOne], List[ReplaceOne]]:
     """保存历史交易日时点数据.
 
@@ -154,12 +165,13 @@ async def save_history_time_series_data(
     end: 结束时间
     category: 组合类别
     currency: 币种
+    position_list: 已批量获取的资金账户持仓, 未指定时单独获取
     """
     (
         position_time_series_list,
         fund_time_series_list,
     ) = await generate_history_time_series_data(
-        fund_account, start, end, category, currency
+        fund_account, start, end, category, currency, position_list
     )
     return [
         ReplaceOne(
@@ -178,81 +190,113 @@ async def save_history_time_series_data(
     ]
 
 
-async def save_time_series_data(portfolio_list: List[PortfolioInResponse]):
-    """保存资金账户时点数据."""
+async def generate_time_series_operations(
+    fund_account: FundAccountInDB,
+    tdate: datetime,
+    category: PortfolioCategory,
+    position_list: Optional[List[FundAccountPositionInDB]] = None,
+) -> Tuple[List[Union[DeleteOne, ReplaceOne]], List[Union[DeleteOne, ReplaceOne]]]:
+    """生成资金账户的时点数据写操作.
+
+    Returns
+    ----------
+    持仓时点数据写操作, 资产时点数据写操作
+    """
+    # 若时点数据同步时间为上一个交易日, 写入今日资金账户数据到时点数据
+    if fund_account.ts_data_sync_date == FastTdate.last_tdate(datetime.today()):
+        position_time_series_opt, fund_time_series_opt = await save_today_time_series_data(fund_account, tdate, category, position_list)
+        return [position_time_series_opt], [fund_time_series_opt]
+    # 若时点数据同步时间不为上一个交易日, 重写时点数据同步日到今日的所有时点数据
+    # 开始时间为流水同步日期, 结束时间为当前交易日
+    start, end = fund_account.ts_data_sync_date, tdate
+    # 删除失效的时点数据
+    position_time_series_operations = [
+        DeleteOne({"_id": position_time_series_data.id})
+        for position_time_series_data in await get_position_time_series_data(
+            db.client,
+            fund_id=str(fund_account.id),
+            start_date=FastTdate.next_tdate(start).date(),
+            end_date=end.date(),
+        )
+    ]
+    fund_time_series_operations = [
+        DeleteOne({"_id": fund_time_series_data.id})
+        for fund_time_series_data in await get_fund_time_series_data(
+            db.client,
+            fund_id=str(fund_account.id),
+            start_date=FastTdate.next_tdate(start).date(),
+            end_date=end.date(),
+        )
+    ]
+    # 补全时点数据
+    position_time_series_opt, fund_time_series_opt = await save_history_time_series_data(
+        fund_account, start, end, category, fund_account.currency, position_list
+    )
+    return position_time_series_operations + position_time_series_opt, fund_time_series_operations + fund_time_series_opt
+
+
+async def save_time_series_data(portfolio_list: List[PortfolioInResponse], checkpoint: Optional[str] = None):
+    """保存资金账户时点数据.
+
+    各资金账户并发处理(并发数为`settings.scheduler.time_series_concurrency`), 写操作分批写入;
+    指定`checkpoint`时记录当日已完成的资金账户, 任务中断后重新执行会跳过这些资金账户.
+    """
     if not FastTdate.is_tdate():
         return None
     tdate = date2datetime()
-    position_time_series_operations = []
-    fund_time_series_operations = []
+    writer = TimeSeriesDataWriter(
+        db.client,
+        G.scheduler_redis if checkpoint else None,
+        f"{str_of_today()}_time_series_data_checkpoint_{checkpoint}" if checkpoint else None,
+        max_size=settings.scheduler.bulk_write_size,
+    )
+    finished = await writer.get_checkpoints()
+    semaphore = asyncio.Semaphore(settings.scheduler.time_series_concurrency)
+
+    async def process(
+        portfolio: PortfolioInResponse, fund_account: FundAccountInDB, position_list: List[FundAccountPositionInDB]
+    ):
+        async with semaphore:
+            try:
+                position_time_series_operations, fund_time_series_operations = await generate_time_series_operations(
+                    fund_account, tdate, portfolio.category, position_list
+                )
+            except (IndexError, AssertionError, ServerDisconnectedError) as e:
+                logger.warning(f"处理组合`{portfolio.id}`时点数据失败, 已跳过处理({e}).")
+                return
+            except Exception:
+                # 单个资金账户失败不影响其他资金账户
+                logger.exception(f"处理资金账户`{fund_account.id}`时点数据失败, 已跳过处理.")
+                return
+            await writer.add(str(fund_account.id), position_time_series_operations, fund_time_series_operations)
+
+    pending = []
+    fund_lists = await get_portfolios_fund_list(db.client, portfolio_list)
     for portfolio in portfolio_list:
-        fund_account_list = await get_portfolio_fund_list(db.client, portfolio.id)
+        fund_account_list = fund_lists[portfolio.id]
         if not fund_account_list:
             logger.warning(f"组合`{portfolio.id}`无可用资金账户, 已跳过处理.")
-        for fund_account in fund_account_list:
-            # 若时点数据同步时间为上一个交易日, 写入今日资金账户数据到时点数据
-            if fund_account.ts_data_sync_date == FastTdate.last_tdate(datetime.today()):
-                try:
-                    (
-                        position_time_series_opt,
-                        fund_time_series_opt,
-                    ) = await save_today_time_series_data(
-                        fund_account, tdate, portfolio.category
-                    )
-                except (IndexError, AssertionError) as e:
-                    logger.warning(f"处理组合`{portfolio.id}`时点数据失败, 已跳过处理({e}).")
-                    continue
-                position_time_series_operations.append(position_time_series_opt)
-                fund_time_series_operations.append(fund_time_series_opt)
-            # 若时点数据同步时间不为上一个交易日, 重写时点数据同步日到今日的所有时点数据
-            else:
-                # 开始时间为流水同步日期
-                start = fund_account.ts_data_sync_date
-                # 结束时间为当前交易日
-                end = tdate
-                # 删除失效的时点数据
-                for position_time_series_data in await get_position_time_series_data(
-                    db.client,
-                    fund_id=str(fund_account.id),
-                    start_date=FastTdate.next_tdate(start).date(),
-                    end_date=end.date(),
-                ):
-                    position_time_series_operations.append(
-                        DeleteOne({"_id": position_time_series_data.id})
-                    )
-                for fund_time_series_data in await get_fund_time_series_data(
-                    db.client,
-                    fund_id=str(fund_account.id),
-                    start_date=FastTdate.next_tdate(start).date(),
-                    end_date=end.date(),
-                ):
-                    fund_time_series_operations.append(
-                        DeleteOne({"_id": fund_time_series_data.id})
-                    )
-                try:
-                    # 补全时点数据
-                    (
-                        position_time_series_opt,
-                        fund_time_series_opt,
-                    ) = await save_history_time_series_data(
-                        fund_account,
-                        start,
-                        end,
-                        portfolio.category,
-                        fund_account.currency,
-                    )
-                except (IndexError, ServerDisconnectedError) as e:
-                    logger.warning(f"处理组合`{portfolio.id}`时点数据失败, 已跳过处理({e}).")
-                    continue
-                position_time_series_operations.extend(position_time_series_opt)
-                fund_time_series_operations.extend(fund_time_series_opt)
-            await asyncio.sleep(0.1)
-    if position_time_series_operations:
-        await bulk_write_position_time_series_data(
-            db.client, position_time_series_operations
-        )
-    if fund_time_series_operations:
-        await bulk_write_fund_time_series_data(db.client, fund_time_series_operations)
+        pending.extend((portfolio, fund_account) for fund_account in fund_account_list if str(fund_account.id) not in finished)
+    # 按组合类别批量获取持仓, 模拟交易组合限制并发数请求交易系统
+    position_lists = {}
+    for category in {portfolio.category for portfolio, _ in pending}:
+        fund_ids = [str(fund_account.id) for portfolio, fund_account in pending if portfolio.category == category]
+        position_lists.update(await get_fund_accounts_position(db.client, fund_ids, category))
+    tasks = [
+        process(portfolio, fund_account, position_lists[str(fund_account.id)]) for portfolio, fund_account in pending
+    ]
+    if finished:
+        logger.info(f"已跳过{len(finished)}个已完成的资金账户.")
+    try:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for error in results:
+            if isinstance(error, Exception):
+                logger.error(f"写入时点数据失败({error!r}).")
+    finally:
+        # 任务异常或被取消时仍写入已累计的操作, 重新执行时跳过已完成的资金账户
+        await writer.flush()
+    # 更新组合运行数据快照
+    await refresh_portfolio_snapshots(db.client, portfolio_list)
 
 
 @print_execute_time
@@ -261,19 +305,21 @@ async def save_manual_import_portfolio_time_series_data_task():
     portfolio_list = await get_portfolio_list(
         db.client, {"status": 组合状态.running, "category": PortfolioCategory.ManualImport}
     )
-    await save_time_series_data(portfolio_list)
+    await save_time_series_data(portfolio_list, checkpoint="manual_import_1")
     redis_key = f"{str_of_today()}_time_series_data"
     await G.scheduler_redis.set(redis_key, "1", get_seconds(time(22, 15)))
 
 
 @print_execute_time
 async def save_manual_import_portfolio_time_series_data_task2():
-    while not await CheckStatus.check_liquidate_dividend_tax_status():
-        await asyncio.sleep(10)
+    if not await CheckStatus.wait_for_task(
+        CheckStatus.check_liquidate_dividend_tax_status, "liquidate_dividend_tax", "manual_import_time_series_data"
+    ):
+        return None
     portfolio_list = await get_portfolio_list(
         db.client, {"status": 组合状态.running, "category": PortfolioCategory.ManualImport}
     )
-    await save_time_series_data(portfolio_list)
+    await save_time_series_data(portfolio_list, checkpoint="manual_import_2")
     redis_key = f"{str_of_today()}_time_series_data"
     await G.scheduler_redis.set(redis_key, "1", get_seconds(time(23, 59)))
 
@@ -285,7 +331,7 @@ async def save_simulated_trading_portfolio_time_series_data_task():
         db.client,
         {"status": 组合状态.running, "category": PortfolioCategory.SimulatedTrading},
     )
-    await save_time_series_data(portfolio_list)
+    await save_time_series_data(portfolio_list, checkpoint="simulated_trading")
     redis_key = f"{str_of_today()}_time_series_data"
     await G.scheduler_redis.set(redis_key, "1", get_seconds(time(22, 0)))
 
@@ -296,21 +342,14 @@ async def liquidation_fund_asset_task():
     portfolio_list = await get_portfolio_list(
         db.client, {"status": 组合状态.running, "category": PortfolioCategory.ManualImport}
     )
-    operations = []
+    fund_accounts = []
+    fund_lists = await get_portfolios_fund_list(db.client, portfolio_list)
     for portfolio in portfolio_list:
-        fund_account_list = await get_portfolio_fund_list(db.client, portfolio.id)
+        fund_account_list = fund_lists[portfolio.id]
         if not fund_account_list:
             logger.warning(f"组合`{portfolio.id}`无可用资金账户, 已跳过处理.")
-        for fund_account in fund_account_list:
-            fund_asset = await calculate_fund_asset(db.client, fund_account)
-            operations.append(
-                UpdateOne(
-                    {"_id": fund_account.id},
-                    {"$set": FundAccountInUpdate(**fund_asset.dict()).dict()},
-                )
-            )
-    if operations:
-        await bulk_write_fund_account(db.client, operations)
+        fund_accounts.extend(fund_account_list)
+    await revalue_fund_accounts(db.client, fund_accounts)
 
 
 @print_execute_time
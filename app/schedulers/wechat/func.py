@@ -1,18 +1,74 @@
+import asyncio
+from typing import List, Tuple
+
 from pymongo import UpdateOne
-from pymongo.errors import BulkWriteError
+from wechatpy import WeChatClientException
 
+from app import settings
+from app.core.auth_cache import invalidate_user_cache
+from app.core.errors import DataQueryTimeout
 from app.crud.base import get_user_collection
 from app.db.mongodb import db
-from app.outer_sys.wechat.user import get_wechat_avatar
+from app.extentions import logger
+from app.outer_sys.wechat.user import WECHAT_BATCH_GET_LIMIT, get_wechat_users
 
 
 async def sync_wechat_avatar_task(conn=None):
     """
     同步微信头像
+
+    用户按`WECHAT_BATCH_GET_LIMIT`个一批获取微信用户信息, 同时请求数不超过`settings.wechat.avatar_sync_concurrency`;
+    只更新头像发生变化的用户, 写操作分批写入.
+    一批中有无效的open_id时整批请求被拒绝, 此时将该批拆分为两半重试, 直到定位到获取失败的用户.
     """
     conn = db.client or conn
-    bulk_data = [
-        UpdateOne({"_id": x["_id"]}, {"$set": {"avatar": get_wechat_avatar(x["open_id"])}})
-        async for x in get_user_collection(conn).find({"$and": [{"open_id": {"$exists": True}}, {"open_id": {"$nin": ["", None]}}]})
-    ]
-    await get_user_collection(conn).bulk_write(bulk_data) if bulk_data else False
+    collection = get_user_collection(conn)
+    semaphore = asyncio.Semaphore(settings.wechat.avatar_sync_concurrency)
+
+    async def get_batch(open_ids: List[str]) -> dict:
+        try:
+            return await get_wechat_users(open_ids)
+        except WeChatClientException as e:
+            if len(open_ids) == 1:
+                logger.error(f"获取用户`{open_ids[0]}`微信头像失败：{e}")
+                return {}
+        middle = len(open_ids) // 2
+        return {**await get_batch(open_ids[:middle]), **await get_batch(open_ids[middle:])}
+
+    async def fetch(users: List[dict]) -> Tuple[List[dict], dict]:
+        async with semaphore:
+            try:
+                return users, await get_batch([user["open_id"] for user in users])
+            except DataQueryTimeout:
+                logger.error(f"获取{len(users)}个用户微信头像超时.")
+                return users, {}
+
+    batches, batch = [], []
+    query = {"$and": [{"open_id": {"$exists": True}}, {"open_id": {"$nin": ["", None]}}]}
+    async for user in collection.find(query, {"username": 1, "open_id": 1, "avatar": 1}):
+        batch.append(user)
+        if len(batch) >= WECHAT_BATCH_GET_LIMIT:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+
+    operations, updated = [], 0
+    for task in asyncio.as_completed([fetch(batch) for batch in batches]):
+        users, wx_users = await task
+        for user in users:
+            # 获取失败的用户不更新头像
+            if user["open_id"] not in wx_users:
+                continue
+            avatar = wx_users[user["open_id"]].get("headimgurl")
+            if avatar != user.get("avatar"):
+                operations.append(UpdateOne({"_id": user["_id"]}, {"$set": {"avatar": avatar}}))
+                invalidate_user_cache(user["username"])
+        if len(operations) >= settings.wechat.avatar_sync_batch_size:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    logger.info(f"[同步微信头像] 共{sum(len(batch) for batch in batches)}个用户, 更新{updated}个用户头像")
@@ -1,13 +1,15 @@
-import copy
+import asyncio
 import logging
-from datetime import datetime
-from typing import Union
+from copy import deepcopy
+from datetime import date, datetime
+from typing import Dict, Generator, Optional, Tuple, Union
 
 from stralib import get_config, FastTdate, SysConfig, RobotMatchUp, UserConfig
 from stralib.data_service.client import DataClient
 from stralib.data_service.robot_data import RobotData
 from stralib.models.robot import 机器人
 
+from app.core.executor import backtest_executor
 from app.outer_sys.hq import get_security_info
 
 try:
@@ -130,14 +132,14 @@ def format_order(order, asset):
     return ret_data
 
 
-def format_回测数据(tdate, data):
+async def format_回测数据(tdate, data):
     ret_data = {
         "交易日期": datetime.strftime(tdate, "%Y%m%d"),
         "可用资金": data["asset"]["fundbal"],
         "当前市值": data["asset"]["mktval"],
         "当前持仓": [format_order(x, data["asset"]) for x in data["stocks"]],
-        "当日成交订单": [format_signal(x, data["stocks"]) for x in data["signals"]],
-        "当日信号": [format_signal(x) for x in data["last_signals"]],
+        "当日成交订单": [await format_signal(x, data["stocks"]) for x in data["signals"]],
+        "当日信号": [await format_signal(x) for x in data["last_signals"]],
         "初始资金": 500000.0,
         "总资产": sum(data["asset"].values()),
         "总收益率": sum(data["asset"].values()) / 500000 - 1,
@@ -145,6 +147,115 @@ def format_回测数据(tdate, data):
     return ret_data
 
 
+def snapshot_回测数据(data: dict) -> dict:
+    """复制格式化回测结果所需的字段, 避免后续交易日修改当日数据(持仓、订单中含嵌套的可变结构, 需深拷贝)."""
+    return deepcopy({key: data[key] for key in ("asset", "stocks", "signals", "last_signals")})
+
+
+def parse_backtest_date(value: Union[str, date]) -> date:
+    """解析回测日期, 支持`YYYYMMDD`及`YYYY-MM-DD`格式的字符串."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value.replace("-", ""), "%Y%m%d").date()
+
+
+def next_backtest_day(generator: Generator) -> Optional[Tuple[datetime, dict]]:
+    """推进一个交易日并返回当日数据快照, 回测结束时返回None."""
+    try:
+        item = next(generator)
+    except StopIteration:
+        return None
+    tdate, data = next(iter(item.items()))
+    return tdate, snapshot_回测数据(data)
+
+
+class BacktestSession:
+    """机器人回测会话, 每个websocket连接一个.
+
+    - 按机器人标识符缓存`RobotData`及其已加载的日期区间, 后续`next`事件的区间(开始日期随回测推进)
+      在已加载区间内时直接复用, 撮合只读取`UserConfig`区间内的数据
+    - 回测在执行池中逐日推进, 当日数据经有界队列回传, 队列满时暂停推进
+    - 回测结束、中断或连接断开时取消未完成的推进任务
+    """
+
+    def __init__(self, websocket, conn, queue_size: int = 5):
+        self.websocket = websocket
+        self.conn = conn
+        self.queue_size = queue_size
+        self._robot_data: Dict[str, Tuple[date, date, RobotData]] = {}
+        self._producer: Optional[asyncio.Future] = None
+
+    async def get_robot_data(self, robot: 机器人, start: str, end: str) -> RobotData:
+        """获取机器人数据, 已加载的日期区间包含`start`~`end`时不再重新加载."""
+        start_date, end_date = parse_backtest_date(start), parse_backtest_date(end)
+        cached = self._robot_data.get(robot.标识符)
+        if cached is not None:
+            loaded_start, loaded_end, robot_data = cached
+            if loaded_start <= start_date and end_date <= loaded_end:
+                return robot_data
+        robot_data = await backtest_executor.run(get_robot_data, robot, start, end, timeout=0)
+        self._robot_data[robot.标识符] = (start_date, end_date, robot_data)
+        return robot_data
+
+    async def prepare(self, data: dict) -> RobotMatchUp:
+        """由`next`事件数据生成回测撮合对象."""
+        user_config = data["user_config"]
+        robot = await get_robot(data["robot_id"], self.conn)
+        fundbal = int(user_config.pop("fund_available", 500000))
+        mktval = int(user_config.pop("market_value", 0) or 0)
+        asset = {"fundbal": fundbal, "mktval": mktval}
+        stocks = user_config.pop("stocks", []) or []
+        for stock in stocks:
+            stock["stopup"] = 99999999
+            stock["stopdown"] = 0
+        userconfig_obj = await backtest_executor.run(get_user_config, robot, data["start"], data["end"])
+        robot_data = await self.get_robot_data(robot, data["start"], data["end"])
+        return RobotMatchUp(asset, stocks, userconfig_obj, robot_data)
+
+    async def _produce(self, robot_match_up: RobotMatchUp, queue: asyncio.Queue) -> None:
+        generator = robot_match_up.robot_yield_trader()
+        try:
+            while True:
+                item = await backtest_executor.run(next_backtest_day, generator)
+                await queue.put(item)
+                if item is None:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+
+    async def stream(self, robot_match_up: RobotMatchUp, is_auto: bool) -> bool:
+        """推送逐日回测数据, 返回回测是否已完成; 非自动模式下遇到当日信号时中断."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._producer = asyncio.ensure_future(self._produce(robot_match_up, queue))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return True
+                if isinstance(item, Exception):
+                    raise item
+                result = await format_回测数据(*item)
+                await self.websocket.send_json({"event": "backtest_data", "data": result})
+                if not is_auto and result["当日信号"]:
+                    return False
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """取消正在进行的回测, 已提交到执行池的当日推进会执行完毕后丢弃."""
+        if self._producer is not None and not self._producer.done():
+            self._producer.cancel()
+        self._producer = None
+
+    def close(self) -> None:
+        self.cancel()
+        self._robot_data.clear()
+
+
 async def 初始化回测数据(websocket, logger=logging):
     data = await websocket.receive_json()
     json_data = to_underline_dict(data)
@@ -158,27 +269,12 @@ async def 获取回测数据(websocket, db):
     data = await websocket.receive_json()
     json_data = to_underline_dict(data)
     data = json_data["data"]
-    user_config = data["user_config"]
-    is_auto = data["is_auto"]
-    robot = await get_robot(data["robot_id"], db)
-    fundbal = int(user_config.pop("fund_available", 500000))
-    mktval = int(user_config.pop("market_value", 0) or 0)
-    asset = {"fundbal": fundbal, "mktval": mktval}
-    stocks = user_config.pop("stocks", []) or []
-    for stock in stocks:
-        stock["stopup"] = 99999999
-        stock["stopdown"] = 0
-    userconfig_obj = get_user_config(robot, data["start"], data["end"])
-    robot_data = get_robot_data(robot, data["start"], data["end"])
-    robot_match_up = RobotMatchUp(asset, stocks, userconfig_obj, robot_data)
+    session = BacktestSession(websocket, db)
     try:
-        for item in robot_match_up.robot_yield_trader():
-            tmp = tuple(item.items())[0]
-            result = format_回测数据(tmp[0], copy.deepcopy(tmp[1]))
-            ret_data = {"event": "backtest_data", "data": result}
-            await websocket.send_json(ret_data)
-            if not is_auto and result["当日信号"]:
-                break
+        robot_match_up = await session.prepare(data)
+        await session.stream(robot_match_up, data["is_auto"])
     except Exception as e:
         logging.warning(f"backtest_next[结束] {e}", exc_info=True)
         await websocket.send_json({"event": "end"})
+    finally:
+        session.close()
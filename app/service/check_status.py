@@ -1,9 +1,14 @@
+import asyncio
+from datetime import time
+from typing import Awaitable, Callable
+
 from motor.motor_asyncio import AsyncIOMotorClient
 
 from app.crud.base import get_equipment_collection
 from app.extentions import logger
 from app.global_var import G
 from app.service.datetime import get_early_morning, str_of_today
+from app.utils.datetime import get_seconds
 
 
 class CheckStatus:
@@ -60,7 +65,7 @@ class CheckStatus:
     async def check_time_series_status(cls):
         """检查同步时点数据状态"""
         key = f"{str_of_today()}_time_series_data"
-        item = await G.scheduler_redis.get(key)
+        item = await G.scheduler_redis.get_cached(key)
         if not item:
             return False
         return True
@@ -69,7 +74,7 @@ class CheckStatus:
     async def check_ability_status(cls):
         """检查战斗力计算是否完成"""
         key = f"{str_of_today()}_ability"
-        item = await G.scheduler_redis.get(key)
+        item = await G.scheduler_redis.get_cached(key)
         if not item:
             return False
         return True
@@ -78,7 +83,7 @@ class CheckStatus:
     async def check_liquidate_dividend_status(cls):
         """检查清算分红任务是否完成"""
         key = f"{str_of_today()}_liquidate_dividend"
-        item = await G.scheduler_redis.get(key)
+        item = await G.scheduler_redis.get_cached(key)
         if not item:
             return False
         return True
@@ -87,7 +92,7 @@ class CheckStatus:
     async def check_liquidate_dividend_flow_status(cls):
         """检查清算分红流水任务是否完成"""
         key = f"{str_of_today()}_liquidate_dividend_flow"
-        item = await G.scheduler_redis.get(key)
+        item = await G.scheduler_redis.get_cached(key)
         if not item:
             return False
         return True
@@ -96,7 +101,33 @@ class CheckStatus:
     async def check_liquidate_dividend_tax_status(cls):
         """检查清算分红扣税任务是否完成"""
         key = f"{str_of_today()}_liquidate_dividend_tax"
-        item = await G.scheduler_redis.get(key)
+        item = await G.scheduler_redis.get_cached(key)
+        if not item:
+            return False
+        return True
+
+    @classmethod
+    async def check_task_failed(cls, name: str):
+        """检查当日任务是否执行失败"""
+        key = f"{str_of_today()}_{name}_failed"
+        item = await G.scheduler_redis.get_cached(key)
         if not item:
             return False
         return True
+
+    @classmethod
+    async def set_task_failed(cls, name: str):
+        """标记当日任务执行失败, 等待该任务完成的后续任务据此跳过"""
+        key = f"{str_of_today()}_{name}_failed"
+        await G.scheduler_redis.set(key, "1", get_seconds(time(23, 59)))
+
+    @classmethod
+    async def wait_for_task(cls, check: Callable[[], Awaitable[bool]], upstream: str, name: str):
+        """等待前置任务完成, 前置任务失败时标记当前任务失败并返回False"""
+        while not await check():
+            if await cls.check_task_failed(upstream):
+                logger.error(f"前置任务`{upstream}`执行失败, 已跳过`{name}`.")
+                await cls.set_task_failed(name)
+                return False
+            await asyncio.sleep(10)
+        return True
@@ -1,10 +1,11 @@
 import calendar
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from typing import Union, Iterable
 
 from stralib import FastTdate
 
 from app import settings
+from app.enums.common import DateType
 
 SIX_HOUR = 6 * 60 * 60
 DAY = 24 * 60 * 60
@@ -113,3 +114,20 @@ def shift_month_datetime(tdate: datetime, months: int) -> datetime:
         month += 12
     day = min(calendar.monthrange(year, month)[1], day)
     return datetime(year, month, day)
+
+
+def get_date_by_type(date_type: DateType, end_date=None):
+    """根据date_type获取日期"""
+    end_date = end_date or get_early_morning()
+    if date_type == DateType.WEEK:
+        start_date = end_date - timedelta(weeks=1)
+    elif date_type == DateType.MONTH:
+        _, month_days = calendar.monthrange(end_date.year, end_date.month)
+        start_date = end_date - timedelta(days=month_days)
+    elif date_type == DateType.DAY:
+        start_date = end_date - timedelta(days=1)
+    else:
+        start_date = end_date
+    if not FastTdate.is_tdate(start_date):
+        start_date = FastTdate.last_tdate(start_date)
+    return start_date
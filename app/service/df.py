@@ -1,6 +1,125 @@
 import base64
 import pickle
+from typing import AsyncGenerator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame
+from starlette.responses import StreamingResponse
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+# 序列化格式及其支持的压缩算法
+DATAFRAME_FORMATS = {
+    "pickle": {None},
+    "arrow": {None, "gzip", "bz2", "brotli", "lz4", "zstd"},
+    "parquet": {None, "snappy", "gzip", "brotli", "lz4", "zstd"},
+}
+DEFAULT_BATCH_SIZE = 65536
 
 
 async def generator_streamer(data):
     yield base64.b64encode(pickle.dumps(data))
+
+
+class ChunkSink:
+    """只写的类文件对象, 暂存写入的数据, 由`pop`逐块取出."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def pop(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def select_columns(df: DataFrame, columns: Optional[List[str]] = None) -> DataFrame:
+    """只保留指定列, `columns`为空时返回全部列."""
+    if not columns:
+        return df
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise ValueError(f"不存在的列: {missing}")
+    return df[columns]
+
+
+async def arrow_streamer(
+    table: pa.Table, compression: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncGenerator[bytes, None]:
+    """按记录批次输出arrow IPC流, 指定压缩算法时整个流经压缩输出."""
+    sink = ChunkSink()
+    stream = pa.PythonFile(sink, mode="w")
+    if compression:
+        stream = pa.CompressedOutputStream(stream, compression)
+    writer = pa.RecordBatchStreamWriter(stream, table.schema)
+    for batch in table.to_batches(batch_size):
+        writer.write_batch(batch)
+        stream.flush()
+        yield sink.pop()
+    writer.close()
+    stream.close()
+    yield sink.pop()
+
+
+async def parquet_streamer(
+    table: pa.Table, compression: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncGenerator[bytes, None]:
+    """按行组输出parquet文件."""
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, table.schema, compression=compression or "none")
+    for batch in table.to_batches(batch_size):
+        writer.write_table(pa.Table.from_batches([batch]))
+        yield sink.pop()
+    writer.close()
+    yield sink.pop()
+
+
+def negotiate_dataframe_format(format: Optional[str], accept: Optional[str]) -> str:
+    """确定DataFrame的序列化格式, 优先使用查询参数, 其次为`Accept`请求头, 默认为pickle."""
+    if format:
+        return format
+    accept = accept or ""
+    if ARROW_MEDIA_TYPE in accept:
+        return "arrow"
+    if PARQUET_MEDIA_TYPE in accept:
+        return "parquet"
+    return "pickle"
+
+
+def dataframe_response(
+    df: DataFrame,
+    format: str = "pickle",
+    columns: Optional[List[str]] = None,
+    compression: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> StreamingResponse:
+    """以指定格式流式返回DataFrame."""
+    if format not in DATAFRAME_FORMATS:
+        raise ValueError(f"不支持的格式`{format}`, 可选: {list(DATAFRAME_FORMATS)}")
+    if compression not in DATAFRAME_FORMATS[format]:
+        raise ValueError(f"格式`{format}`不支持压缩算法`{compression}`")
+    df = select_columns(df, columns)
+    if format == "pickle":
+        return StreamingResponse(generator_streamer(df))
+    table = pa.Table.from_pandas(df)
+    if format == "arrow":
+        headers = {"X-Arrow-Compression": compression} if compression else None
+        return StreamingResponse(arrow_streamer(table, compression, batch_size), media_type=ARROW_MEDIA_TYPE, headers=headers)
+    return StreamingResponse(parquet_streamer(table, compression, batch_size), media_type=PARQUET_MEDIA_TYPE)
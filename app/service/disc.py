@@ -1,7 +1,16 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+import aiohttp
 import requests
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import UpdateOne
-from app.crud.discuzq import get_thread
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ASCENDING, UpdateOne
+
+from app.core.errors import DiscuzqCustomError
+from app.crud.discuzq import create_thread, get_thread, get_user_created_threads
+from app.db.redis import SuperRedis
+from app.extentions import logger
 
 
 async def check_article_exist(article_id):
@@ -17,3 +26,120 @@ async def clear_error_article(conn: AsyncIOMotorClient, collection, filters, nam
             bulk_list.append(UpdateOne({"_id": cur["_id"]}, {"$set": {name: None}}))
     if bulk_list:
         await collection(conn).bulk_write(bulk_list)
+
+
+# 社区接口调用失败时可重试的异常
+DISC_RETRY_ERRORS = (DiscuzqCustomError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class DiscSyncEngine:
+    """社区数据同步.
+
+    - 缺失社区数据的记录按`_id`升序分批读取, 每批并发调用社区接口(同时请求数不超过`concurrency`), 所有社区客户端共享同一个keep-alive会话
+    - 接口调用失败按指数退避重试`retries`次; 重试前可先查询是否已创建, 重试不会重复创建
+    - 每批的结果通过一次`bulk_write`写入, 写入后记录该批最后一条记录的`_id`为检查点, 任务中断后重新执行从检查点继续, 全部完成后清除检查点
+    """
+
+    def __init__(
+        self,
+        conn: AsyncIOMotorClient,
+        collection: Callable[[AsyncIOMotorClient], AsyncIOMotorCollection],
+        field: str,
+        redis: Optional[SuperRedis] = None,
+        checkpoint_key: Optional[str] = None,
+        concurrency: int = 10,
+        retries: int = 3,
+        retry_backoff: float = 1,
+        batch_size: int = 500,
+        checkpoint_ttl: int = 3600 * 24,
+    ):
+        self.conn = conn
+        self.collection = collection
+        self.field = field
+        self.redis = redis
+        self.checkpoint_key = checkpoint_key
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.batch_size = batch_size
+        self.checkpoint_ttl = checkpoint_ttl
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def get_checkpoint(self) -> Optional[ObjectId]:
+        """上次写入的最后一条记录的`_id`."""
+        if self.redis is None or not self.checkpoint_key:
+            return None
+        checkpoint = await self.redis.get(self.checkpoint_key)
+        return ObjectId(checkpoint) if checkpoint else None
+
+    async def save_checkpoint(self, last_id: ObjectId) -> None:
+        if self.redis is not None and self.checkpoint_key:
+            await self.redis.set(self.checkpoint_key, str(last_id), self.checkpoint_ttl)
+
+    async def clear_checkpoint(self) -> None:
+        if self.redis is not None and self.checkpoint_key:
+            await self.redis.delete(self.checkpoint_key)
+
+    async def call(self, func: Callable[..., Awaitable], *args, lookup: Callable[[], Awaitable] = None, **kwargs) -> Any:
+        """调用社区接口, 失败时按指数退避重试, 重试后仍失败时抛出最后一次的异常.
+
+        指定`lookup`时, 每次重试前先调用`lookup`, 结果不为None(上次请求实际已成功)则直接返回该结果.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if attempt and lookup is not None:
+                    found = await lookup()
+                    if found is not None:
+                        return found
+                return await func(*args, **kwargs)
+            except DISC_RETRY_ERRORS as e:
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"[社区接口调用失败] {getattr(func, '__name__', func)} 第{attempt + 1}次: {getattr(e, 'message', e)}")
+            await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+
+    async def create_thread(self, username: str, title: str, raw: str, category: int) -> Optional[int]:
+        """发布文章并返回文章id, 重试前先在用户的文章中按标题查找, 避免重复发布."""
+
+        async def lookup():
+            threads = await get_user_created_threads(username, 0, 20)
+            return next((thread["id"] for thread in threads if thread.get("title") == title), None)
+
+        async def create():
+            thread = await create_thread(username, title=title, raw=raw, category=category)
+            return thread["id"] if thread else None
+
+        return await self.call(create, lookup=lookup)
+
+    async def _process(self, row: dict, sync: Callable[[dict], Awaitable[Any]]) -> Optional[UpdateOne]:
+        async with self._semaphore:
+            try:
+                value = await sync(row)
+            except DISC_RETRY_ERRORS as e:
+                logger.error(f"[同步社区数据失败] {self.field}({row['_id']}): {getattr(e, 'message', e)}")
+                return None
+        if value is None:
+            return None
+        return UpdateOne({"_id": row["_id"]}, {"$set": {self.field: value}})
+
+    async def run(self, filters: dict, sync: Callable[[dict], Awaitable[Any]]) -> int:
+        """同步满足`filters`的记录, `sync`返回需写入`field`的值(为None时不写入), 返回写入的记录数."""
+        last_id = await self.get_checkpoint()
+        if last_id is not None:
+            logger.info(f"[同步社区数据] {self.field}从检查点`{last_id}`继续.")
+        updated = 0
+        while True:
+            query = {"$and": [filters, {"_id": {"$gt": last_id}}]} if last_id is not None else filters
+            rows = await self.collection(self.conn).find(query).sort("_id", ASCENDING).limit(self.batch_size).to_list(None)
+            if not rows:
+                break
+            operations = [op for op in await asyncio.gather(*(self._process(row, sync) for row in rows)) if op is not None]
+            if operations:
+                await self.collection(self.conn).bulk_write(operations, ordered=False)
+                updated += len(operations)
+            last_id = rows[-1]["_id"]
+            await self.save_checkpoint(last_id)
+            if len(rows) < self.batch_size:
+                break
+        # 全部处理完成后清除检查点, 下次执行时重新处理本次失败的记录
+        await self.clear_checkpoint()
+        return updated
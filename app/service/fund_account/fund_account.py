@@ -1,6 +1,7 @@
+import asyncio
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -34,7 +35,6 @@ from app.models.fund_account import (
 )
 from app.models.portfolio import Portfolio
 from app.models.rwmodel import PyDecimal, PyObjectId
-from app.outer_sys.hq import get_security_price
 from app.schema.fund_account import (
     FundAccountFlowInCreate,
     FundAccountInUpdate,
@@ -42,9 +42,9 @@ from app.schema.fund_account import (
     FundAccountPositionList,
 )
 from app.service.check_status import CheckStatus
+from app.service.fund_account.valuation import calculate_securities, revalue_fund_accounts
 from app.service.time_series_data.converter import pt_flow2beehive_flow
 from app.utils.datetime import date2datetime, get_utc_now
-from app.utils.exchange import convert_exchange
 
 
 def calculate_flow_fee(
@@ -96,13 +96,7 @@ async def update_fund_account_by_flow(
         conn, fund_id=str(fund_account.id)
     )
     cash = fund_account.cash.to_decimal() + flow.fundeffect.to_decimal()
-    securities = Decimal(0)
-    for position in position_list:
-        security = await get_security_price(
-            symbol=position.symbol,
-            exchange=convert_exchange(position.exchange, to="beehive"),
-        )
-        securities += security.current * position.volume
+    securities = sum((await calculate_securities(position_list)).values(), Decimal(0))
     if ts_data_sync_date is None:
         if FastTdate.last_tdate(flow.tdate) < fund_account.ts_data_sync_date:
             ts_data_sync_date = FastTdate.last_tdate(flow.tdate)
@@ -176,6 +170,12 @@ async def get_portfolio_position(
     return fund_account_position_list
 
 
+def pt_position2position(position: dict, fund_id: str) -> FundAccountPositionInDB:
+    """模拟交易系统持仓转换为资金账户持仓."""
+    position["exchange"] = Exchange.CNSESH if position["exchange"] == "SH" else Exchange.CNSESZ
+    return FundAccountPositionInDB(**position, fund_id=fund_id)
+
+
 async def get_fund_account_position(
     conn: AsyncIOMotorClient, fund_id: str, category: PortfolioCategory
 ) -> Optional[List[FundAccountPositionInDB]]:
@@ -189,57 +189,95 @@ async def get_fund_account_position(
     else:
         tir = await G.trade_system.get_fund_stock(fund_id=fund_id, convert_out=False)
         if tir.flag and tir.data:
-            fund_account_position_list = []
-            for position in tir.data:
-                position["exchange"] = (
-                    Exchange.CNSESH if position["exchange"] == "SH" else Exchange.CNSESZ
-                )
-                fund_account_position_list.append(
-                    FundAccountPositionInDB(**position, fund_id=fund_id)
-                )
+            fund_account_position_list = [pt_position2position(position, fund_id) for position in tir.data]
         else:
             fund_account_position_list = []
     return fund_account_position_list
 
 
+async def get_fund_accounts_position(
+    conn: AsyncIOMotorClient, fund_ids: List[str], category: PortfolioCategory
+) -> Dict[str, List[FundAccountPositionInDB]]:
+    """批量获取资金账户持仓列表(手动导入组合一次查询数据库, 模拟交易组合限制并发数批量请求交易系统)."""
+    position_lists = {fund_id: [] for fund_id in fund_ids}
+    if not fund_ids:
+        return position_lists
+    if category == PortfolioCategory.ManualImport:
+        for position in await get_fund_account_position_from_db(conn, fund_ids=fund_ids):
+            position_lists[position.fund_id].append(position)
+    else:
+        for fund_id, tir in (await G.trade_system.get_fund_stocks_many(fund_ids, convert_out=False)).items():
+            if tir.flag and tir.data:
+                position_lists[fund_id] = [pt_position2position(position, fund_id) for position in tir.data]
+    return position_lists
+
+
 async def get_portfolio_fund_list(
     conn: AsyncIOMotorClient,
     portfolio_id: PyObjectId,
 ) -> List[FundAccountInDB]:
     """获取组合资金账户资产列表."""
     portfolio = await get_portfolio_by_id(conn, portfolio_id)
-    fund_account_fund_list = []
-    # 类型为手动导入组合的资产
-    if portfolio.category == PortfolioCategory.ManualImport:
+    return (await get_portfolios_fund_list(conn, [portfolio]))[portfolio.id]
+
+
+async def get_portfolios_fund_list(
+    conn: AsyncIOMotorClient,
+    portfolio_list: List[Portfolio],
+) -> Dict[PyObjectId, List[FundAccountInDB]]:
+    """批量获取组合资金账户资产列表(模拟交易组合的资产通过一次批量请求从交易系统获取)."""
+    manual_ids = [
+        fund_account.fundid
+        for portfolio in portfolio_list
+        if portfolio.category == PortfolioCategory.ManualImport
+        for fund_account in portfolio.fund_account
+    ]
+    simulated_ids = [
+        fund_account.fundid
+        for portfolio in portfolio_list
+        if portfolio.category != PortfolioCategory.ManualImport
+        for fund_account in portfolio.fund_account
+    ]
+
+    async def _get_fund_account(fund_id: str) -> Optional[FundAccountInDB]:
+        try:
+            return await get_fund_account_by_id(conn, PyObjectId(fund_id))
+        except EntityDoesNotExist:
+            return None
+
+    manual_fund_accounts = dict(zip(manual_ids, await asyncio.gather(*map(_get_fund_account, manual_ids))))
+    simulated_assets = (
+        await G.trade_system.get_fund_assets_many(simulated_ids, convert_out=False)
+        if simulated_ids
+        else {}
+    )
+    ts_data_sync_date = FastTdate.last_tdate(date2datetime())
+    fund_lists = {}
+    for portfolio in portfolio_list:
+        fund_account_fund_list = []
         for fund_account_item in portfolio.fund_account:
-            try:
-                fund_account = await get_fund_account_by_id(
-                    conn, PyObjectId(fund_account_item.fundid)
-                )
-            except EntityDoesNotExist:
-                logger.warning(f"获取资金账户`{fund_account_item.fundid}`失败, 该资金账户不存在.")
-                continue
-            else:
-                fund_account_fund_list.append(fund_account)
-    # 类型为模拟交易组合的资产
-    else:
-        for fund_account in portfolio.fund_account:
-            tir = await G.trade_system.get_fund_asset(
-                fund_id=fund_account.fundid, convert_out=False
-            )
-            if not tir.data:
-                logger.warning(f"获取资金账户`{fund_account.fundid}`失败, 该资金账户不存在.")
-                continue
+            # 类型为手动导入组合的资产
+            if portfolio.category == PortfolioCategory.ManualImport:
+                fund_account = manual_fund_accounts.get(fund_account_item.fundid)
+            # 类型为模拟交易组合的资产
             else:
-                fund_account_fund_list.append(
+                tir = simulated_assets.get(fund_account_item.fundid)
+                fund_account = (
                     FundAccountInDB(
                         **tir.data,
-                        id=fund_account.fundid,
-                        currency=fund_account.currency,
-                        ts_data_sync_date=FastTdate.last_tdate(date2datetime()),
+                        id=fund_account_item.fundid,
+                        currency=fund_account_item.currency,
+                        ts_data_sync_date=ts_data_sync_date,
                     )
+                    if tir is not None and tir.data
+                    else None
                 )
-    return fund_account_fund_list
+            if fund_account is None:
+                logger.warning(f"获取资金账户`{fund_account_item.fundid}`失败, 该资金账户不存在.")
+                continue
+            fund_account_fund_list.append(fund_account)
+        fund_lists[portfolio.id] = fund_account_fund_list
+    return fund_lists
 
 
 async def get_fund_account_flow(
@@ -333,13 +371,7 @@ async def calculate_fund_asset(
     position_list = await get_fund_account_position_from_db(
         conn, fund_id=str(fund_account.id)
     )
-    securities = Decimal(0)
-    for position in position_list:
-        security = await get_security_price(
-            symbol=position.symbol,
-            exchange=convert_exchange(position.exchange, to="beehive"),
-        )
-        securities += security.current * position.volume
+    securities = sum((await calculate_securities(position_list)).values(), Decimal(0))
     fund_account.securities = PyDecimal(securities)
     fund_account.assets = PyDecimal(securities + fund_account.cash.to_decimal())
     return fund_account
@@ -438,7 +470,4 @@ async def liquidation_fund_asset(
     old_fund_account = await get_fund_account_by_id(
         conn, PyObjectId(portfolio.fund_account[0].fundid)
     )
-    new_fund_account = await calculate_fund_asset(conn, old_fund_account)
-    await update_fund_account_by_id(
-        conn, new_fund_account.id, FundAccountInUpdate(**new_fund_account.dict())
-    )
+    await revalue_fund_accounts(conn, [old_fund_account])
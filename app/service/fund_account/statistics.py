@@ -0,0 +1,134 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Union
+from weakref import WeakValueDictionary
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne
+
+from app.crud.fund_account import (
+    bulk_write_fund_account_statistics,
+    delete_fund_account_statistics_many,
+    get_fund_account_flow_from_db,
+    get_fund_account_statistics_from_db,
+)
+from app.enums.fund_account import FlowTType
+from app.models.base.fund_account import FundAccountStatistics
+from app.models.fund_account import FundAccountFlowInDB
+
+# 计入个股统计的流水类别
+STATISTICS_TTYPES = [FlowTType.BUY, FlowTType.SELL, FlowTType.DIVIDEND, FlowTType.TAX]
+# 各资金账户的统计写入锁, 没有协程持有时自动释放
+_statistics_locks: "WeakValueDictionary[str, asyncio.Lock]" = WeakValueDictionary()
+
+
+def get_flow_increments(flow: FundAccountFlowInDB) -> Dict[str, Union[int, float]]:
+    """流水对个股统计各字段的增量."""
+    fundeffect = float(flow.fundeffect.to_decimal())
+    if flow.ttype == FlowTType.BUY:
+        return {"buy_num": 1, "buy_volume": abs(flow.stkeffect), "buy_amount": -fundeffect}
+    if flow.ttype == FlowTType.SELL:
+        return {
+            "sell_num": 1,
+            "sell_volume": abs(flow.stkeffect),
+            "sell_amount": fundeffect,
+            f"sell_dates.{flow.tdate:%Y%m%d}": 1,
+        }
+    # 送转股按零成本买入计入持仓数量
+    return {"buy_volume": max(flow.stkeffect, 0), "dividend": fundeffect}
+
+
+def aggregate_flow_statistics(flow_list: Iterable[FundAccountFlowInDB]) -> Dict[str, FundAccountStatistics]:
+    """在内存中由流水计算个股统计."""
+    increments = defaultdict(lambda: defaultdict(float))
+    statistics = {}
+    for flow in flow_list:
+        if flow.ttype not in STATISTICS_TTYPES:
+            continue
+        for field, value in get_flow_increments(flow).items():
+            increments[flow.symbol][field] += value
+        stats = statistics.setdefault(
+            flow.symbol,
+            {"fund_id": flow.fund_id, "symbol": flow.symbol, "exchange": flow.exchange, "sell_dates": {}},
+        )
+        stats["first_tdate"] = min(stats.get("first_tdate") or flow.tdate, flow.tdate)
+        stats["last_tdate"] = max(stats.get("last_tdate") or flow.tdate, flow.tdate)
+        if flow.created_at:
+            stats["first_created_at"] = min(stats.get("first_created_at") or flow.created_at, flow.created_at)
+    for symbol, stats in statistics.items():
+        for field, value in increments[symbol].items():
+            if field.startswith("sell_dates."):
+                stats["sell_dates"][field.split(".", 1)[1]] = int(value)
+            else:
+                stats[field] = value
+    return {symbol: FundAccountStatistics(**stats) for symbol, stats in statistics.items()}
+
+
+def subtract_flow_statistics(
+    statistics: Iterable[FundAccountStatistics], flow_list: Iterable[FundAccountFlowInDB]
+) -> List[FundAccountStatistics]:
+    """从个股统计中扣除指定流水(如当日新录入的流水)."""
+    statistics = {stats.symbol: stats.copy(deep=True) for stats in statistics}
+    for flow in flow_list:
+        stats = statistics.get(flow.symbol)
+        if stats is None or flow.ttype not in STATISTICS_TTYPES:
+            continue
+        for field, value in get_flow_increments(flow).items():
+            if field.startswith("sell_dates."):
+                tdate = field.split(".", 1)[1]
+                num = stats.sell_dates.get(tdate, 0) - value
+                if num > 0:
+                    stats.sell_dates[tdate] = num
+                else:
+                    stats.sell_dates.pop(tdate, None)
+            else:
+                setattr(stats, field, getattr(stats, field) - value)
+    return list(statistics.values())
+
+
+def get_statistics_lock(fund_id: str) -> asyncio.Lock:
+    """资金账户个股统计写入锁, 同一资金账户的统计重建依次执行."""
+    lock = _statistics_locks.get(fund_id)
+    if lock is None:
+        lock = _statistics_locks[fund_id] = asyncio.Lock()
+    return lock
+
+
+async def update_statistics_by_flow(conn: AsyncIOMotorClient, flow: FundAccountFlowInDB) -> None:
+    """新增流水时重建该股票的个股统计."""
+    if flow.ttype in STATISTICS_TTYPES:
+        await rebuild_fund_account_statistics(conn, flow.fund_id, flow.symbol)
+
+
+async def rebuild_fund_account_statistics(
+    conn: AsyncIOMotorClient, fund_id: str, symbol: Optional[str] = None
+) -> None:
+    """由流水重建资金账户(或其中某只股票)的个股统计, 用于流水新增、修改、删除及批量写入之后.
+
+    统计值在内存中由全部流水计算后整体替换写入, 重复执行结果不变; 资金账户尚无统计时重建全部股票.
+    """
+    async with get_statistics_lock(fund_id):
+        if symbol is not None and not await get_fund_account_statistics_from_db(conn, fund_id=fund_id):
+            symbol = None
+        flow_list = await get_fund_account_flow_from_db(conn, fund_id=fund_id, ttype=STATISTICS_TTYPES, symbol=symbol)
+        statistics = aggregate_flow_statistics(flow_list)
+        operations = [
+            ReplaceOne({"fund_id": fund_id, "symbol": stats.symbol}, stats.dict(), upsert=True)
+            for stats in statistics.values()
+        ]
+        if operations:
+            await bulk_write_fund_account_statistics(conn, operations)
+        # 删除已无流水的股票统计
+        if symbol is None:
+            await delete_fund_account_statistics_many(conn, {"fund_id": fund_id, "symbol": {"$nin": list(statistics)}})
+        elif symbol not in statistics:
+            await delete_fund_account_statistics_many(conn, {"fund_id": fund_id, "symbol": symbol})
+
+
+async def get_fund_account_statistics(conn: AsyncIOMotorClient, fund_id: str) -> List[FundAccountStatistics]:
+    """获取资金账户个股统计, 尚未建立统计的资金账户(如历史数据)由流水在内存中计算, 不在查询时写入."""
+    statistics = await get_fund_account_statistics_from_db(conn, fund_id=fund_id)
+    if not statistics:
+        flow_list = await get_fund_account_flow_from_db(conn, fund_id=fund_id, ttype=STATISTICS_TTYPES)
+        statistics = list(aggregate_flow_statistics(flow_list).values())
+    return statistics
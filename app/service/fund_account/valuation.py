@@ -0,0 +1,76 @@
+from decimal import Decimal
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from app.crud.fund_account import bulk_write_fund_account, get_fund_account_position_from_db
+from app.models.fund_account import FundAccountInDB, FundAccountPositionInDB
+from app.models.rwmodel import PyDecimal
+from app.outer_sys.hq import get_security_prices
+from app.schema.fund_account import FundAccountInUpdate
+from app.utils.exchange import convert_exchange
+
+# 价格放大倍数, 价格最多保留4位小数时市值按整数计算, 与Decimal计算结果一致;
+# 放大后的市值需在int64范围内, 即单个资金账户持仓市值低于900万亿元
+PRICE_SCALE = 10000
+
+
+def sum_securities_by_decimal(position_list: List[FundAccountPositionInDB], prices: Dict[str, Decimal]) -> Dict[str, Decimal]:
+    """按Decimal逐笔累加各资金账户持仓市值."""
+    rv = {}
+    for position in position_list:
+        security = f"{position.symbol}_{convert_exchange(position.exchange, to='beehive')}"
+        rv[position.fund_id] = rv.get(position.fund_id, Decimal(0)) + prices[security] * position.volume
+    return rv
+
+
+async def calculate_securities(position_list: List[FundAccountPositionInDB]) -> Dict[str, Decimal]:
+    """计算各资金账户持仓证券市值, 全部持仓的行情通过一次批量请求获取.
+
+    价格均不超过4位小数时按放大后的整数向量化计算, 否则按Decimal逐笔累加, 结果均与Decimal计算一致.
+    """
+    if not position_list:
+        return {}
+    securities = list(dict.fromkeys((position.symbol, convert_exchange(position.exchange, to="beehive")) for position in position_list))
+    prices = {"_".join(security): Decimal(str(price.current)) for security, price in zip(securities, await get_security_prices(securities))}
+    if any((price * PRICE_SCALE) % 1 for price in prices.values()):
+        return sum_securities_by_decimal(position_list, prices)
+    scaled_prices = pd.Series({security: int(price * PRICE_SCALE) for security, price in prices.items()}, dtype=np.int64)
+    positions = pd.DataFrame(
+        {
+            "fund_id": [position.fund_id for position in position_list],
+            "security": [f"{position.symbol}_{convert_exchange(position.exchange, to='beehive')}" for position in position_list],
+            "volume": np.array([position.volume for position in position_list], dtype=np.int64),
+        }
+    )
+    positions["mktval"] = positions["security"].map(scaled_prices) * positions["volume"]
+    mktval = positions.groupby("fund_id")["mktval"].sum()
+    return {fund_id: Decimal(int(value)) / PRICE_SCALE for fund_id, value in mktval.items()}
+
+
+async def calculate_fund_assets(conn: AsyncIOMotorClient, fund_accounts: List[FundAccountInDB]) -> List[FundAccountInDB]:
+    """批量计算资金账户最新证券市值和总资产(一次查询全部持仓, 一次批量获取行情)."""
+    if not fund_accounts:
+        return fund_accounts
+    position_list = await get_fund_account_position_from_db(conn, fund_ids=[str(fund_account.id) for fund_account in fund_accounts])
+    securities = await calculate_securities(position_list)
+    for fund_account in fund_accounts:
+        fund_securities = securities.get(str(fund_account.id), Decimal(0))
+        fund_account.securities = PyDecimal(fund_securities)
+        fund_account.assets = PyDecimal(fund_securities + fund_account.cash.to_decimal())
+    return fund_accounts
+
+
+async def revalue_fund_accounts(conn: AsyncIOMotorClient, fund_accounts: List[FundAccountInDB]) -> List[FundAccountInDB]:
+    """批量计算资金账户资产并通过一次`bulk_write`写入数据库."""
+    fund_accounts = await calculate_fund_assets(conn, fund_accounts)
+    operations = [
+        UpdateOne({"_id": fund_account.id}, {"$set": FundAccountInUpdate(**fund_account.dict()).dict()})
+        for fund_account in fund_accounts
+    ]
+    if operations:
+        await bulk_write_fund_account(conn, operations)
+    return fund_accounts
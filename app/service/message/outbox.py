@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app import settings
+from app.crud.msg import create_outbox_messages, get_outbox_messages, update_outbox_message
+from app.enums.user import 发件箱状态
+from app.extentions import logger
+from app.models.msg import OutboxMessageInDB
+from app.outer_sys.message.sender import AsyncMessageSender
+
+
+def get_message_sender() -> AsyncMessageSender:
+    """按配置创建消息发送器."""
+    return AsyncMessageSender(
+        concurrency=settings.notification.concurrency,
+        retries=settings.notification.retries,
+        retry_backoff=settings.notification.retry_backoff,
+    )
+
+
+async def enqueue_messages(conn: AsyncIOMotorClient, messages: List[OutboxMessageInDB]) -> None:
+    """写入发件箱, 同一消息(`key`相同)只写入一次."""
+    await create_outbox_messages(conn, messages)
+
+
+async def deliver_message(conn: AsyncIOMotorClient, sender: AsyncMessageSender, message: OutboxMessageInDB) -> bool:
+    """发送发件箱中的一条消息并记录发送结果."""
+    message.attempts += 1
+    try:
+        await sender.send(message.send_type, message.to, message.title, message.content)
+    except Exception as e:
+        message.status = 发件箱状态.failed
+        message.error = str(getattr(e, "message", e))
+        logger.error(f"[消息发送失败] {message.username}({message.to}): {message.error}")
+    else:
+        message.status = 发件箱状态.sent
+        message.error = None
+        message.sent_at = datetime.utcnow()
+    await update_outbox_message(conn, message)
+    return message.status == 发件箱状态.sent
+
+
+async def deliver_outbox(
+    conn: AsyncIOMotorClient, batch: str, sender: Optional[AsyncMessageSender] = None
+) -> Dict[str, int]:
+    """发送某批次中未发送成功的消息(待发送及之前发送失败的), 返回发送成功和失败的数量."""
+    messages = await get_outbox_messages(conn, {"batch": batch, "status": {"$ne": 发件箱状态.sent}})
+    own_sender = sender is None
+    sender = sender or get_message_sender()
+    try:
+        results = await asyncio.gather(*(deliver_message(conn, sender, message) for message in messages))
+    finally:
+        if own_sender:
+            await sender.close()
+    return {"sent": results.count(True), "failed": results.count(False)}
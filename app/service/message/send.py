@@ -1,56 +1,94 @@
 from datetime import datetime
-from smtplib import SMTPResponseException
+from typing import Dict, List, Optional
 
 import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorClient
 from stralib import get_strategy_signal
 
+from app.core.executor import run_blocking
 from app.crud.base import get_equipment_collection, get_collection_by_config
 from app.crud.stock import get_favorite_stock_by_unique
 from app.enums.equipment import 装备分类转换
 from app.enums.user import 发送消息类型
-from app.outer_sys.message.adaptor.mail import SendEmail
-from app.outer_sys.message.send_msg import SendMessage
+from app.models.msg import OutboxMessageInDB
+from app.outer_sys.message.sender import AsyncMessageSender
 from app.schedulers import logger
 from app.service.stocks.stock import query_stock_price
 from app.service.strawman_data import 获取选股信号列表, 获取择时信号列表
 
 
-async def get_package_signal(conn: AsyncIOMotorClient, sid: str, start: datetime, end: datetime, user: dict) -> tuple:
-    """获取风控包信号"""
+class PackageSignal:
+    """风控包信号.
+
+    - 成员装备的信号只计算一次, 同一天同一股票的多条风险合并为一条, 同一次群发中各用户共享
+    - 按用户自选股筛选后补充股票名称, 已查询过的股票名称同样共享
+    """
+
+    COLUMNS = {"tdate": "日期", "symbol_name": "股票名称", "symbol": "股票代码", "risk": "当前风险"}
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self._symbol_names: Dict[str, Optional[str]] = {}
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    def for_symbols(self, symbol_list: List[str]) -> pd.DataFrame:
+        """筛选自选股的信号."""
+        if self.frame.empty:
+            return pd.DataFrame()
+        result = self.frame[self.frame.symbol.isin(symbol_list)]
+        if result.empty:
+            return pd.DataFrame()
+        missing = result[~result.symbol.isin(list(self._symbol_names))].drop_duplicates("symbol")
+        if not missing.empty:
+            for row in query_stock_price([f"{s}_{e}" for s, e in zip(missing.symbol, missing.exchange)]):
+                self._symbol_names[row["symbol"]] = row["symbol_name"]
+            for symbol in missing.symbol:
+                self._symbol_names.setdefault(symbol, None)
+        result = result.assign(symbol_name=result.symbol.map(self._symbol_names))
+        result = result.where(pd.notna(result), None)
+        return result[list(self.COLUMNS)].rename(columns=self.COLUMNS)
+
+
+async def get_package_signal_frame(conn: AsyncIOMotorClient, sid: str, start: datetime, end: datetime) -> PackageSignal:
+    """计算风控包全部股票的信号"""
     equipment_info = await get_equipment_collection(conn).find_one({"标识符": sid})
     equipment_list = equipment_info["装备列表"] if equipment_info else []
-    favorite_stock = await get_favorite_stock_by_unique(conn, {"category": "portfolio", "username": user["username"]})
-    symbol_list = [stock.symbol for stock in favorite_stock.stocks] if favorite_stock else []
-    result = pd.DataFrame()
-    for sid in equipment_list:
+    cursor = get_equipment_collection(conn).find({"标识符": {"$in": equipment_list}}, {"标识符": 1, "策略话术": 1})
+    risk_words = {x["标识符"]: x.get("策略话术") async for x in cursor}
+    frames = []
+    for member_sid in equipment_list:
         try:
-            df = get_strategy_signal(sid, start, end)
-            df = df[df["symbol"].isin(symbol_list)]
-            df["risk"] = (await get_equipment_collection(conn).find_one({"标识符": sid})).get("策略话术")
-            result = result.append(df, sort=False)
+            df = await run_blocking(get_strategy_signal, member_sid, start, end)
+            frames.append(df.assign(risk=risk_words.get(member_sid)))
         except KeyError:
             continue
-    if result.empty:
-        return result
+    if not frames:
+        return PackageSignal(pd.DataFrame())
+    result = pd.concat(frames, sort=False, ignore_index=True)
     try:
-        result.reset_index(drop=True, inplace=True)
-        result.drop(result[result.grade == "."].index, inplace=True)
-        result["risk"] = result.apply(
-            lambda x: "<br />".join(result[result.tdate.isin([x["tdate"]]) & result.symbol.isin([x["symbol"]])].risk.tolist()), axis=1
-        )
-        result = result[["tdate", "symbol", "exchange", "risk"]]
-        result.drop_duplicates(keep="first", inplace=True)
-        result.replace({"exchange": {"CNSESH": "1", "CNSESZ": "0"}}, inplace=True)
-        args = ["{}_{}".format(s, e) for s, e in zip(*[getattr(result, col).tolist() for col in ["symbol", "exchange"]])]
-        symbol_name = pd.DataFrame(query_stock_price(args))[["symbol", "symbol_name"]]
-        result = pd.merge(result, symbol_name, how="outer", on="symbol", copy=False)
-        result = result.where(pd.notna(result), None)
-        result = result[["tdate", "symbol_name", "symbol", "risk"]]
-        result.rename(columns={"tdate": "日期", "symbol_name": "股票名称", "symbol": "股票代码", "risk": "当前风险"}, inplace=True)
-        return result
+        result = result[result.grade != "."]
+        # 同一天同一股票的多条风险合并显示
+        risks = result.groupby(["tdate", "symbol"], sort=False)["risk"].agg(lambda x: "<br />".join(x.fillna("")))
+        result = result[["tdate", "symbol", "exchange"]].drop_duplicates(keep="first").join(risks, on=["tdate", "symbol"])
+        result = result.replace({"exchange": {"CNSESH": "1", "CNSESZ": "0"}}).reset_index(drop=True)
     except (AttributeError, KeyError, ValueError) as e:
-        return result
+        logger.warning(f"[风控包信号格式错误] {sid}: {e}")
+        return PackageSignal(pd.DataFrame())
+    return PackageSignal(result)
+
+
+async def get_package_signal(
+    conn: AsyncIOMotorClient, sid: str, start: datetime, end: datetime, user: dict, package_signal: PackageSignal = None
+) -> pd.DataFrame:
+    """获取用户自选股的风控包信号, 传入`package_signal`时复用已计算的风控包信号"""
+    favorite_stock = await get_favorite_stock_by_unique(conn, {"category": "portfolio", "username": user["username"]})
+    symbol_list = [stock.symbol for stock in favorite_stock.stocks] if favorite_stock else []
+    if package_signal is None:
+        package_signal = await get_package_signal_frame(conn, sid, start, end)
+    return package_signal.for_symbols(symbol_list)
 
 
 async def get_appointed_real_signal(conn: AsyncIOMotorClient, sid: str, start: datetime, end: datetime) -> pd.DataFrame:
@@ -84,8 +122,7 @@ async def get_equipment_signal(conn: AsyncIOMotorClient, equipment: dict, start:
     elif equipment["标识符"][:2] in ["06", "07"]:
         df = await get_appointed_real_signal(conn, equipment["标识符"], start, end)
     elif equipment["标识符"].startswith("11"):
-        equipment_list = equipment["装备列表"] if equipment else []
-        df = [get_strategy_signal(x, start, end) for x in equipment_list]
+        df = await get_package_signal_frame(conn, equipment["标识符"], start, end)
     return df
 
 
@@ -96,48 +133,77 @@ async def get_all_equipment_signals(conn: AsyncIOMotorClient, tdate: datetime, f
     ret_data = {}
     async for equipment in equipments:
         signal = await get_equipment_signal(conn, equipment, tdate, tdate)
-        if equipment["标识符"].startswith("11"):
-            if signal:
-                ret_data[equipment["标识符"]] = {"signal": signal, "equipment": equipment}
-        else:
-            if not signal.empty:
-                ret_data[equipment["标识符"]] = {"signal": signal, "equipment": equipment}
+        if not signal.empty:
+            ret_data[equipment["标识符"]] = {"signal": signal, "equipment": equipment}
     return ret_data
 
 
+def render_signal_html(sid: str, equipment: dict, df: pd.DataFrame) -> str:
+    """将装备信号渲染为邮件内容"""
+    html = df.to_html(index=False, justify="center", escape=False).replace("<table", '<table style="text-align: center;border-collapse:collapse"')
+    return f"<h3>{装备分类转换._value2member_map_[sid[:2]].name}装备：</h3><p>您订阅的{equipment['分类']}装备《{equipment['名称']}》，今日发出信号：</p>{html}"
+
+
 async def get_equipment_signal_by_user(conn: AsyncIOMotorClient, user: dict, tdate: datetime, signals: dict):
-    """根据用户获取装备信号（包括用户创建和订阅的装备）"""
+    """根据用户获取装备信号（包括用户创建和订阅的装备）
+
+    `signals`为当日全部装备的信号, 当日没有信号的装备跳过; 除风控包外各用户的内容相同, 渲染结果缓存在`signals`中
+    """
     content = ""
     try:
         equipment_list = user["equipment"]["subscribe_info"]["focus_list"] + user["equipment"]["create_info"]["running_list"]
     except KeyError:
         return content
+    pd.set_option("display.max_colwidth", -1)
     for sid in equipment_list:
+        if sid not in signals:
+            continue
+        signal = signals[sid]
         if sid.startswith("11"):
-            df = await get_package_signal(conn, sid, tdate, tdate, user)
-        else:
-            df = signals[sid]["signal"] if sid in signals.keys() else pd.DataFrame()
-        df.dropna(axis=0, how="any", inplace=True)
-        if not df.empty:
-            pd.set_option("display.max_colwidth", -1)
-            html = df.to_html(index=False, justify="center", escape=False).replace("<table", '<table style="text-align: center;border-collapse:collapse"')
-            content += f"<h3>{装备分类转换._value2member_map_[sid[:2]].name}装备：</h3><p>您订阅的{signals[sid]['equipment']['分类']}装备《{signals[sid]['equipment']['名称']}》，今日发出信号：</p>{html}"
+            df = (await get_package_signal(conn, sid, tdate, tdate, user, signal["signal"])).dropna(axis=0, how="any")
+            content += render_signal_html(sid, signal["equipment"], df) if not df.empty else ""
+            continue
+        if "html" not in signal:
+            df = signal["signal"].dropna(axis=0, how="any")
+            signal["html"] = render_signal_html(sid, signal["equipment"], df) if not df.empty else ""
+        content += signal["html"]
     return content
 
 
-async def send_message(user, content, tdate):
+def get_signal_batch(tdate: datetime) -> str:
+    """装备信号群发批次"""
+    return f"equipment_signal_{tdate:%Y%m%d}"
+
+
+def build_signal_message(user: dict, content: str, tdate: datetime) -> Optional[OutboxMessageInDB]:
+    """生成装备信号消息, 用户未设置邮件接收时返回None"""
+    if not content or user.get("send_type") != 发送消息类型.email or not user.get("email"):
+        return None
+    batch = get_signal_batch(tdate)
+    return OutboxMessageInDB(
+        key=f"{batch}_{user['username']}",
+        batch=batch,
+        username=user["username"],
+        send_type=发送消息类型.email,
+        to=user["email"],
+        title=f"智道-订阅装备信号 {tdate:%Y-%m-%d}",
+        content=content,
+    )
+
+
+async def send_message(user, content, tdate, sender: AsyncMessageSender = None):
     """发送消息"""
-    if not content:
+    message = build_signal_message(user, content, tdate)
+    if message is None:
         return False
-    sm, params = None, None
-    if user["send_type"] == 发送消息类型.email:
-        sm = SendMessage(SendEmail())
-        params = {"to_addr": user["email"], "title": f"智道-订阅装备信号 {tdate:%Y-%m-%d}", "content": content, "send_type": "html"}
+    own_sender = sender is None
+    sender = sender or AsyncMessageSender(concurrency=1)
     try:
-        sm.send(**params)
-    except SMTPResponseException as e:
-        logger.error(f"Code:{e.smtp_code} Msg:{e.smtp_error.decode()}")
+        await sender.send(message.send_type, message.to, message.title, message.content)
     except Exception as e:
-        logger.error(f"{user['username']}消息发送失败！失败详情；{e}")
-    else:
-        return True
+        logger.error(f"{user['username']}消息发送失败！失败详情；{getattr(e, 'message', e)}")
+        return False
+    finally:
+        if own_sender:
+            await sender.close()
+    return True
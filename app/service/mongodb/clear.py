@@ -15,6 +15,7 @@ from app.crud.base import (
     get_fund_account_collection,
     get_fund_account_flow_collection,
     get_fund_account_position_collection,
+    get_fund_account_statistics_collection,
     get_favorite_stock_collection,
 )
 from app.db.mongodb import db
@@ -52,6 +53,7 @@ class ClearCollection:
             await get_fund_account_collection(self.client).delete_many({"_id": fund_id})
             await get_fund_account_flow_collection(self.client).delete_many({"fund_id": fund_id})
             await get_fund_account_position_collection(self.client).delete_many({"fund_id": fund_id})
+            await get_fund_account_statistics_collection(self.client).delete_many({"fund_id": fund_id})
             typer.echo("clear 清理日志")
             await get_user_message_collection(self.client).delete_many({"category": "portfolio", "data_info": str(pid)})
 
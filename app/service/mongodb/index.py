@@ -0,0 +1,89 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel
+
+from app import settings
+from app.extentions import logger
+from app.settings.db import db_idx
+
+# 未在`settings.collections`中配置的集合, 如定时任务存储
+EXTRA_COLLECTIONS = {"JOB": "job"}
+
+
+class IndexSpec(NamedTuple):
+    """声明的集合索引."""
+
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+
+def get_index_registry(collections: Optional[List[str]] = None) -> Dict[str, List[IndexSpec]]:
+    """由`ColIndex`生成各集合声明的索引, `collections`为空时返回全部集合."""
+    cols = {**settings.collections.dict(), **EXTRA_COLLECTIONS}
+    registry = {}
+    for key, col_name in cols.items():
+        if collections and col_name not in collections:
+            continue
+        specs = []
+        for keys, unique in getattr(db_idx, f"{key}_IDX", []):
+            if isinstance(keys, str):
+                keys = [(keys, ASCENDING)]
+            specs.append(IndexSpec(col_name, tuple((field, direction) for field, direction in keys), unique))
+        if specs:
+            registry[col_name] = specs
+    return registry
+
+
+async def get_existing_indexes(conn: AsyncIOMotorClient, collection: str) -> Dict[Tuple[Tuple[str, int], ...], dict]:
+    """查询集合已有索引, 以索引键为键."""
+    info = await conn[settings.db.DB_NAME][collection].index_information()
+    return {
+        tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in index["key"]): {"name": name, **index}
+        for name, index in info.items()
+    }
+
+
+async def ensure_indexes(conn: AsyncIOMotorClient, collections: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    """创建缺失的声明索引, 已存在相同索引键的索引不再重复创建, 返回各集合新建的索引名."""
+    created = {}
+    for collection, specs in get_index_registry(collections).items():
+        existing = await get_existing_indexes(conn, collection)
+        models = []
+        for spec in specs:
+            index = existing.get(spec.keys)
+            if index is None:
+                models.append(IndexModel(list(spec.keys), unique=spec.unique, background=True))
+            elif bool(index.get("unique")) != spec.unique:
+                logger.warning(f"[索引声明冲突] {collection}.{index['name']}已存在, 唯一性与声明不一致, 已跳过.")
+        if models:
+            created[collection] = await conn[settings.db.DB_NAME][collection].create_indexes(models)
+            logger.info(f"[创建索引] {collection}: {created[collection]}")
+    return created
+
+
+async def index_report(conn: AsyncIOMotorClient, collections: Optional[List[str]] = None) -> List[dict]:
+    """索引报告: 缺失的声明索引, 未声明的已有索引, 以及`$indexStats`统计的各索引使用次数."""
+    report = []
+    for collection, specs in get_index_registry(collections).items():
+        existing = await get_existing_indexes(conn, collection)
+        declared = {spec.keys for spec in specs}
+        stats = {
+            row["name"]: row["accesses"]["ops"]
+            async for row in conn[settings.db.DB_NAME][collection].aggregate([{"$indexStats": {}}])
+        }
+        report.append(
+            {
+                "collection": collection,
+                "missing": [spec.name for spec in specs if spec.keys not in existing],
+                "undeclared": [index["name"] for keys, index in existing.items() if keys not in declared and index["name"] != "_id_"],
+                "unused": [name for name, ops in stats.items() if not ops and name != "_id_"],
+                "ops": stats,
+            }
+        )
+    return report
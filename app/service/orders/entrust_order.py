@@ -76,6 +76,32 @@ async def get_entrust_orders_recent_by_fund_id(fund_id: str) -> Dict[str, dict]:
     return {}
 
 
+async def get_entrust_orders_recent_by_fund_ids(fund_ids: List[str]) -> Dict[str, Dict[str, dict]]:
+    """
+    批量查询多个资金账户当日所有委托订单
+    Parameters
+    ----------
+    fund_ids:    资金账户ID列表
+
+    Returns
+    -------
+        Dict[fund_id, Dict[order_id]]: outer_sys/trade_system/output_tuple/ORDER_RECORD
+    """
+    if not fund_ids:
+        return {}
+    start_date = stop_date = str_of_today()
+    result = await G.trade_system.get_order_records_many(
+        fund_ids,
+        start_date=start_date,
+        stop_date=stop_date,
+        op_flag=1,
+    )
+    return {
+        fund_id: {order["order_id"]: order for order in tir.data} if tir.flag else {}
+        for fund_id, tir in result.items()
+    }
+
+
 async def get_entrust_orders(
     portfolio,
     start_date,
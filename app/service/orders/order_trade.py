@@ -4,6 +4,7 @@ from typing import List, Optional
 import ujson
 from stralib import FastTdate
 
+from app import settings
 from app.core.errors import NotInTradingHour
 from app.global_var import G
 from app.models.order import Order
@@ -52,9 +53,8 @@ class OrderTrade:
         redis = G.entrust_redis
         pipeline = await redis.pipeline()
         portfolio_id = str(portfolio.id)
-        portfolio = await redis.hget(cls.PORTFOLIO_HASH, portfolio_id, encoding="utf8")
-        if not portfolio:
-            pipeline.hset(cls.PORTFOLIO_HASH, portfolio_id, "1")
+        # 组合在监测池中的值为版本号, 每次加入委托时递增, 订单监控据此立即检测该组合
+        pipeline.hincrby(cls.PORTFOLIO_HASH, portfolio_id, 1)
 
         if task_id:
             task_info = {"task_id": str(task_id)}
@@ -66,5 +66,7 @@ class OrderTrade:
         else:
             for order in orders:
                 pipeline.hset(portfolio_id, order.order_id, order.status.value)
+        if settings.scheduler.order_monitor_channel:
+            pipeline.publish(settings.scheduler.order_monitor_channel, portfolio_id)
         if pipeline is not None:
             await pipeline.execute()
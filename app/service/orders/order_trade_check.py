@@ -1,18 +1,22 @@
 import asyncio
 import copy
+import time
 from collections import ChainMap
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 import ujson
+from cacheout import Cache
 from pymongo import UpdateOne
 from stralib import FastTdate
 
 from app import settings
 from app.core.errors import NotInTradingHour
 from app.crud.order import get_order_by_order_id, get_orders, update_order_by_bulk
-from app.crud.portfolio import get_portfolio_by_id, patch_portfolio_by_id
+from app.crud.portfolio import get_portfolio_list, patch_portfolio_by_id
 from app.crud.user import get_user, 创建消息
 from app.db.mongodb import db
+from app.db.redis import HASH_COMPARE_AND_DELETE_SCRIPT, SuperRedis
 from app.enums.order import 订单状态
 from app.enums.portfolio import 风险点状态
 from app.enums.user import 消息分类, 消息类型
@@ -20,9 +24,9 @@ from app.extentions import logger
 from app.global_var import G
 from app.models.base.portfolio import 风险点信息
 from app.models.rwmodel import PyObjectId
-from app.schema.portfolio import PortfolioInUpdate
+from app.schema.portfolio import PortfolioInResponse, PortfolioInUpdate
 from app.schema.user import UserMessageInCreate
-from app.service.orders.entrust_order import get_entrust_orders_recent_by_fund_id
+from app.service.orders.entrust_order import get_entrust_orders_recent_by_fund_ids
 from app.service.orders.order import update_from_trade_sys
 from app.service.orders.order_trade import OrderTrade
 from app.service.risks.detection import risk_detection
@@ -39,79 +43,59 @@ class CheckOrder(OrderTrade):
         logger.info("[委托订单监控] 开始")
         if not FastTdate.is_tdate():
             raise Exception("当天为非交易日")
-        while True:
-            logger.debug("[委托订单监控] 轮训任务开始")
-            # 交易时间刚过时, 未完成的订单不会立即被撤单, 所以需要等撤单完成后再更进行一次检测
-            try:
-                cls.check_trade_time()
-            except NotInTradingHour:
-                logger.error(f"[委托订单监控] 失败 非交易时间")
-                try:
-                    await cls.check_order()
-                except Exception as e:
-                    logger.error(f"[委托订单监控] 失败 {e}")
-                await G.entrust_redis.flush()
-                break
-            try:
-                await cls.check_order()
-            except Exception as e:
-                logger.error(f"[委托订单监控] 失败 {e}")
-            logger.debug("[委托订单监控] 轮训任务结束 等待下次轮询")
-            await asyncio.sleep(1)
+        monitor = OrderMonitor(
+            G.entrust_redis,
+            min_interval=settings.scheduler.order_monitor_min_interval,
+            max_interval=settings.scheduler.order_monitor_max_interval,
+            backoff=settings.scheduler.order_monitor_backoff,
+            portfolio_ttl=settings.scheduler.order_monitor_portfolio_ttl,
+            channel=settings.scheduler.order_monitor_channel or None,
+        )
+        await monitor.run()
         logger.info("[委托订单监控] 结束")
 
     @classmethod
     async def check_order(cls):
-        """检测订单"""
-        # 无组合则终止
-        redis = G.entrust_redis
-        portfolio_list = await redis.hgetall(cls.PORTFOLIO_HASH)
-        if not portfolio_list:
-            return
-        pipe = await redis.pipeline()
-        operations = []
-        for portfolio_id in portfolio_list:
-            # 组合不存在,删除redis相关信息
-            portfolio = await get_portfolio_by_id(db.client, PyObjectId(portfolio_id))
-            if not portfolio:
-                await redis.hdel(cls.PORTFOLIO_HASH, portfolio_id)
-                await redis.delete(portfolio_id)
-                continue
-            orders = await redis.hgetall(portfolio_id)
-            if "task" in orders.keys():
-                task = ujson.loads(orders.pop("task"))
-            else:
-                task = {}
+        """检测监测池中全部组合的订单"""
+        await OrderMonitor(G.entrust_redis).check(force=True)
 
-            latest_orders_in_trade_sys = await get_entrust_orders_recent_by_fund_id(
-                portfolio.fund_account[0].fundid
-            )
-            # 检查redis的订单是否已经处理完毕，如果处理完毕则删除redis内的无效数据并跳过这次循环
-            if await cls.check_order_is_empty(orders, task, latest_orders_in_trade_sys):
-                await redis.hdel(cls.PORTFOLIO_HASH, portfolio_id)
-                await redis.delete(portfolio_id)
-                continue
-            # 处理正常下单
-            if orders:
-                await cls.deal_orders(
-                    pipe, portfolio, orders, latest_orders_in_trade_sys
-                )
-            # 处理解决方案下单
-            if task:
-                await cls.deal_orders_by_task(
-                    pipe, portfolio, copy.deepcopy(task), latest_orders_in_trade_sys
-                )
-            # 变更本地数据库订单状态
-            changed_order_list = await cls.get_changed_orders(
-                orders, task, latest_orders_in_trade_sys
-            )
-            operations = await cls.update_order_in_db(
-                changed_order_list, latest_orders_in_trade_sys
+    @classmethod
+    async def check_portfolio(
+        cls, pipe, portfolio, orders, latest_orders_in_trade_sys, version: Optional[str] = None
+    ) -> Tuple[bool, List[UpdateOne]]:
+        """检测单个组合的订单, 返回订单状态是否有变化及本地数据库订单的更新操作
+
+        传入监测池中组合的版本号时, 仅当版本号未变化(期间没有新委托加入)才删除组合的监测信息
+        """
+        portfolio_id = str(portfolio.id)
+        if "task" in orders.keys():
+            task = ujson.loads(orders.pop("task"))
+        else:
+            task = {}
+        # 检查redis的订单是否已经处理完毕，如果处理完毕则删除redis内的无效数据并跳过这次循环
+        if await cls.check_order_is_empty(orders, task, latest_orders_in_trade_sys):
+            if version is None:
+                pipe.hdel(cls.PORTFOLIO_HASH, portfolio_id)
+                pipe.delete(portfolio_id)
+            else:
+                pipe.eval(HASH_COMPARE_AND_DELETE_SCRIPT, keys=[cls.PORTFOLIO_HASH, portfolio_id], args=[portfolio_id, version])
+            return False, []
+        # 处理正常下单
+        if orders:
+            await cls.deal_orders(pipe, portfolio, orders, latest_orders_in_trade_sys)
+        # 处理解决方案下单
+        if task:
+            await cls.deal_orders_by_task(
+                pipe, portfolio, copy.deepcopy(task), latest_orders_in_trade_sys
             )
-            operations.extend(operations)
-        if operations:
-            await update_order_by_bulk(db.client, operations, ordered=False)
-        await pipe.execute()
+        # 变更本地数据库订单状态
+        changed_order_list = await cls.get_changed_orders(
+            orders, task, latest_orders_in_trade_sys
+        )
+        operations = await cls.update_order_in_db(
+            changed_order_list, latest_orders_in_trade_sys
+        )
+        return bool(changed_order_list), operations
 
     @classmethod
     async def update_order_in_db(cls, order_list, today_orders):
@@ -290,6 +274,181 @@ class CheckOrder(OrderTrade):
         task_orders = task.get("orders", {}) if task else {}
         order_dict = ChainMap(orders, task_orders)
         order_list = [
-            k for k, v in order_dict.items() if today_orders[k]["order_status"] != v
+            k for k, v in order_dict.items() if k in today_orders and today_orders[k]["order_status"] != v
         ]
         return order_list
+
+
+class OrderMonitor:
+    """委托订单监控.
+
+    - 每个组合独立计算轮询间隔: 订单状态有变化时恢复为最小间隔, 无变化时按倍数退避至最大间隔
+    - 组合有新委托加入监测池时(监测池中组合的版本号变化)立即检测, 并重新加载组合信息
+    - 同一轮到期的组合一次批量查询交易系统, 组合信息缓存在内存中
+    - 配置通知频道时订阅订单状态变更通知(消息为组合id或资金账户id), 收到通知的组合立即检测;
+      订阅连接断开时重新订阅, 并立即检测全部组合以补上断开期间遗漏的通知
+    """
+
+    def __init__(
+        self,
+        redis: SuperRedis,
+        min_interval: float = 1,
+        max_interval: float = 30,
+        backoff: float = 2,
+        portfolio_ttl: float = 60,
+        channel: Optional[str] = None,
+    ):
+        self.redis = redis
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.channel = channel
+        self._portfolios = Cache(maxsize=0, ttl=portfolio_ttl)
+        self._fund_portfolio: Dict[str, str] = {}
+        self._intervals: Dict[str, float] = {}
+        self._next_check: Dict[str, float] = {}
+        self._versions: Dict[str, str] = {}
+        self._wakeup = asyncio.Event()
+
+    def is_due(self, portfolio_id: str, now: float) -> bool:
+        return self._next_check.get(portfolio_id, 0) <= now
+
+    def schedule(self, portfolio_id: str, changed: bool, now: float) -> None:
+        """订单状态有变化时恢复最小间隔, 否则退避."""
+        if changed or portfolio_id not in self._intervals:
+            interval = self.min_interval
+        else:
+            interval = min(self._intervals[portfolio_id] * self.backoff, self.max_interval)
+        self._intervals[portfolio_id] = interval
+        self._next_check[portfolio_id] = now + interval
+
+    def notify(self, key: str) -> None:
+        """收到订单状态变更通知, 下一轮立即检测该组合."""
+        portfolio_id = self._fund_portfolio.get(key, key)
+        self._intervals.pop(portfolio_id, None)
+        self._next_check.pop(portfolio_id, None)
+        self._wakeup.set()
+
+    def forget(self, portfolio_id: str) -> None:
+        self._intervals.pop(portfolio_id, None)
+        self._next_check.pop(portfolio_id, None)
+        self._versions.pop(portfolio_id, None)
+        self._portfolios.delete(portfolio_id)
+
+    async def get_portfolios(self, portfolio_ids: List[str]) -> Dict[str, PortfolioInResponse]:
+        """获取组合信息, 未缓存的组合一次查询数据库."""
+        portfolios = {pid: self._portfolios.get(pid) for pid in portfolio_ids}
+        missing = [PyObjectId(pid) for pid, portfolio in portfolios.items() if portfolio is None]
+        if missing:
+            for portfolio in await get_portfolio_list(db.client, {"_id": {"$in": missing}}):
+                portfolio_id = str(portfolio.id)
+                portfolios[portfolio_id] = portfolio
+                self._portfolios.set(portfolio_id, portfolio)
+                self._fund_portfolio[portfolio.fund_account[0].fundid] = portfolio_id
+        return portfolios
+
+    async def check(self, force: bool = False) -> None:
+        """检测到期组合的订单, `force`为True时检测全部组合."""
+        versions = await self.redis.hgetall(CheckOrder.PORTFOLIO_HASH, {})
+        portfolio_ids = list(versions)
+        for portfolio_id in set(self._next_check) - set(portfolio_ids):
+            self.forget(portfolio_id)
+        for portfolio_id, version in versions.items():
+            if self._versions.get(portfolio_id) != version:
+                self._versions[portfolio_id] = version
+                # 新委托可能来自组合信息(风险点等)变更后的调仓, 不再使用缓存的组合信息
+                self._portfolios.delete(portfolio_id)
+                self.notify(portfolio_id)
+        now = time.monotonic()
+        due = [pid for pid in portfolio_ids if force or self.is_due(pid, now)]
+        if not due:
+            return
+        portfolios = await self.get_portfolios(due)
+        pipe = await self.redis.pipeline()
+        # 组合不存在,删除redis相关信息
+        for portfolio_id in [pid for pid, portfolio in portfolios.items() if portfolio is None]:
+            pipe.hdel(CheckOrder.PORTFOLIO_HASH, portfolio_id)
+            pipe.delete(portfolio_id)
+            self.forget(portfolio_id)
+            portfolios.pop(portfolio_id)
+        if not portfolios:
+            await pipe.execute()
+            return
+        order_list = await self.redis.hgetall_many(list(portfolios), {})
+        latest_orders = await get_entrust_orders_recent_by_fund_ids(
+            [portfolio.fund_account[0].fundid for portfolio in portfolios.values()]
+        )
+        operations = []
+        for (portfolio_id, portfolio), orders in zip(portfolios.items(), order_list):
+            changed, portfolio_operations = await CheckOrder.check_portfolio(
+                pipe, portfolio, orders, latest_orders.get(portfolio.fund_account[0].fundid, {}), versions[portfolio_id]
+            )
+            operations.extend(portfolio_operations)
+            if changed:
+                # 订单状态变化后风险点等组合信息可能已更新
+                self._portfolios.delete(portfolio_id)
+            self.schedule(portfolio_id, changed, now)
+        if operations:
+            await update_order_by_bulk(db.client, operations, ordered=False)
+        await pipe.execute()
+
+    async def wait(self) -> None:
+        """等待下一轮检测, 收到通知时提前结束等待."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), self.min_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    def notify_all(self) -> None:
+        """下一轮立即检测全部组合."""
+        self._intervals.clear()
+        self._next_check.clear()
+        self._wakeup.set()
+
+    async def listen(self) -> None:
+        """订阅订单状态变更通知, 连接断开时记录日志并重新订阅."""
+        try:
+            while True:
+                try:
+                    channel = await self.redis.subscribe(self.channel)
+                    while await channel.wait_message():
+                        self.notify(await channel.get(encoding="utf8"))
+                    logger.warning("[委托订单监控] 订阅连接已断开, 重新订阅")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"[委托订单监控] 订阅通知失败 {e}, 重新订阅")
+                self.notify_all()
+                await asyncio.sleep(self.min_interval)
+        finally:
+            try:
+                await self.redis.unsubscribe(self.channel)
+            except Exception as e:
+                logger.warning(f"[委托订单监控] 取消订阅失败 {e}")
+
+    async def run(self) -> None:
+        listener = asyncio.ensure_future(self.listen()) if self.channel else None
+        try:
+            while True:
+                logger.debug("[委托订单监控] 轮训任务开始")
+                # 交易时间刚过时, 未完成的订单不会立即被撤单, 所以需要等撤单完成后再更进行一次检测
+                try:
+                    CheckOrder.check_trade_time()
+                except NotInTradingHour:
+                    logger.error(f"[委托订单监控] 失败 非交易时间")
+                    try:
+                        await self.check(force=True)
+                    except Exception as e:
+                        logger.error(f"[委托订单监控] 失败 {e}")
+                    await self.redis.flush()
+                    break
+                try:
+                    await self.check()
+                except Exception as e:
+                    logger.error(f"[委托订单监控] 失败 {e}")
+                logger.debug("[委托订单监控] 轮训任务结束 等待下次轮询")
+                await self.wait()
+        finally:
+            if listener is not None:
+                listener.cancel()
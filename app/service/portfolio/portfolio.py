@@ -1,4 +1,3 @@
-from calendar import monthrange
 from datetime import date, datetime, timedelta
 from math import ceil
 from typing import Dict, List, Optional, Union
@@ -20,7 +19,10 @@ from app.crud.equipment import 查询某个装备的详情
 from app.crud.fund_account import create_fund_account, update_fund_account_by_id
 from app.crud.portfolio import create_portfolio, get_portfolio_by_id
 from app.crud.robot import 查询某机器人信息
-from app.crud.time_series_data import get_portfolio_assessment_time_series_data
+from app.crud.time_series_data import (
+    get_portfolio_assessment_time_series_data,
+    get_portfolio_yield_time_series_data,
+)
 from app.enums.common import DateType
 from app.enums.portfolio import PortfolioCategory, ReturnYieldCalculationMethod, 组合状态
 from app.extentions import logger
@@ -35,7 +37,7 @@ from app.schema.portfolio import (
     PortfolioInResponse,
 )
 from app.schema.user import User
-from app.service.datetime import get_early_morning, str_of_today
+from app.service.datetime import get_date_by_type, get_early_morning, str_of_today
 from app.service.fund_account.converter import db_asset2frontend, db_position2frontend
 from app.service.fund_account.fund_account import (
     calculate_fund_asset,
@@ -46,6 +48,7 @@ from app.service.fund_account.fund_account import (
     get_net_deposit_flow,
     liquidation_fund_asset,
 )
+from app.service.portfolio.snapshot import get_portfolio_snapshot
 from app.service.time_series_data.time_series_data import get_assets_time_series_data
 from app.utils.datetime import date2datetime, date2tdate
 
@@ -97,47 +100,34 @@ async def get_portfolio_profit_rate(
     return rv
 
 
-def get_date_by_type(date_type: DateType, end_date=None):
-    """根据date_type获取日期"""
-    end_date = end_date or get_early_morning()
-    if date_type == DateType.WEEK:
-        start_date = end_date - timedelta(weeks=1)
-    elif date_type == DateType.MONTH:
-        _, month_days = monthrange(end_date.year, end_date.month)
-        start_date = end_date - timedelta(days=month_days)
-    elif date_type == DateType.DAY:
-        start_date = end_date - timedelta(days=1)
-    else:
-        start_date = end_date
-    if not FastTdate.is_tdate(start_date):
-        start_date = FastTdate.last_tdate(start_date)
-    return start_date
-
-
 async def get_portfolio_yield_trend(
     conn: AsyncIOMotorClient,
     portfolio: Portfolio,
     start_date: datetime,
     end_date: datetime,
+    max_points: Optional[int] = None,
 ) -> List[Dict[str, Union[float, str]]]:
-    """获取组合收益率趋势."""
-    current_date = start_date
+    """获取组合收益率趋势, 指定`max_points`时对超出的数据等间隔抽样(保留首尾两点)."""
+    assessment_list = await get_portfolio_yield_time_series_data(
+        conn, portfolio.id, start_date.date(), end_date.date()
+    )
     data_list = []
-    while True:
-        loop_date = FastTdate.next_tdate(current_date)
-        if current_date > end_date:
-            break
-        assessment = await get_portfolio_assessment_time_series_data(
-            conn, portfolio=portfolio.id, tdate=current_date.date()
-        )
-        if assessment:
-            tmp_dict = {
-                "timestamp": current_date.strftime("%Y-%m-%d"),
-                "profit_rate": assessment[0].account_yield,
-            }
-            data_list.append(tmp_dict)
-        current_date = loop_date
-    return data_list
+    for assessment in assessment_list:
+        timestamp = assessment.tdate.strftime("%Y-%m-%d")
+        if data_list and data_list[-1]["timestamp"] == timestamp:
+            continue
+        data_list.append({"timestamp": timestamp, "profit_rate": assessment.account_yield})
+    return downsample(data_list, max_points)
+
+
+def downsample(data_list: list, max_points: Optional[int] = None) -> list:
+    """等间隔抽样, 保留首尾两点."""
+    if not max_points or len(data_list) <= max_points:
+        return data_list
+    if max_points < 2:
+        return data_list[-1:]
+    step = (len(data_list) - 1) / (max_points - 1)
+    return [data_list[round(i * step)] for i in range(max_points)]
 
 
 async def get_yield_trend(
@@ -145,6 +135,7 @@ async def get_yield_trend(
     portfolio_id: PyObjectId,
     start_date: Optional[datetime],
     end_date: Optional[datetime],
+    max_points: Optional[int] = None,
 ) -> Dict[str, Union[PortfolioInResponse, List[Dict[str, Union[float, str]]]]]:
     """收益率趋势"""
     portfolio = await get_portfolio_by_id(conn, id=portfolio_id)
@@ -156,7 +147,7 @@ async def get_yield_trend(
         end_date = end_date - timedelta(days=1)
     start_date = date2tdate(start_date)
     end_date = date2tdate(end_date)
-    data_list = await get_portfolio_yield_trend(conn, portfolio, start_date, end_date)
+    data_list = await get_portfolio_yield_trend(conn, portfolio, start_date, end_date, max_points)
     data = {"portfolio": portfolio, "data_list": data_list}
     return data
 
@@ -224,7 +215,7 @@ class PortfolioTools:
         portfolio_id: PyObjectId,
         calculation_method: ReturnYieldCalculationMethod,
     ) -> PortfolioBasicRunDataInResponse:
-        """计算组合基本运行数据."""
+        """组合基本运行数据, 按SWR计算的收益率及评估数据取自组合快照."""
         portfolio = await get_portfolio_by_id(conn, id=portfolio_id)
         if not portfolio:
             raise HTTPException(404, detail=f"未找到组合`{portfolio_id}`.")
@@ -234,6 +225,41 @@ class PortfolioTools:
             "rank": portfolio.rank,
             "over_percent": portfolio.over_percent,
         }
+        if calculation_method == ReturnYieldCalculationMethod.SWR:
+            snapshot = await get_portfolio_snapshot(conn, portfolio)
+            result["trade_date"] = snapshot.tdate.date()
+            result["profit_rate"] = snapshot.profit_rate
+            result["daily_profit_rate"] = snapshot.daily_profit_rate
+            result["weekly_profit_rate"] = snapshot.weekly_profit_rate
+            result["monthly_profit_rate"] = snapshot.monthly_profit_rate
+            annual_rate = snapshot.annual_rate
+        else:
+            annual_rate = await cls.calculate_run_data(conn, portfolio, calculation_method, result)
+        result["expected_profit_rate"] = portfolio.config.expected_return
+        if annual_rate > 0:
+            days = ceil(portfolio.config.expected_return * 365 / annual_rate)
+            try:
+                expected_reach_date = datetime.strptime(
+                    shift_trade_day(str_of_today(), days), "%Y%m%d"
+                ).date()
+            except NeedUpdateError:
+                expected_reach_date = (
+                    get_early_morning() + timedelta(days=days)
+                ).date()
+        else:
+            expected_reach_date = None
+        result["expected_reach_date"] = expected_reach_date
+        return PortfolioBasicRunDataInResponse(**result)
+
+    @classmethod
+    async def calculate_run_data(
+        cls,
+        conn: AsyncIOMotorClient,
+        portfolio: Portfolio,
+        calculation_method: ReturnYieldCalculationMethod,
+        result: dict,
+    ) -> float:
+        """计算组合各区间收益率并写入`result`, 返回最新年化收益率."""
         start_date = portfolio.import_date
         end_date = get_early_morning()
         if portfolio.category == PortfolioCategory.ManualImport:
@@ -277,7 +303,6 @@ class PortfolioTools:
             result["weekly_profit_rate"] = 0
             result["monthly_profit_rate"] = 0
 
-        result["expected_profit_rate"] = portfolio.config.expected_return
         fund_account = await get_fund_asset(
             conn,
             fund_id=portfolio.fund_account[0].fundid,
@@ -293,23 +318,8 @@ class PortfolioTools:
         )
         # 若没有查询到时点评估数据，则组合为今日刚创建的组合，annual_rate为0
         if not assessment:
-            annual_rate = 0
-        else:
-            annual_rate = assessment[0].annual_rate
-        if annual_rate > 0:
-            days = ceil(portfolio.config.expected_return * 365 / annual_rate)
-            try:
-                expected_reach_date = datetime.strptime(
-                    shift_trade_day(str_of_today(), days), "%Y%m%d"
-                ).date()
-            except NeedUpdateError:
-                expected_reach_date = (
-                    get_early_morning() + timedelta(days=days)
-                ).date()
-        else:
-            expected_reach_date = None
-        result["expected_reach_date"] = expected_reach_date
-        return PortfolioBasicRunDataInResponse(**result)
+            return 0
+        return assessment[0].annual_rate
 
     @classmethod
     async def get_position(cls, conn: AsyncIOMotorClient, portfolio_id: PyObjectId):
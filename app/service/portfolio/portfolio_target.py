@@ -1,88 +1,20 @@
-from datetime import date, timedelta
-from decimal import Decimal
 from typing import List, Union
 
 from motor.motor_asyncio import AsyncIOMotorClient
-from stralib import FastTdate
 
+from app.core.auth_cache import invalidate_user_cache
 from app.crud.base import (
     get_portfolio_collection,
     get_portfolio_target_conf_collection,
     get_user_collection,
 )
-from app.crud.time_series_data import (
-    get_portfolio_assessment_time_series_data,
-)
-from app.enums.portfolio import PortfolioCategory, ReturnYieldCalculationMethod, 组合状态
+from app.enums.portfolio import 组合状态
 from app.models.base.user import 指标配置
-from app.models.fund_account import FundAccountInDB
 from app.models.portfolio import Portfolio
 from app.models.target_config import PortfolioTargetConf
-from app.models.time_series_data import (
-    PortfolioAssessmentTimeSeriesDataInDB,
-)
 from app.schema.user import TargetDataInResponse, User, UserPortfolioTargetInResponse
-from app.service.datetime import get_early_morning
-from app.service.fund_account.fund_account import get_fund_asset
-from app.service.portfolio.portfolio import get_portfolio_profit_rate
-from app.utils.datetime import date2tdate, date2datetime
-
-
-async def get_code_data(
-    conn: AsyncIOMotorClient,
-    code: str,
-    portfolio: Portfolio,
-    assessment: PortfolioAssessmentTimeSeriesDataInDB,
-    fund_asset: FundAccountInDB,
-    start_date: date,
-    end_date: date,
-) -> float:
-    """获取用户组合指标数据."""
-    rv = 0.0
-    profit_rate = await get_portfolio_profit_rate(
-        conn, portfolio, start_date, end_date, ReturnYieldCalculationMethod.SWR
-    )
-    profit = fund_asset.assets.to_decimal() * Decimal(profit_rate)
-    profit_rate_day = await get_portfolio_profit_rate(
-        conn,
-        portfolio,
-        FastTdate.last_tdate(end_date),
-        end_date,
-        ReturnYieldCalculationMethod.SWR,
-    )
-    profit_day = fund_asset.assets.to_decimal() * Decimal(profit_rate_day)
-    if code == "10001":
-        rv = profit_day
-    elif code == "10002":
-        rv = fund_asset.assets.to_decimal()
-    elif code == "10003":
-        rv = fund_asset.securities.to_decimal()
-    elif code == "10004":
-        rv = fund_asset.cash.to_decimal()
-    elif code == "10005":
-        rv = fund_asset.cash.to_decimal()
-    elif code == "10006":
-        rv = Decimal(profit_rate_day)
-    elif code == "10007":
-        rv = Decimal(profit_rate)
-    elif code == "10008":
-        rv = profit
-    else:
-        if code == "10009":
-            rv = assessment.profit_loss_ratio
-        elif code == "10010":
-            rv = assessment.winning_rate
-        elif code == "10011":
-            rv = assessment.annual_rate
-        elif code == "10012":
-            rv = assessment.max_drawdown
-        elif code == "10013":
-            rv = assessment.sharpe_ratio
-        elif code == "10014":
-            rv = assessment.mktval_volatility
-    if isinstance(rv, Decimal):
-        rv = float(round(rv, 4))
-    return rv
+from app.service.portfolio.snapshot import PortfolioSnapshotEngine, get_portfolio_snapshot
+from app.service.portfolio.target_engine import get_target_values
 
 
 class PortfolioTargetTools:
@@ -103,6 +35,7 @@ class PortfolioTargetTools:
                 {"username": user.username},
                 {"$set": {"target_config.portfolio_target": portfolio_target}},
             )
+            invalidate_user_cache(user.username)
         return user.target_config.portfolio_target
 
     @classmethod
@@ -112,51 +45,12 @@ class PortfolioTargetTools:
         code_or_list: Union[List[str], str],
         portfolio: Portfolio,
     ) -> Union[List[float], float]:
-        """获取用户组合指标数据"""
-        start_date = portfolio.import_date
-        end_date = get_early_morning()
-        if portfolio.category == PortfolioCategory.ManualImport:
-            start_date = start_date - timedelta(days=1)
-            end_date = end_date - timedelta(days=1)
-        start_date = date2tdate(start_date).date()
-        end_date = date2tdate(end_date).date()
-        fund_account = portfolio.fund_account[0]
-        fund_asset = await get_fund_asset(
-            conn, fund_account.fundid, portfolio.category, fund_account.currency
-        )
-        assessment = await get_portfolio_assessment_time_series_data(
-            conn, portfolio=portfolio.id
-        )
-        if not assessment:
-            assessment = [PortfolioAssessmentTimeSeriesDataInDB(
-                portfolio=portfolio.id,
-                tdate=date2datetime(end_date),
-            )]
-        if isinstance(code_or_list, list):
-            rv = []
-            for code in code_or_list:
-                rv.append(
-                    await get_code_data(
-                        conn,
-                        code,
-                        portfolio,
-                        assessment[-1],
-                        fund_asset,
-                        start_date,
-                        end_date,
-                    )
-                )
-        else:
-            rv = await get_code_data(
-                conn,
-                code_or_list,
-                portfolio,
-                assessment[-1],
-                fund_asset,
-                start_date,
-                end_date,
-            )
-        return rv
+        """获取用户组合指标数据, 取自组合快照"""
+        code_list = code_or_list if isinstance(code_or_list, list) else [code_or_list]
+        snapshot = await get_portfolio_snapshot(conn, portfolio)
+        values = get_target_values(snapshot, snapshot, snapshot.profit_rate, snapshot.daily_profit_rate)
+        rv = [values.get(code, 0.0) for code in code_list]
+        return rv if isinstance(code_or_list, list) else rv[0]
 
     @classmethod
     async def _get_data(
@@ -164,25 +58,27 @@ class PortfolioTargetTools:
     ):
         """获取数据"""
         configs = await cls.get_config(conn, user)
-        return [
-            {
-                "name": config.name,
-                "value": await cls.get_row_data(conn, config.code, portfolio),
-            }
-            for config in configs
-        ]
+        values = await cls.get_row_data(conn, [config.code for config in configs], portfolio)
+        return [{"name": config.name, "value": value} for config, value in zip(configs, values)]
 
     @classmethod
     async def get_data_list(
         cls, conn: AsyncIOMotorClient, portfolio_list: List[Portfolio], user: User
     ) -> List[UserPortfolioTargetInResponse]:
-        """获取数据列表"""
+        """获取数据列表, 全部组合的快照一次读取"""
+        configs = await cls.get_config(conn, user)
+        snapshots = await PortfolioSnapshotEngine(conn).get_many(portfolio_list)
+        data = {}
+        for portfolio in portfolio_list:
+            snapshot = snapshots[portfolio.id]
+            values = get_target_values(snapshot, snapshot, snapshot.profit_rate, snapshot.daily_profit_rate)
+            data[portfolio.id] = [values.get(config.code, 0.0) for config in configs]
         return [
             UserPortfolioTargetInResponse(
                 **{
                     "portfolio": portfolio,
                     "user": user,
-                    "data": await cls._get_data(conn, portfolio, user),
+                    "data": [{"name": config.name, "value": value} for config, value in zip(configs, data[portfolio.id])],
                 }
             )
             for portfolio in portfolio_list
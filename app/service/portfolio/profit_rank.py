@@ -0,0 +1,164 @@
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from stralib import FastTdate
+
+from app.core.errors import EntityDoesNotExist
+from app.crud.base import get_portfolio_collection
+from app.db.redis import SuperRedis
+from app.enums.portfolio import PortfolioCategory, 组合状态
+from app.extentions import logger
+from app.models.portfolio import Portfolio
+from app.service.datetime import get_early_morning
+from app.service.fund_account.fund_account import get_net_deposit_flow
+from app.service.time_series_data.time_series_data import get_assets_time_series_data
+from app.utils.datetime import date2tdate
+
+PROFIT_RANK_KEY = "portfolio_profit_rank"
+
+
+class ProfitAggregate(NamedTuple):
+    """组合截至上一交易日的累计数据."""
+
+    start_date: datetime
+    end_date: datetime
+    expire_at: float
+    base_assets: Optional[float]
+    last_assets: Optional[float]
+    net_deposit: float
+
+
+class ProfitRankEngine:
+    """组合总收益增量排行.
+
+    - 缓存各组合截至上一交易日的累计数据(期初资产、期末资产、累计净入金), 每轮只读取最新交易日的资产和净入金
+    - 收益率写入redis有序集合, 由有序集合得出排名和超越比例
+    - 仅对排名、超越比例或收益率发生变化的组合生成更新
+    """
+
+    def __init__(
+        self,
+        conn: AsyncIOMotorClient,
+        redis: SuperRedis,
+        aggregate_ttl: float = 1800,
+        tolerance: float = 1e-6,
+    ):
+        self.conn = conn
+        self.redis = redis
+        self.aggregate_ttl = aggregate_ttl
+        self.tolerance = tolerance
+        self._aggregates: Dict[str, ProfitAggregate] = {}
+
+    @staticmethod
+    def get_date_range(portfolio: Portfolio) -> Tuple[datetime, datetime]:
+        """组合收益计算区间."""
+        start_date = portfolio.import_date
+        end_date = get_early_morning()
+        if portfolio.category == PortfolioCategory.ManualImport:
+            start_date = start_date - timedelta(days=1)
+            end_date = end_date - timedelta(days=1)
+        return date2tdate(start_date), date2tdate(end_date)
+
+    async def get_aggregate(self, portfolio: Portfolio, start_date: datetime, end_date: datetime) -> ProfitAggregate:
+        """获取组合截至上一交易日的累计数据, 计算区间变化或缓存过期时重新查询."""
+        aggregate = self._aggregates.get(str(portfolio.id))
+        if (
+            aggregate is not None
+            and aggregate.start_date == start_date
+            and aggregate.end_date == end_date
+            and aggregate.expire_at > time.monotonic()
+        ):
+            return aggregate
+        base_assets = last_assets = None
+        net_deposit = 0.0
+        last_tdate = FastTdate.last_tdate(end_date)
+        if start_date <= last_tdate:
+            assets = await get_assets_time_series_data(self.conn, portfolio, start_date, last_tdate)
+            deposits = await get_net_deposit_flow(self.conn, portfolio, start_date, last_tdate, include_capital=False)
+            if not assets.empty:
+                base_assets, last_assets = float(assets[0]), float(assets[-1])
+            net_deposit = float(deposits.sum())
+        aggregate = ProfitAggregate(
+            start_date=start_date,
+            end_date=end_date,
+            expire_at=time.monotonic() + self.aggregate_ttl,
+            base_assets=base_assets,
+            last_assets=last_assets,
+            net_deposit=net_deposit,
+        )
+        self._aggregates[str(portfolio.id)] = aggregate
+        return aggregate
+
+    async def calculate_profit_rate(self, portfolio: Portfolio) -> float:
+        """计算组合总收益率, 结果与`calculation_simple`在完整区间上的计算一致."""
+        if portfolio.create_date.date() == get_early_morning().date():
+            return 0
+        start_date, end_date = self.get_date_range(portfolio)
+        aggregate = await self.get_aggregate(portfolio, start_date, end_date)
+        base_assets, last_assets, net_deposit = aggregate.base_assets, aggregate.last_assets, aggregate.net_deposit
+        if start_date <= end_date:
+            assets = await get_assets_time_series_data(self.conn, portfolio, end_date, end_date)
+            deposits = await get_net_deposit_flow(self.conn, portfolio, end_date, end_date, include_capital=False)
+            if not assets.empty:
+                last_assets = float(assets[-1])
+                if base_assets is None:
+                    base_assets = float(assets[0])
+            net_deposit += float(deposits.sum())
+        if not base_assets or last_assets is None:
+            return 0
+        profit = last_assets - base_assets - net_deposit
+        return profit / base_assets if profit else 0
+
+    async def rank(self, profit_rates: Dict[str, float]) -> List[Tuple[str, float]]:
+        """将收益率写入有序集合, 移除已不在运行中的组合, 返回按收益率降序排列的组合."""
+        if profit_rates:
+            pairs = [x for portfolio_id, rate in profit_rates.items() for x in (rate, portfolio_id)]
+            await self.redis.zadd(PROFIT_RANK_KEY, *pairs)
+        ranking = await self.redis.zrevrange(PROFIT_RANK_KEY, withscores=True)
+        stale = [portfolio_id for portfolio_id, _ in ranking if portfolio_id not in profit_rates]
+        if stale:
+            await self.redis.zrem(PROFIT_RANK_KEY, *stale)
+        return [(portfolio_id, score) for portfolio_id, score in ranking if portfolio_id in profit_rates]
+
+    def is_changed(self, portfolio: Portfolio, profit_rate: float, rank: int, over_percent: float) -> bool:
+        """排名、超过百分比或收益率有变化时返回True, 组合中尚无数据(None)视为有变化."""
+        if portfolio.over_percent is None or portfolio.profit_rate is None:
+            return True
+        return (
+            portfolio.rank != rank
+            or not math.isclose(portfolio.over_percent, over_percent, abs_tol=self.tolerance)
+            or not math.isclose(portfolio.profit_rate, profit_rate, abs_tol=self.tolerance)
+        )
+
+    async def run_once(self) -> int:
+        """计算一轮排行并写入有变化的组合, 返回更新的组合数."""
+        portfolios, profit_rates = {}, {}
+        async for row in get_portfolio_collection(self.conn).find({"status": 组合状态.running}):
+            portfolio = Portfolio(**row)
+            try:
+                rate = await self.calculate_profit_rate(portfolio)
+            except EntityDoesNotExist:
+                logger.warning(f"组合`{portfolio.id}`资金账户不存在, 已跳过.")
+                continue
+            portfolios[str(portfolio.id)] = portfolio
+            profit_rates[str(portfolio.id)] = rate
+        for portfolio_id in set(self._aggregates) - set(portfolios):
+            del self._aggregates[portfolio_id]
+        ranking = await self.rank(profit_rates)
+        update_list = []
+        for index, (portfolio_id, profit_rate) in enumerate(ranking):
+            portfolio, rank, over_percent = portfolios[portfolio_id], index + 1, 1 - index / len(ranking)
+            if self.is_changed(portfolio, profit_rate, rank, over_percent):
+                update_list.append(
+                    UpdateOne(
+                        {"_id": portfolio.id},
+                        {"$set": {"profit_rate": profit_rate, "rank": rank, "over_percent": over_percent}},
+                    )
+                )
+        if update_list:
+            await get_portfolio_collection(self.conn).bulk_write(update_list)
+        return len(update_list)
@@ -0,0 +1,266 @@
+import asyncio
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from stralib import FastTdate
+
+from app import settings
+from app.core.errors import EntityDoesNotExist
+from app.crud.portfolio import (
+    bulk_write_portfolio_snapshot,
+    delete_portfolio_snapshot,
+    get_portfolio_by_fund_id,
+    get_portfolio_snapshot_from_db,
+    get_portfolio_snapshots_from_db,
+)
+from app.crud.time_series_data import get_latest_portfolio_assessment_time_series_data
+from app.enums.common import DateType
+from app.extentions import logger
+from app.models.fund_account import FundAccountInDB
+from app.models.portfolio import Portfolio, PortfolioSnapshotInDB
+from app.models.rwmodel import PyObjectId
+from app.models.time_series_data import PortfolioAssessmentTimeSeriesDataInDB
+from app.service.fund_account.fund_account import calculation_simple_ability, get_fund_asset
+from app.service.datetime import get_date_by_type
+from app.service.portfolio.target_engine import (
+    PortfolioTargetEngine,
+    calculate_swr,
+    get_target_date_range,
+    slice_series,
+    to_date,
+)
+from app.utils.datetime import date2datetime
+
+ASSESSMENT_FIELDS = ("profit_loss_ratio", "winning_rate", "annual_rate", "max_drawdown", "sharpe_ratio", "mktval_volatility")
+
+
+def get_snapshot_windows(portfolio: Portfolio) -> Dict[str, Tuple[date, date]]:
+    """快照各收益率的计算区间, 与`PortfolioTools.basic_run_data`一致."""
+    start_date, end_date = get_target_date_range(portfolio)
+    return {
+        "profit_rate": (start_date, end_date),
+        "daily_profit_rate": (to_date(FastTdate.last_tdate(end_date)), end_date),
+        "weekly_profit_rate": (get_date_by_type(DateType.WEEK).date(), end_date),
+        "monthly_profit_rate": (get_date_by_type(DateType.MONTH).date(), end_date),
+    }
+
+
+def is_current_snapshot(snapshot: PortfolioSnapshotInDB, portfolio: Portfolio) -> bool:
+    """快照的计算区间与当前的计算区间一致时可直接使用."""
+    windows = get_snapshot_windows(portfolio)
+    start_date, end_date = windows["profit_rate"]
+    return (
+        snapshot.tdate == date2datetime(end_date)
+        and snapshot.start_date == date2datetime(start_date)
+        and snapshot.weekly_start_date == date2datetime(windows["weekly_profit_rate"][0])
+        and snapshot.monthly_start_date == date2datetime(windows["monthly_profit_rate"][0])
+    )
+
+
+def calculate_base_swr(assets: pd.Series, net_deposit: pd.Series, start_date: date, end_date: date) -> Optional[float]:
+    """区间收益率中截至`end_date`之前的部分, 区间内`end_date`之前没有资产数据时返回None.
+
+    区间收益率 = (1 + 该收益率) * (1 + `end_date`当日收益率) - 1
+    """
+    history = slice_series(assets, start_date, end_date)
+    history = history[history.index < end_date]
+    if history.empty:
+        return None
+    net_deposit = slice_series(net_deposit, to_date(FastTdate.next_tdate(start_date)), end_date)
+    return calculation_simple_ability(net_deposit[net_deposit.index < end_date], history)
+
+
+def patch_snapshot(
+    snapshot: PortfolioSnapshotInDB, fund_asset: FundAccountInDB, net_deposit: Optional[float] = None
+) -> Dict[str, Any]:
+    """按实时资产及当日净入金计算当日快照的收益率及资产, 返回需更新的字段, 未指定`net_deposit`时使用快照中的当日净入金."""
+    assets = float(fund_asset.securities.to_decimal() + fund_asset.cash.to_decimal())
+    base_assets = snapshot.base_assets
+    net_deposit = snapshot.base_net_deposit if net_deposit is None else net_deposit
+    denominator = base_assets + max(net_deposit, 0)
+    profit_rate_day = (assets - base_assets - net_deposit) / denominator if denominator else 0
+    update = {
+        "assets": fund_asset.assets,
+        "securities": fund_asset.securities,
+        "cash": fund_asset.cash,
+        "base_net_deposit": net_deposit,
+        "updated_at": datetime.utcnow(),
+    }
+    for field, base_profit_rate in snapshot.base_profit_rates.items():
+        update[field] = (1 + base_profit_rate) * (1 + profit_rate_day) - 1
+    return update
+
+
+class PortfolioSnapshotEngine(PortfolioTargetEngine):
+    """组合运行数据快照.
+
+    - 快照包含总、日、周、月收益率(SWR)、最新资产及最新评估数据, 接口读取快照只需一次查询
+    - 多个组合的时点数据批量加载, 各区间收益率由同一份序列计算, 快照批量写入
+    - 当日快照另记录各区间截至上一交易日的收益率, 盘中只按实时资产更新, 不再重新加载时点数据
+    """
+
+    @staticmethod
+    def build_snapshot(
+        portfolio: Portfolio,
+        fund_asset: FundAccountInDB,
+        assets: pd.Series,
+        net_deposit: pd.Series,
+        assessment: Optional[PortfolioAssessmentTimeSeriesDataInDB],
+    ) -> PortfolioSnapshotInDB:
+        windows = get_snapshot_windows(portfolio)
+        start_date, end_date = windows["profit_rate"]
+        snapshot = PortfolioSnapshotInDB(
+            portfolio=portfolio.id,
+            tdate=date2datetime(end_date),
+            start_date=date2datetime(start_date),
+            weekly_start_date=date2datetime(windows["weekly_profit_rate"][0]),
+            monthly_start_date=date2datetime(windows["monthly_profit_rate"][0]),
+            assets=fund_asset.assets,
+            securities=fund_asset.securities,
+            cash=fund_asset.cash,
+            **({field: getattr(assessment, field) for field in ASSESSMENT_FIELDS} if assessment else {}),
+        )
+        today = datetime.today().date()
+        # 今日创建的组合收益率为0
+        if portfolio.create_date.date() == today:
+            return snapshot
+        if end_date == today:
+            history = assets[assets.index < end_date]
+            assets = assets.copy()
+            assets[end_date] = float(fund_asset.securities.to_decimal() + fund_asset.cash.to_decimal())
+            if not history.empty:
+                snapshot.base_assets = float(history.iloc[-1])
+                snapshot.base_net_deposit = float(net_deposit[net_deposit.index == end_date].sum())
+        base_profit_rates = {}
+        for field, (start, end) in windows.items():
+            setattr(snapshot, field, calculate_swr(assets, net_deposit, start, end))
+            if snapshot.base_assets is not None and start < end:
+                base_profit_rate = calculate_base_swr(assets, net_deposit, start, end)
+                if base_profit_rate is not None:
+                    base_profit_rates[field] = base_profit_rate
+        snapshot.base_profit_rates = base_profit_rates
+        return snapshot
+
+    async def build(self, portfolios: List[Portfolio]) -> List[PortfolioSnapshotInDB]:
+        """计算多个组合的快照."""
+        if not portfolios:
+            return []
+        date_ranges = [date_range for p in portfolios for date_range in get_snapshot_windows(p).values()]
+        start_date = min(start for start, _ in date_ranges)
+        end_date = max(end for _, end in date_ranges)
+        fund_ids = [p.fund_account[0].fundid for p in portfolios]
+        fund_assets, assets, net_deposit, assessments = await asyncio.gather(
+            self.load_fund_assets(portfolios),
+            self.load_assets(fund_ids, start_date, end_date),
+            self.load_net_deposit(fund_ids, start_date, end_date),
+            get_latest_portfolio_assessment_time_series_data(self.conn, [p.id for p in portfolios]),
+        )
+        return [
+            self.build_snapshot(
+                portfolio,
+                fund_assets[fund_id],
+                assets[fund_id],
+                net_deposit[fund_id],
+                assessments.get(portfolio.id),
+            )
+            for portfolio, fund_id in zip(portfolios, fund_ids)
+        ]
+
+    async def save(self, snapshots: List[PortfolioSnapshotInDB]) -> None:
+        """批量写入快照, 每个组合只保留一份."""
+        if not snapshots:
+            return
+        operations = [
+            UpdateOne(
+                {"portfolio": snapshot.portfolio},
+                {"$set": snapshot.dict(exclude={"id", "created_at"}), "$setOnInsert": {"created_at": snapshot.created_at}},
+                upsert=True,
+            )
+            for snapshot in snapshots
+        ]
+        await bulk_write_portfolio_snapshot(self.conn, operations)
+
+    async def refresh(self, portfolios: List[Portfolio]) -> List[PortfolioSnapshotInDB]:
+        """重新计算并写入快照, 每批处理`settings.scheduler.portfolio_snapshot_batch_size`个组合, 资金账户不存在的组合跳过."""
+        rv = []
+        batch_size = settings.scheduler.portfolio_snapshot_batch_size
+        for index in range(0, len(portfolios), batch_size):
+            batch = portfolios[index:index + batch_size]
+            try:
+                snapshots = await self.build(batch)
+            except EntityDoesNotExist:
+                snapshots = []
+                for portfolio in batch:
+                    try:
+                        snapshots.extend(await self.build([portfolio]))
+                    except EntityDoesNotExist:
+                        logger.warning(f"组合`{portfolio.id}`资金账户不存在, 已跳过.")
+            await self.save(snapshots)
+            rv.extend(snapshots)
+        return rv
+
+    async def get_many(self, portfolios: List[Portfolio]) -> Dict[PyObjectId, PortfolioSnapshotInDB]:
+        """读取多个组合的快照, 快照不存在或已过期的组合重新计算并写入."""
+        snapshots = await get_portfolio_snapshots_from_db(self.conn, [p.id for p in portfolios])
+        stale = [p for p in portfolios if p.id not in snapshots or not is_current_snapshot(snapshots[p.id], p)]
+        if stale:
+            rebuilt = await self.build(stale)
+            await self.save(rebuilt)
+            snapshots.update({snapshot.portfolio: snapshot for snapshot in rebuilt})
+        return snapshots
+
+    async def patch(self, portfolios: List[Portfolio]) -> int:
+        """盘中更新快照: 已过期的快照重新计算, 当日快照按实时资产及重新读取的当日净入金更新, 返回更新的组合数."""
+        snapshots = await get_portfolio_snapshots_from_db(self.conn, [p.id for p in portfolios])
+        today = date2datetime()
+        stale, live = [], []
+        for portfolio in portfolios:
+            snapshot = snapshots.get(portfolio.id)
+            if snapshot is None or not is_current_snapshot(snapshot, portfolio):
+                stale.append(portfolio)
+            elif snapshot.tdate == today and snapshot.base_assets is not None:
+                live.append(portfolio)
+        refreshed = await self.refresh(stale)
+        today_date = today.date()
+        net_deposit = await self.load_net_deposit([p.fund_account[0].fundid for p in live], today_date, today_date)
+
+        async def patch_one(portfolio: Portfolio) -> Optional[UpdateOne]:
+            fund_account = portfolio.fund_account[0]
+            try:
+                fund_asset = await get_fund_asset(self.conn, fund_account.fundid, portfolio.category, fund_account.currency)
+            except EntityDoesNotExist:
+                logger.warning(f"组合`{portfolio.id}`资金账户不存在, 已跳过.")
+                return None
+            update = patch_snapshot(snapshots[portfolio.id], fund_asset, float(net_deposit[fund_account.fundid].sum()))
+            return UpdateOne({"portfolio": portfolio.id}, {"$set": update})
+
+        operations = [op for op in await asyncio.gather(*(patch_one(p) for p in live)) if op is not None]
+        if operations:
+            await bulk_write_portfolio_snapshot(self.conn, operations)
+        return len(refreshed) + len(operations)
+
+
+async def invalidate_portfolio_snapshot(conn: AsyncIOMotorClient, fund_id: str) -> None:
+    """资金账户流水(含出入金)变更后删除组合快照, 下次读取时重新计算."""
+    portfolio = await get_portfolio_by_fund_id(conn, fund_id)
+    if portfolio is not None:
+        await delete_portfolio_snapshot(conn, portfolio.id)
+
+
+async def get_portfolio_snapshot(conn: AsyncIOMotorClient, portfolio: Portfolio) -> PortfolioSnapshotInDB:
+    """读取组合快照, 快照不存在或已过期时重新计算并写入."""
+    snapshot = await get_portfolio_snapshot_from_db(conn, portfolio.id)
+    if snapshot is None or not is_current_snapshot(snapshot, portfolio):
+        engine = PortfolioSnapshotEngine(conn)
+        snapshot, = await engine.build([portfolio])
+        await engine.save([snapshot])
+    return snapshot
+
+
+async def refresh_portfolio_snapshots(conn: AsyncIOMotorClient, portfolios: List[Portfolio]) -> None:
+    """重新计算并写入组合快照, 由时点数据及战斗力任务在完成后调用."""
+    snapshots = await PortfolioSnapshotEngine(conn).refresh(portfolios)
+    logger.info(f"已更新{len(snapshots)}个组合快照.")
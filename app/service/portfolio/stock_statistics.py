@@ -1,22 +1,29 @@
-from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import List
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app.core.auth_cache import invalidate_user_cache
 from app.crud.base import get_stock_stats_conf_collection, get_user_collection
-from app.enums.fund_account import FlowTType
+from app.crud.fund_account import get_fund_account_flow_from_db
 from app.enums.portfolio import PortfolioCategory
-from app.models.base.portfolio import 用户资金账户信息
+from app.models.base.fund_account import FundAccountStatistics
 from app.models.base.user import 指标配置
 from app.models.portfolio import Portfolio
 from app.models.target_config import StockStatsConf
-from app.outer_sys.hq import get_security_hq
+from app.outer_sys.hq import get_security_hqs
 from app.schema.user import User
 from app.service.datetime import get_early_morning
 from app.service.fund_account.fund_account import (
     get_fund_account_flow,
     get_fund_account_position,
 )
+from app.service.fund_account.statistics import (
+    STATISTICS_TTYPES,
+    aggregate_flow_statistics,
+    get_fund_account_statistics,
+    subtract_flow_statistics,
+)
 from app.utils.exchange import convert_exchange
 
 
@@ -36,8 +43,36 @@ class StockStatisticsTools:
                 {"username": user.username},
                 {"$set": {"target_config.stock_stats": stock_stats}},
             )
+            invalidate_user_cache(user.username)
         return user.target_config.stock_stats
 
+    @classmethod
+    async def _get_statistics(
+        cls, conn: AsyncIOMotorClient, portfolio: Portfolio
+    ) -> List[FundAccountStatistics]:
+        """获取组合资金账户的个股统计."""
+        fund_account = portfolio.fund_account[0]
+        if portfolio.category == PortfolioCategory.ManualImport:
+            # 手动导入组合不统计当日新录入的流水
+            early_morning = get_early_morning()
+            statistics = await get_fund_account_statistics(conn, fund_account.fundid)
+            today_flows = await get_fund_account_flow_from_db(
+                conn,
+                fund_id=fund_account.fundid,
+                ttype=STATISTICS_TTYPES,
+                created_after=early_morning,
+            )
+            return [
+                stats
+                for stats in subtract_flow_statistics(statistics, today_flows)
+                if stats.first_created_at and stats.first_created_at < early_morning
+            ]
+        # 模拟交易组合的流水在交易系统中, 获取一次流水后在内存中统计
+        flow_list = await get_fund_account_flow(
+            conn, fund_account.fundid, portfolio.category, fund_account.currency
+        )
+        return list(aggregate_flow_statistics(flow_list).values())
+
     @classmethod
     async def _get_data(
         cls,
@@ -52,45 +87,41 @@ class StockStatisticsTools:
             conn, fund_account.fundid, portfolio.category
         )
         position_dict = {position.symbol: position for position in position_list}
-        flow_list = await get_fund_account_flow(
-            conn, fund_account.fundid, portfolio.category, fund_account.currency
+        statistics = await cls._get_statistics(conn, portfolio)
+        statistics = sorted(
+            [stats for stats in statistics if stats.symbol in position_dict],
+            key=lambda stats: stats.first_tdate,
         )
-        if portfolio.category == PortfolioCategory.ManualImport:
-            flow_list = [
-                flow for flow in flow_list if flow.created_at < get_early_morning()
-            ]
-        if not flow_list:
+        if not statistics:
             return []
-        start_date = start_date or min([flow.tdate for flow in flow_list])
-        flow_group = defaultdict(list)
-        for flow in flow_list:
-            flow_group[flow.symbol].append(flow)
-        ret_list = []
-        for symbol, group in flow_group.items():
-            if symbol not in position_dict.keys():
-                continue
-            position = position_dict[symbol]
-            tmp_dict = {"symbol": symbol}
-            security = await get_security_hq(
-                symbol=symbol,
-                exchange=convert_exchange(position.exchange, to="beehive"),
+        securities = [
+            (
+                stats.symbol,
+                convert_exchange(position_dict[stats.symbol].exchange, to="beehive"),
             )
-            tmp_dict["symbol_name"] = security.symbol_name
-            tmp_data = [
-                {
-                    "name": "收益",
-                    "value": (security.current - position.cost.to_decimal())
-                    * position.volume,
-                },
+            for stats in statistics
+        ]
+        security_list = await get_security_hqs(securities)
+        ret_list = []
+        for stats, security in zip(statistics, security_list):
+            position = position_dict[stats.symbol]
+            ret_list.append(
                 {
-                    "name": "交易次数",
-                    "value": await get_trade_num(
-                        conn, fund_account, start_date, end_date, symbol, portfolio
-                    ),
-                },
-            ]
-            tmp_dict["data"] = tmp_data
-            ret_list.append(tmp_dict)
+                    "symbol": stats.symbol,
+                    "symbol_name": security.symbol_name,
+                    "data": [
+                        {
+                            "name": "收益",
+                            "value": (security.current - position.cost.to_decimal())
+                            * position.volume,
+                        },
+                        {
+                            "name": "交易次数",
+                            "value": stats.get_sell_num(start_date, end_date),
+                        },
+                    ],
+                }
+            )
         return ret_list
 
     @classmethod
@@ -105,28 +136,3 @@ class StockStatisticsTools:
         data = await cls._get_data(conn, portfolio, start_date, end_date)
         return data
 
-
-async def get_trade_num(
-    conn: AsyncIOMotorClient,
-    fund_account: 用户资金账户信息,
-    start_date: datetime,
-    end_date: datetime,
-    symbol: str,
-    portfolio: Portfolio,
-):
-    """获取交易次数"""
-    flow_list = await get_fund_account_flow(
-        conn,
-        fund_account.fundid,
-        portfolio.category,
-        fund_account.currency,
-        start_date=start_date.date(),
-        end_date=end_date.date(),
-    )
-    return len(
-        [
-            flow
-            for flow in flow_list
-            if flow.ttype == FlowTType.SELL and flow.symbol == symbol
-        ]
-    )
@@ -0,0 +1,133 @@
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from motor.motor_asyncio import AsyncIOMotorClient
+from stralib import FastTdate
+
+from app.core.errors import EntityDoesNotExist
+from app.crud.fund_account import get_fund_account_flow_from_db, get_fund_account_from_db
+from app.crud.time_series_data import get_fund_time_series_data
+from app.enums.fund_account import FlowTType
+from app.enums.portfolio import PortfolioCategory
+from app.models.fund_account import FundAccountInDB
+from app.models.portfolio import Portfolio, PortfolioSnapshotInDB
+from app.models.rwmodel import PyObjectId
+from app.models.time_series_data import PortfolioAssessmentTimeSeriesDataInDB
+from app.service.datetime import get_early_morning
+from app.service.fund_account.fund_account import calculation_simple_ability, get_fund_asset
+from app.utils.datetime import date2tdate
+
+
+def get_target_values(
+    fund_asset: Union[FundAccountInDB, PortfolioSnapshotInDB],
+    assessment: Union[PortfolioAssessmentTimeSeriesDataInDB, PortfolioSnapshotInDB],
+    profit_rate: float,
+    profit_rate_day: float,
+) -> Dict[str, float]:
+    """计算全部组合指标, 以指标代码为键, 资产及评估数据也可取自组合快照."""
+    assets = fund_asset.assets.to_decimal()
+    values = {
+        "10001": assets * Decimal(profit_rate_day),
+        "10002": assets,
+        "10003": fund_asset.securities.to_decimal(),
+        "10004": fund_asset.cash.to_decimal(),
+        "10005": fund_asset.cash.to_decimal(),
+        "10006": Decimal(profit_rate_day),
+        "10007": Decimal(profit_rate),
+        "10008": assets * Decimal(profit_rate),
+        "10009": assessment.profit_loss_ratio,
+        "10010": assessment.winning_rate,
+        "10011": assessment.annual_rate,
+        "10012": assessment.max_drawdown,
+        "10013": assessment.sharpe_ratio,
+        "10014": assessment.mktval_volatility,
+    }
+    return {code: float(round(value, 4)) if isinstance(value, Decimal) else value for code, value in values.items()}
+
+
+def get_target_date_range(portfolio: Portfolio) -> Tuple[date, date]:
+    """组合指标计算区间."""
+    start_date = portfolio.import_date
+    end_date = get_early_morning()
+    if portfolio.category == PortfolioCategory.ManualImport:
+        start_date = start_date - timedelta(days=1)
+        end_date = end_date - timedelta(days=1)
+    return date2tdate(start_date).date(), date2tdate(end_date).date()
+
+
+def to_date(value: Union[date, datetime]) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def slice_series(series: pd.Series, start_date: date, end_date: date) -> pd.Series:
+    """截取日期索引序列的区间数据(包含首尾)."""
+    if series.empty:
+        return series
+    return series[(series.index >= start_date) & (series.index <= end_date)]
+
+
+def calculate_swr(assets: pd.Series, net_deposit: pd.Series, start_date: date, end_date: date) -> float:
+    """由已加载的资产及净入金序列计算区间收益率, 结果与`get_portfolio_profit_rate`(SWR)一致."""
+    assets = slice_series(assets, start_date, end_date)
+    if assets.empty:
+        return 0
+    deposit_start_date = to_date(FastTdate.next_tdate(start_date)) if start_date < end_date else start_date
+    return calculation_simple_ability(slice_series(net_deposit, deposit_start_date, end_date), assets)
+
+
+class PortfolioTargetEngine:
+    """组合指标数据批量加载, 指标由`PortfolioSnapshotEngine`计算并写入快照.
+
+    - 多个组合的资金账户、资产时点数据及净入金流水各通过一次查询加载
+    """
+
+    def __init__(self, conn: AsyncIOMotorClient):
+        self.conn = conn
+
+    async def load_fund_assets(self, portfolios: List[Portfolio]) -> Dict[str, FundAccountInDB]:
+        """加载组合资金账户资产, 以资金账户id为键."""
+        fund_assets = {}
+        manual_import = [p for p in portfolios if p.category == PortfolioCategory.ManualImport]
+        if manual_import:
+            rows = await get_fund_account_from_db(self.conn, ids=[PyObjectId(p.fund_account[0].fundid) for p in manual_import])
+            fund_assets.update({str(row.id): row for row in rows})
+        others = [p for p in portfolios if p.category != PortfolioCategory.ManualImport]
+        rows = await asyncio.gather(
+            *(get_fund_asset(self.conn, p.fund_account[0].fundid, p.category, p.fund_account[0].currency) for p in others)
+        )
+        fund_assets.update({p.fund_account[0].fundid: row for p, row in zip(others, rows)})
+        if any(p.fund_account[0].fundid not in fund_assets for p in portfolios):
+            raise EntityDoesNotExist
+        return fund_assets
+
+    async def load_assets(self, fund_ids: List[str], start_date: date, end_date: date) -> Dict[str, pd.Series]:
+        """加载资产时点数据, 以资金账户id为键."""
+        assets_raw = defaultdict(dict)
+        for row in await get_fund_time_series_data(self.conn, fund_ids=fund_ids, start_date=start_date, end_date=end_date):
+            assets_raw[row.fund_id][row.tdate.date()] = row.mktval.to_decimal() + row.fundbal.to_decimal()
+        return {fund_id: pd.Series(assets_raw[fund_id], dtype=np.float64, name="股票资产") for fund_id in fund_ids}
+
+    async def load_net_deposit(self, fund_ids: List[str], start_date: date, end_date: date) -> Dict[str, pd.Series]:
+        """加载净入金(不含初始资金), 以资金账户id为键, 当日创建的流水不计入."""
+        flow_raw = defaultdict(lambda: defaultdict(Decimal))
+        if fund_ids:
+            flow_list = await get_fund_account_flow_from_db(
+                self.conn,
+                fund_ids=fund_ids,
+                start_date=start_date,
+                end_date=end_date,
+                ttype=[FlowTType.DEPOSIT, FlowTType.WITHDRAW],
+            )
+            for flow in flow_list:
+                if flow.created_at.date() == datetime.today().date():
+                    continue
+                flow_raw[flow.fund_id][flow.tdate.date()] += flow.fundeffect.to_decimal()
+        return defaultdict(
+            lambda: pd.Series({}, dtype=np.float64, name="当日净入金_中间值"),
+            {fund_id: pd.Series(dict(raw), dtype=np.float64, name="当日净入金_中间值") for fund_id, raw in flow_raw.items()},
+        )
@@ -3,6 +3,7 @@ from typing import Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app.core.auth_cache import invalidate_user_cache
 from app.crud.base import (
     get_portfolio_assessment_time_series_data_collection,
     get_portfolio_collection,
@@ -38,6 +39,7 @@ class TradeStatisticsTools:
                 {"username": user.username},
                 {"$set": {"target_config.trade_stats": trade_stats}},
             )
+            invalidate_user_cache(user.username)
         return user.target_config.trade_stats
 
     @classmethod
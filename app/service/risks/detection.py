@@ -1,8 +1,11 @@
+import asyncio
 from datetime import datetime
 from typing import List, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app import settings
+from app.core.executor import robot_executor
 from app.crud.base import (
     get_equipment_collection,
     get_portfolio_collection,
@@ -17,7 +20,7 @@ from app.models.fund_account import FundAccountInDB, FundAccountPositionInDB
 from app.models.portfolio import Portfolio
 from app.models.rwmodel import PyObjectId
 from app.outer_sys.hq import get_security_info, get_security_price
-from app.outer_sys.stralib.robot.run_robot import create_stralib_robot
+from app.outer_sys.stralib.robot.run_robot import RobotContextCache, create_stralib_robot
 from app.service.fund_account.fund_account import (
     get_fund_account_position,
     get_fund_asset,
@@ -30,6 +33,9 @@ async def risk_detection_by_robot(conn: AsyncIOMotorClient, robot_sid_list: List
     """
     根据使用的机器人筛选出来的组合执行风险检测
 
+    同一机器人的组合共享机器人配置及RobotData, 各组合并发检测(并发数为`settings.scheduler.risk_detection_concurrency`);
+    机器人在执行池中构建及运行, 使用同一RobotData的组合依次运行机器人, 不同机器人的组合并行
+
     Parameters
     ----------
     conn
@@ -44,15 +50,22 @@ async def risk_detection_by_robot(conn: AsyncIOMotorClient, robot_sid_list: List
         "status": 组合状态.running,
         "robot": {"$in": robot_sid_list if robot_sid_list else [x["标识符"] async for x in get_robots_collection(conn).find({"状态": "已上线"})]},
     }
-    portfolio_list = get_portfolio_collection(conn).find(filters)
-    async for portfolio in portfolio_list:
-        try:
-            portfolio = await risk_detection(conn, Portfolio(**portfolio), send_msg=send_msg)
-        except Exception as e:
-            logger.error(f"【风险检测失败】[{e}]{portfolio['_id']}")
+    robot_contexts = RobotContextCache()
+    semaphore = asyncio.Semaphore(settings.scheduler.risk_detection_concurrency)
+
+    async def detect(portfolio: dict):
+        async with semaphore:
+            try:
+                await risk_detection(conn, Portfolio(**portfolio), send_msg=send_msg, robot_contexts=robot_contexts)
+            except Exception as e:
+                logger.error(f"【风险检测失败】[{e}]{portfolio['_id']}")
 
+    await asyncio.gather(*[detect(portfolio) async for portfolio in get_portfolio_collection(conn).find(filters)])
 
-async def risk_detection(conn: AsyncIOMotorClient, portfolio: Portfolio, send_msg=True) -> Portfolio:
+
+async def risk_detection(
+    conn: AsyncIOMotorClient, portfolio: Portfolio, send_msg=True, robot_contexts: Optional[RobotContextCache] = None
+) -> Portfolio:
     """
     风险检测
 
@@ -63,6 +76,7 @@ async def risk_detection(conn: AsyncIOMotorClient, portfolio: Portfolio, send_ms
     conn
     portfolio
     send_msg
+    robot_contexts 机器人上下文缓存, 批量检测时由各组合共享
 
     Returns
     -------
@@ -78,7 +92,7 @@ async def risk_detection(conn: AsyncIOMotorClient, portfolio: Portfolio, send_ms
     fund_account_assets = await get_fund_asset(conn, fund_account.fundid, portfolio.category, fund_account.currency)
     fund_account_position = await get_fund_account_position(conn, fund_account.fundid, portfolio.category)
     # 检测风险
-    new_risks = await get_detect_all_risks(conn, portfolio, fund_account_assets, fund_account_position)
+    new_risks = await get_detect_all_risks(conn, portfolio, fund_account_assets, fund_account_position, robot_contexts)
     # 保存风险
     await save_risks(conn, portfolio, new_risks)
     # 发送消息
@@ -103,17 +117,21 @@ async def get_detect_all_risks(
     portfolio: Portfolio,
     fund_account_assets: FundAccountInDB,
     fund_account_position: List[FundAccountPositionInDB],
+    robot_contexts: Optional[RobotContextCache] = None,
 ) -> List[风险点信息]:
     """获取当前组合所有风险点."""
-    try:
-        robot = await create_stralib_robot(portfolio, fund_account_assets, fund_account_position)
-    except Exception as e:
-        logger.error(f"[构建robot失败][{portfolio.id}]{e}")
-        return []
-    # 检测个股风险
-    new_risks = await get_stock_risk(conn, robot, portfolio)
-    # 检测仓位风险
-    position_risk = await get_position_risk(robot)
+    robot_contexts = robot_contexts or RobotContextCache()
+    # 执行池中同时只有一个机器人访问同一RobotData
+    async with robot_contexts.lock(portfolio.robot):
+        try:
+            robot = await create_stralib_robot(portfolio, fund_account_assets, fund_account_position, robot_contexts)
+        except Exception as e:
+            logger.error(f"[构建robot失败][{portfolio.id}]{e}")
+            return []
+        # 检测个股风险
+        new_risks = await get_stock_risk(conn, robot, portfolio)
+        # 检测仓位风险
+        position_risk = await get_position_risk(robot)
     if position_risk:
         new_risks.append(position_risk)
     # 风险筛选
@@ -257,7 +275,7 @@ async def get_stock_risk(conn, robot, portfolio: Portfolio) -> List[风险点信
     -------
     risks
     """
-    robot.get_hold_risk()
+    await robot_executor.run(robot.get_hold_risk, timeout=0)
     risks = list(
         filter(
             None,
@@ -279,7 +297,7 @@ async def get_position_risk(robot) -> Optional[风险点信息]:
     -------
     risks
     """
-    robot.check_position()
+    await robot_executor.run(robot.check_position, timeout=0)
     adviced = [
         float(robot.timing_signal.split("-")[0]) / 100,
         float(robot.timing_signal.split("-")[1][:-1]) / 100,
@@ -5,6 +5,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from pandas import DataFrame
 from stralib import FastTdate, get_strategy_signal
 
+from app.core.executor import run_blocking
 from app.crud.base import (
     get_equipment_collection,
     get_portfolio_collection,
@@ -16,7 +17,7 @@ from app.extentions import logger
 from app.models.base.portfolio import 风险点信息
 from app.models.portfolio import Portfolio
 from app.models.rwmodel import PyObjectId
-from app.outer_sys.hq import get_security_info
+from app.outer_sys.hq import get_security_info, get_security_infos
 from app.schema.portfolio import PortfolioInResponse
 from app.schema.signal import (
     ScreenStrategySignalInResponse,
@@ -83,7 +84,7 @@ async def screen_strategy_signal_list(conn: AsyncIOMotorClient, portfolio_id: Py
 
     res_list = []
     for sid in stock_equips:
-        signals = get_strategy_signal(sid, signal_date.strftime("%Y%m%d"), signal_date.strftime("%Y%m%d"))
+        signals = await run_blocking(get_strategy_signal, sid, signal_date.strftime("%Y%m%d"), signal_date.strftime("%Y%m%d"))
         # 去掉股票代码为‘nan’的信号（股票代码为‘nan’表示当日信号已运行，但是无信号）
         signals = signals[signals.SYMBOL != "nan"].dropna(subset=["SYMBOL"]) if not signals.empty else signals
         if signals.empty:
@@ -102,8 +103,7 @@ async def screen_strategy_signal_list(conn: AsyncIOMotorClient, portfolio_id: Py
         )
         selected = select_column_tolist(signals, "symbol", "exchange")
         descriptions = []
-        for symbol, exchange in zip(*selected):
-            security = await get_security_info(symbol, exchange)
+        for security in await get_security_infos(list(zip(*selected))):
             data = security.dict()
             data["exchange"] = "1" if security.exchange == "SH" else "0"
             descriptions.append(data)
@@ -129,7 +129,7 @@ async def screen_strategy_signal_list(conn: AsyncIOMotorClient, portfolio_id: Py
     return res_list
 
 
-def format_stralib_timing_signal(sid: str, symbol: str, start_date: str, end_date: str) -> List[TimingStrategySignalInResponse]:
+async def format_stralib_timing_signal(sid: str, symbol: str, start_date: str, end_date: str) -> List[TimingStrategySignalInResponse]:
     """
     格式化stralib调用返回的择时信号
     Parameters
@@ -142,7 +142,7 @@ def format_stralib_timing_signal(sid: str, symbol: str, start_date: str, end_dat
     -------
     List[TimingStrategySignalInResponse]
     """
-    signal = get_strategy_signal(sid, start_date, end_date)
+    signal = await run_blocking(get_strategy_signal, sid, start_date, end_date)
     ret_data = []
     if not signal.empty:
         for item in signal.T.to_dict().values():
@@ -173,7 +173,7 @@ async def timing_strategy_signal_list(
     equip_sid = robot["择时装备列表"][0] if robot and robot.get("择时装备列表") else None  # 目前择时策略只有一个需要展示
     if not equip_sid:
         return []
-    return format_stralib_timing_signal(equip_sid, symbol, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+    return await format_stralib_timing_signal(equip_sid, symbol, start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
 
 
 async def timing_strategy_signal(
@@ -193,7 +193,7 @@ async def timing_strategy_signal(
     # 当天数据未准备完毕，则显示昨天的信号
     if start_date == date.today() and not equip_status:
         start_date = FastTdate.last_tdate(start_date)
-    signal_list = format_stralib_timing_signal(timing_sid, "399001", start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+    signal_list = await format_stralib_timing_signal(timing_sid, "399001", start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
     if signal_list:
         return signal_list[0]
 
@@ -210,7 +210,7 @@ async def trade_strategy_signal(conn: AsyncIOMotorClient, portfolio_id: PyObject
 
     res_list = []
     for sid in stock_equips:
-        signals = get_strategy_signal(sid, signal_date.strftime("%Y%m%d"), signal_date.strftime("%Y%m%d"))
+        signals = await run_blocking(get_strategy_signal, sid, signal_date.strftime("%Y%m%d"), signal_date.strftime("%Y%m%d"))
         signals = signals[signals.SYMBOL.isin(symbol_list)]
         signals = signals[signals.SIGNAL != 0.0]
         if signals.empty:
@@ -10,7 +10,11 @@ from app.enums.portfolio import 风险类型
 from app.models.base.portfolio import 风险点信息
 from app.models.fund_account import FundAccountInDB, FundAccountPositionInDB
 from app.models.portfolio import Portfolio
-from app.outer_sys.stralib.robot.run_robot import account_robot_factory, database_stock_list_to_robot
+from app.outer_sys.stralib.robot.run_robot import (
+    account_robot_factory,
+    database_stock_list_to_robot,
+    solution_robot_contexts,
+)
 from app.schema.order import SolutionOrderItem
 from app.service.risks.utils import risk_type_from_signal, get_exchange_from_signal
 
@@ -86,6 +90,6 @@ async def get_robot(
     fund_bal, market_value = await update_account_info(last_step_solutions, fund_asset, position_list)
     asset = dict(fundbal=float(fund_bal.to_decimal()), mktval=float(market_value.to_decimal()))
     stocks = await database_stock_list_to_robot(position_list)
-    robot_partial = await account_robot_factory(portfolio)
+    robot_partial = await account_robot_factory(portfolio, solution_robot_contexts)
     robot = robot_partial(asset, stocks)
     return robot
@@ -15,6 +15,7 @@ from stralib import FastTdate, STRATEGY_SIGNAL_LIBRARY_NAME
 from stralib.adam.arctic_store import TimeSeriesStore
 
 from app.core.errors import StrategyDataError, StrategySignalError
+from app.core.executor import run_blocking
 from app.crud.base import get_collection_by_config
 from app.enums.publish import 错误信息错误类型enum
 from app.enums.strategy_data import 策略名称, 策略数据类型
@@ -209,7 +210,7 @@ async def write_strategy_data_to_adam(sid: str, strategy_data: List[策略数据
     """
     data = generate_adam_signal(strategy_data)
     try:
-        update_adam_strategy_signal(sid, data, start_date, end_date)
+        await run_blocking(update_adam_strategy_signal, sid, data, start_date, end_date)
     except Exception as e:
         raise StrategySignalError(message=f"更新策略数据错误，错误信息：{e}")
 
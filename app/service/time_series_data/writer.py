@@ -0,0 +1,66 @@
+import asyncio
+from typing import List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.crud.time_series_data import bulk_write_fund_time_series_data, bulk_write_position_time_series_data
+from app.db.redis import SuperRedis
+
+
+class TimeSeriesDataWriter:
+    """时点数据分批写入.
+
+    - 持仓和资产时点数据的写操作累计到`max_size`后写入一次, 不再在任务结束时一次写入全部操作
+    - 同一资金账户的写操作总在同一批次内按顺序写入
+    - 资金账户的写操作写入后记录检查点, 重新执行时跳过已完成的资金账户
+    """
+
+    def __init__(
+        self,
+        conn: AsyncIOMotorClient,
+        redis: Optional[SuperRedis] = None,
+        checkpoint_key: Optional[str] = None,
+        max_size: int = 1000,
+        checkpoint_ttl: int = 3600 * 24,
+    ):
+        self.conn = conn
+        self.redis = redis
+        self.checkpoint_key = checkpoint_key
+        self.max_size = max_size
+        self.checkpoint_ttl = checkpoint_ttl
+        self._position_operations = []
+        self._fund_operations = []
+        self._fund_ids = []
+        self._lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._position_operations) + len(self._fund_operations)
+
+    async def get_checkpoints(self) -> Set[str]:
+        """已完成的资金账户."""
+        if self.redis is None or not self.checkpoint_key:
+            return set()
+        return set(await self.redis.smembers(self.checkpoint_key, set()))
+
+    async def add(self, fund_id: str, position_operations: List, fund_operations: List) -> None:
+        """添加资金账户的写操作, 超过批次上限时写入."""
+        self._position_operations.extend(position_operations)
+        self._fund_operations.extend(fund_operations)
+        self._fund_ids.append(fund_id)
+        if self.size >= self.max_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """写入已累计的操作并记录检查点."""
+        async with self._lock:
+            position_operations, self._position_operations = self._position_operations, []
+            fund_operations, self._fund_operations = self._fund_operations, []
+            fund_ids, self._fund_ids = self._fund_ids, []
+            if position_operations:
+                await bulk_write_position_time_series_data(self.conn, position_operations)
+            if fund_operations:
+                await bulk_write_fund_time_series_data(self.conn, fund_operations)
+            if fund_ids and self.redis is not None and self.checkpoint_key:
+                await self.redis.sadd(self.checkpoint_key, *fund_ids)
+                await self.redis.execute("EXPIRE", self.checkpoint_key, self.checkpoint_ttl)
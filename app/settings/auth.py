@@ -13,6 +13,12 @@ class BaseAuth(OtherSettings):
 
     api_key: str = Field(..., description="后管api_key，用于校验后台登录", env="api_key")
 
+    # 认证缓存
+    token_cache_ttl: float = Field(300, description="token解码结果缓存时长(秒), 不超过token剩余有效期", env="AUTH_TOKEN_CACHE_TTL")
+    user_cache_ttl: float = Field(5, description="当前用户缓存时长(秒)", env="AUTH_USER_CACHE_TTL")
+    permission_cache_ttl: float = Field(60, description="角色权限匹配器缓存时长(秒)", env="AUTH_PERMISSION_CACHE_TTL")
+    auth_cache_maxsize: int = Field(10000, description="认证缓存最大数量", env="AUTH_CACHE_MAXSIZE")
+
     def get_rsa_public_key(self):
         return self.public_key
 
@@ -10,12 +10,14 @@ from app.settings.airflow import AirflowSettings
 from app.settings.auth import WebAuth, PWDWebAuth
 from app.settings.db import DbSettings, Collections
 from app.settings.discuzq import DiscuzqSettings
+from app.settings.executor import ExecutorSettings
 from app.settings.hq import HQSettings
 from app.settings.log import LogSettings
-from app.settings.message import SMSSettings, EmailSettings, WechatSettings
+from app.settings.message import SMSSettings, EmailSettings, NotificationSettings, WechatSettings
 from app.settings.mfrs import MfrsSettings
 from app.settings.redis import RedisSettings
 from app.settings.scheduler import SchedulerSettings
+from app.settings.trade_system import TradeSystemSettings
 
 
 class GlobalConfig(OtherSettings):
@@ -34,6 +36,7 @@ class GlobalConfig(OtherSettings):
     manufacturer_switch: bool = Field(..., description="厂商开关", env="MANUFACTURER_SWITCH")
     # 交易系统
     trade_url: str = Field(..., description="模拟交易系统url", env="trade_url")
+    trade_system: TradeSystemSettings = TradeSystemSettings()
     market_index_list: list = Field(..., description="市场指数", env="market_index_list")
     host: str = Field(..., description="HOST", env="beehive3_host")
     port: str = Field(..., description="PORT", env="beehive3_port")
@@ -52,15 +55,20 @@ class GlobalConfig(OtherSettings):
     airflow: AirflowSettings = AirflowSettings()
     log: LogSettings = LogSettings()
     hq: HQSettings = HQSettings()
+    executor: ExecutorSettings = ExecutorSettings()
     mfrs: MfrsSettings = MfrsSettings()
     wechat: WechatSettings = WechatSettings()
     sms: SMSSettings = SMSSettings()
     email: EmailSettings = EmailSettings()
+    notification: NotificationSettings = NotificationSettings()
 
     # 登录认证
     auth: WebAuth = PWDWebAuth()
     # 权限设置
     num_limit: Dict[str, Dict[str, int]] = Field(..., description="角色可创建数量限制（包含组合、装备、机器人等）", env="num_limit")
+    # 用户资料缓存
+    profile_cache_ttl: float = Field(30, description="用户资料缓存时长(秒)", env="PROFILE_CACHE_TTL")
+    profile_cache_maxsize: int = Field(1000, description="用户资料缓存最大数量", env="PROFILE_CACHE_MAXSIZE")
     # 聚宽登陆
     jqdata_user: str = Field(..., description="聚宽账号", env="jqdata_user")
     jqdata_password: str = Field(..., description="聚宽密码", env="jqdata_password")
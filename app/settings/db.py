@@ -21,6 +21,7 @@ class Collections(OtherSettings):
     ERROR_LOG: str  # 错误日志
     STOCK_LOG: str  # 股票流水
     MESSAGE_CONFIG: str  # 消息配置
+    MESSAGE_OUTBOX: str  # 消息发件箱
     TREND_CHART: str  # 趋势图
     ORDER: str  # 订单
     FAVORITE_STOCK: str  # 自选股
@@ -37,10 +38,12 @@ class Collections(OtherSettings):
     FUND_ACCOUNT_FLOW: str  # 资金账户流水
     FUND_ACCOUNT: str  # 资金账户
     FUND_ACCOUNT_POSITION: str  # 资金账户持仓
+    FUND_ACCOUNT_STATISTICS: str  # 资金账户个股统计
     POSITION_TIME_SERIES_DATA: str  # 持仓时点数据
     FUND_TIME_SERIES_DATA: str  # 资产时点数据
     PORTFOLIO_ASSESSMENT_TIME_SERIES_DATA: str  # 组合评估时点数据
     PORTFOLIO_ANALYSIS: str  # 组合分析数据
+    PORTFOLIO_SNAPSHOT: str  # 组合运行数据快照
 
     # 回测实盘数据
     BACKTEST_SIGNAL_AIP: str  # 回测信号.大类资产配置
@@ -79,14 +82,25 @@ class ColIndex(OtherSettings):
     ACTIVITY_IDX = [("status", False)]
     ACTIVITY_YIELD_RANK_IDX = [("activity", False), ("portfolio", False)]
     EQUIPMENT_IDX = [("标识符", True), ("状态", False)]
+    FUND_ACCOUNT_FLOW_IDX = [
+        ([("fund_id", ASCENDING), ("tdate", ASCENDING)], False),
+        ([("fund_id", ASCENDING), ("ttype", ASCENDING), ("tdate", ASCENDING)], False),
+        ([("fund_id", ASCENDING), ("symbol", ASCENDING), ("tdate", ASCENDING)], False),
+    ]
+    FUND_ACCOUNT_POSITION_IDX = [([("fund_id", ASCENDING), ("symbol", ASCENDING)], False)]
+    FUND_ACCOUNT_STATISTICS_IDX = [([("fund_id", ASCENDING), ("symbol", ASCENDING)], True)]
+    FUND_TIME_SERIES_DATA_IDX = [([("fund_id", ASCENDING), ("tdate", ASCENDING)], False)]
     FAVORITE_STOCK_IDX = [
         ([("username", ASCENDING), ("category", ASCENDING), ("sid", ASCENDING), ("relationship", ASCENDING)], True),
     ]
+    JOB_IDX = [("next_run_time", False)]
     ORDER_IDX = [
         ("portfolio", False),
         ("username", False),
         ("order_id", False),
         ("fund_id", False),
+        ("task", False),
+        ("status", False),
     ]
     PERMISSION_IDX = [("role", True)]
     PORTFOLIO_IDX = [
@@ -94,12 +108,16 @@ class ColIndex(OtherSettings):
         ("robot", False),
         ("username", False),
         ("activity", False),
+        ([("status", ASCENDING), ("category", ASCENDING)], False),
     ]
     PORTFOLIO_ACCOUNT_IDX = [
         ("portfolio", False),
         ([("portfolio", ASCENDING), ("tdate", ASCENDING)], True),
     ]
+    PORTFOLIO_ASSESSMENT_TIME_SERIES_DATA_IDX = [([("portfolio", ASCENDING), ("tdate", ASCENDING)], False)]
+    PORTFOLIO_SNAPSHOT_IDX = [("portfolio", True)]
     PORTFOLIO_TARGET_CONF_IDX = []
+    POSITION_TIME_SERIES_DATA_IDX = [([("fund_id", ASCENDING), ("tdate", ASCENDING)], False)]
     ROBOT_IDX = [("标识符", True), ("状态", False)]
     ROLE_IDX = [("name", True)]
     SITE_CONFIG_IDX = [
@@ -122,9 +140,11 @@ class ColIndex(OtherSettings):
             [("username", ASCENDING), ("category", ASCENDING), ("is_read", ASCENDING)],
             False,
         ),
+        ([("username", ASCENDING), ("is_read", ASCENDING)], False),
     ]
     ERROR_LOG_IDX = [("category", False)]
     MESSAGE_CONFIG_IDX = [([("title", ASCENDING), ("category", ASCENDING)], True)]
+    MESSAGE_OUTBOX_IDX = [("key", True), ([("batch", ASCENDING), ("status", ASCENDING)], False)]
     BACKTEST_ASSESSMENT_AIP_IDX = [
         ("标识符", False),
         ([("标识符", ASCENDING), ("开始时间", ASCENDING), ("结束时间", ASCENDING)], True),
@@ -240,6 +260,7 @@ class DbSettings(OtherSettings):
     MIN_CONNECTIONS: int  # 最小连接数
     DB_NAME: str  # 接口的数据库
     TEST_DB_NAME: str  # 测试数据库
+    ENSURE_INDEXES_ON_STARTUP: bool = False  # 启动时创建缺失的索引
 
     def get_client(self):
         return MongoClient(
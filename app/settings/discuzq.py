@@ -11,4 +11,10 @@ class DiscuzqSettings(OtherSettings):
     password: str = Field(..., env="discuzq_password")
     switch: str = Field(..., env="discuzq_switch") # 社区启用开关
     category: Dict[str, int] = Field(..., env="discuzq_category")
+    max_connections: int = Field(20, description="社区接口连接池大小", env="discuzq_max_connections")
+    timeout: float = Field(30, description="社区接口请求超时时间(秒)", env="discuzq_timeout")
+    sync_concurrency: int = Field(10, description="同步社区数据同时请求数", env="discuzq_sync_concurrency")
+    sync_retries: int = Field(3, description="同步社区数据接口调用失败重试次数", env="discuzq_sync_retries")
+    sync_retry_backoff: float = Field(1, description="同步社区数据重试退避基数(秒)", env="discuzq_sync_retry_backoff")
+    sync_batch_size: int = Field(500, description="同步社区数据每批处理及写入的记录数", env="discuzq_sync_batch_size")
 
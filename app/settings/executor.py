@@ -0,0 +1,12 @@
+from pydantic import Field
+
+from app.settings import OtherSettings
+
+
+class ExecutorSettings(OtherSettings):
+    kind: str = Field("thread", description="阻塞调用执行池类型(thread/process)", env="BLOCKING_EXECUTOR_KIND")
+    max_workers: int = Field(8, description="阻塞调用执行池最大工作数", env="BLOCKING_EXECUTOR_MAX_WORKERS")
+    timeout: float = Field(30, description="阻塞调用默认超时时间(秒)", env="BLOCKING_EXECUTOR_TIMEOUT")
+    backtest_max_workers: int = Field(4, description="机器人回测执行池最大工作数", env="BACKTEST_EXECUTOR_MAX_WORKERS")
+    robot_max_workers: int = Field(4, description="机器人运行(风险检测)执行池最大工作数", env="ROBOT_EXECUTOR_MAX_WORKERS")
+    cpu_max_workers: int = Field(2, description="计算密集型任务进程池最大工作数", env="CPU_EXECUTOR_MAX_WORKERS")
@@ -1,7 +1,12 @@
+from typing import Dict
+
 from pydantic import Field
 
 from app.settings import OtherSettings
 
+# 各类行情数据默认缓存时长(秒), 0表示缓存至当日结束
+DEFAULT_HQ_CACHE_TTL = {"price": 0.5, "hq": 0.5, "ticks": 0.5, "info": 0, "meta": 0}
+
 
 class HQSettings(OtherSettings):
     source: str = Field(..., description="行情源", env="HQ_SOURCE")
@@ -13,4 +18,19 @@ class HQSettings(OtherSettings):
     db_password: str = Field(..., description="行情数据库密码", env="HQDB_PASSWORD")
     hq_url: str = Field(..., description="接口调用行情时的地址", env="HQ_URL")
     jiantou_url: str = Field(..., description="建投URL", env="JIANTOU_URL")
+    jiantou_max_concurrency: int = Field(10, description="批量请求建投行情的最大并发数", env="JIANTOU_MAX_CONCURRENCY")
+    jiantou_max_connections: int = Field(20, description="建投HTTP连接池最大连接数", env="JIANTOU_MAX_CONNECTIONS")
+    jiantou_max_keepalive_connections: int = Field(10, description="建投HTTP连接池最大保活连接数", env="JIANTOU_MAX_KEEPALIVE_CONNECTIONS")
+    jiantou_timeout: float = Field(5, description="请求建投API超时时间(秒)", env="JIANTOU_TIMEOUT")
+    jiantou_retries: int = Field(2, description="请求建投API失败重试次数", env="JIANTOU_RETRIES")
+    jiantou_retry_backoff: float = Field(0.2, description="请求建投API重试退避基数(秒)", env="JIANTOU_RETRY_BACKOFF")
+    jiantou_cache_ttl: float = Field(1, description="建投接口响应缓存时长(秒)", env="JIANTOU_CACHE_TTL")
     refresh_interval_seconds: int = Field(..., description="行情刷新时间间隔")
+    # 进程内行情缓存
+    cache_switch: bool = Field(True, description="行情缓存开关", env="HQ_CACHE_SWITCH")
+    cache_maxsize: int = Field(5000, description="每种行情数据缓存的最大证券数量", env="HQ_CACHE_MAXSIZE")
+    cache_ttl: Dict[str, float] = Field(
+        DEFAULT_HQ_CACHE_TTL,
+        description="各类行情数据缓存时长(秒), 0表示缓存至当日结束, 未配置的数据类型使用默认时长",
+        env="HQ_CACHE_TTL",
+    )
@@ -22,6 +22,15 @@ class EmailSettings(OtherSettings):
     smtp_server_port: int = Field(..., description="邮件服务器端口", env="smtp_server_port")
 
 
+class NotificationSettings(OtherSettings):
+    concurrency: int = Field(5, description="同时发送的消息数(邮件连接池大小)", env="notification_concurrency")
+    retries: int = Field(3, description="消息发送失败重试次数", env="notification_retries")
+    retry_backoff: float = Field(1, description="消息发送重试退避基数(秒)", env="notification_retry_backoff")
+    batch_size: int = Field(500, description="每批写入发件箱的消息数", env="notification_batch_size")
+
+
 class WechatSettings(OtherSettings):
     app_id: str = Field(..., description="微信APP_ID", env="wechat_app_id")
     app_secret: str = Field(..., description="微信APP_SECRET", env="wechat_app_secret")
+    avatar_sync_concurrency: int = Field(4, description="同步微信头像同时请求数", env="wechat_avatar_sync_concurrency")
+    avatar_sync_batch_size: int = Field(1000, description="同步微信头像每批写入的最大操作数", env="wechat_avatar_sync_batch_size")
@@ -22,6 +22,8 @@ class RedisSettings(OtherSettings, BaseRedisSettings):
 
     redis_pool_minsize: int
     redis_pool_maxsize: int
+    redis_local_cache_ttl: int = Field(300, description="不可变键本地缓存时间(秒)", env="redis_local_cache_ttl")
+    redis_local_cache_maxsize: int = Field(10000, description="不可变键本地缓存数量上限", env="redis_local_cache_maxsize")
     default_time_out: int = Field(..., description="默认超时时间", env="default_time_out")
     # 数据库
     cache_db: int  # 缓存库
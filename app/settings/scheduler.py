@@ -6,3 +6,17 @@ from app.settings import OtherSettings
 
 class SchedulerSettings(OtherSettings, BaseSchedulerSettings):
     max_thread_num: int = Field(..., description="定时任务异步任务最大线程数", env="scheduler_max_thread_num")
+    distributed: bool = Field(False, description="分布式执行定时任务", env="scheduler_distributed")
+    lease_ttl: int = Field(30, description="leader租约时长(秒)", env="scheduler_lease_ttl")
+    shard_concurrency: int = Field(1, description="每个worker同时执行的分片数", env="scheduler_shard_concurrency")
+    shard_visibility_timeout: int = Field(600, description="分片超过该时长(秒)未续心跳时重新投递", env="scheduler_shard_visibility_timeout")
+    time_series_concurrency: int = Field(8, description="时点数据同时处理的资金账户数", env="scheduler_time_series_concurrency")
+    risk_detection_concurrency: int = Field(8, description="风险检测同时处理的组合数", env="scheduler_risk_detection_concurrency")
+    bulk_write_size: int = Field(1000, description="时点数据每批写入的最大操作数", env="scheduler_bulk_write_size")
+    portfolio_snapshot_batch_size: int = Field(200, description="组合快照每批刷新的组合数", env="scheduler_portfolio_snapshot_batch_size")
+    portfolio_snapshot_patch_interval: float = Field(60, description="组合快照盘中更新间隔(秒)", env="scheduler_portfolio_snapshot_patch_interval")
+    order_monitor_min_interval: float = Field(1, description="委托订单监控最小轮询间隔(秒)", env="scheduler_order_monitor_min_interval")
+    order_monitor_max_interval: float = Field(30, description="委托订单监控最大轮询间隔(秒)", env="scheduler_order_monitor_max_interval")
+    order_monitor_backoff: float = Field(2, description="订单状态无变化时轮询间隔的增长倍数", env="scheduler_order_monitor_backoff")
+    order_monitor_portfolio_ttl: float = Field(60, description="委托订单监控组合信息缓存时长(秒)", env="scheduler_order_monitor_portfolio_ttl")
+    order_monitor_channel: str = Field("", description="订单状态变更通知频道, 为空时不订阅", env="scheduler_order_monitor_channel")
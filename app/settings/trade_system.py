@@ -0,0 +1,15 @@
+from pydantic import Field
+
+from app.settings import OtherSettings
+
+
+class TradeSystemSettings(OtherSettings):
+    max_connections: int = Field(50, description="模拟交易系统HTTP连接池最大连接数", env="PT_MAX_CONNECTIONS")
+    max_concurrency: int = Field(10, description="批量请求模拟交易系统的最大并发数", env="PT_MAX_CONCURRENCY")
+    timeout: float = Field(10, description="请求模拟交易系统超时时间(秒)", env="PT_TIMEOUT")
+    retries: int = Field(2, description="查询接口失败重试次数", env="PT_RETRIES")
+    retry_backoff: float = Field(0.2, description="查询接口重试退避基数(秒)", env="PT_RETRY_BACKOFF")
+    breaker_failure_threshold: int = Field(5, description="连续失败多少次后熔断", env="PT_BREAKER_FAILURE_THRESHOLD")
+    breaker_recovery_timeout: float = Field(30, description="熔断后多久允许试探请求(秒)", env="PT_BREAKER_RECOVERY_TIMEOUT")
+    cache_ttl: float = Field(3, description="查询接口响应缓存时长(秒), 0表示不缓存", env="PT_CACHE_TTL")
+    cache_maxsize: int = Field(5000, description="查询接口响应缓存最大数量", env="PT_CACHE_MAXSIZE")
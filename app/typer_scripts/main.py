@@ -7,6 +7,7 @@ from app import settings
 from app.db.mongodb import db
 from app.dec.cmd import typer_log
 from app.service.mongodb.clear import clear_mongodb
+from app.service.mongodb.index import ensure_indexes, index_report
 from app.typer_scripts.utils import init_config
 
 t_app = typer.Typer()
@@ -39,5 +40,48 @@ def clear_db(cols: str = None):
     asyncio.get_event_loop().run_until_complete(clear_mongodb(col_list=col_list))
 
 
+@t_app.command()
+@typer_log
+def create_indexes(cols: str = None):
+    """
+    创建ColIndex中声明但缺失的索引, 可重复执行
+
+    Parameters
+    ----------
+    cols  集合列表, 逗号分隔, 默认为全部集合
+
+    Returns
+    -------
+
+    """
+    col_list = cols.split(",") if cols else None
+    created = asyncio.get_event_loop().run_until_complete(ensure_indexes(db.client, col_list))
+    for col_name, names in created.items():
+        typer.echo(f"{col_name}: {', '.join(names)}")
+
+
+@t_app.command()
+@typer_log
+def report_indexes(cols: str = None):
+    """
+    索引报告: 缺失的声明索引、未声明的索引及未使用的索引
+
+    Parameters
+    ----------
+    cols  集合列表, 逗号分隔, 默认为全部集合
+
+    Returns
+    -------
+
+    """
+    col_list = cols.split(",") if cols else None
+    report = asyncio.get_event_loop().run_until_complete(index_report(db.client, col_list))
+    for row in report:
+        typer.echo(f"{row['collection']}")
+        typer.echo(f"    缺失: {row['missing']}")
+        typer.echo(f"    未声明: {row['undeclared']}")
+        typer.echo(f"    未使用: {row['unused']}")
+
+
 if __name__ == "__main__":
     t_app()
@@ -7,7 +7,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorClient
 from pymongo.errors import CollectionInvalid
 
 from app import settings
-from app.settings.db import db_idx
+from app.service.mongodb.index import ensure_indexes
 
 sys.path.append(os.path.dirname(__file__) + os.sep + "../")
 
@@ -35,10 +35,9 @@ async def migrate(col_name: str = None):
     for k, col_name in cols.items():
         await create_collection(db[settings.db.DB_NAME], col_name)
         logging.warning(f"创建集合({col_name})成功")
-        idx_list = db_idx.__dict__.get(f"{col_name.upper()}_IDX", [])
-        for idx, unique in idx_list:
-            result = await db[settings.db.DB_NAME][col_name].create_index(idx, unique=unique)
-            logger.info(f"创建({result})索引成功。\n")
+    created = await ensure_indexes(db, list(cols.values()))
+    for col_name, names in created.items():
+        logger.info(f"创建({col_name}: {names})索引成功。\n")
 
 
 if __name__ == "__main__":
@@ -14,6 +14,7 @@ from starlette.config import environ
 from starlette.testclient import TestClient
 
 from app import get_settings
+from app.core.auth_cache import invalidate_user_cache
 from app.crud.base import get_user_collection
 from app.crud.user import create_manufacturer_user, create_user, delete_user
 from app.db.mongodb import get_database
@@ -240,6 +241,7 @@ async def logged_in_client_user(client, event_loop, fixture_db, client_user_data
         {"username": user["user"]["username"]},
         {"$set": {"client_name": "建投测试厂商"}},
     )
+    invalidate_user_cache(user["user"]["username"])
     yield logged_in_user_data
     await delete_user(fixture_db, user["user"]["username"])
 
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.core.auth_cache import (
+    compile_scope_matcher,
+    invalidate_user_cache,
+    scope_matcher_cache,
+    token_cache,
+    user_cache,
+)
+from app.core.jwt import _get_authorization_token
+from app.crud.base import get_user_collection
+from app.crud.permission import 增加一条权限记录, 删除一条权限记录, 获取某用户的权限匹配器
+from app.crud.role import 删除一个角色, 增加一个角色
+from app.crud.user import delete_user, update_user_roles
+from app.models.role import Role
+from app.schema.permission import 角色权限InRequest
+from tests.test_helper import get_random_str
+
+pytestmark = pytest.mark.asyncio
+
+
+def test_compile_scope_matcher():
+    matcher = compile_scope_matcher({"portfolio": ["read", "*"], "user": ["read"]})
+    assert matcher.match("portfolio:delete")
+    assert matcher.match("user:read")
+    assert not matcher.match("user:delete")
+
+
+async def test_token_cache_expires_with_token(mocker):
+    token = get_random_str()
+    decode = mocker.patch(
+        "app.core.jwt.jwt.decode", side_effect=lambda *args, **kwargs: {"username": "test", "exp": time.time() + 1}
+    )
+    assert _get_authorization_token(f"Bearer {token}").username == "test"
+    assert _get_authorization_token(f"Bearer {token}").username == "test"
+    assert decode.call_count == 1
+    # 缓存时长不超过token剩余有效期
+    await asyncio.sleep(1.1)
+    assert token_cache.get(token) is None
+    _get_authorization_token(f"Bearer {token}")
+    assert decode.call_count == 2
+
+
+async def test_user_cache_expires(mocker):
+    mocker.patch.object(user_cache, "ttl", 1)
+    username = get_random_str()
+    user_cache.set(username, "cached")
+    assert user_cache.get(username) == "cached"
+    await asyncio.sleep(1.1)
+    assert user_cache.get(username) is None
+
+
+async def test_user_cache_invalidated_on_update(fixture_db):
+    username, other = get_random_str(), get_random_str()
+    await get_user_collection(fixture_db).insert_one({"username": username})
+    user_cache.set(username, "cached")
+    user_cache.set(other, "cached")
+    await delete_user(fixture_db, username)
+    assert user_cache.get(username) is None
+    assert user_cache.get(other) == "cached"
+    # 角色变更清空全部用户缓存
+    await update_user_roles(fixture_db, ObjectId(), ["免费用户"])
+    assert user_cache.get(other) is None
+    invalidate_user_cache()
+
+
+async def test_scope_matcher_cache_invalidated_on_role_and_permission_update(fixture_db):
+    role = get_random_str()
+    user = SimpleNamespace(roles=[role])
+    await 增加一个角色(fixture_db, Role(name=role))
+    user_read = 角色权限InRequest(role=role, permissions={"user": ["read"]})
+    portfolio_read = 角色权限InRequest(role=role, permissions={"portfolio": ["read"]})
+    await 增加一条权限记录(fixture_db, user_read)
+    try:
+        assert not (await 获取某用户的权限匹配器(fixture_db, user)).match("portfolio:read")
+        assert (role,) in scope_matcher_cache
+        await 删除一条权限记录(fixture_db, user_read)
+        assert (role,) not in scope_matcher_cache
+        await 增加一条权限记录(fixture_db, portfolio_read)
+        matcher = await 获取某用户的权限匹配器(fixture_db, user)
+        assert matcher.match("portfolio:read")
+        assert not matcher.match("user:read")
+        await 删除一条权限记录(fixture_db, portfolio_read)
+    finally:
+        await 删除一个角色(fixture_db, Role(name=role))
+    assert (role,) not in scope_matcher_cache
@@ -0,0 +1,35 @@
+import time
+
+import pytest
+
+from app.core.errors import DataQueryTimeout
+from app.core.executor import BlockingExecutor
+
+pytestmark = pytest.mark.asyncio
+
+
+def add(x, y):
+    return x + y
+
+
+def fail():
+    raise ValueError("fail")
+
+
+async def test_blocking_executor_run():
+    executor = BlockingExecutor(max_workers=2, timeout=1)
+    assert await executor.run(add, 1, y=2) == 3
+    with pytest.raises(ValueError):
+        await executor.run(fail)
+    with pytest.raises(DataQueryTimeout):
+        await executor.run(time.sleep, 0.5, timeout=0.1)
+    stats = executor.stats()["funcs"]
+    assert stats["add"]["calls"] == 1
+    assert stats["fail"]["errors"] == 1
+    assert stats["sleep"]["timeouts"] == 1
+    executor.shutdown(wait=True)
+
+
+def test_blocking_executor_kind():
+    with pytest.raises(ValueError):
+        BlockingExecutor(kind="fiber")
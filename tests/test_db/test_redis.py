@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from app.global_var import G
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_mget_mset():
+    redis = G.scheduler_redis
+    await redis.mset({"test_mset_a": "1", "test_mset_b": "2"}, expire=60)
+    assert await redis.mget(["test_mset_a", "test_mset_b", "test_mset_c"], default="0") == ["1", "2", "0"]
+    assert await redis.mget([]) == []
+    await redis.delete("test_mset_a")
+    await redis.delete("test_mset_b")
+
+
+async def test_hgetall_many():
+    redis = G.entrust_redis
+    await redis.hmset_dict("test_hash_a", {"order_1": "1"})
+    assert await redis.hgetall_many(["test_hash_a", "test_hash_b"], {}) == [{"order_1": "1"}, {}]
+    assert await redis.hmget("test_hash_a", "order_1", "order_2") == ["1", None]
+    await redis.delete("test_hash_a")
+
+
+async def test_get_cached():
+    redis = G.scheduler_redis
+    key = "test_get_cached"
+    # 不存在的键不缓存
+    assert await redis.get_cached(key) is None
+    await redis.set(key, "1", 1)
+    assert await redis.get_cached(key) == "1"
+    assert await redis.get_cached_many([key, "test_get_cached_missing"], default="0") == ["1", "0"]
+    # 键在redis中过期后不再读取本地缓存
+    await asyncio.sleep(1.1)
+    assert await redis.get_cached(key) is None
+    stats = redis.stats()
+    assert stats["MGET"]["calls"] >= 2
+    assert stats["MGET"]["errors"] == 0
+
+
+async def test_blpop():
+    redis = G.scheduler_redis
+    key = "test_blpop"
+    await redis.execute("RPUSH", key, "1")
+    assert await redis.blpop(key, 1) == [key, "1"]
+    assert await redis.blpop(key, 1) is None
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from app.outer_sys.hq.cache import HQCache
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeSource:
+    def __init__(self):
+        self.calls = []
+
+    async def fetch_many(self, securities, return_exceptions=False):
+        self.calls.append(list(securities))
+        await asyncio.sleep(0.01)
+        return [f"{symbol}.{exchange}" if symbol != "error" else ValueError(symbol) for symbol, exchange in securities]
+
+    async def fetch(self, symbol, exchange):
+        return (await self.fetch_many([(symbol, exchange)]))[0]
+
+
+async def test_get_hit_and_miss():
+    source, cache = FakeSource(), HQCache(ttl={"price": 60}, maxsize=10)
+    assert await cache.get("price", "600001", "1", source.fetch) == "600001.1"
+    assert await cache.get("price", "600001", "1", source.fetch) == "600001.1"
+    assert len(source.calls) == 1
+    assert cache.stats()["price"]["hit"] == 1
+    assert cache.stats()["price"]["miss"] == 1
+
+
+async def test_concurrent_miss_coalesced():
+    source, cache = FakeSource(), HQCache(ttl={"price": 60}, maxsize=10)
+    results = await asyncio.gather(*[cache.get("price", "600001", "1", source.fetch) for _ in range(5)])
+    assert results == ["600001.1"] * 5
+    assert len(source.calls) == 1
+    assert cache.stats()["price"]["coalesced"] == 4
+
+
+async def test_get_many_only_fetch_missing():
+    source, cache = FakeSource(), HQCache(ttl={"price": 60}, maxsize=10)
+    await cache.get("price", "600001", "1", source.fetch)
+    results = await cache.get_many("price", [("600001", "1"), ("000001", "0")], source.fetch_many)
+    assert results == ["600001.1", "000001.0"]
+    assert source.calls[-1] == [("000001", "0")]
+
+
+async def test_get_many_return_exceptions():
+    source, cache = FakeSource(), HQCache(ttl={"price": 60}, maxsize=10)
+    results = await cache.get_many("price", [("error", "1"), ("000001", "0")], source.fetch_many, return_exceptions=True)
+    assert isinstance(results[0], ValueError)
+    with pytest.raises(ValueError):
+        await cache.get("price", "error", "1", source.fetch)
+
+
+async def test_lru_eviction():
+    source, cache = FakeSource(), HQCache(ttl={"price": 60}, maxsize=1)
+    await cache.get("price", "600001", "1", source.fetch)
+    await cache.get("price", "000001", "0", source.fetch)
+    await cache.get("price", "600001", "1", source.fetch)
+    assert len(source.calls) == 3
+
+
+async def test_ttl_merged_with_default():
+    source, cache = FakeSource(), HQCache(ttl={"price": 60}, maxsize=10)
+    # 未配置的数据类型使用默认缓存时长
+    assert await cache.get("hq", "600001", "1", source.fetch) == "600001.1"
+    assert await cache.get("hq", "600001", "1", source.fetch) == "600001.1"
+    assert len(source.calls) == 1
+    assert cache._get_ttl("price") == 60
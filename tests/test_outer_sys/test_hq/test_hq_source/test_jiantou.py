@@ -49,11 +49,15 @@ class FakeJiantouRequest:
     async def get(self, *args, **kwargs):
         return self.FakeResponse()
 
+    async def aclose(self):
+        ...
+
 
 @pytest.fixture(autouse=True, scope="module")
-def jiantou(module_mocker):
+async def jiantou(module_mocker):
     module_mocker.patch("app.outer_sys.hq.hq_source.jiantou.httpx.AsyncClient", side_effect=FakeJiantouRequest)
-    return JiantouHQ()
+    yield JiantouHQ()
+    await JiantouHQ.shutdown()
 
 
 async def test_jiantou_field():
@@ -95,3 +99,33 @@ async def test_get_security_ticks(jiantou):
     assert json.exchange == EXCHANGE
     assert float(json.bid1_p) == float(FAKE_HQ_JSON["result"]["bestBid1"])
 
+
+
+async def test_get_security_prices(jiantou):
+    security_list = await jiantou.get_security_prices([(SYMBOL, EXCHANGE), (SYMBOL, EXCHANGE)])
+    assert len(security_list) == 2
+    for security in security_list:
+        assert security.symbol == SYMBOL
+        assert float(security.current) == float(FAKE_HQ_JSON["result"]["consecutivePresentPrice"])
+
+
+async def test_get_security_hqs(jiantou):
+    security_list = await jiantou.get_security_hqs([(SYMBOL, EXCHANGE)])
+    assert len(security_list) == 1
+    assert float(security_list[0].open) == float(FAKE_HQ_JSON["result"]["open"])
+
+
+async def test_get_security_infos_return_exceptions(jiantou):
+    security_list = await jiantou.get_security_infos([(SYMBOL, EXCHANGE)], return_exceptions=True)
+    assert isinstance(security_list[0], HQSourceError)
+
+
+async def test_fetch_reuse_client_and_response(jiantou, mocker):
+    await jiantou.shutdown()
+    await jiantou.startup()
+    client = jiantou._client
+    request = mocker.spy(client, "get")
+    await jiantou.get_security_price(SYMBOL, EXCHANGE)
+    await jiantou.get_security_ticks(SYMBOL, EXCHANGE)
+    assert jiantou._client is client
+    assert request.call_count == 1
@@ -0,0 +1,24 @@
+import pytest
+
+from app.outer_sys.hq.hq_source.redis import RedisHQ
+from tests.mocks.mock_hq import FakeHQ
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_get_security_prices(mocker):
+    securities = [("601816", "1"), ("000001", "0")]
+    cached = await FakeHQ.get_security_price(*securities[0])
+    fallback = await FakeHQ.get_security_price(*securities[1])
+
+    class FakeRedis:
+        async def hgetall_many(self, keys, default=None):
+            assert keys == ["601816.SH", "000001.SZ"]
+            return [cached.dict(), default]
+
+    mocker.patch.object(RedisHQ, "_get_redis", return_value=FakeRedis())
+    get_security_price = mocker.patch.object(RedisHQ, "get_security_price", side_effect=FakeHQ.get_security_price)
+    rv = await RedisHQ.get_security_prices(securities)
+    assert rv == [cached, fallback]
+    # 管道中未读取到的证券回退到单只读取
+    get_security_price.assert_called_once_with(*securities[1])
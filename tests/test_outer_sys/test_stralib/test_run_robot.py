@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.errors import PermissionDenied
+from app.outer_sys.stralib.robot.run_robot import RobotContextCache
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_robot_context_cache(mocker):
+    async def fake_get_portfolio_robot(sid):
+        await asyncio.sleep(0)
+        return {"标识符": sid, "计算时间": "20210305", "name": "robot"}
+
+    async def fake_get_stralib_robot_data(sid):
+        return SimpleNamespace(data={})
+
+    mock_robot = mocker.patch(
+        "app.outer_sys.stralib.robot.run_robot.RobotTools.get_portfolio_robot", side_effect=fake_get_portfolio_robot
+    )
+    mock_data = mocker.patch(
+        "app.outer_sys.stralib.robot.run_robot.get_stralib_robot_data", side_effect=fake_get_stralib_robot_data
+    )
+    robot_contexts = RobotContextCache()
+    contexts = await asyncio.gather(*(robot_contexts.get("10000000sid001") for _ in range(5)))
+    assert mock_robot.call_count == mock_data.call_count == 1
+    # RobotData中的数据共享, 对RobotData属性的赋值及机器人配置各自独立
+    assert len({id(source_data.data) for _, source_data in contexts}) == 1
+    contexts[0][1].data = None
+    assert contexts[1][1].data == {}
+    assert robot_contexts.lock("10000000sid001") is robot_contexts.lock("10000000sid001")
+    contexts[0][0]["name"] = "changed"
+    assert contexts[1][0]["name"] == "robot"
+    # 不支持检测的机器人只查询一次
+    for _ in range(2):
+        with pytest.raises(PermissionDenied):
+            await robot_contexts.get("15000000sid001")
+    assert mock_robot.call_count == 2
@@ -2,6 +2,7 @@ from contextlib import nullcontext
 from datetime import datetime
 
 import pytest
+from aiohttp import ClientPayloadError
 from yarl import URL
 
 from app.outer_sys.trade_system.pt.mapper import INPUT, INTERFACE
@@ -242,3 +243,53 @@ async def test_manual_clear(pt_adaptor: PTAdaptor):
     tir = await pt_adaptor.manual_clear(**kwargs)
     assert tir.flag
     assert tir.data == "清算完成"
+
+
+async def test_get_fund_assets_many(pt_adaptor: PTAdaptor):
+    fund_ids = [get_random_str() for _ in range(3)]
+    result = await pt_adaptor.get_fund_assets_many(fund_ids + fund_ids[:1], convert_out=False)
+    assert list(result) == fund_ids
+    for fund_id, tir in result.items():
+        assert tir.flag
+        assert tir.data["_id"] == fund_id
+
+
+async def test_get_fund_stocks_many(pt_adaptor: PTAdaptor):
+    fund_ids = [get_random_str() for _ in range(2)]
+    result = await pt_adaptor.get_fund_stocks_many(fund_ids, convert_out=False)
+    assert all(tir.data == PT_POSITION_GET_RESPONSE for tir in result.values())
+
+
+async def test_request_interface_cache(pt_adaptor: PTAdaptor):
+    fund_id = get_random_str()
+    tir = await pt_adaptor.get_fund_asset(fund_id=fund_id, convert_out=False)
+    # 修改返回数据不影响缓存
+    tir.data["_id"] = None
+    assert len([key for key in pt_adaptor._cache.keys() if key[0] == fund_id]) == 1
+    tir = await pt_adaptor.get_fund_asset(fund_id=fund_id, convert_out=False)
+    assert tir.data["_id"] == fund_id
+    pt_adaptor.invalidate_cache(fund_id)
+    assert not [key for key in pt_adaptor._cache.keys() if key[0] == fund_id]
+
+
+async def test_request_interface_circuit_open(fixture_settings):
+    pt_adaptor = PTAdaptor(fixture_settings.trade_url)
+    for _ in range(pt_adaptor._breaker.failure_threshold):
+        pt_adaptor._breaker.record_failure()
+    tir = await pt_adaptor.get_fund_asset(fund_id=get_random_str(), convert_out=False)
+    assert not tir.flag
+    assert "熔断" in tir.msg
+    await pt_adaptor.close()
+
+
+async def test_request_interface_probe_released(fixture_settings, mocker):
+    pt_adaptor = PTAdaptor(fixture_settings.trade_url)
+    pt_adaptor._breaker.recovery_timeout = 0
+    for _ in range(pt_adaptor._breaker.failure_threshold):
+        pt_adaptor._breaker.record_failure()
+    mocker.patch.object(pt_adaptor, "request_wrapper", side_effect=ClientPayloadError("payload"))
+    with pytest.raises(ClientPayloadError):
+        await pt_adaptor.get_fund_asset(fund_id=get_random_str(), convert_out=False)
+    # 试探请求异常退出后仍可再次试探
+    assert pt_adaptor._breaker.allow_request()
+    await pt_adaptor.close()
@@ -0,0 +1,35 @@
+from app.outer_sys.trade_system.circuit_breaker import CircuitBreaker
+
+
+def test_circuit_breaker(mocker):
+    now = mocker.patch("app.outer_sys.trade_system.circuit_breaker.time.monotonic", return_value=100)
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    now.return_value = 110
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 半开状态只放行一个试探请求
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    now.return_value = 120
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_release_probe(mocker):
+    now = mocker.patch("app.outer_sys.trade_system.circuit_breaker.time.monotonic", return_value=100)
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+    now.return_value = 110
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    # 试探请求被取消后释放试探名额
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
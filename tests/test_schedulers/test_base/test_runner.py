@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from app.schedulers.base.runner import (
+    LEADER_KEY,
+    REQUEUE_SCRIPT,
+    SHARD_QUEUE_KEY,
+    SHARD_RUNNING_KEY,
+    DistributedJobRunner,
+    get_func_path,
+    get_shard_progress,
+    load_func,
+    run_as_leader,
+)
+from app.schedulers.risk.func import preload_robot_data
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.hashes = {}
+        self.lists = {}
+
+    async def execute(self, command, *args, **kwargs):
+        if command == "SET":
+            key, value = args[0], args[1]
+            if key in self.data:
+                return None
+            self.data[key] = value
+            return b"OK"
+        if command == "EVAL" and args[0] == REQUEUE_SCRIPT:
+            running, queue, field, value, payload = args[2:]
+            if self.hashes.get(running, {}).get(field) != value:
+                return 0
+            del self.hashes[running][field]
+            self.lists.setdefault(queue, []).append(payload)
+            return len(self.lists[queue])
+        if command == "EVAL":
+            return int(self.data.get(args[2]) == args[3])
+        return None
+
+    async def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    async def hmset_dict(self, key, value):
+        self.hashes.setdefault(key, {}).update(value)
+
+    async def hgetall(self, key, default=None):
+        return self.hashes.get(key, default)
+
+    async def hdel(self, key, field, *fields):
+        for f in (field, *fields):
+            self.hashes.get(key, {}).pop(f, None)
+
+
+def test_load_func():
+    assert load_func(get_func_path(preload_robot_data)) is preload_robot_data
+    with pytest.raises(ValueError):
+        load_func("os.system")
+
+
+async def test_acquire_leader():
+    redis = FakeRedis()
+    runner1, runner2 = DistributedJobRunner(redis), DistributedJobRunner(redis)
+    runner2.worker_id = "other"
+    assert await runner1.acquire_leader()
+    runner1.is_leader = True
+    assert await runner1.acquire_leader()
+    assert not await runner2.acquire_leader()
+
+
+async def test_run_shard(mocker):
+    calls = []
+
+    async def fake_func(job_idx, job_num):
+        calls.append((job_idx, job_num))
+
+    mocker.patch("app.schedulers.base.runner.load_func", return_value=fake_func)
+    redis = FakeRedis()
+    runner = DistributedJobRunner(redis)
+    await runner.run_shard({"func": "app.schedulers.risk.func.preload_robot_data", "args": [1, 3], "run_id": "preload_robot_data_202103050000"})
+    assert calls == [(1, 3)]
+    progress = await get_shard_progress(redis, "preload_robot_data_202103050000")
+    assert progress["1"]["status"] == "success"
+    assert json.dumps(progress)
+    assert SHARD_RUNNING_KEY not in redis.hashes or not redis.hashes[SHARD_RUNNING_KEY]
+
+
+async def test_run_as_leader(mocker):
+    calls = []
+
+    async def fake_func(*args):
+        calls.append(args)
+
+    mocker.patch("app.schedulers.base.runner.load_func", return_value=fake_func)
+    on_demoted = mocker.patch.object(DistributedJobRunner, "on_demoted")
+    redis = FakeRedis()
+    runner = DistributedJobRunner(redis)
+    mocker.patch("app.schedulers.base.runner.job_runner", runner)
+    redis.data[LEADER_KEY] = runner.worker_id
+    runner.is_leader = True
+    await run_as_leader("app.schedulers.risk.func.risk_detection_task")
+    assert calls == [()]
+    # 租约已被其他worker接管时跳过并暂停调度
+    redis.data[LEADER_KEY] = "other"
+    await run_as_leader("app.schedulers.risk.func.risk_detection_task")
+    assert calls == [()]
+    assert not runner.is_leader
+    on_demoted.assert_called_once()
+
+
+async def test_requeue_expired():
+    redis = FakeRedis()
+    runner = DistributedJobRunner(redis, visibility_timeout=60)
+    message = {"func": "app.schedulers.risk.func.preload_robot_data", "args": [1, 3], "run_id": "preload_robot_data_202103050000"}
+    redis.hashes[SHARD_RUNNING_KEY] = {
+        "preload_robot_data_202103050000:1": json.dumps({"message": message, "worker": "crashed", "heartbeat": 0}),
+        "preload_robot_data_202103050000:2": json.dumps({"message": {**message, "args": [2, 3]}, "worker": "alive", "heartbeat": 2 ** 40}),
+    }
+    await runner.requeue_expired()
+    assert [json.loads(item) for item in redis.lists[SHARD_QUEUE_KEY]] == [{**message, "requeued": 1}]
+    assert list(redis.hashes[SHARD_RUNNING_KEY]) == ["preload_robot_data_202103050000:2"]
+    progress = await get_shard_progress(redis, "preload_robot_data_202103050000")
+    assert progress["1"]["status"] == "pending"
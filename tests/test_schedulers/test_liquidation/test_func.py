@@ -1,7 +1,9 @@
 from copy import deepcopy
 from datetime import date, datetime
 from decimal import Decimal
+from types import SimpleNamespace
 
+import pandas as pd
 import pytest
 from stralib import FastTdate
 
@@ -25,10 +27,13 @@ from app.models.fund_account import FundAccountFlowInDB, FundAccountPositionInDB
 from app.models.rwmodel import PyDecimal
 from app.models.time_series_data import PositionTimeSeriesDataInDB
 from app.schedulers.liquidation.func import (
+    filter_dividend_detail,
     liquidate_dividend_flow_task,
     liquidate_dividend_task,
     liquidate_dividend_tax_task,
+    liquidate_fund_account_dividend,
     make_ts_position,
+    prefetch_dividend_detail,
     reverse_flow,
     time_series_position2dividend,
     update_fund_account_by_flow,
@@ -150,6 +155,18 @@ def test_update_time_series_position_data_by_flow(
             assert position.stkbal == 5000
 
 
+def test_filter_dividend_detail():
+    dividend_detail = pd.DataFrame(
+        {
+            "code": ["600519", "600519"],
+            "dividend_pay_date": [datetime(2019, 6, 28), datetime(2020, 6, 24)],
+        }
+    )
+    rv = filter_dividend_detail(dividend_detail, date(2020, 6, 24))
+    assert len(rv) == 1
+    assert filter_dividend_detail(dividend_detail.iloc[0:0], date(2020, 6, 24)).empty
+
+
 @pytest.mark.parametrize(
     "symbol, record_dates, pay_dates, fundeffect_list, stkeffect_list",
     [
@@ -289,6 +306,124 @@ async def test_liquidate_dividend_task_with_ts_data_sync_date(
     assert position_updated[0].volume == 1000
 
 
+async def test_liquidate_fund_account_dividend(
+    fixture_db,
+    portfolio_with_fund_account,
+    fund_account_flow_in_db,
+    fund_account_position_data,
+    mocker,
+):
+    _, fund_account = portfolio_with_fund_account
+    fund_id = str(fund_account.id)
+    record_dates = [datetime(2019, 6, 27), datetime(2020, 6, 23)]
+    position_time_series_data = [
+        PositionTimeSeriesDataInDB(
+            fund_id=fund_id,
+            tdate=record_date,
+            position_list=[
+                {
+                    "symbol": "600519",
+                    "market": "CNSESH",
+                    "stkbal": 1000,
+                    "mktval": "100000",
+                    "buy_date": record_dates[0],
+                }
+            ],
+        )
+        for record_date in record_dates
+    ]
+    # 待失效的分红流水
+    flow = deepcopy(fund_account_flow_in_db)
+    flow.ttype = FlowTType.DIVIDEND
+    flow.fundeffect = PyDecimal("100")
+    flow.stkeffect = 0
+    flow.fund_id = fund_id
+    flow.symbol = "600519"
+    flow.tdate = datetime(2020, 6, 24)
+    await delete_fund_account_flow_many(fixture_db, {})
+    flow_in_db = await create_fund_account_flow(fixture_db, flow)
+    position = FundAccountPositionInDB(**fund_account_position_data)
+    position.cost = PyDecimal("500")
+    position.symbol = "600519"
+    position.fund_id = fund_id
+    position.volume = 1000
+    position = await create_fund_account_position(fixture_db, position)
+
+    dividend_details = await prefetch_dividend_detail(["600519"])
+    # 清算只使用预取的分红明细, 不再逐条查询
+    query_data = mocker.patch("zvt.api.DividendDetail.query_data")
+    await liquidate_fund_account_dividend(
+        fixture_db,
+        fund_account,
+        datetime(2019, 6, 26),
+        position_time_series_data,
+        [flow_in_db],
+        dividend_details,
+        get_early_morning(),
+    )
+    query_data.assert_not_called()
+
+    with pytest.raises(EntityDoesNotExist):
+        await get_fund_account_flow_by_id(fixture_db, flow_in_db.id)
+    for pay_date, fundeffect in [(date(2019, 6, 28), Decimal("14539")), (date(2020, 6, 24), Decimal("17025"))]:
+        flow_list = await get_fund_account_flow_from_db(
+            fixture_db, fund_id=fund_id, ttype=[FlowTType.DIVIDEND], tdate=pay_date
+        )
+        assert sum(flow.fundeffect.to_decimal() for flow in flow_list) == fundeffect
+    # 失效流水的派息日分红明细用于还原成本价
+    updated_position = await get_fund_account_position_by_id(fixture_db, position.id)
+    assert updated_position.cost.to_decimal() == Decimal("517.025")
+    updated_fund_account = await get_fund_account_by_id(fixture_db, fund_account.id)
+    assert fund_account.cash.to_decimal() - updated_fund_account.cash.to_decimal() == Decimal("100")
+
+
+async def test_liquidate_dividend_task_marks_failure(mocker):
+    async def get_list(*args, **kwargs):
+        return []
+
+    async def prefetch(*args, **kwargs):
+        raise ValueError("error")
+
+    mocker.patch("app.schedulers.liquidation.func.get_portfolio_list", side_effect=get_list)
+    mocker.patch("app.schedulers.liquidation.func.get_fund_account_from_db", side_effect=get_list)
+    mocker.patch("app.schedulers.liquidation.func.prefetch_dividend_detail", side_effect=prefetch)
+    set_task_failed = mocker.patch(
+        "app.schedulers.liquidation.func.CheckStatus.set_task_failed", side_effect=get_list
+    )
+    redis_set = mocker.Mock(side_effect=get_list)
+    mocker.patch("app.schedulers.liquidation.func.G.scheduler_redis", SimpleNamespace(set=redis_set))
+    with pytest.raises(ValueError):
+        await liquidate_dividend_task()
+    # 清算失败时不设置完成标记, 另行标记失败
+    redis_set.assert_not_called()
+    set_task_failed.assert_called_once_with("liquidate_dividend")
+
+
+async def test_liquidate_dividend_flow_task_skipped_on_upstream_failure(mocker):
+    async def not_finished():
+        return False
+
+    async def failed(name):
+        return name == "liquidate_dividend"
+
+    async def coro(*args, **kwargs):
+        ...
+
+    mocker.patch(
+        "app.schedulers.liquidation.func.CheckStatus.check_liquidate_dividend_status", not_finished
+    )
+    mocker.patch("app.schedulers.liquidation.func.CheckStatus.check_task_failed", side_effect=failed)
+    set_task_failed = mocker.patch(
+        "app.schedulers.liquidation.func.CheckStatus.set_task_failed", side_effect=coro
+    )
+    liquidate_dividend_flow = mocker.patch(
+        "app.schedulers.liquidation.func.liquidate_dividend_flow", side_effect=coro
+    )
+    await liquidate_dividend_flow_task()
+    liquidate_dividend_flow.assert_not_called()
+    set_task_failed.assert_called_once_with("liquidate_dividend_flow")
+
+
 @pytest.mark.parametrize("fundeffect", (Decimal("0"), Decimal("100"), Decimal("150")))
 async def test_update_fund_account_by_flow(
     fixture_db,
@@ -1,5 +1,6 @@
 from datetime import timedelta
 from decimal import Decimal
+from types import SimpleNamespace
 
 import pytest
 from stralib import FastTdate
@@ -10,8 +11,10 @@ from app.models.fund_account import FundAccountInDB, FundAccountPositionInDB
 from app.schedulers.time_series_data.func import (
     generate_history_time_series_data,
     save_history_time_series_data,
+    save_time_series_data,
     save_today_time_series_data,
 )
+from app.service.time_series_data.writer import TimeSeriesDataWriter
 from app.utils.datetime import date2datetime
 from tests.test_helper import get_random_str
 
@@ -158,3 +161,44 @@ async def test_save_history_time_series_data(mocker, fund_account_data):
         CurrencyType.CNY,
     )
     assert len(operations) == 2
+
+
+async def test_save_time_series_data_isolates_fund_accounts(mocker, fund_account_data):
+    fund_accounts = [FundAccountInDB(**fund_account_data) for _ in range(2)]
+    portfolio = SimpleNamespace(id=get_random_str(), category=PortfolioCategory.ManualImport)
+
+    async def coro(*args, **kwargs):
+        ...
+
+    async def coro_value(value):
+        return value
+
+    async def get_portfolios_fund_list(*args, **kwargs):
+        return {portfolio.id: fund_accounts}
+
+    async def generate_time_series_operations(fund_account, *args, **kwargs):
+        if fund_account is fund_accounts[0]:
+            raise ValueError("error")
+        return ["position"], ["fund"]
+
+    mocker.patch("app.schedulers.time_series_data.func.FastTdate.is_tdate", return_value=True)
+    mocker.patch(
+        "app.schedulers.time_series_data.func.get_portfolios_fund_list", side_effect=get_portfolios_fund_list
+    )
+    mocker.patch(
+        "app.schedulers.time_series_data.func.generate_time_series_operations",
+        side_effect=generate_time_series_operations,
+    )
+    mocker.patch("app.schedulers.time_series_data.func.refresh_portfolio_snapshots", side_effect=coro)
+    get_fund_accounts_position = mocker.patch(
+        "app.schedulers.time_series_data.func.get_fund_accounts_position",
+        side_effect=lambda conn, fund_ids, category: coro_value({fund_id: [] for fund_id in fund_ids}),
+    )
+    add = mocker.patch.object(TimeSeriesDataWriter, "add", side_effect=coro)
+    flush = mocker.patch.object(TimeSeriesDataWriter, "flush", side_effect=coro)
+    # 单个资金账户失败不影响其他资金账户, 已累计的操作仍会写入
+    await save_time_series_data([portfolio])
+    add.assert_called_once_with(str(fund_accounts[1].id), ["position"], ["fund"])
+    flush.assert_called_once()
+    # 持仓按组合类别一次批量获取
+    get_fund_accounts_position.assert_called_once()
@@ -0,0 +1,62 @@
+import pytest
+from wechatpy import WeChatClientException
+
+from app.core.auth_cache import user_cache
+from app.core.errors import DataQueryTimeout
+from app.crud.base import get_user_collection
+from app.schedulers.wechat.func import sync_wechat_avatar_task
+from tests.test_helper import get_random_str
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_sync_wechat_avatar_task(fixture_db, mocker):
+    users = [
+        {"username": get_random_str(), "open_id": get_random_str(), "avatar": "old"},
+        {"username": get_random_str(), "open_id": get_random_str(), "avatar": "same"},
+        {"username": get_random_str(), "open_id": get_random_str(), "avatar": "missing"},
+    ]
+    await get_user_collection(fixture_db).insert_many(users)
+    avatars = {users[0]["open_id"]: "new", users[1]["open_id"]: "same"}
+
+    async def fake_get_wechat_users(open_ids):
+        return {open_id: {"openid": open_id, "headimgurl": avatars[open_id]} for open_id in open_ids if open_id in avatars}
+
+    mocker.patch("app.schedulers.wechat.func.get_wechat_users", side_effect=fake_get_wechat_users)
+    for user in users:
+        user_cache.set(user["username"], "cached")
+    await sync_wechat_avatar_task(fixture_db)
+    # 只清除头像有变化的用户缓存
+    assert [user_cache.get(user["username"]) for user in users] == [None, "cached", "cached"]
+    rows = {row["username"]: row async for row in get_user_collection(fixture_db).find({"username": {"$in": [u["username"] for u in users]}})}
+    assert [rows[user["username"]]["avatar"] for user in users] == ["new", "same", "missing"]
+    await get_user_collection(fixture_db).delete_many({"username": {"$in": [u["username"] for u in users]}})
+
+
+async def test_sync_wechat_avatar_task_with_failed_batch(fixture_db, mocker):
+    users = [{"username": get_random_str(), "open_id": get_random_str(), "avatar": "old"} for _ in range(4)]
+    await get_user_collection(fixture_db).insert_many(users)
+    open_ids = [user["open_id"] for user in users]
+    invalid_open_id, timeout_open_id = open_ids[1], open_ids[3]
+
+    async def fake_get_wechat_users(batch):
+        # 有无效open_id时整批被拒绝
+        if invalid_open_id in batch:
+            raise WeChatClientException(40003, "invalid openid")
+        return {open_id: {"openid": open_id, "headimgurl": "new"} for open_id in batch if open_id in open_ids[:3]}
+
+    mocker.patch("app.schedulers.wechat.func.get_wechat_users", side_effect=fake_get_wechat_users)
+    await sync_wechat_avatar_task(fixture_db)
+    rows = {row["username"]: row async for row in get_user_collection(fixture_db).find({"username": {"$in": [u["username"] for u in users]}})}
+    # 同批中的有效用户仍更新
+    assert [rows[user["username"]]["avatar"] for user in users] == ["new", "old", "new", "old"]
+
+    async def fake_get_wechat_users_timeout(batch):
+        if timeout_open_id in batch:
+            raise DataQueryTimeout
+        return {}
+
+    mocker.patch("app.schedulers.wechat.func.get_wechat_users", side_effect=fake_get_wechat_users_timeout)
+    # 超时的批次跳过, 不中断同步
+    await sync_wechat_avatar_task(fixture_db)
+    await get_user_collection(fixture_db).delete_many({"username": {"$in": [u["username"] for u in users]}})
@@ -0,0 +1,107 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.service.backtest import BacktestSession, next_backtest_day, snapshot_回测数据
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_day(day, last_signals=None):
+    data = {"asset": {"fundbal": 500000, "mktval": 0}, "stocks": [], "signals": [], "last_signals": last_signals or []}
+    return {datetime(2021, 3, day): data}
+
+
+class FakeMatchUp:
+    def __init__(self, days):
+        self.days = days
+
+    def robot_yield_trader(self):
+        for day in self.days:
+            yield day
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+def test_next_backtest_day():
+    generator = FakeMatchUp([make_day(1)]).robot_yield_trader()
+    tdate, data = next_backtest_day(generator)
+    assert tdate == datetime(2021, 3, 1)
+    assert data["asset"] == {"fundbal": 500000, "mktval": 0}
+    assert next_backtest_day(generator) is None
+
+
+def test_snapshot_回测数据():
+    data = {
+        "asset": {"fundbal": 500000, "mktval": 0},
+        "stocks": [{"symbol": "600000", "detail": {"stkbal": 100}}],
+        "signals": [],
+        "last_signals": [],
+        "other": object(),
+    }
+    snapshot = snapshot_回测数据(data)
+    # 后续交易日修改嵌套结构不影响当日快照
+    data["stocks"][0]["detail"]["stkbal"] = 200
+    assert snapshot["stocks"][0]["detail"]["stkbal"] == 100
+    assert "other" not in snapshot
+
+
+async def test_get_robot_data_cached(mocker):
+    get_robot_data = mocker.patch("app.service.backtest.get_robot_data", side_effect=lambda *args: object())
+    session = BacktestSession(FakeWebSocket(), None)
+    robot = SimpleNamespace(标识符="10000000000001")
+    first = await session.get_robot_data(robot, "20210301", "20210305")
+    # 开始日期随回测推进, 仍在已加载的区间内
+    second = await session.get_robot_data(robot, "20210303", "20210305")
+    assert first is second
+    assert get_robot_data.call_count == 1
+    third = await session.get_robot_data(robot, "20210303", "20210310")
+    assert third is not first
+    assert get_robot_data.call_count == 2
+
+
+async def test_get_robot_data_date_format(mocker):
+    get_robot_data = mocker.patch("app.service.backtest.get_robot_data", side_effect=lambda *args: object())
+    session = BacktestSession(FakeWebSocket(), None)
+    robot = SimpleNamespace(标识符="10000000000001")
+    first = await session.get_robot_data(robot, "20210301", "20210305")
+    # 日期格式不同时按日期比较, 仍在已加载的区间内
+    second = await session.get_robot_data(robot, "2021-03-03", "2021-03-05")
+    assert first is second
+    assert get_robot_data.call_count == 1
+    # 结束日期超出已加载的区间时重新加载
+    third = await session.get_robot_data(robot, "2021-03-03", "2021-03-10")
+    assert third is not first
+    assert get_robot_data.call_count == 2
+    fourth = await session.get_robot_data(robot, "20210304", "20210310")
+    assert fourth is third
+    assert get_robot_data.call_count == 2
+
+
+async def test_stream(mocker):
+    websocket = FakeWebSocket()
+    session = BacktestSession(websocket, None, queue_size=1)
+    finished = await session.stream(FakeMatchUp([make_day(1), make_day(2), make_day(3)]), is_auto=True)
+    assert finished
+    assert [x["data"]["交易日期"] for x in websocket.sent] == ["20210301", "20210302", "20210303"]
+
+
+async def test_stream_stop_on_signal(mocker):
+    async def fake_format_signal(order, stocks=None):
+        return order
+
+    mocker.patch("app.service.backtest.format_signal", side_effect=fake_format_signal)
+    websocket = FakeWebSocket()
+    session = BacktestSession(websocket, None)
+    days = [make_day(1), make_day(2, last_signals=[{"SYMBOL": "600000"}]), make_day(3)]
+    finished = await session.stream(FakeMatchUp(days), is_auto=False)
+    assert not finished
+    assert len(websocket.sent) == 2
+    assert session._producer is None
@@ -0,0 +1,47 @@
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.service.df import arrow_streamer, negotiate_dataframe_format, parquet_streamer, select_columns, ARROW_MEDIA_TYPE
+
+pytestmark = pytest.mark.asyncio
+
+DF = pd.DataFrame({"symbol": ["600000", "000001", "600519"], "price": [10.1, 12.5, 1800.0], "volume": [100, 200, 300]})
+
+
+async def collect(streamer):
+    return b"".join([chunk async for chunk in streamer])
+
+
+async def test_arrow_streamer():
+    table = pa.Table.from_pandas(select_columns(DF, ["symbol", "price"]))
+    data = await collect(arrow_streamer(table, batch_size=2))
+    df = pa.ipc.open_stream(data).read_pandas()
+    assert df.equals(DF[["symbol", "price"]])
+
+
+async def test_arrow_streamer_compression():
+    data = await collect(arrow_streamer(pa.Table.from_pandas(DF), compression="gzip", batch_size=2))
+    df = pa.ipc.open_stream(pa.CompressedInputStream(pa.BufferReader(data), "gzip")).read_pandas()
+    assert df.equals(DF)
+
+
+async def test_parquet_streamer():
+    data = await collect(parquet_streamer(pa.Table.from_pandas(DF), compression="snappy", batch_size=2))
+    df = pq.read_table(io.BytesIO(data)).to_pandas()
+    assert df.equals(DF)
+
+
+def test_select_columns():
+    assert select_columns(DF) is DF
+    with pytest.raises(ValueError):
+        select_columns(DF, ["unknown"])
+
+
+def test_negotiate_dataframe_format():
+    assert negotiate_dataframe_format("parquet", ARROW_MEDIA_TYPE) == "parquet"
+    assert negotiate_dataframe_format(None, ARROW_MEDIA_TYPE) == "arrow"
+    assert negotiate_dataframe_format(None, None) == "pickle"
@@ -0,0 +1,50 @@
+import pytest
+
+from app.core.errors import DiscuzqCustomError
+from app.crud.base import get_user_collection
+from app.service.disc import DiscSyncEngine
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_create_thread_retry_is_idempotent(fixture_db, mocker):
+    created = []
+
+    async def create_thread(username, title, raw, category):
+        created.append(title)
+        # 文章已创建但响应失败
+        raise DiscuzqCustomError(message="timeout")
+
+    async def get_user_created_threads(username, skip, limit):
+        return [{"id": index + 1, "title": title} for index, title in enumerate(created)]
+
+    mocker.patch("app.service.disc.create_thread", side_effect=create_thread)
+    mocker.patch("app.service.disc.get_user_created_threads", side_effect=get_user_created_threads)
+    engine = DiscSyncEngine(fixture_db, get_user_collection, "disc_id", retries=2, retry_backoff=0)
+    assert await engine.create_thread("user", "title", "raw", 1) == 1
+    assert created == ["title"]
+
+
+async def test_run(fixture_db, mocker):
+    usernames = ["disc_sync_user_1", "disc_sync_user_2", "disc_sync_user_3"]
+    await get_user_collection(fixture_db).insert_many([{"username": username} for username in usernames])
+
+    async def sync(user):
+        if user["username"] == usernames[1]:
+            raise DiscuzqCustomError(message="error")
+        return usernames.index(user["username"]) + 100
+
+    engine = DiscSyncEngine(fixture_db, get_user_collection, "disc_id", retries=0, batch_size=2)
+    collection = mocker.spy(engine, "collection")
+    try:
+        assert await engine.run({"username": {"$in": usernames}}, sync) == 2
+        users = await get_user_collection(fixture_db).find({"username": {"$in": usernames}}).to_list(None)
+        assert {user["username"]: user.get("disc_id") for user in users} == {
+            usernames[0]: 100,
+            usernames[1]: None,
+            usernames[2]: 102,
+        }
+        # 2批, 每批读取、写入各一次
+        assert collection.call_count == 4
+    finally:
+        await get_user_collection(fixture_db).delete_many({"username": {"$in": usernames}})
@@ -24,6 +24,7 @@ from app.service.fund_account.fund_account import (
     generate_simulation_account,
     get_fund_account_flow,
     get_fund_account_position,
+    get_fund_accounts_position,
     get_fund_asset,
     get_net_deposit_flow,
     get_portfolio_fund_list,
@@ -84,19 +85,19 @@ async def test_update_fund_account_by_flow(
     async def fake_position(*args, **kwargs):
         return [FundAccountPositionInDB(**fund_account_position_data)]
 
-    async def fake_price(*args, **kwargs):
+    async def fake_prices(securities, *args, **kwargs):
         class FakeSecurity:
             current = Decimal("10")
 
-        return FakeSecurity()
+        return [FakeSecurity() for _ in securities]
 
     mocker.patch(
         "app.service.fund_account.fund_account.get_fund_account_position_from_db",
         side_effect=fake_position,
     )
     mocker.patch(
-        "app.service.fund_account.fund_account.get_security_price",
-        side_effect=fake_price,
+        "app.service.fund_account.valuation.get_security_prices",
+        side_effect=fake_prices,
     )
 
     async def coro(*args, **kwargs):
@@ -182,6 +183,27 @@ async def test_get_fund_account_position(
     assert portfolio_position[0].exchange
 
 
+@pytest.mark.parametrize(
+    "category,", [PortfolioCategory.ManualImport, PortfolioCategory.SimulatedTrading]
+)
+async def test_get_fund_accounts_position(
+    mocker, fund_account_position_data, fixture_db, category
+):
+    fund_ids = [str(PyObjectId()) for _ in range(2)]
+
+    async def fake_get_fund_account_position_from_db(*args, **kwargs):
+        return [FundAccountPositionInDB(**{**fund_account_position_data, "fund_id": fund_ids[0]})]
+
+    mocker.patch(
+        "app.service.fund_account.fund_account.get_fund_account_position_from_db",
+        side_effect=fake_get_fund_account_position_from_db,
+    )
+    position_lists = await get_fund_accounts_position(fixture_db, fund_ids, category)
+    assert list(position_lists) == fund_ids
+    assert position_lists[fund_ids[0]][0].exchange
+    assert all(position.fund_id == fund_id for fund_id in fund_ids for position in position_lists[fund_id])
+
+
 @pytest.mark.parametrize(
     "category,", [PortfolioCategory.ManualImport, PortfolioCategory.SimulatedTrading]
 )
@@ -289,15 +311,15 @@ async def test_calculate_fund_asset(
         side_effect=fake_get_fund_account_position_from_db,
     )
 
-    async def fake_get_security_price(*args, **kwargs):
+    async def fake_get_security_prices(securities, *args, **kwargs):
         class FakeSecurityPrice:
             current = Decimal(10)
 
-        return FakeSecurityPrice()
+        return [FakeSecurityPrice() for _ in securities]
 
     mocker.patch(
-        "app.service.fund_account.fund_account.get_security_price",
-        side_effect=fake_get_security_price,
+        "app.service.fund_account.valuation.get_security_prices",
+        side_effect=fake_get_security_prices,
     )
     fund_account = await calculate_fund_asset(fixture_db, fund_account_in_db)
     assert (
@@ -0,0 +1,79 @@
+import asyncio
+from copy import deepcopy
+
+import pytest
+
+from app.crud.fund_account import (
+    create_fund_account_flow,
+    delete_fund_account_flow_by_id,
+    delete_fund_account_flow_many,
+    delete_fund_account_statistics_many,
+    get_fund_account_statistics_from_db,
+)
+from app.service.fund_account.statistics import (
+    aggregate_flow_statistics,
+    get_fund_account_statistics,
+    rebuild_fund_account_statistics,
+    subtract_flow_statistics,
+    update_statistics_by_flow,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_update_statistics_by_flow(fixture_db, fund_account_flow_list):
+    flow_list = deepcopy(fund_account_flow_list)
+    fund_id = flow_list[0].fund_id
+    for flow in flow_list:
+        await create_fund_account_flow(fixture_db, flow)
+        await update_statistics_by_flow(fixture_db, flow)
+    stats, *_ = await get_fund_account_statistics_from_db(fixture_db, fund_id=fund_id)
+    expected = aggregate_flow_statistics(flow_list)[stats.symbol]
+    assert (stats.buy_num, stats.sell_num) == (2, 1)
+    assert (stats.buy_volume, stats.sell_volume) == (11000, 5000)
+    assert stats.first_tdate == flow_list[0].tdate
+    assert stats.last_tdate == flow_list[-1].tdate
+    assert stats.get_sell_num(flow_list[1].tdate, flow_list[1].tdate) == 1
+    assert stats.get_sell_num(flow_list[2].tdate, flow_list[2].tdate) == 0
+    assert stats.realized_pnl == pytest.approx(expected.realized_pnl)
+
+    # 删除卖出流水后重建统计
+    await delete_fund_account_flow_by_id(fixture_db, flow_list[1].id)
+    await rebuild_fund_account_statistics(fixture_db, fund_id, stats.symbol)
+    stats, *_ = await get_fund_account_statistics_from_db(fixture_db, fund_id=fund_id)
+    assert (stats.trade_num, stats.sell_num) == (2, 0)
+    assert stats.sell_dates == {}
+    assert stats.realized_pnl == 0
+
+
+def test_subtract_flow_statistics(fund_account_flow_list):
+    flow_list = deepcopy(fund_account_flow_list)
+    statistics = list(aggregate_flow_statistics(flow_list).values())
+    # 扣除卖出流水后与不含该流水的统计一致
+    stats, *_ = subtract_flow_statistics(statistics, flow_list[1:2])
+    expected = aggregate_flow_statistics(flow_list[:1] + flow_list[2:])[stats.symbol]
+    assert (stats.buy_num, stats.sell_num) == (2, 0)
+    assert stats.sell_dates == {}
+    assert stats.realized_pnl == pytest.approx(expected.realized_pnl)
+    # 不修改原统计
+    assert statistics[0].sell_num == 1
+
+
+async def test_rebuild_fund_account_statistics_idempotent(fixture_db, fund_account_flow_list):
+    flow_list = deepcopy(fund_account_flow_list)
+    fund_id = flow_list[0].fund_id
+    await delete_fund_account_flow_many(fixture_db, {"fund_id": fund_id})
+    await delete_fund_account_statistics_many(fixture_db, {"fund_id": fund_id})
+    for flow in flow_list:
+        await create_fund_account_flow(fixture_db, flow)
+    # 尚无统计时查询不写入统计
+    stats, *_ = await get_fund_account_statistics(fixture_db, fund_id)
+    assert (stats.buy_num, stats.sell_num) == (2, 1)
+    assert not await get_fund_account_statistics_from_db(fixture_db, fund_id=fund_id)
+    # 并发及重复重建结果不变
+    await asyncio.gather(*[rebuild_fund_account_statistics(fixture_db, fund_id) for _ in range(3)])
+    await rebuild_fund_account_statistics(fixture_db, fund_id, stats.symbol)
+    statistics = await get_fund_account_statistics_from_db(fixture_db, fund_id=fund_id)
+    assert len(statistics) == 1
+    assert (statistics[0].buy_num, statistics[0].sell_num) == (2, 1)
+    assert (statistics[0].buy_volume, statistics[0].sell_volume) == (11000, 5000)
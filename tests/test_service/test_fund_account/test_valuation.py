@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+import pytest
+
+from app.models.fund_account import FundAccountPositionInDB
+from app.service.fund_account.valuation import calculate_securities
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_calculate_securities(mocker, fund_account_position_data):
+    prices = {("603386", "1"): Decimal("10.123"), ("000001", "0"): Decimal("3.1")}
+    requested = []
+
+    async def fake_get_security_prices(securities, *args, **kwargs):
+        requested.append(securities)
+
+        class FakeSecurityPrice:
+            def __init__(self, current):
+                self.current = current
+
+        return [FakeSecurityPrice(prices[security]) for security in securities]
+
+    mocker.patch("app.service.fund_account.valuation.get_security_prices", side_effect=fake_get_security_prices)
+    position_list = [
+        FundAccountPositionInDB(**{**fund_account_position_data, "fund_id": "a", "volume": 100}),
+        FundAccountPositionInDB(**{**fund_account_position_data, "fund_id": "a", "symbol": "000001", "exchange": "CNSESZ", "volume": 300}),
+        FundAccountPositionInDB(**{**fund_account_position_data, "fund_id": "b", "volume": 200}),
+    ]
+    securities = await calculate_securities(position_list)
+    assert securities == {"a": Decimal("1942.3"), "b": Decimal("2024.6")}
+    assert len(requested) == 1 and len(requested[0]) == 2
+    assert await calculate_securities([]) == {}
+
+
+async def test_calculate_securities_beyond_price_scale(mocker, fund_account_position_data):
+    async def fake_get_security_prices(securities, *args, **kwargs):
+        class FakeSecurityPrice:
+            current = Decimal("10.12345")
+
+        return [FakeSecurityPrice() for _ in securities]
+
+    mocker.patch("app.service.fund_account.valuation.get_security_prices", side_effect=fake_get_security_prices)
+    position_list = [FundAccountPositionInDB(**{**fund_account_position_data, "fund_id": "a", "volume": 300})]
+    # 价格超过4位小数时按Decimal计算
+    assert await calculate_securities(position_list) == {"a": Decimal("3037.035")}
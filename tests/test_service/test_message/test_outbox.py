@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.errors import MessageSendError
+from app.crud.msg import get_outbox_messages
+from app.enums.user import 发件箱状态, 发送消息类型
+from app.service.message.outbox import deliver_outbox, enqueue_messages
+from app.service.message.send import build_signal_message, get_signal_batch
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeSender:
+    def __init__(self, fail_to=()):
+        self.fail_to = set(fail_to)
+        self.sent = []
+
+    async def send(self, send_type, to, title, content):
+        if to in self.fail_to:
+            raise MessageSendError(message="连接失败")
+        self.sent.append(to)
+
+
+async def test_deliver_outbox(fixture_db):
+    tdate = datetime(2021, 3, 5)
+    users = [
+        {"username": f"outbox_user_{i}", "send_type": 发送消息类型.email, "email": f"outbox_user_{i}@example.com"} for i in range(3)
+    ]
+    assert build_signal_message({**users[0], "send_type": 发送消息类型.we_chat}, "<p>signal</p>", tdate) is None
+    messages = [build_signal_message(user, "<p>signal</p>", tdate) for user in users]
+    await enqueue_messages(fixture_db, messages)
+    # 重复写入不会产生重复消息
+    await enqueue_messages(fixture_db, messages)
+    batch = get_signal_batch(tdate)
+    assert len(await get_outbox_messages(fixture_db, {"batch": batch})) == 3
+
+    sender = FakeSender(fail_to={users[0]["email"]})
+    assert await deliver_outbox(fixture_db, batch, sender) == {"sent": 2, "failed": 1}
+    failed, = await get_outbox_messages(fixture_db, {"batch": batch, "status": 发件箱状态.failed})
+    assert (failed.username, failed.attempts, failed.error) == (users[0]["username"], 1, "连接失败")
+
+    # 再次发送时只发送失败的消息
+    sender = FakeSender()
+    assert await deliver_outbox(fixture_db, batch, sender) == {"sent": 1, "failed": 0}
+    assert sender.sent == [users[0]["email"]]
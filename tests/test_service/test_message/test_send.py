@@ -12,6 +12,7 @@ from app.service.message.send import (
     get_equipment_signal,
     get_equipment_signal_by_user,
     get_package_signal,
+    get_package_signal_frame,
     send_message,
 )
 from tests.consts.signal import const_signal
@@ -175,3 +176,39 @@ async def test_get_equipment_signal_by_user(
     response = await get_equipment_signal_by_user(fixture_db, user, tdate, signals)
     assert isinstance(response, str)
     assert fixture_create_equipments[0]["名称"] in response
+
+
+async def test_get_package_signal_frame(fixture_db, fixture_settings, mocker):
+    collection = fixture_db[fixture_settings.db.DB_NAME][fixture_settings.collections.EQUIPMENT]
+    equipments = [
+        {"标识符": "11000000package", "装备列表": ["04000000risk01", "04000000risk02"]},
+        {"标识符": "04000000risk01", "策略话术": "风险1"},
+        {"标识符": "04000000risk02", "策略话术": "风险2"},
+    ]
+    await collection.insert_many(equipments)
+    frames = {
+        "04000000risk01": DataFrame(
+            {"tdate": ["2021-03-05"] * 2, "symbol": ["600000", "000001"], "exchange": ["CNSESH", "CNSESZ"], "grade": ["高风险", "."]}
+        ),
+        "04000000risk02": DataFrame({"tdate": ["2021-03-05"], "symbol": ["600000"], "exchange": ["CNSESH"], "grade": ["低风险"]}),
+    }
+    mocker.patch("app.service.message.send.get_strategy_signal", side_effect=lambda sid, start, end: frames[sid])
+    mock_query_stock_price = mocker.patch(
+        "app.service.message.send.query_stock_price",
+        side_effect=lambda args: [{"symbol": x.split("_")[0], "symbol_name": f"name_{x}"} for x in args],
+    )
+    tdate = get_early_morning()
+    package_signal = await get_package_signal_frame(fixture_db, "11000000package", tdate, tdate)
+    # 同一天同一股票的风险合并, 无效信号被过滤
+    assert package_signal.frame.to_dict("records") == [
+        {"tdate": "2021-03-05", "symbol": "600000", "exchange": "1", "risk": "风险1<br />风险2"}
+    ]
+    result = package_signal.for_symbols(["600000", "600519"])
+    assert result.to_dict("records") == [
+        {"日期": "2021-03-05", "股票名称": "name_600000_1", "股票代码": "600000", "当前风险": "风险1<br />风险2"}
+    ]
+    # 股票名称只查询一次
+    package_signal.for_symbols(["600000"])
+    assert mock_query_stock_price.call_count == 1
+    assert package_signal.for_symbols(["300750"]).empty
+    await collection.delete_many({"标识符": {"$in": [x["标识符"] for x in equipments]}})
@@ -0,0 +1,17 @@
+from app import settings
+from app.service.mongodb.index import IndexSpec, get_index_registry
+
+
+def test_get_index_registry():
+    registry = get_index_registry()
+    flow_indexes = registry[settings.collections.FUND_ACCOUNT_FLOW]
+    assert IndexSpec(settings.collections.FUND_ACCOUNT_FLOW, (("fund_id", 1), ("tdate", 1)), False) in flow_indexes
+    user_indexes = registry[settings.collections.USER]
+    assert IndexSpec(settings.collections.USER, (("username", 1),), True) in user_indexes
+    assert "job" in registry
+
+
+def test_get_index_registry_filter():
+    registry = get_index_registry([settings.collections.PORTFOLIO])
+    assert list(registry) == [settings.collections.PORTFOLIO]
+    assert IndexSpec(settings.collections.PORTFOLIO, (("status", 1), ("category", 1)), False).name == "status_1_category_1"
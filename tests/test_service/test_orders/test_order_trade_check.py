@@ -1,12 +1,15 @@
+import asyncio
+
 import pytest
 
 from app.crud.order import create_order
+from app.global_var import G
 from app.models.order import Order
 from app.models.portfolio import Portfolio
 from app.schema.order import OrderInCreate
 from app.schema.portfolio import PortfolioInResponse
 from app.service.orders.order_trade import OrderTrade
-from app.service.orders.order_trade_check import CheckOrder
+from app.service.orders.order_trade_check import CheckOrder, OrderMonitor
 from tests.consts.mock_pt_response_data import PT_ORDER_GET_RESPONSE
 from tests.consts.order import order_in_db_data
 from tests.test_helper import get_random_str
@@ -23,3 +26,79 @@ async def test_check_order(portfolio_in_db: Portfolio, logged_in_free_user, fixt
     task_id = get_random_str()
     await OrderTrade.insert_to_monitor_pool(portfolio, [order], task_id)
     await CheckOrder.check_order()
+
+
+def test_order_monitor_schedule():
+    monitor = OrderMonitor(G.entrust_redis, min_interval=1, max_interval=5, backoff=2)
+    monitor.schedule("a", changed=False, now=0)
+    assert monitor._next_check["a"] == 1
+    for expected in (2, 4, 5, 5):
+        monitor.schedule("a", changed=False, now=0)
+        assert monitor._intervals["a"] == expected
+    monitor.schedule("a", changed=True, now=10)
+    assert monitor._next_check["a"] == 11
+    assert not monitor.is_due("a", 10)
+    monitor.notify("a")
+    assert monitor.is_due("a", 10)
+
+
+async def test_order_monitor_check(mocker, portfolio_in_db: Portfolio):
+    portfolio = PortfolioInResponse(**portfolio_in_db.dict())
+    order = Order(**{**order_in_db_data, "status": "1"})
+    await OrderTrade.insert_to_monitor_pool(portfolio, [order])
+    calls = []
+
+    async def fake_get_entrust_orders(fund_ids):
+        calls.append(fund_ids)
+        return {fund_id: {order.order_id: {"order_status": order.status.value}} for fund_id in fund_ids}
+
+    mocker.patch(
+        "app.service.orders.order_trade_check.get_entrust_orders_recent_by_fund_ids",
+        side_effect=fake_get_entrust_orders,
+    )
+    monitor = OrderMonitor(G.entrust_redis, min_interval=60)
+    await monitor.check()
+    assert calls == [[portfolio.fund_account[0].fundid]]
+    # 订单状态无变化, 未到下次检测时间
+    await monitor.check()
+    assert len(calls) == 1
+    # 新委托加入监测池后立即检测
+    monitor._portfolios.set(str(portfolio.id), "stale")
+    await OrderTrade.insert_to_monitor_pool(portfolio, [order])
+    await monitor.check()
+    assert len(calls) == 2
+    # 版本号变化时重新加载组合信息
+    assert monitor._portfolios.get(str(portfolio.id)) != "stale"
+    await G.entrust_redis.hdel(OrderTrade.PORTFOLIO_HASH, str(portfolio.id))
+    await G.entrust_redis.delete(str(portfolio.id))
+
+
+async def test_order_monitor_listen_resubscribe(mocker):
+    class FakeChannel:
+        def __init__(self, messages):
+            self.messages = messages
+
+        async def wait_message(self):
+            return bool(self.messages)
+
+        async def get(self, encoding=None):
+            return self.messages.pop(0)
+
+    channels = [FakeChannel(["a"]), FakeChannel(["b"])]
+
+    async def fake_subscribe(channel):
+        if not channels:
+            raise asyncio.CancelledError
+        return channels.pop(0)
+
+    redis = mocker.Mock()
+    redis.subscribe = mocker.Mock(side_effect=fake_subscribe)
+    redis.unsubscribe = mocker.Mock(side_effect=lambda channel: asyncio.sleep(0))
+    monitor = OrderMonitor(redis, min_interval=0, channel="order_status")
+    notified = []
+    mocker.patch.object(monitor, "notify", side_effect=notified.append)
+    with pytest.raises(asyncio.CancelledError):
+        await monitor.listen()
+    # 第一个连接断开后重新订阅, 继续接收通知
+    assert notified == ["a", "b"]
+    assert redis.subscribe.call_count == 3
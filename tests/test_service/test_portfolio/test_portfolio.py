@@ -19,6 +19,7 @@ from app.schema.portfolio import PortfolioInResponse
 from app.schema.user import User
 from app.service.portfolio.portfolio import (
     PortfolioTools,
+    downsample,
     get_account_asset,
     get_account_position,
     get_account_stock_position,
@@ -81,28 +82,30 @@ async def test_get_portfolio_yield_trend(
         tdate - timedelta(days=100), tdate
     )
 
-    async def fake_get_portfolio_assessment_time_series_data(conn, portfolio, tdate):
-
-        tdate_yield_mapping = {
-            start_date.date(): 0,
-            day1.date(): 1,
-            day2.date(): 2,
-            end_date.date(): 3,
-        }
-
-        class Assessment:
-            account_yield = tdate_yield_mapping[tdate]
-
-        return [Assessment()]
+    async def fake_get_portfolio_yield_time_series_data(conn, portfolio, start_date_, end_date_):
+        return [
+            PortfolioAssessmentTimeSeriesDataInDB(portfolio=portfolio, tdate=day, account_yield=index)
+            for index, day in enumerate([start_date, day1, day2, end_date])
+        ]
 
     mocker.patch(
-        "app.service.portfolio.portfolio.get_portfolio_assessment_time_series_data",
-        side_effect=fake_get_portfolio_assessment_time_series_data,
+        "app.service.portfolio.portfolio.get_portfolio_yield_time_series_data",
+        side_effect=fake_get_portfolio_yield_time_series_data,
     )
     data_list = await get_portfolio_yield_trend(
         fixture_db, portfolio, start_date=start_date, end_date=end_date
     )
     assert [data["profit_rate"] for data in data_list] == [0, 1, 2, 3]
+    data_list = await get_portfolio_yield_trend(
+        fixture_db, portfolio, start_date=start_date, end_date=end_date, max_points=2
+    )
+    assert [data["profit_rate"] for data in data_list] == [0, 3]
+
+
+def test_downsample():
+    assert downsample(list(range(10))) == list(range(10))
+    assert downsample(list(range(10)), 4) == [0, 3, 6, 9]
+    assert downsample(list(range(3)), 5) == [0, 1, 2]
 
 
 async def test_get_yield_trend(
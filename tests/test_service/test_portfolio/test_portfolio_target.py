@@ -1,5 +1,8 @@
 import pytest
-from datetime import datetime
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
 
 from app.crud.time_series_data import create_portfolio_assessment_time_series_data
 from app.crud.user import get_user_by_username
@@ -7,12 +10,12 @@ from app.models.portfolio import Portfolio
 from app.models.time_series_data import PortfolioAssessmentTimeSeriesDataInDB
 from app.schema.user import User
 from app.service.datetime import get_early_morning
+from app.service.fund_account.fund_account import calculation_simple_ability
 from app.service.portfolio.portfolio_target import (
     PortfolioTargetTools,
-    get_code_data,
     get_user_portfolio_targets,
 )
-from app.utils.datetime import date2datetime
+from app.service.portfolio.target_engine import calculate_swr, slice_series
 
 pytestmark = pytest.mark.asyncio
 
@@ -34,30 +37,6 @@ CODE_RESULT_MAPPING = [
 ]
 
 
-@pytest.mark.parametrize("code, result", CODE_RESULT_MAPPING)
-async def test_get_code_data(
-    code, result, fixture_db, portfolio_with_fund_time_series_data
-):
-    portfolio, fund_account, asset_time_series_data_list, days = portfolio_with_fund_time_series_data
-    assessment_in_db = PortfolioAssessmentTimeSeriesDataInDB(
-        portfolio=portfolio.id, tdate=date2datetime()
-    )
-    assessment = await create_portfolio_assessment_time_series_data(
-        fixture_db, assessment_in_db
-    )
-
-    rv = await get_code_data(
-        fixture_db,
-        code,
-        portfolio,
-        assessment,
-        fund_account,
-        days[0],
-        days[-1]
-    )
-    assert rv == result
-
-
 async def test_get_config(fixture_db, logged_in_free_user):
     user = User(**logged_in_free_user["user"])
     rv = await PortfolioTargetTools.get_config(fixture_db, user)
@@ -124,3 +103,17 @@ async def test_get_user_portfolio_targets(
     assert len(rv) == 1
     assert rv[0].user.username == user.username
     assert rv[0].data
+
+
+def test_calculate_swr(mocker):
+    days = [date(2021, 3, 1), date(2021, 3, 2), date(2021, 3, 3), date(2021, 3, 4)]
+    assets = pd.Series(dict(zip(days, [100.0, 110.0, 120.0, 150.0])), dtype=np.float64, name="股票资产")
+    net_deposit = pd.Series({days[1]: 5.0, days[3]: 10.0}, dtype=np.float64, name="当日净入金_中间值")
+    mocker.patch("app.service.portfolio.target_engine.FastTdate.next_tdate", side_effect=lambda x: days[days.index(x) + 1])
+    assert calculate_swr(assets, net_deposit, days[0], days[3]) == pytest.approx(
+        calculation_simple_ability(slice_series(net_deposit, days[1], days[3]), assets)
+    )
+    assert calculate_swr(assets, net_deposit, days[2], days[3]) == pytest.approx(
+        calculation_simple_ability(net_deposit[days[3]:], assets[days[2]:])
+    )
+    assert calculate_swr(assets.iloc[:0], net_deposit, days[0], days[3]) == 0
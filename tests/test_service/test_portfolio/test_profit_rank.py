@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from app.enums.portfolio import PortfolioCategory
+from app.service.fund_account.fund_account import calculation_simple
+from app.service.portfolio.profit_rank import ProfitRankEngine
+
+pytestmark = pytest.mark.asyncio
+
+ASSETS = pd.Series([100.0, 110.0, 120.0, 150.0])
+DEPOSITS = pd.Series([0.0, 5.0, 0.0, 10.0])
+
+
+class FakeRedis:
+    def __init__(self):
+        self.scores = {}
+
+    async def zadd(self, key, *pairs):
+        self.scores.update(dict(zip(pairs[1::2], pairs[::2])))
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.scores.pop(member, None)
+
+    async def zrevrange(self, key, withscores=False):
+        return sorted(self.scores.items(), key=lambda x: x[1], reverse=True)
+
+
+@pytest.fixture
+def fake_time_series(mocker):
+    end_date = datetime(2021, 3, 5)
+    last_tdate = datetime(2021, 3, 4)
+    calls = []
+
+    async def fake_get_assets_time_series_data(conn, portfolio, start_date, end_date_):
+        calls.append((start_date, end_date_))
+        return ASSETS[-1:] if start_date == end_date else ASSETS[:-1]
+
+    async def fake_get_net_deposit_flow(conn, portfolio, start_date, end_date_, include_capital=True):
+        return DEPOSITS[-1:] if start_date == end_date else DEPOSITS[:-1]
+
+    mocker.patch.object(ProfitRankEngine, "get_date_range", return_value=(datetime(2021, 3, 1), end_date))
+    mocker.patch("app.service.portfolio.profit_rank.FastTdate.last_tdate", return_value=last_tdate)
+    mocker.patch("app.service.portfolio.profit_rank.get_assets_time_series_data", side_effect=fake_get_assets_time_series_data)
+    mocker.patch("app.service.portfolio.profit_rank.get_net_deposit_flow", side_effect=fake_get_net_deposit_flow)
+    return calls
+
+
+async def test_calculate_profit_rate_incremental(fake_time_series):
+    portfolio = SimpleNamespace(id="p1", create_date=datetime.utcnow() - timedelta(days=10), category=PortfolioCategory.SimulatedTrading)
+    engine = ProfitRankEngine(None, FakeRedis())
+    expected = calculation_simple(DEPOSITS, ASSETS)
+    assert await engine.calculate_profit_rate(portfolio) == pytest.approx(expected)
+    assert await engine.calculate_profit_rate(portfolio) == pytest.approx(expected)
+    history_calls = [call for call in fake_time_series if call[0] != call[1]]
+    assert len(history_calls) == 1
+
+
+async def test_rank_removes_stale_portfolio():
+    redis = FakeRedis()
+    engine = ProfitRankEngine(None, redis)
+    await engine.rank({"a": 0.1, "b": 0.3, "c": 0.2})
+    ranking = await engine.rank({"a": 0.4, "b": 0.3})
+    assert ranking == [("a", 0.4), ("b", 0.3)]
+    assert "c" not in redis.scores
+
+
+def test_is_changed():
+    engine = ProfitRankEngine(None, FakeRedis())
+    portfolio = SimpleNamespace(rank=1, over_percent=1.0, profit_rate=0.1)
+    assert not engine.is_changed(portfolio, 0.1 + 1e-9, 1, 1.0)
+    assert engine.is_changed(portfolio, 0.1, 2, 0.5)
+    assert engine.is_changed(portfolio, 0.2, 1, 1.0)
+    assert engine.is_changed(SimpleNamespace(rank=1, over_percent=None, profit_rate=0.1), 0.1, 1, 1.0)
+    assert engine.is_changed(SimpleNamespace(rank=1, over_percent=1.0, profit_rate=None), 0.1, 1, 1.0)
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.crud.portfolio import get_portfolio_snapshot_from_db
+from app.models.portfolio import PortfolioSnapshotInDB
+from app.models.rwmodel import PyDecimal, PyObjectId
+from app.service.portfolio.target_engine import calculate_swr
+from app.service.portfolio.snapshot import (
+    PortfolioSnapshotEngine,
+    calculate_base_swr,
+    get_portfolio_snapshot,
+    invalidate_portfolio_snapshot,
+    patch_snapshot,
+)
+
+pytestmark = pytest.mark.asyncio
+
+DAYS = [date(2021, 3, 1), date(2021, 3, 2), date(2021, 3, 3), date(2021, 3, 4)]
+
+
+def test_calculate_base_swr(mocker):
+    assets = pd.Series(dict(zip(DAYS, [100.0, 110.0, 120.0, 150.0])), dtype=np.float64, name="股票资产")
+    net_deposit = pd.Series({DAYS[1]: 5.0, DAYS[3]: 10.0}, dtype=np.float64, name="当日净入金_中间值")
+    next_tdate = lambda x: DAYS[DAYS.index(x) + 1]
+    mocker.patch("app.service.portfolio.target_engine.FastTdate.next_tdate", side_effect=next_tdate)
+    mocker.patch("app.service.portfolio.snapshot.FastTdate.next_tdate", side_effect=next_tdate)
+    profit_rate_day = (150.0 - 120.0 - 10.0) / (120.0 + 10.0)
+    for start_date in DAYS[:3]:
+        base_profit_rate = calculate_base_swr(assets, net_deposit, start_date, DAYS[3])
+        assert (1 + base_profit_rate) * (1 + profit_rate_day) - 1 == pytest.approx(
+            calculate_swr(assets, net_deposit, start_date, DAYS[3])
+        )
+    assert calculate_base_swr(assets[DAYS[3]:], net_deposit, DAYS[2], DAYS[3]) is None
+
+
+def test_patch_snapshot():
+    snapshot = PortfolioSnapshotInDB(
+        portfolio=PyObjectId("5fa3c3d1d9f8b1a2c3e4f5a6"),
+        tdate=datetime(2021, 3, 4),
+        start_date=datetime(2021, 3, 1),
+        weekly_start_date=datetime(2021, 3, 1),
+        monthly_start_date=datetime(2021, 3, 1),
+        base_profit_rates={"profit_rate": 0.2, "daily_profit_rate": 0},
+        base_assets=100,
+    )
+    fund_asset = SimpleNamespace(assets=PyDecimal("110"), securities=PyDecimal("60"), cash=PyDecimal("50"))
+    update = patch_snapshot(snapshot, fund_asset)
+    assert update["profit_rate"] == pytest.approx(1.2 * 1.1 - 1)
+    assert update["daily_profit_rate"] == pytest.approx(0.1)
+    assert "weekly_profit_rate" not in update
+    assert update["assets"] == fund_asset.assets
+    # 盘中新增的当日入金不计入收益
+    update = patch_snapshot(snapshot, fund_asset, 10)
+    assert update["daily_profit_rate"] == pytest.approx(0)
+    assert update["base_net_deposit"] == 10
+
+
+async def test_get_portfolio_snapshot(fixture_db, portfolio_for_target_data, mocker):
+    build = mocker.spy(PortfolioSnapshotEngine, "build")
+    snapshot = await get_portfolio_snapshot(fixture_db, portfolio_for_target_data)
+    assert await get_portfolio_snapshot_from_db(fixture_db, portfolio_for_target_data.id) is not None
+    assert (await get_portfolio_snapshot(fixture_db, portfolio_for_target_data)).profit_rate == snapshot.profit_rate
+    assert build.call_count == 1
+
+
+async def test_invalidate_portfolio_snapshot(fixture_db, portfolio_for_target_data):
+    await get_portfolio_snapshot(fixture_db, portfolio_for_target_data)
+    await invalidate_portfolio_snapshot(fixture_db, portfolio_for_target_data.fund_account[0].fundid)
+    assert await get_portfolio_snapshot_from_db(fixture_db, portfolio_for_target_data.id) is None
@@ -9,7 +9,7 @@ from app.models.fund_account import FundAccountPositionInDB
 from app.models.portfolio import Portfolio
 from app.schema.user import User
 from app.service.datetime import get_early_morning
-from app.service.portfolio.stock_statistics import StockStatisticsTools, get_trade_num
+from app.service.portfolio.stock_statistics import StockStatisticsTools
 
 pytestmark = pytest.mark.asyncio
 
@@ -46,17 +46,3 @@ async def test_get_data(
     assert rv[0]["symbol"] == position_data["symbol"]
     assert rv[0]["data"]
 
-
-async def test_get_trade_num(
-    fixture_db, portfolio_with_flow: Portfolio, fund_account_flow_data
-):
-    tdate = get_early_morning()
-    rv = await get_trade_num(
-        fixture_db,
-        portfolio_with_flow.fund_account[0],
-        tdate,
-        tdate,
-        fund_account_flow_data["symbol"],
-        portfolio_with_flow,
-    )
-    assert rv == 1
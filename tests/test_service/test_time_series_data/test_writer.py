@@ -0,0 +1,42 @@
+import pytest
+from pymongo import DeleteOne
+
+from app.service.time_series_data.writer import TimeSeriesDataWriter
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeRedis:
+    def __init__(self):
+        self.members = set()
+
+    async def smembers(self, key, default=None):
+        return list(self.members)
+
+    async def sadd(self, key, *members):
+        self.members.update(members)
+
+    async def execute(self, *args, **kwargs):
+        ...
+
+
+async def test_time_series_data_writer(mocker):
+    batches = []
+
+    async def fake_bulk_write(conn, operations):
+        batches.append(operations)
+
+    mocker.patch("app.service.time_series_data.writer.bulk_write_position_time_series_data", side_effect=fake_bulk_write)
+    mocker.patch("app.service.time_series_data.writer.bulk_write_fund_time_series_data", side_effect=fake_bulk_write)
+    redis = FakeRedis()
+    writer = TimeSeriesDataWriter(None, redis, "checkpoint", max_size=4)
+    await writer.add("a", [DeleteOne({"_id": 1})], [DeleteOne({"_id": 1})])
+    assert not batches
+    assert await writer.get_checkpoints() == set()
+    await writer.add("b", [DeleteOne({"_id": 2})], [DeleteOne({"_id": 2})])
+    assert len(batches) == 2
+    assert await writer.get_checkpoints() == {"a", "b"}
+    await writer.add("c", [DeleteOne({"_id": 3})], [])
+    await writer.flush()
+    assert len(batches) == 3
+    assert await writer.get_checkpoints() == {"a", "b", "c"}